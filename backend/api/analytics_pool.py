@@ -0,0 +1,293 @@
+"""
+Pool de procesos para los cálculos de analítica (serie de valor de la cartera).
+
+La serie se calcula en Python puro y retiene el GIL: ejecutada en el threadpool de FastAPI, una
+serie grande retrasa `/health` y las lecturas pequeñas. `AnalyticsExecutor` la envía a procesos
+worker que mantienen en caliente una instantánea de sólo lectura (trades, columnas de precios y
+la matriz FX memory-mapped) mientras no cambien las versiones de datos; en carteras grandes la
+valoración por ticker se reparte entre varios workers.
+
+El número de cálculos simultáneos está acotado (`PORTFOLIO_ANALYTICS_MAX_CONCURRENT`) y los que
+esperan hueco cuentan en la profundidad de cola (`PORTFOLIO_ANALYTICS_MAX_QUEUE`; por encima se
+responde 503). Si el cliente se desconecta, lo que aún no ha empezado se cancela y el resultado de
+lo que ya corre se descarta. `PORTFOLIO_ANALYTICS_WORKERS=0` calcula en el hilo de la petición.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+from cash_ledger import refresh_cash_ledger
+from db import get_connection
+from fx_matrix import get_fx_matrix
+from logging_config import configure_root_logging
+from price_store import refresh_price_columns
+from .http_cache import read_data_versions
+from .portfolio_service import build_value_by_date, collect_trades_and_cash, merge_missing_points, new_missing_data, value_series_payload
+
+LOGGER = logging.getLogger(__name__)
+
+# A partir de cuántos tickers se reparte la valoración entre workers
+PARALLEL_MIN_TICKERS = 64
+# Cada cuánto se comprueba la cancelación mientras se espera hueco o resultado
+CANCEL_POLL_SECONDS = 0.05
+# Cada cuánto se comprueba si el cliente sigue conectado
+DISCONNECT_POLL_SECONDS = 0.1
+# Código no estándar (el de nginx) para peticiones cuyo cliente cerró la conexión
+CLIENT_CLOSED_REQUEST = 499
+# Tablas cuya versión invalida la instantánea de un worker (FX se valida en `get_fx_matrix`)
+SNAPSHOT_TABLES = ("trades", "prices")
+
+
+class AnalyticsCancelled(Exception):
+  """El cliente se desconectó y el cálculo se abandonó."""
+
+
+def _env_int(name: str, default: int) -> int:
+  try:
+    return max(0, int(os.environ.get(name, default)))
+  except ValueError:
+    return default
+
+
+def default_workers() -> int:
+  """`PORTFOLIO_ANALYTICS_WORKERS` o, por defecto, un worker por núcleo libre (entre 1 y 4)."""
+  return _env_int("PORTFOLIO_ANALYTICS_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1)))
+
+
+# --- Lado worker ---------------------------------------------------------------------------
+
+class _Snapshot:
+  """Datos de sólo lectura que un worker reutiliza entre tareas mientras no cambien las versiones."""
+  __slots__ = ("db_path", "versions", "trades_and_cash", "price_columns")
+
+  def __init__(self, db_path: str, versions: Dict[str, Tuple[int, str]]) -> None:
+    self.db_path = db_path
+    self.versions = versions
+    self.trades_and_cash: Optional[Tuple[Any, Any]] = None
+    self.price_columns: Dict[str, Any] = {}
+
+
+_SNAPSHOT: Optional[_Snapshot] = None
+
+
+def _init_worker() -> None:
+  # Ctrl+C lo gestiona el proceso principal, que cierra el pool
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  configure_root_logging()
+
+
+def _snapshot(conn, db_path: str) -> _Snapshot:
+  global _SNAPSHOT
+  versions = read_data_versions(conn, SNAPSHOT_TABLES)
+  if _SNAPSHOT is None or _SNAPSHOT.db_path != db_path or _SNAPSHOT.versions != versions:
+    _SNAPSHOT = _Snapshot(db_path, versions)
+  if _SNAPSHOT.trades_and_cash is None:
+    _SNAPSHOT.trades_and_cash = collect_trades_and_cash(conn)
+  return _SNAPSHOT
+
+
+def _ticker_values_task(db_path: str, base_currency: str, tickers: Sequence[str]):
+  """Valor diario de las posiciones de `tickers` y sus faltantes punto a punto."""
+  conn = get_connection(db_path)
+  try:
+    snapshot = _snapshot(conn, db_path)
+    trades, ticker_currency = snapshot.trades_and_cash
+    missing_data = new_missing_data(points=True)
+    subset = {ticker: trades[ticker] for ticker in tickers if ticker in trades}
+    values = build_value_by_date(conn, subset, ticker_currency, base_currency, missing_data=missing_data, price_columns=snapshot.price_columns)
+    return values, missing_data['points']
+  finally:
+    conn.close()
+
+
+def _value_series_task(db_path: str, meta: Dict[str, Any], options: Dict[str, Any], value_by_date: Optional[Dict[date, float]], missing_points: Optional[Dict[str, Set[Tuple[str, ...]]]]):
+  conn = get_connection(db_path)
+  try:
+    snapshot = _snapshot(conn, db_path)
+    missing_data = new_missing_data(points=(options.get('missing') == 'points'))
+    if missing_points:
+      merge_missing_points(missing_data, missing_points)
+    return value_series_payload(
+      conn, meta, **options, missing_data=missing_data, value_by_date=value_by_date,
+      trades_and_cash=snapshot.trades_and_cash, price_columns=snapshot.price_columns
+    )
+  finally:
+    conn.close()
+
+
+# --- Lado servidor -------------------------------------------------------------------------
+
+class AnalyticsExecutor:
+  def __init__(self, workers: Optional[int] = None, max_concurrent: Optional[int] = None, max_queue: Optional[int] = None) -> None:
+    self.workers = default_workers() if workers is None else workers
+    if max_concurrent is None:
+      max_concurrent = _env_int("PORTFOLIO_ANALYTICS_MAX_CONCURRENT", max(self.workers, 1))
+    self.max_concurrent = max(1, max_concurrent)
+    self.max_queue = _env_int("PORTFOLIO_ANALYTICS_MAX_QUEUE", 32) if max_queue is None else max_queue
+    self._lock = threading.Lock()
+    self._slots = threading.Condition(self._lock)
+    self._pool: Optional[ProcessPoolExecutor] = None
+    self._queued = 0
+    self._running = 0
+    self._tasks = 0
+    self._wait_seconds = 0.0
+    self._counters = {"completed": 0, "failed": 0, "cancelled": 0, "rejected": 0}
+
+  @contextmanager
+  def slot(self, cancel: Optional[threading.Event] = None) -> Iterator[None]:
+    """Espera (en cola) a que haya hueco bajo el límite de concurrencia; 503 si la cola está llena."""
+    start = time.perf_counter()
+    with self._slots:
+      if self._running >= self.max_concurrent and self._queued >= self.max_queue:
+        self._counters["rejected"] += 1
+        raise HTTPException(status_code=503, detail='Demasiados cálculos en curso, reintente más tarde', headers={'Retry-After': '1'})
+      self._queued += 1
+      try:
+        while self._running >= self.max_concurrent:
+          if cancel is not None and cancel.is_set():
+            self._counters["cancelled"] += 1
+            raise AnalyticsCancelled()
+          self._slots.wait(CANCEL_POLL_SECONDS)
+      finally:
+        self._queued -= 1
+      self._running += 1
+      self._wait_seconds += time.perf_counter() - start
+    status = "failed"
+    try:
+      yield
+      status = "completed"
+    except AnalyticsCancelled:
+      status = "cancelled"
+      raise
+    finally:
+      with self._slots:
+        self._running -= 1
+        self._counters[status] += 1
+        self._slots.notify()
+
+  def _get_pool(self) -> ProcessPoolExecutor:
+    with self._lock:
+      if self._pool is None:
+        # spawn: el proceso del servidor tiene hilos (listener de logging, precarga de proveedores)
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker)
+      return self._pool
+
+  def shutdown(self) -> None:
+    with self._lock:
+      pool, self._pool = self._pool, None
+    if pool is not None:
+      pool.shutdown(wait=False, cancel_futures=True)
+
+  def _wait(self, futures: List[Future], cancel: Optional[threading.Event]) -> List[Any]:
+    """Resultados en orden; si se cancela, anula las tareas que aún no han empezado."""
+    pending = set(futures)
+    while pending:
+      if cancel is not None and cancel.is_set():
+        for future in pending:
+          future.cancel()
+        raise AnalyticsCancelled()
+      done, pending = wait(pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_EXCEPTION)
+      for future in done:
+        if future.exception() is not None:
+          for other in pending:
+            other.cancel()
+          raise future.exception()
+    return [future.result() for future in futures]
+
+  def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+    future = self._get_pool().submit(fn, *args)
+    with self._lock:
+      self._tasks += 1
+    return future
+
+  def value_series(self, db_path: str, meta: Dict[str, Any], options: Dict[str, Any], cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """Cuerpo de `/portfolio/value/series` (ver `value_series_payload`) calculado en el pool."""
+    with self.slot(cancel):
+      if self.workers > 0:
+        try:
+          return self._value_series_in_pool(db_path, meta, options, cancel)
+        except BrokenProcessPool:
+          LOGGER.exception("Pool de analítica caído; se recrea y esta serie se calcula en el hilo")
+          self.shutdown()
+      conn = get_connection(db_path)
+      try:
+        return value_series_payload(conn, meta, **options)
+      finally:
+        conn.close()
+
+  def _value_series_in_pool(self, db_path: str, meta: Dict[str, Any], options: Dict[str, Any], cancel: Optional[threading.Event]) -> Dict[str, Any]:
+    base_currency = meta['base_currency']
+    conn = get_connection(db_path)
+    try:
+      # Los workers sólo leen: dejar al día el libro de caja, los bloques de precios y la matriz FX persistida
+      refresh_cash_ledger(conn)
+      refresh_price_columns(conn)
+      get_fx_matrix(conn, base_currency)
+      weights = conn.execute("SELECT ticker, COUNT(*) FROM trades WHERE ticker IS NOT NULL GROUP BY ticker").fetchall()
+    finally:
+      conn.close()
+    value_by_date: Optional[Dict[date, float]] = None
+    missing_points: Optional[Dict[str, Set[Tuple[str, ...]]]] = None
+    if self.workers > 1 and len(weights) >= PARALLEL_MIN_TICKERS:
+      # Reparto voraz por número de trades: cada tramo va al worker menos cargado
+      chunks: List[List[str]] = [[] for _ in range(self.workers)]
+      loads = [0] * self.workers
+      for ticker, count in sorted(weights, key=lambda row: -row[1]):
+        idx = loads.index(min(loads))
+        chunks[idx].append(ticker)
+        loads[idx] += count
+      futures = [self._submit(_ticker_values_task, db_path, base_currency, chunk) for chunk in chunks if chunk]
+      value_by_date, missing_points = {}, {}
+      for values, points in self._wait(futures, cancel):
+        for day, value in values.items():
+          value_by_date[day] = value_by_date.get(day, 0.0) + value
+        for key, items in points.items():
+          missing_points.setdefault(key, set()).update(items)
+    future = self._submit(_value_series_task, db_path, meta, options, value_by_date, missing_points)
+    return self._wait([future], cancel)[0]
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      return {
+        "workers": self.workers,
+        "max_concurrent": self.max_concurrent,
+        "max_queue": self.max_queue,
+        "queued": self._queued,
+        "running": self._running,
+        "tasks": self._tasks,
+        "wait_seconds": round(self._wait_seconds, 6),
+        **self._counters,
+      }
+
+
+async def run_cancellable(request: Request, fn: Callable[[threading.Event], Any]) -> Any:
+  """
+  Ejecuta `fn(cancel)` en el threadpool vigilando la conexión: si el cliente se desconecta se marca
+  `cancel` y, cuando `fn` abandona el cálculo (`AnalyticsCancelled`), se responde 499.
+  """
+  cancel = threading.Event()
+  work = asyncio.ensure_future(run_in_threadpool(fn, cancel))
+  try:
+    while not work.done():
+      await asyncio.wait({work}, timeout=DISCONNECT_POLL_SECONDS)
+      if not work.done() and await request.is_disconnected():
+        cancel.set()
+        break
+    return await work
+  except AnalyticsCancelled:
+    LOGGER.info("Cálculo de %s cancelado: el cliente cerró la conexión", request.url.path)
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
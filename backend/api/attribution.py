@@ -0,0 +1,253 @@
+"""
+Atribución de rendimiento por activo y por clase (`trades.asset_class`, más `CASH`) para un rango
+arbitrario (`GET /portfolio/attribution`).
+
+Las entradas se construyen una vez por versión de datos como matrices día × ticker sobre el
+calendario completo, a partir del índice temporal de `timeline` (cantidades por ticker), los
+cierres con forward-fill y la `FxMatrix`:
+- `values`: valor en moneda base al cierre de cada día.
+- `flows`: compras netas en base (el importe del trade en el libro de caja, comisión incluida).
+- `income`: dividendos del ticker en base.
+- `cash` y `external`: caja total en base y transferencias externas en base.
+
+Cada rango es un corte de esas matrices y todas las columnas se resuelven a la vez:
+- PnL diario de un activo: `V_t - V_{t-1} - F_t + D_t`.
+- PnL de la caja: el PnL total (`ΔTotal - externas`) menos el de los activos, es decir, diferencias
+  de cambio, conversiones y dividendos sin ticker reconocido.
+- Peso medio: media diaria de `V / Total`.
+- Contribución: `Σ PnL_t / Total_{t-1}` (suma lo mismo que el PnL sobre el patrimonio previo).
+- Rentabilidad: Dietz modificado, `PnL / (V_0 + Σ w_k F_k)` con `w_k = (T - k) / T`.
+
+Las operaciones que no mueven caja (opciones) y las de tickers sin ningún cierre no se pueden
+repartir entre activo y caja: se tratan como aportes o retiradas externas de la cartera. Antes del
+primer cierre de un ticker se usa ese primer cierre y el ticker se lista en `missing_prices`.
+"""
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from fx_matrix import FxMatrix
+from .portfolio_service import _parse_db_datetime
+from .timeline import QTY_EPSILON, PositionTimeline
+
+CASH_CLASS = "CASH"
+
+_TICKER_FLOWS_SQL = {
+  "trade": "SELECT t.ticker, c.day, c.currency, c.amount FROM cash_ledger c JOIN trades t ON t.id = c.source_id WHERE c.source = 'trade'",
+  "dividend": "SELECT d.ticker, c.day, c.currency, c.amount FROM cash_ledger c JOIN dividends d ON d.id = c.source_id WHERE c.source = 'dividend'",
+}
+
+
+def _fill(values: np.ndarray) -> Optional[np.ndarray]:
+  """Forward-fill y, antes del primer dato, el primer dato; None si no hay ninguno."""
+  valid = ~np.isnan(values)
+  if not valid.any():
+    return None
+  idx = np.where(valid, np.arange(len(values)), 0)
+  np.maximum.accumulate(idx, out=idx)
+  filled = values[idx]
+  filled[:int(np.argmax(valid))] = values[valid][0]
+  return filled
+
+
+class AttributionInputs:
+  """Matrices diarias (filas = días desde `start`, columnas = `tickers`) de un índice y una moneda base."""
+
+  def __init__(self, start: int, tickers: List[str], asset_class: List[str], values: np.ndarray, flows: np.ndarray, income: np.ndarray, cash: np.ndarray, external: np.ndarray, missing_prices: List[str], missing_fx: List[str]):
+    self.start = start
+    self.tickers = tickers
+    self.asset_class = asset_class
+    self.values = values
+    self.flows = flows
+    self.income = income
+    self.cash = cash
+    self.external = external
+    self.missing_prices = missing_prices
+    self.missing_fx = missing_fx
+
+  @property
+  def days(self) -> int:
+    return len(self.cash)
+
+  @classmethod
+  def build(cls, conn, timeline: PositionTimeline, fx_matrix: FxMatrix, today: Optional[date] = None) -> "AttributionInputs":
+    firsts = [steps[0][0] for steps in list(timeline.positions.values()) + list(timeline.cash.values()) if len(steps[0])]
+    lasts = [steps[0][-1] for steps in list(timeline.positions.values()) + list(timeline.cash.values()) if len(steps[0])]
+    if not firsts:
+      empty = np.zeros((0, 0))
+      return cls(0, [], [], empty, empty, empty, np.zeros(0), np.zeros(0), [], [])
+    start = int(min(firsts))
+    end = max(int(max(lasts)), (today or date.today()).toordinal())
+    grid = np.arange(start, end + 1, dtype=np.int64)
+    n = len(grid)
+    base = fx_matrix.base
+    classes = dict(conn.execute(
+      "SELECT ticker, MAX(COALESCE(asset_class, 'STK')) FROM trades WHERE ticker IS NOT NULL GROUP BY ticker"
+    ).fetchall())
+    fx_cache: Dict[str, Optional[np.ndarray]] = {}
+
+    def rates(currency: str) -> Optional[np.ndarray]:
+      if currency not in fx_cache:
+        fx_cache[currency] = _fill(fx_matrix.rates(currency, grid))
+      return fx_cache[currency]
+
+    tickers: List[str] = []
+    columns: List[np.ndarray] = []
+    missing_prices: List[str] = []
+    missing_fx = set()
+    for ticker, qty in sorted(timeline.quantities(grid).items()):
+      held = np.abs(qty) > QTY_EPSILON
+      if not held.any():
+        continue
+      currency = timeline.ticker_currency.get(ticker) or base
+      days, closes = timeline.prices(conn, ticker)
+      fx = rates(currency)
+      if not len(days) or fx is None:
+        if not len(days):
+          missing_prices.append(ticker)
+        else:
+          missing_fx.add(currency)
+        continue
+      idx = np.searchsorted(days, grid, side='right') - 1
+      if (held & (idx < 0)).any():
+        missing_prices.append(ticker)
+      tickers.append(ticker)
+      columns.append(qty * np.asarray(closes, dtype=np.float64)[np.maximum(idx, 0)] * fx)
+    position = {ticker: j for j, ticker in enumerate(tickers)}
+    asset_class = [classes.get(ticker) or 'STK' for ticker in tickers]
+
+    flows = np.zeros((n, len(tickers)))
+    income = np.zeros((n, len(tickers)))
+    external = np.zeros(n)
+    for source, matrix in (("trade", flows), ("dividend", income)):
+      for ticker, day, currency, amount in conn.execute(_TICKER_FLOWS_SQL[source]).fetchall():
+        d = _parse_db_datetime(day)
+        fx = rates(currency)
+        if d is None or fx is None:
+          continue
+        i = d.toordinal() - start
+        j = position.get(ticker)
+        if j is not None:
+          matrix[i, j] += (-amount if source == "trade" else amount) * fx[i]
+        elif source == "trade":
+          # Caja invertida en un ticker que no se valora: sale de la cartera
+          external[i] += amount * fx[i]
+    for ticker, j in position.items():
+      if asset_class[j] == 'STK':
+        continue
+      # Sin movimiento de caja: el importe del trade es a la vez compra del activo y aporte externo
+      days, amounts = timeline.amounts.get(ticker, (np.zeros(0, dtype=np.int64), np.zeros(0)))
+      converted = amounts * rates(timeline.ticker_currency.get(ticker) or base)[days - start]
+      np.add.at(flows[:, j], days - start, converted)
+      np.add.at(external, days - start, converted)
+
+    cash = np.zeros(n)
+    for currency, balances in timeline.balances(grid).items():
+      fx = rates(currency)
+      if fx is None:
+        missing_fx.add(currency)
+        continue
+      cash += balances * fx
+    for day, currency, amount in conn.execute("SELECT day, currency, amount FROM cash_ledger WHERE source = 'transfer' AND external = 1").fetchall():
+      d = _parse_db_datetime(day)
+      fx = rates(currency)
+      if d is not None and fx is not None:
+        external[d.toordinal() - start] += amount * fx[d.toordinal() - start]
+    values = np.column_stack(columns) if columns else np.zeros((n, 0))
+    return cls(start, tickers, asset_class, values, flows, income, cash, external, missing_prices, sorted(missing_fx))
+
+
+def _num(value: float) -> Optional[float]:
+  return None if np.isnan(value) else round(float(value), 4)
+
+
+def _dietz(pnl: np.ndarray, start_value: np.ndarray, flows: np.ndarray) -> np.ndarray:
+  """Dietz modificado por columna; `flows` con una fila por día del rango (entrada al inicio del día)."""
+  periods = flows.shape[0]
+  weights = (periods - np.arange(periods)) / periods
+  capital = start_value + weights @ flows
+  with np.errstate(invalid="ignore", divide="ignore"):
+    return np.where(capital > 0, pnl / capital, np.nan)
+
+
+def attribution(inputs: AttributionInputs, from_d: Optional[date] = None, to_d: Optional[date] = None) -> Dict[str, Any]:
+  """
+  Peso, PnL, contribución y rentabilidad por ticker y por clase entre `from_d` y `to_d` (incluidos),
+  partiendo del cierre del día anterior a `from_d`.
+  """
+  n = inputs.days
+  lo = min(max(from_d.toordinal() - inputs.start, 0), n) if from_d else 0
+  hi = min(max(to_d.toordinal() - inputs.start + 1, 0), n) if to_d else n
+  out: Dict[str, Any] = {
+    'start_date': None, 'end_date': None, 'days': max(hi - lo, 0),
+    'total': None, 'assets': [], 'classes': [],
+    'missing_prices': inputs.missing_prices, 'missing_fx': inputs.missing_fx
+  }
+  if lo >= hi:
+    return out
+  out['start_date'] = date.fromordinal(inputs.start + lo).isoformat()
+  out['end_date'] = date.fromordinal(inputs.start + hi - 1).isoformat()
+
+  # Activos y caja como columnas de una misma matriz (la caja es la última)
+  values = np.column_stack((inputs.values, inputs.cash))
+  previous = values[lo - 1:hi - 1] if lo else np.vstack((np.zeros((1, values.shape[1])), values[:hi - 1]))
+  values = values[lo:hi]
+  flows = inputs.flows[lo:hi]
+  income = inputs.income[lo:hi]
+  external = inputs.external[lo:hi]
+  total, total_prev = values.sum(axis=1), previous.sum(axis=1)
+  total_pnl = total - total_prev - external
+  asset_pnl = values[:, :-1] - previous[:, :-1] - flows + income
+  cash_pnl = total_pnl - asset_pnl.sum(axis=1)
+  cash_flows = values[:, -1] - previous[:, -1] - cash_pnl
+  pnl = np.column_stack((asset_pnl, cash_pnl))
+  # Entradas netas en cada columna: compras menos dividendos cobrados (que pasan a la caja)
+  net_flows = np.column_stack((flows - income, cash_flows))
+  income = np.column_stack((income, np.zeros(hi - lo)))
+
+  classes = sorted(set(inputs.asset_class)) + [CASH_CLASS]
+  membership = np.zeros((values.shape[1], len(classes)))
+  membership[np.arange(values.shape[1]), [classes.index(c) for c in inputs.asset_class + [CASH_CLASS]]] = 1.0
+
+  with np.errstate(invalid="ignore", divide="ignore"):
+    share = np.where(total[:, None] > 0, values / total[:, None], np.nan)
+    relative = np.where(total_prev[:, None] > 0, pnl / total_prev[:, None], 0.0)
+
+  def columns(matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    # Mismas métricas sobre activos (matrix = identidad) o sobre clases (matrix = pertenencia)
+    grouped_pnl = pnl.sum(axis=0) @ matrix
+    start_value = previous[0] @ matrix
+    grouped_flows = net_flows @ matrix
+    weighted = share @ matrix
+    return {
+      'start_value': start_value,
+      'end_value': values[-1] @ matrix,
+      'net_flows': grouped_flows.sum(axis=0),
+      'income': income.sum(axis=0) @ matrix,
+      'pnl': grouped_pnl,
+      'weight': np.nanmean(weighted, axis=0) if (total > 0).any() else np.full(matrix.shape[1], np.nan),
+      'contribution': relative.sum(axis=0) @ matrix,
+      'return': _dietz(grouped_pnl, start_value, grouped_flows),
+    }
+
+  per_asset = columns(np.eye(values.shape[1]))
+  per_class = columns(membership)
+  active = (np.abs(values).sum(axis=0) + np.abs(previous[0]) + np.abs(net_flows).sum(axis=0)) > 0
+  names = inputs.tickers + [CASH_CLASS]
+  for j in np.flatnonzero(active).tolist():
+    out['assets'].append({
+      'ticker': names[j], 'asset_class': (inputs.asset_class + [CASH_CLASS])[j],
+      **{key: _num(metric[j]) for key, metric in per_asset.items()}
+    })
+  for g, name in enumerate(classes):
+    if (membership[:, g] * active).any():
+      out['classes'].append({'asset_class': name, **{key: _num(metric[g]) for key, metric in per_class.items()}})
+  out['total'] = {
+    'start_value': _num(total_prev[0]),
+    'end_value': _num(total[-1]),
+    'net_flows': _num(external.sum()),
+    'pnl': _num(total_pnl.sum()),
+    'return': _num(_dietz(np.array([total_pnl.sum()]), np.array([total_prev[0]]), external[:, None])[0]),
+  }
+  return out
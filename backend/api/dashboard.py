@@ -0,0 +1,139 @@
+"""
+Vista agregada del dashboard (`GET /dashboard`).
+
+Calcula en una sola conexión y una sola transacción de lectura las secciones que el dashboard pedía
+por separado (`/config`, `/cash/net-transfers`, `/portfolio/value/series`, `/transfers/series`,
+`/cash/balance`, `/cash/series`, `/prices/latest`). Las lecturas compartidas (moneda base, matriz FX,
+trades) se hacen una vez y todas las secciones ven el mismo estado de la base. Cada sección devuelve
+el mismo cuerpo que su endpoint individual. La serie de valor puede llegar ya calculada (en el pool de
+analítica, como `/portfolio/value/series`) si se calculó sobre la misma versión de datos.
+"""
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+from cash_ledger import SOURCE_TRANSFER, cash_balances, ledger_series, refresh_cash_ledger
+from price_store import refresh_price_columns
+from prices import latest_prices_for_tickers
+from .portfolio_service import (
+  _parse_date,
+  build_buckets,
+  build_series_from_buckets,
+  collect_trades_and_cash,
+  missing_data_summary,
+  net_transfer_totals,
+  new_missing_data,
+  value_series_inputs
+)
+
+LOGGER = logging.getLogger(__name__)
+
+DASHBOARD_SECTIONS = (
+  "config",
+  "net_transfers",
+  "value_series",
+  "transfers_series",
+  "cash_balance",
+  "cash_series",
+  "latest_prices",
+)
+
+
+def parse_sections(sections: Optional[str]) -> List[str]:
+  """Secciones pedidas en `sections=a,b` (todas si no se indica); 400 si alguna no existe."""
+  if not sections:
+    return list(DASHBOARD_SECTIONS)
+  requested = {s.strip() for s in sections.split(",") if s.strip()}
+  unknown = requested - set(DASHBOARD_SECTIONS)
+  if unknown:
+    raise HTTPException(status_code=400, detail=f"Secciones desconocidas: {', '.join(sorted(unknown))}")
+  return [s for s in DASHBOARD_SECTIONS if s in requested]
+
+
+def _has_pending_derived(conn) -> bool:
+  return bool(conn.execute(
+    "SELECT EXISTS(SELECT 1 FROM cash_ledger_dirty) OR EXISTS(SELECT 1 FROM price_columns_dirty)"
+  ).fetchone()[0])
+
+
+@contextmanager
+def read_snapshot(conn, attempts: int = 3) -> Iterator[None]:
+  """
+  Transacción de lectura con los derivados (saldos del libro de caja, bloques de precios) al día.
+  Se materializan antes de abrirla: dentro no debe haber escrituras, que cerrarían la transacción.
+  Si un escritor marca derivados entre medias se reintenta.
+  """
+  for _ in range(attempts):
+    refresh_cash_ledger(conn)
+    refresh_price_columns(conn)
+    conn.execute("BEGIN")
+    if not _has_pending_derived(conn):
+      break
+    conn.rollback()
+  else:
+    LOGGER.warning("Dashboard: derivados pendientes tras %s intentos; se lee sin snapshot completo", attempts)
+    conn.execute("BEGIN")
+  try:
+    yield
+  finally:
+    conn.rollback()
+
+
+def _open_tickers(trades: Dict[str, Sequence[Any]]) -> List[str]:
+  """Tickers con posición abierta (cantidad neta distinta de cero)."""
+  return sorted(ticker for ticker, rows in trades.items() if abs(sum(row[1] for row in rows)) > 1e-9)
+
+
+def build_dashboard(conn, sections: Sequence[str], interval: str = "day", from_date: Optional[str] = None, to_date: Optional[str] = None, base: Optional[str] = None, tickers: Optional[Sequence[str]] = None, missing: str = "ranges", value_series: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+  """Calcula las secciones pedidas; se espera dentro de `read_snapshot`. `value_series` es el cuerpo ya calculado de esa sección."""
+  row = conn.execute("SELECT value FROM app_config WHERE key = 'base_currency'").fetchone()
+  configured = (row[0] if row else None) or "USD"
+  base_currency = (base or configured).upper()
+  from_d = _parse_date(from_date)
+  to_d = _parse_date(to_date)
+  from_day = from_d.isoformat() if from_d else None
+  to_day = to_d.isoformat() if to_d else None
+  out: Dict[str, Any] = {
+    "base_currency": base_currency,
+    "interval": interval,
+    "from": from_date,
+    "to": to_date,
+    "sections": list(sections),
+  }
+  shared: Dict[str, Any] = {}
+
+  def trades_and_cash():
+    if "trades" not in shared:
+      shared["trades"] = collect_trades_and_cash(conn)
+    return shared["trades"]
+
+  if "config" in sections:
+    out["config"] = {"base_currency": configured.upper()}
+  if "net_transfers" in sections:
+    out["net_transfers"] = {"base_currency": base_currency, "totals": net_transfer_totals(conn, from_date, to_date)}
+  if "value_series" in sections and value_series is not None:
+    out["value_series"] = value_series
+  elif "value_series" in sections:
+    missing_data = new_missing_data(points=(missing == "points"))
+    fx_matrix, value_by_date, transfer_by_date, cash_movements = value_series_inputs(conn, base_currency, missing_data, trades_and_cash=trades_and_cash())
+    buckets = build_buckets(from_d, to_d, interval, value_by_date, transfer_by_date, cash_movements)
+    out["value_series"] = {
+      "base_currency": base_currency,
+      "interval": interval,
+      "from": from_date,
+      "to": to_date,
+      "series": build_series_from_buckets(conn, buckets, base_currency, missing_data=missing_data, fx_matrix=fx_matrix),
+      **missing_data_summary(missing_data, missing)
+    }
+  if "transfers_series" in sections:
+    out["transfers_series"] = {"interval": interval, "series": ledger_series(conn, interval, from_day, to_day, sources=(SOURCE_TRANSFER,))}
+  if "cash_balance" in sections:
+    out["cash_balance"] = {"balances": [{"currency": cur, "balance": round(val, 4)} for cur, val in cash_balances(conn).items()]}
+  if "cash_series" in sections:
+    out["cash_series"] = {"interval": interval, "series": ledger_series(conn, interval, from_day, to_day, with_balance=True)}
+  if "latest_prices" in sections:
+    wanted = list(tickers) if tickers else _open_tickers(trades_and_cash()[0])
+    out["latest_prices"] = latest_prices_for_tickers(conn, wanted)
+  return out
@@ -0,0 +1,146 @@
+"""
+GET condicional para los endpoints de lectura.
+
+Cada ruta declara de qué tablas depende; el ETag se deriva de la ruta, la query, la época de la base
+y las versiones (`data_versions`) de esas tablas, que incrementan los triggers en cada escritura.
+Las rutas cuyo resultado depende de "hoy" (posiciones y caja a fecha actual, series y matrices que
+llegan hasta hoy) añaden además la fecha del día, para no servir un 304 del día anterior.
+Si `If-None-Match` coincide se responde `304` sin ejecutar el handler: una respuesta sin cambios
+cuesta una lectura de contadores en lugar del recálculo y la serialización completos.
+"""
+import hashlib
+import logging
+import uuid
+from datetime import date, datetime, timezone
+from email.utils import format_datetime
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LOGGER = logging.getLogger(__name__)
+
+ALL_DATA = ("trades", "transfers", "dividends", "prices", "fx_rates", "app_config")
+CASH_DATA = ("trades", "transfers", "dividends", "fx_rates", "app_config")
+
+# Prefijo de ruta -> tablas de las que depende la respuesta (gana el prefijo más largo)
+ROUTE_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+  "/portfolio/": ALL_DATA,
+  "/dashboard": ALL_DATA,
+  "/cash/": CASH_DATA,
+  "/transfers": ("transfers",),
+  "/trades": ("trades",),
+  "/dividends": ("dividends",),
+  "/changes": ("trades", "transfers", "dividends"),
+  "/prices/": ("prices",),
+  "/fx/rate": ("fx_rates",),
+  "/config": ("app_config",),
+}
+
+# Prefijos de ruta cuyo resultado por defecto depende de la fecha actual
+TODAY_DEPENDENT = ("/portfolio/", "/dashboard")
+
+EPOCH_KEY = "_epoch"
+
+# Cambia en cada arranque: una nueva versión del backend no reutiliza ETags de la anterior
+_BOOT_TOKEN = uuid.uuid4().hex[:8]
+
+VersionReader = Callable[[Sequence[str]], Optional[Dict[str, Tuple[int, str]]]]
+
+
+def tables_for_path(path: str) -> Tuple[str, ...]:
+  best = ""
+  for prefix in ROUTE_DEPENDENCIES:
+    if path.startswith(prefix) and len(prefix) > len(best):
+      best = prefix
+  return ROUTE_DEPENDENCIES.get(best, ())
+
+
+def read_data_versions(conn, tables: Sequence[str]) -> Dict[str, Tuple[int, str]]:
+  """`{tabla: (versión, updated_at)}` de las tablas pedidas más la época de la base."""
+  names = list(tables) + [EPOCH_KEY]
+  cur = conn.execute(
+    f"SELECT name, version, updated_at FROM data_versions WHERE name IN ({','.join('?' for _ in names)})",
+    names
+  )
+  return {name: (int(version), updated_at) for name, version, updated_at in cur.fetchall()}
+
+
+def compute_etag(path: str, query: str, versions: Dict[str, Tuple[int, str]], today: Optional[date] = None) -> str:
+  stamp = ";".join(f"{name}={versions[name][0]}" for name in sorted(versions))
+  if today is not None:
+    stamp += f";today={today.isoformat()}"
+  digest = hashlib.sha1(f"{_BOOT_TOKEN}|{path}?{query}|{stamp}".encode("utf-8")).hexdigest()[:20]
+  return f'W/"{digest}"'
+
+
+def last_modified(versions: Dict[str, Tuple[int, str]]) -> Optional[str]:
+  stamps = [updated for name, (_v, updated) in versions.items() if name != EPOCH_KEY and updated]
+  if not stamps:
+    return None
+  try:
+    latest = datetime.strptime(max(stamps), "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+  except ValueError:
+    return None
+  return format_datetime(latest, usegmt=True)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+  # Comparación débil (RFC 9110): se ignora el prefijo W/
+  target = etag[2:] if etag.startswith("W/") else etag
+  for candidate in if_none_match.split(","):
+    candidate = candidate.strip()
+    if candidate == "*":
+      return True
+    if (candidate[2:] if candidate.startswith("W/") else candidate) == target:
+      return True
+  return False
+
+
+class ConditionalGetMiddleware:
+  """
+  Middleware ASGI de GET condicional; `read_versions` devuelve None si no hay base que consultar.
+  Es ASGI puro (no `BaseHTTPMiddleware`) para no convertir cada respuesta en streaming.
+  """
+
+  def __init__(self, app: ASGIApp, read_versions: VersionReader) -> None:
+    self.app = app
+    self.read_versions = read_versions
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+      await self.app(scope, receive, send)
+      return
+    path = scope["path"]
+    tables = tables_for_path(path)
+    if not tables:
+      await self.app(scope, receive, send)
+      return
+    try:
+      versions = self.read_versions(tables)
+    except Exception as exc:  # sin contadores se sirve sin caché, nunca se bloquea la petición
+      LOGGER.debug("Sin versiones de datos para %s: %s", path, exc)
+      versions = None
+    if not versions:
+      await self.app(scope, receive, send)
+      return
+    today = date.today() if path.startswith(TODAY_DEPENDENT) else None
+    etag = compute_etag(path, scope.get("query_string", b"").decode("latin-1"), versions, today)
+    cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    modified = last_modified(versions)
+    if modified:
+      cache_headers["Last-Modified"] = modified
+    if_none_match = Headers(scope=scope).get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+      await Response(status_code=304, headers=cache_headers)(scope, receive, send)
+      return
+
+    async def send_with_etag(message: Message) -> None:
+      if message["type"] == "http.response.start" and message["status"] == 200:
+        headers = MutableHeaders(scope=message)
+        for key, value in cache_headers.items():
+          headers[key] = value
+      await send(message)
+
+    await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,122 @@
+"""
+Listados paginados de tablas de hechos (`trades`, `transfers`, `dividends`).
+
+- Paginación por cursor (keyset) sobre `(datetime, id)`: cada página continúa desde la última
+  fila devuelta sin OFFSET, así que el coste no crece con la posición en el listado.
+- Filtros opcionales por columna y rango de fechas (`from_date` inclusive, `to_date` inclusive por día).
+- Proyección `fields=`: columnas separadas por comas; las columnas pesadas (p. ej. `raw_json`)
+  sólo se incluyen si se piden explícitamente.
+
+El cuerpo sigue siendo una lista de objetos; el total filtrado y el siguiente cursor van en las
+cabeceras `X-Total-Count` y `X-Next-Cursor` (ausente en la última página). `iter_rows` recorre el
+mismo resultado en streaming (NDJSON), sin total ni paginación.
+"""
+import base64
+import json
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+TOTAL_COUNT_HEADER = "X-Total-Count"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 5000
+LIST_FORMAT_PATTERN = '^(rows|ndjson)$'
+
+
+def encode_cursor(dt: Optional[str], row_id: int) -> str:
+  raw = json.dumps([dt, row_id], separators=(",", ":")).encode("utf-8")
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], int]:
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    dt, row_id = json.loads(raw)
+    if dt is not None and not isinstance(dt, str):
+      raise ValueError(dt)
+    return dt, int(row_id)
+  except (ValueError, TypeError):
+    raise HTTPException(status_code=400, detail='Cursor inválido')
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str], default: Sequence[str]) -> List[str]:
+  """Columnas pedidas en `fields=` (en el orden de `allowed`); sin `fields` se usan las de `default`."""
+  if not fields:
+    return list(default)
+  requested = {f.strip() for f in fields.split(",") if f.strip()}
+  unknown = requested - set(allowed)
+  if unknown:
+    raise HTTPException(status_code=400, detail=f"Campos desconocidos: {', '.join(sorted(unknown))}")
+  return [col for col in allowed if col in requested]
+
+
+def date_range_filters(from_date: Optional[str], to_date: Optional[str]) -> List[Tuple[str, Any]]:
+  """Filtros sobre `datetime` (texto ISO) que aprovechan su índice: `>= from` y `< to + 1 día`."""
+  filters: List[Tuple[str, Any]] = []
+  try:
+    if from_date:
+      filters.append(("datetime >= ?", date.fromisoformat(from_date[:10]).isoformat()))
+    if to_date:
+      filters.append(("datetime < ?", (date.fromisoformat(to_date[:10]) + timedelta(days=1)).isoformat()))
+  except ValueError:
+    raise HTTPException(status_code=400, detail='Fecha inválida, use YYYY-MM-DD')
+  return filters
+
+
+def _select(table: str, columns: Sequence[str], filters: Sequence[Tuple[str, Any]], cursor: Optional[str]) -> Tuple[str, List[Any], List[str]]:
+  """SQL ordenada por `(datetime, id)` desde el cursor; devuelve `(sql, params, columnas seleccionadas)`."""
+  where = [clause for clause, _ in filters]
+  params: List[Any] = [value for _, value in filters]
+  if cursor:
+    after_dt, after_id = decode_cursor(cursor)
+    if after_dt is None:
+      where.append("((datetime IS NULL AND id > ?) OR datetime IS NOT NULL)")
+      params.append(after_id)
+    else:
+      where.append("(datetime > ? OR (datetime = ? AND id > ?))")
+      params.extend([after_dt, after_dt, after_id])
+  select_cols = list(columns) + [c for c in ("datetime", "id") if c not in columns]
+  sql = f"SELECT {', '.join(select_cols)} FROM {table}"
+  if where:
+    sql += f" WHERE {' AND '.join(where)}"
+  sql += " ORDER BY datetime ASC, id ASC"
+  return sql, params, select_cols
+
+
+def list_page(conn, table: str, columns: Sequence[str], filters: Sequence[Tuple[str, Any]], cursor: Optional[str] = None, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+  """
+  Devuelve `(filas, total filtrado, siguiente cursor)` ordenando por `(datetime, id)`.
+  Sin `limit` devuelve todas las filas desde el cursor. Las filas con `datetime` nulo van primero.
+  """
+  where = [clause for clause, _ in filters]
+  total = conn.execute(
+    f"SELECT COUNT(*) FROM {table}" + (f" WHERE {' AND '.join(where)}" if where else ""),
+    [value for _, value in filters]
+  ).fetchone()[0]
+
+  sql, params, select_cols = _select(table, columns, filters, cursor)
+  if limit:
+    sql += " LIMIT ?"
+    params.append(limit + 1)
+  rows = conn.execute(sql, params).fetchall()
+
+  next_cursor = None
+  if limit and len(rows) > limit:
+    rows = rows[:limit]
+    last = dict(zip(select_cols, rows[-1]))
+    next_cursor = encode_cursor(last["datetime"], last["id"])
+  out = [{col: row[idx] for idx, col in enumerate(columns)} for row in rows]
+  return out, int(total), next_cursor
+
+
+def iter_rows(conn, table: str, columns: Sequence[str], filters: Sequence[Tuple[str, Any]], cursor: Optional[str] = None, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+  """Mismo orden y filtros que `list_page` pero sin total ni límite, leyendo el cursor por lotes."""
+  sql, params, _ = _select(table, columns, filters, cursor)
+  cur = conn.execute(sql, params)
+  while True:
+    rows = cur.fetchmany(batch_size)
+    if not rows:
+      return
+    for row in rows:
+      yield {col: row[idx] for idx, col in enumerate(columns)}
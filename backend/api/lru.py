@@ -0,0 +1,37 @@
+"""
+Caché LRU en memoria compartida por los hilos del servidor.
+
+Guarda resultados caros por clave (base de datos, moneda base, versión de datos...): al cambiar los
+datos cambia la clave y las entradas viejas salen por antigüedad.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LruCache:
+  """LRU de `capacity` entradas protegido por un lock."""
+
+  def __init__(self, capacity: int) -> None:
+    self.capacity = capacity
+    self._lock = threading.Lock()
+    self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+  def get_or_build(self, key: Hashable, build: Callable[[], Any]) -> Any:
+    """`build` se llama fuera del lock (las peticiones iguales ya se coalescen en `single_flight`)."""
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None:
+        self._entries.move_to_end(key)
+        return entry
+    entry = build()
+    with self._lock:
+      self._entries[key] = entry
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.capacity:
+        self._entries.popitem(last=False)
+    return entry
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
@@ -1,16 +1,19 @@
 import json
 import os
+import sqlite3
 import subprocess
 import sys
 import tempfile
+import threading
 from datetime import datetime, date
+from itertools import islice
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Body, Request
+from fastapi import FastAPI, HTTPException, Body, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.params import Query
 try:
@@ -31,21 +34,43 @@ except ImportError:
     return False
 from pydantic import BaseModel
 
-from db import ensure_schema, get_connection
+from cash_ledger import SOURCE_TRANSFER, cash_balances, iter_ledger_points, ledger_series
+from change_feed import CHANGE_TABLES, changes_since, current_change_seq
+from db import ensure_schema, get_connection, set_connection_factory
 from prices import list_price_series, latest_prices_for_tickers, sync_prices_for_tickers
 from fx import sync_fx_for_currencies
+from fx_engine import coverage_for_base, resolve_fx_rate
+from fx_matrix import FxMatrix, get_fx_matrix, invalidate_fx_matrices
 from logging_config import configure_root_logging, log_path_from_env
+from lots import realized_pnl, unrealized_pnl
+from providers import start_warmup
+from .analytics_pool import AnalyticsCancelled, AnalyticsExecutor, run_cancellable
+from .dashboard import build_dashboard, parse_sections, read_snapshot
+from .http_cache import ConditionalGetMiddleware, read_data_versions, tables_for_path
+from .responses import CompressionMiddleware, FastJSONResponse, dumps_json
+from .series_format import DATES_PATTERN, SERIES_FORMAT_PATTERN, columnar_points
+from .lru import LruCache
+from .single_flight import SingleFlight
+from .slow_queries import SlowQueryLog, threshold_from_env
+from .streaming import ndjson_response
+from .listing import LIST_FORMAT_PATTERN, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, date_range_filters, decode_cursor, iter_rows, list_page, parse_fields
+from .attribution import AttributionInputs, attribution
+from .rolling import DEFAULT_WINDOWS, ROLLING_METRICS, rolling_payload
+from .timeline import PositionTimeline, snapshots
+from .performance import daily_series_from_columnar, performance_metrics, slice_range
+from .metrics import InstrumentedConnection, MetricsMiddleware, MetricsRegistry, set_slow_query_log
 from .portfolio_service import (
   _parse_date,
   _parse_db_datetime,
   _period_end_for,
-  collect_trades_and_cash,
-  collect_transfers_and_cash,
-  build_buckets,
-  build_series_from_buckets,
-  build_value_by_date,
+  iter_buckets,
+  iter_series_from_buckets,
+  missing_data_summary,
+  net_transfer_totals,
+  value_series_inputs,
   convert_amount_on_date,
-  schedule_missing_data_sync
+  fx_rate_on_date,
+  new_missing_data
 )
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -144,20 +169,6 @@ def run_importer_from_csv(kind: str, csv_text: str):
       pass
 
 
-def fetch_rows(query: str, columns: List[str]):
-  db_path = ensure_db_ready()
-  conn = get_connection(str(db_path))
-  ensure_schema(conn)
-  try:
-    cur = conn.execute(query)
-    results = []
-    for row in cur.fetchall():
-      results.append({col: row[idx] for idx, col in enumerate(columns)})
-    return results
-  finally:
-    conn.close()
-
-
 def get_config_value(key: str, default: Optional[str] = None) -> Optional[str]:
   db_path = ensure_db_ready()
   conn = get_connection(str(db_path))
@@ -184,21 +195,12 @@ def set_config_value(key: str, value: str) -> None:
     conn.close()
 
 
-def latest_fx_rate(conn, base: str, quote: str) -> Optional[float]:
-  if not base or not quote:
-    return None
-  if base.upper() == quote.upper():
-    return 1.0
-  cur = conn.execute(
-    "SELECT rate FROM fx_rates WHERE base_currency = ? AND quote_currency = ? ORDER BY date DESC LIMIT 1",
-    (base.upper(), quote.upper())
-  )
-  row = cur.fetchone()
-  return float(row[0]) if row else None
+def latest_fx_rate(conn, base: str, quote: str, fx_matrix: Optional[FxMatrix] = None) -> Optional[float]:
+  return fx_rate_on_date(conn, base, quote, date.max, fx_matrix)
 
 
-def convert_amount(conn, amount: float, from_currency: str, base_currency: str) -> float:
-  rate = latest_fx_rate(conn, base_currency, from_currency)
+def convert_amount(conn, amount: float, from_currency: str, base_currency: str, fx_matrix: Optional[FxMatrix] = None) -> float:
+  rate = latest_fx_rate(conn, base_currency, from_currency, fx_matrix)
   if rate is None:
     raise HTTPException(status_code=400, detail=f'No hay tipo de cambio para {from_currency}->{base_currency}')
   return amount * rate
@@ -225,24 +227,160 @@ async def lifespan(_app: FastAPI):
   ensure_db_ready()
   logging.info("Base de datos en %s", get_db_path())
   yield
+  ANALYTICS.shutdown()
+
+
+app = FastAPI(title='Portfolio Backend', version='0.1.0', lifespan=lifespan, default_response_class=FastJSONResponse)
+
+
+def read_versions(tables):
+  """Versiones de datos para el ETag; None si la base aún no existe o no tiene contadores."""
+  db_path = get_db_path()
+  if not db_path.exists():
+    return None
+  conn = get_connection(str(db_path))
+  try:
+    return read_data_versions(conn, tables)
+  except sqlite3.OperationalError:
+    return None
+  finally:
+    conn.close()
+
+
+# Cálculos pesados coalescidos: peticiones idénticas simultáneas comparten un único cálculo
+HEAVY_FLIGHTS = SingleFlight()
+# Cálculos de analítica en procesos worker, con límite de concurrencia (GET /debug/analytics)
+ANALYTICS = AnalyticsExecutor()
+# Ventana móvil más larga admitida en /portfolio/rolling (diez años de días hábiles)
+MAX_ROLLING_WINDOW = 2520
+# Series diarias de /portfolio/metrics y /portfolio/rolling por moneda base y versión de datos: cada rango es un corte
+DAILY_SERIES = LruCache(capacity=8)
+# Índices a fecha de /portfolio/snapshot por versión de datos; fechas por petición en modo lote
+TIMELINES = LruCache(capacity=4)
+MAX_SNAPSHOT_DATES = 366
+# Matrices de /portfolio/attribution por moneda base, versión de datos y día (la rejilla llega hasta hoy)
+ATTRIBUTIONS = LruCache(capacity=4)
+
+
+def _coalesced_json(route: str, params: Dict[str, Any], compute, cancel: Optional[threading.Event] = None) -> Response:
+  """
+  Ejecuta `compute` (que devuelve el cuerpo como dict) coalesciendo peticiones iguales en curso.
+  La clave incluye la versión de las tablas de la ruta: tras una escritura no se reutiliza un cálculo anterior.
+  Se comparte el JSON ya serializado y cada petición recibe su propia respuesta.
+  `cancel` es el de esta petición: si se abandona el cálculo de otra a la que esperaba, calcula ella.
+  """
+  versions = read_versions(tables_for_path(route)) or {}
+  key = (
+    route,
+    tuple(sorted((name, str(value)) for name, value in params.items() if value is not None)),
+    tuple(sorted((name, version) for name, (version, _updated) in versions.items()))
+  )
+  while True:
+    try:
+      body = HEAVY_FLIGHTS.do(key, lambda: dumps_json(compute()))
+      break
+    except AnalyticsCancelled:
+      if cancel is None or cancel.is_set():
+        raise
+  return Response(content=body, media_type='application/json')
 
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
-app = FastAPI(title='Portfolio Backend', version='0.1.0', lifespan=lifespan)
+# Antes que CORS para que también las respuestas 304 lleven sus cabeceras
+app.add_middleware(ConditionalGetMiddleware, read_versions=read_versions)
 app.add_middleware(
   CORSMiddleware,
   allow_origins=['*'],
   allow_credentials=True,
   allow_methods=['*'],
-  allow_headers=['*']
+  allow_headers=['*'],
+  expose_headers=[TOTAL_COUNT_HEADER, NEXT_CURSOR_HEADER, 'ETag']
 )
+app.add_middleware(CompressionMiddleware)
+# La más externa: mide la petición completa y los bytes ya comprimidos
+METRICS = MetricsRegistry()
+set_connection_factory(InstrumentedConnection)
+app.add_middleware(MetricsMiddleware, registry=METRICS)
+# Sentencias por encima de PORTFOLIO_SLOW_QUERY_MS con su plan (GET /debug/slow-queries)
+SLOW_QUERIES = SlowQueryLog(threshold_from_env())
+set_slow_query_log(SLOW_QUERIES)
+
+
+def _coalescing_metrics() -> List[str]:
+  stats = HEAVY_FLIGHTS.stats()
+  lines: List[str] = []
+  for name, field, help_text in (
+    ("portfolio_singleflight_computed_total", "computed", "Cálculos pesados ejecutados."),
+    ("portfolio_singleflight_coalesced_total", "coalesced", "Peticiones que reutilizaron un cálculo en curso."),
+  ):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    lines += [f'{name}{{route="{route}"}} {values[field]}' for route, values in sorted(stats["routes"].items())]
+  return lines
+
+
+def _analytics_metrics() -> List[str]:
+  stats = ANALYTICS.stats()
+  lines = [
+    "# HELP portfolio_analytics_queue_depth Cálculos de analítica esperando hueco.",
+    "# TYPE portfolio_analytics_queue_depth gauge",
+    f"portfolio_analytics_queue_depth {stats['queued']}",
+    "# HELP portfolio_analytics_running Cálculos de analítica en curso.",
+    "# TYPE portfolio_analytics_running gauge",
+    f"portfolio_analytics_running {stats['running']}",
+    "# HELP portfolio_analytics_wait_seconds_total Tiempo total esperando hueco en el pool de analítica.",
+    "# TYPE portfolio_analytics_wait_seconds_total counter",
+    f"portfolio_analytics_wait_seconds_total {stats['wait_seconds']}",
+    "# HELP portfolio_analytics_requests_total Cálculos de analítica por resultado.",
+    "# TYPE portfolio_analytics_requests_total counter",
+  ]
+  lines += [f'portfolio_analytics_requests_total{{status="{status}"}} {stats[status]}' for status in ("completed", "failed", "cancelled", "rejected")]
+  return lines
+
+
+def _slow_query_metrics() -> List[str]:
+  return [
+    "# HELP portfolio_sqlite_slow_queries_total Sentencias por encima del umbral de consulta lenta.",
+    "# TYPE portfolio_sqlite_slow_queries_total counter",
+    f"portfolio_sqlite_slow_queries_total {SLOW_QUERIES.stats()['total']}",
+  ]
+
+
+METRICS.add_collector(_coalescing_metrics)
+METRICS.add_collector(_slow_query_metrics)
+METRICS.add_collector(_analytics_metrics)
 
 
 @app.get('/health')
 def health_check():
+  # El primer /health marca que el servidor ya responde: a partir de ahí se precargan en segundo
+  # plano los proveedores de mercado, que no se importan al arrancar
+  start_warmup()
   return {'status': 'ok'}
 
 
+@app.get('/debug/metrics')
+def debug_metrics():
+  """Métricas por ruta en formato de texto Prometheus."""
+  return Response(content=METRICS.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.get('/debug/slow-queries')
+def slow_queries():
+  """Últimas consultas lentas (más reciente primero) con forma de parámetros, duración, filas y plan."""
+  return {**SLOW_QUERIES.stats(), 'queries': SLOW_QUERIES.entries()}
+
+
+@app.get('/debug/analytics')
+def analytics_stats():
+  """Estado del pool de analítica: workers, cola, cálculos en curso y resultados por tipo."""
+  return ANALYTICS.stats()
+
+
+@app.get('/debug/coalescing')
+def coalescing_stats():
+  """Contadores de coalescencia: cálculos hechos y peticiones que esperaron a uno en curso (ahorrados)."""
+  return HEAVY_FLIGHTS.stats()
+
+
 @app.get('/config')
 def get_config():
   base = get_config_value('base_currency', default='USD')
@@ -255,7 +393,19 @@ def update_base_currency(payload: BaseCurrencyPayload):
   if not currency or len(currency) < 3 or len(currency) > 6:
     raise HTTPException(status_code=400, detail='Moneda base inválida.')
   set_config_value('base_currency', currency)
-  return {'status': 'ok', 'base_currency': currency}
+  # El cambio de base es local: los pares se derivan de las tasas ya guardadas (inversas/cruces).
+  db_path = ensure_db_ready()
+  conn = get_connection(str(db_path))
+  try:
+    coverage = coverage_for_base(conn, currency, _list_currencies_in_use(conn))
+  finally:
+    conn.close()
+  return {
+    'status': 'ok',
+    'base_currency': currency,
+    'fx_coverage': coverage,
+    'needs_sync': sorted(cur for cur, info in coverage.items() if info is None)
+  }
 
 
 @app.post('/fx/rate')
@@ -283,6 +433,32 @@ def set_fx_rate(payload: FxRatePayload):
   return {'status': 'ok', 'base_currency': base, 'quote_currency': quote, 'date': date, 'rate': payload.rate}
 
 
+@app.get('/fx/rate')
+def get_fx_rate(
+  base_currency: str = Query(..., description="Divisa base del par"),
+  quote_currency: str = Query(..., description="Divisa cotizada del par"),
+  on: Optional[str] = Query(default=None, alias="date", description="Fecha ISO (YYYY-MM-DD); por defecto la última disponible")
+):
+  """Devuelve la tasa vigente y su procedencia (direct, inverse, cross:<pivote>, identity)."""
+  target = _parse_date(on) or date.max
+  db_path = ensure_db_ready()
+  conn = get_connection(str(db_path))
+  try:
+    resolved = resolve_fx_rate(conn, base_currency, quote_currency, target)
+  finally:
+    conn.close()
+  if resolved is None:
+    raise HTTPException(status_code=404, detail=f'No hay tipo de cambio para {base_currency.upper()}/{quote_currency.upper()}')
+  rate, provenance = resolved
+  return {
+    'base_currency': base_currency.upper(),
+    'quote_currency': quote_currency.upper(),
+    'date': on,
+    'rate': rate,
+    'provenance': provenance
+  }
+
+
 def _list_currencies_in_use(conn) -> List[str]:
   cur = conn.execute("SELECT DISTINCT currency FROM trades WHERE currency IS NOT NULL")
   trade_curs = [row[0] for row in cur.fetchall()]
@@ -368,216 +544,146 @@ def import_dividends(payload: RowsPayload):
   return {'status': 'ok', 'rows': len(payload.rows)}
 
 
-@app.get('/transfers')
-def list_transfers():
-  rows = fetch_rows(
-    "SELECT transaction_id, currency, datetime, amount, origin, kind FROM transfers ORDER BY datetime ASC",
-    ['transaction_id', 'currency', 'datetime', 'amount', 'origin', 'kind']
-  )
+TRANSFER_FIELDS = ['transaction_id', 'currency', 'datetime', 'amount', 'origin', 'kind', 'raw_json']
+TRANSFER_DEFAULT_FIELDS = ['transaction_id', 'currency', 'datetime', 'amount', 'origin', 'kind']
+TRADE_FIELDS = ['trade_id', 'ticker', 'quantity', 'purchase', 'datetime', 'commission', 'commission_currency', 'currency', 'isin', 'asset_class', 'raw_json']
+TRADE_DEFAULT_FIELDS = [f for f in TRADE_FIELDS if f != 'raw_json']
+DIVIDEND_FIELDS = ['action_id', 'ticker', 'currency', 'datetime', 'amount', 'gross', 'tax', 'issuer_country', 'raw_json']
+DIVIDEND_DEFAULT_FIELDS = [f for f in DIVIDEND_FIELDS if f != 'raw_json']
+
+
+def _list_response(response: Response, table: str, columns: List[str], filters: List[Tuple[str, Any]], cursor: Optional[str], limit: Optional[int], format: str = 'rows'):
+  db_path = ensure_db_ready()
+  if format == 'ndjson':
+    if cursor:
+      decode_cursor(cursor)
+    return ndjson_response(db_path, lambda conn: islice(iter_rows(conn, table, columns, filters, cursor=cursor), limit))
+  conn = get_connection(str(db_path))
+  ensure_schema(conn)
+  try:
+    rows, total, next_cursor = list_page(conn, table, columns, filters, cursor=cursor, limit=limit)
+  finally:
+    conn.close()
+  response.headers[TOTAL_COUNT_HEADER] = str(total)
+  if next_cursor:
+    response.headers[NEXT_CURSOR_HEADER] = next_cursor
   return rows
 
 
+@app.get('/transfers')
+def list_transfers(
+  response: Response,
+  currency: Optional[str] = None,
+  origin: Optional[str] = Query(default=None, description="externo|fx_interno"),
+  from_date: Optional[str] = None,
+  to_date: Optional[str] = None,
+  fields: Optional[str] = Query(default=None, description="Columnas separadas por comas (raw_json sólo si se pide)"),
+  cursor: Optional[str] = None,
+  limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+  format: str = Query(default='rows', pattern=LIST_FORMAT_PATTERN, description="rows (JSON paginado) | ndjson (streaming, una fila por línea)")
+):
+  filters = date_range_filters(from_date, to_date)
+  if currency:
+    filters.append(('currency = ?', currency.upper()))
+  if origin:
+    filters.append(('origin = ?', origin))
+  columns = parse_fields(fields, TRANSFER_FIELDS, TRANSFER_DEFAULT_FIELDS)
+  return _list_response(response, 'transfers', columns, filters, cursor, limit, format)
+
+
 @app.get('/cash/balance')
 def cash_balance():
   """
-  Devuelve balance por divisa sin conversión FX, sumando transferencias, dividendos y flujo de trades (STK/OPT).
+  Devuelve balance por divisa sin conversión FX a partir del libro de caja (transferencias, dividendos y trades STK).
   Incluye transferencias externas e internas; no descuenta valor de posiciones.
   """
   db_path = ensure_db_ready()
   conn = get_connection(str(db_path))
   ensure_schema(conn)
   try:
-    # Transferencias
-    cur = conn.execute("""
-      SELECT currency, SUM(amount) as total
-      FROM transfers
-      GROUP BY currency
-    """)
-    transfer_totals = { (row[0] or '').upper(): float(row[1] or 0.0) for row in cur.fetchall() }
-
-    # Dividendos
-    cur = conn.execute("""
-      SELECT currency, SUM(amount) as total
-      FROM dividends
-      GROUP BY currency
-    """)
-    for currency, total in cur.fetchall():
-      key = (currency or '').upper()
-      transfer_totals[key] = transfer_totals.get(key, 0.0) + float(total or 0.0)
-
-    # Trades STK: flujo de caja por compra/venta y comisión si misma divisa
-    cur = conn.execute("""
-      SELECT currency, quantity, purchase, commission, commission_currency
-      FROM trades
-      WHERE asset_class = 'STK'
-    """)
-    for currency, qty, price, commission, comm_cur in cur.fetchall():
-      ccy = (currency or '').upper()
-      if not ccy:
-        continue
-      q = float(qty or 0.0)
-      p = float(price or 0.0)
-      comm = float(commission or 0.0)
-      comm_ccy = (comm_cur or '').upper()
-      flow = -(q * p)  # compra: qty>0 => flujo negativo; venta qty<0 => flujo positivo
-      if not comm_ccy or comm_ccy == ccy:
-        flow -= comm
-      transfer_totals[ccy] = transfer_totals.get(ccy, 0.0) + flow
-
-    balances = [{'currency': cur, 'balance': round(val, 4)} for cur, val in transfer_totals.items()]
+    balances = [{'currency': cur, 'balance': round(val, 4)} for cur, val in cash_balances(conn).items()]
     return {'balances': balances}
   finally:
     conn.close()
 
 
+def _ledger_day(value: Optional[str]) -> Optional[str]:
+  return datetime.fromisoformat(value).date().isoformat() if value else None
+
+
+def _ledger_ndjson(db_path: Path, interval: str, from_day: Optional[str], to_day: Optional[str], **kwargs):
+  """Serie del libro de caja en NDJSON: `{"meta": ...}` y una línea `{currency, date, amount, ...}` por punto."""
+  def produce(conn):
+    yield {'meta': {'interval': interval}}
+    for currency, point in iter_ledger_points(conn, interval, from_day, to_day, **kwargs):
+      yield {'currency': currency, **point}
+  return ndjson_response(db_path, produce)
+
+
 @app.get('/transfers/series')
-def transfers_series(interval: str = Query('day', pattern='^(day|month)$'), from_date: Optional[str] = None, to_date: Optional[str] = None):
+def transfers_series(
+  interval: str = Query('day', pattern='^(day|week|month|quarter|year)$'),
+  from_date: Optional[str] = None,
+  to_date: Optional[str] = None,
+  format: str = Query('rows', pattern=SERIES_FORMAT_PATTERN, description="rows (lista de puntos) | columnar (arrays por campo) | ndjson (streaming)"),
+  dates: str = Query('iso', pattern=DATES_PATTERN, description="Con columnar: iso | delta (date_start + días entre puntos)")
+):
   """
   Serie de transferencias por divisa sin convertir FX.
   Incluye transferencias externas e internas; cada divisa mantiene su propio acumulado.
   """
   db_path = ensure_db_ready()
-  conn = get_connection(str(db_path))
-  ensure_schema(conn)
-  try:
-    rows = fetch_rows(
-      "SELECT currency, datetime, amount, origin FROM transfers ORDER BY datetime ASC",
-      ['currency', 'datetime', 'amount', 'origin']
-    )
-  finally:
-    conn.close()
-
-  def parse_dt(dt_str: str) -> date:
-    return datetime.fromisoformat(dt_str).date()
-
-  def bucket_for(d: date) -> date:
-    if interval == 'month':
-      return date(d.year, d.month, 1)
-    return d
-
-  from_d = datetime.fromisoformat(from_date).date() if from_date else None
-  to_d = datetime.fromisoformat(to_date).date() if to_date else None
+  if format == 'ndjson':
+    return _ledger_ndjson(db_path, interval, _ledger_day(from_date), _ledger_day(to_date), sources=(SOURCE_TRANSFER,))
+  from_day, to_day = _ledger_day(from_date), _ledger_day(to_date)
 
-  series: Dict[str, Dict[date, float]] = {}
-  for row in rows:
+  def compute():
+    conn = get_connection(str(db_path))
     try:
-      dt = parse_dt(str(row['datetime']))
-    except Exception:
-      continue
-    if from_d and dt < from_d:
-      continue
-    if to_d and dt > to_d:
-      continue
-    cur = (row.get('currency') or '').upper() or 'N/A'
-    amount = float(row.get('amount') or 0.0)
-    bucket = bucket_for(dt)
-    by_date = series.setdefault(cur, {})
-    by_date[bucket] = by_date.get(bucket, 0.0) + amount
-
-  result: Dict[str, List[Dict[str, Any]]] = {}
-  for cur, by_date in series.items():
-    cumulative = 0.0
-    points = []
-    for day in sorted(by_date.keys()):
-      cumulative += by_date[day]
-      points.append({
-        'date': day.isoformat(),
-        'amount': round(by_date[day], 4),
-        'cumulative': round(cumulative, 4)
-      })
-    result[cur] = points
+      result = ledger_series(conn, interval, from_day, to_day, sources=(SOURCE_TRANSFER,))
+    finally:
+      conn.close()
+    if format == 'columnar':
+      result = {cur: columnar_points(points, delta_dates=(dates == 'delta')) for cur, points in result.items()}
+    return {
+      'interval': interval,
+      'series': result
+    }
 
-  return {
-    'interval': interval,
-    'series': result
-  }
+  return _coalesced_json('/transfers/series', {'interval': interval, 'from': from_day, 'to': to_day, 'format': format, 'dates': dates}, compute)
 
 
 @app.get('/cash/series')
-def cash_series(interval: str = Query('day', pattern='^(day|month)$'), from_date: Optional[str] = None, to_date: Optional[str] = None):
+def cash_series(
+  interval: str = Query('day', pattern='^(day|week|month|quarter|year)$'),
+  from_date: Optional[str] = None,
+  to_date: Optional[str] = None,
+  format: str = Query('rows', pattern=SERIES_FORMAT_PATTERN, description="rows (lista de puntos) | columnar (arrays por campo) | ndjson (streaming)"),
+  dates: str = Query('iso', pattern=DATES_PATTERN, description="Con columnar: iso | delta (date_start + días entre puntos)")
+):
   """
   Serie temporal de efectivo por divisa (transferencias + dividendos + trades STK), sin conversión FX.
+  `cumulative` acumula desde el inicio del rango; `balance` es el saldo absoluto al cierre de cada periodo.
   """
   db_path = ensure_db_ready()
-  conn = get_connection(str(db_path))
-  ensure_schema(conn)
-  try:
-    transfers = fetch_rows(
-      "SELECT currency, datetime, amount FROM transfers ORDER BY datetime ASC",
-      ['currency', 'datetime', 'amount']
-    )
-    dividends = fetch_rows(
-      "SELECT currency, datetime, amount FROM dividends ORDER BY datetime ASC",
-      ['currency', 'datetime', 'amount']
-    )
-    trades = fetch_rows(
-      "SELECT currency, datetime, quantity, purchase, commission, commission_currency FROM trades WHERE asset_class = 'STK' ORDER BY datetime ASC",
-      ['currency', 'datetime', 'quantity', 'purchase', 'commission', 'commission_currency']
-    )
-  finally:
-    conn.close()
+  if format == 'ndjson':
+    return _ledger_ndjson(db_path, interval, _ledger_day(from_date), _ledger_day(to_date), with_balance=True)
+  from_day, to_day = _ledger_day(from_date), _ledger_day(to_date)
 
-  def parse_dt(dt_str: str) -> date:
-    return datetime.fromisoformat(dt_str).date()
-
-  def bucket_for(d: date) -> date:
-    if interval == 'month':
-      return date(d.year, d.month, 1)
-    return d
-
-  from_d = datetime.fromisoformat(from_date).date() if from_date else None
-  to_d = datetime.fromisoformat(to_date).date() if to_date else None
-
-  series: Dict[str, Dict[date, float]] = {}
-  rows_all: List[Dict[str, Any]] = []
-  rows_all.extend(transfers)
-  rows_all.extend(dividends)
-  # Trades STK -> flujo de caja
-  for row in trades:
-    currency = (row.get('currency') or '').upper()
-    if not currency:
-      continue
-    qty = float(row.get('quantity') or 0.0)
-    price = float(row.get('purchase') or 0.0)
-    commission = float(row.get('commission') or 0.0)
-    comm_cur = (row.get('commission_currency') or '').upper()
-    flow = -(qty * price)
-    if not comm_cur or comm_cur == currency:
-      flow -= commission
-    rows_all.append({'currency': currency, 'datetime': row.get('datetime'), 'amount': flow})
-
-  for row in rows_all:
+  def compute():
+    conn = get_connection(str(db_path))
     try:
-      dt = parse_dt(str(row['datetime']))
-    except Exception:
-      continue
-    if from_d and dt < from_d:
-      continue
-    if to_d and dt > to_d:
-      continue
-    cur = (row.get('currency') or '').upper() or 'N/A'
-    amount = float(row.get('amount') or 0.0)
-    bucket = bucket_for(dt)
-    by_date = series.setdefault(cur, {})
-    by_date[bucket] = by_date.get(bucket, 0.0) + amount
-
-  result: Dict[str, List[Dict[str, Any]]] = {}
-  for cur, by_date in series.items():
-    cumulative = 0.0
-    points = []
-    for day in sorted(by_date.keys()):
-      cumulative += by_date[day]
-      points.append({
-        'date': day.isoformat(),
-        'amount': round(by_date[day], 4),
-        'cumulative': round(cumulative, 4)
-      })
-    result[cur] = points
+      result = ledger_series(conn, interval, from_day, to_day, with_balance=True)
+    finally:
+      conn.close()
+    if format == 'columnar':
+      result = {cur: columnar_points(points, delta_dates=(dates == 'delta')) for cur, points in result.items()}
+    return {
+      'interval': interval,
+      'series': result
+    }
 
-  return {
-    'interval': interval,
-    'series': result
-  }
+  return _coalesced_json('/cash/series', {'interval': interval, 'from': from_day, 'to': to_day, 'format': format, 'dates': dates}, compute)
 
 
 @app.get('/portfolio/value')
@@ -587,13 +693,12 @@ def portfolio_value():
   ensure_schema(conn)
   try:
     base_currency = (get_config_value('base_currency', 'USD') or 'USD').upper()
-    # Cash por divisa
-    cur = conn.execute("SELECT currency, SUM(amount) FROM transfers GROUP BY currency")
+    fx_matrix = get_fx_matrix(conn, base_currency)
+    # Cash por divisa: saldo del libro de caja (transferencias, dividendos y trades con comisiones)
     cash_base = 0.0
     cash_breakdown = []
-    for currency, total in cur.fetchall():
-      total = float(total or 0)
-      converted = convert_amount(conn, total, currency, base_currency)
+    for currency, total in cash_balances(conn).items():
+      converted = convert_amount(conn, total, currency, base_currency, fx_matrix)
       cash_base += converted
       cash_breakdown.append({'currency': currency, 'amount': total, 'amount_base': converted})
     # Posiciones
@@ -619,7 +724,7 @@ def portfolio_value():
       price = float(price_info.get('close') or 0)
       value = info['qty'] * price
       currency = info['currency'] or base_currency
-      converted = convert_amount(conn, value, currency, base_currency)
+      converted = convert_amount(conn, value, currency, base_currency, fx_matrix)
       positions_base += converted
       positions_breakdown.append({'ticker': ticker, 'qty': info['qty'], 'price': price, 'currency': currency, 'value': value, 'value_base': converted})
     total_base = cash_base + positions_base
@@ -636,59 +741,305 @@ def portfolio_value():
 
 
 @app.get('/portfolio/value/series')
-def portfolio_value_series(
+async def portfolio_value_series(
+  request: Request,
   interval: str = Query(default='day', description="day|week|month|quarter|year"),
   from_date: Optional[str] = Query(default=None, alias="from", description="Fecha mínima ISO (YYYY-MM-DD)"),
   to_date: Optional[str] = Query(default=None, alias="to", description="Fecha máxima ISO (YYYY-MM-DD)"),
-  base: Optional[str] = Query(default=None, description="Moneda base deseada (default: config)")
+  base: Optional[str] = Query(default=None, description="Moneda base deseada (default: config)"),
+  missing: str = Query(default='ranges', pattern='^(ranges|points)$', description="Detalle de faltantes: ranges (tramos) | points (fecha a fecha)"),
+  format: str = Query(default='rows', pattern=SERIES_FORMAT_PATTERN, description="rows (lista de puntos) | columnar (arrays por campo) | ndjson (streaming)"),
+  dates: str = Query(default='iso', pattern=DATES_PATTERN, description="Con columnar: iso | delta (date_start + días entre puntos)")
 ):
+  # Se calcula en el pool de analítica; si el cliente se desconecta se abandona el cálculo
+  return await run_cancellable(request, lambda cancel: _value_series_response(cancel, interval, from_date, to_date, base, missing, format, dates))
+
+
+def _value_series_response(cancel, interval, from_date, to_date, base, missing, format, dates) -> Response:
   interval = (interval or 'day').strip().lower()
   if interval not in {'day', 'week', 'month', 'quarter', 'year'}:
     raise HTTPException(status_code=400, detail='Intervalo inválido, use day|week|month|quarter|year')
   from_d = _parse_date(from_date)
   to_d = _parse_date(to_date)
   db_path = ensure_db_ready()
-  conn = get_connection(str(db_path))
-  ensure_schema(conn)
+  base_currency = (base or get_config_value('base_currency', 'USD') or 'USD').upper()
+  meta = {'base_currency': base_currency, 'interval': interval, 'from': from_date, 'to': to_date}
+
+  if format == 'ndjson':
+    def produce(conn):
+      missing_data = new_missing_data(points=(missing == 'points'))
+      fx_matrix, value_by_date, transfer_by_date, cash_movements = value_series_inputs(conn, base_currency, missing_data)
+      yield {'meta': meta}
+      buckets = iter_buckets(from_d, to_d, interval, value_by_date, transfer_by_date, cash_movements)
+      yield from iter_series_from_buckets(conn, buckets, base_currency, missing_data=missing_data, fx_matrix=fx_matrix)
+      yield {'end': missing_data_summary(missing_data, missing)}
+    return ndjson_response(db_path, produce)
+
+  def compute():
+    options = {'from_d': from_d, 'to_d': to_d, 'missing': missing, 'format': format, 'dates': dates}
+    return ANALYTICS.value_series(str(db_path), meta, options, cancel)
+
+  params = {'interval': interval, 'from': from_d, 'to': to_d, 'base': base_currency, 'missing': missing, 'format': format, 'dates': dates}
+  return _coalesced_json('/portfolio/value/series', params, compute, cancel=cancel)
+
+
+def _daily_series(db_path: Path, base_currency: str, cancel: Optional[threading.Event]):
+  """
+  Serie diaria de días hábiles `(ordinales, valor, flujos)` y `{'sync_in_progress'}` de la cartera.
+  Se calcula en el pool de analítica y se guarda por moneda base y versión de datos.
+  """
+  def build():
+    meta = {'base_currency': base_currency, 'interval': 'day', 'from': None, 'to': None}
+    options = {'from_d': None, 'to_d': None, 'missing': 'ranges', 'format': 'columnar', 'dates': 'delta'}
+    data = ANALYTICS.value_series(str(db_path), meta, options, cancel)
+    return daily_series_from_columnar(data['series']), {'sync_in_progress': data['sync_in_progress']}
+
+  versions = read_versions(tables_for_path('/portfolio/')) or {}
+  key = (str(db_path), base_currency, tuple(sorted((name, version) for name, (version, _updated) in versions.items())))
+  return DAILY_SERIES.get_or_build(key, build)
+
+
+def _risk_free_rate(rf: Optional[float]) -> float:
+  if rf is not None:
+    return rf
   try:
-    base_currency = (base or get_config_value('base_currency', 'USD') or 'USD').upper()
-    missing_data: Dict[str, set] = {'fx': set(), 'prices': set()}
-    trades, ticker_currency, cash_movements = collect_trades_and_cash(conn)
-    value_by_date = build_value_by_date(conn, trades, ticker_currency, base_currency, missing_data=missing_data)
-    transfer_by_date, cash_movements = collect_transfers_and_cash(conn, base_currency, cash_movements, missing_data=missing_data)
-    buckets = build_buckets(from_d, to_d, interval, value_by_date, transfer_by_date, cash_movements)
-    out = build_series_from_buckets(conn, buckets, base_currency, missing_data=missing_data)
-    sync_in_progress = bool(missing_data.get('fx') or missing_data.get('prices'))
-    if sync_in_progress:
-      schedule_missing_data_sync(missing_data)
-    data = {
+    return float(get_config_value('risk_free_rate', '0') or 0)
+  except ValueError:
+    return 0.0
+
+
+@app.get('/portfolio/metrics')
+async def portfolio_metrics(
+  request: Request,
+  from_date: Optional[str] = Query(default=None, alias="from", description="Fecha inicial ISO (YYYY-MM-DD)"),
+  to_date: Optional[str] = Query(default=None, alias="to", description="Fecha final ISO (YYYY-MM-DD)"),
+  base: Optional[str] = Query(default=None, description="Moneda base deseada (default: config)"),
+  rf: Optional[float] = Query(default=None, description="Tasa libre anual (0.02 = 2%); por defecto config risk_free_rate o 0"),
+  series: bool = Query(default=False, description="Incluir las series diarias (valor, retorno, TWR acumulado, drawdown) en formato columnar")
+):
+  """TWR, rentabilidad anualizada, volatilidad, drawdown, Sharpe y Sortino del rango (docs/metrics.md)."""
+  return await run_cancellable(request, lambda cancel: _metrics_response(cancel, from_date, to_date, base, rf, series))
+
+
+def _metrics_response(cancel, from_date, to_date, base, rf, series) -> Response:
+  from_d = _parse_date(from_date)
+  to_d = _parse_date(to_date)
+  db_path = ensure_db_ready()
+  base_currency = (base or get_config_value('base_currency', 'USD') or 'USD').upper()
+  rf = _risk_free_rate(rf)
+
+  def compute():
+    daily, extra = _daily_series(db_path, base_currency, cancel)
+    return {
       'base_currency': base_currency,
-      'interval': interval,
       'from': from_date,
       'to': to_date,
-      'series': out,
-      'sync_in_progress': sync_in_progress,
-      'missing_fx': [
-        {'date': d, 'base_currency': base, 'quote_currency': quote}
-        for (d, base, quote) in sorted(missing_data.get('fx', set()))
-      ],
-      'missing_prices': [
-        {'date': d, 'ticker': ticker}
-        for (d, ticker) in sorted(missing_data.get('prices', set()))
-      ]
+      **performance_metrics(*slice_range(daily, from_d, to_d), rf=rf, with_series=series),
+      **extra
     }
-    
-    logging.info(data)
 
-    return data
-  finally:
-    conn.close()
+  params = {'from': from_d, 'to': to_d, 'base': base_currency, 'rf': rf, 'series': series}
+  return _coalesced_json('/portfolio/metrics', params, compute, cancel=cancel)
+
+
+@app.get('/portfolio/rolling')
+async def portfolio_rolling(
+  request: Request,
+  window: str = Query(default=','.join(map(str, DEFAULT_WINDOWS)), description="Ventanas en días hábiles separadas por comas"),
+  metric: str = Query(default=','.join(ROLLING_METRICS), description="return,volatility,sharpe,max_drawdown"),
+  from_date: Optional[str] = Query(default=None, alias="from", description="Fecha inicial ISO (YYYY-MM-DD) de los puntos devueltos"),
+  to_date: Optional[str] = Query(default=None, alias="to", description="Fecha final ISO (YYYY-MM-DD) de los puntos devueltos"),
+  base: Optional[str] = Query(default=None, description="Moneda base deseada (default: config)"),
+  rf: Optional[float] = Query(default=None, description="Tasa libre anual para el Sharpe (default: config risk_free_rate o 0)")
+):
+  """Curvas de métricas en ventana móvil (columnar), todas las ventanas en una pasada sobre la serie diaria."""
+  return await run_cancellable(request, lambda cancel: _rolling_response(cancel, window, metric, from_date, to_date, base, rf))
+
+
+def _rolling_response(cancel, window, metric, from_date, to_date, base, rf) -> Response:
+  try:
+    windows = sorted({int(item) for item in window.split(',') if item.strip()})
+  except ValueError:
+    raise HTTPException(status_code=400, detail='Ventana inválida, use enteros separados por comas (p. ej. 30,90,252)')
+  if not windows or windows[0] < 2 or windows[-1] > MAX_ROLLING_WINDOW:
+    raise HTTPException(status_code=400, detail=f'Las ventanas deben estar entre 2 y {MAX_ROLLING_WINDOW} días')
+  metrics = [item.strip() for item in metric.split(',') if item.strip()]
+  unknown = sorted(set(metrics) - set(ROLLING_METRICS))
+  if not metrics or unknown:
+    raise HTTPException(status_code=400, detail=f"Métrica inválida, use {','.join(ROLLING_METRICS)}")
+  from_d = _parse_date(from_date)
+  to_d = _parse_date(to_date)
+  db_path = ensure_db_ready()
+  base_currency = (base or get_config_value('base_currency', 'USD') or 'USD').upper()
+  rf = _risk_free_rate(rf)
+
+  def compute():
+    daily, extra = _daily_series(db_path, base_currency, cancel)
+    return {
+      'base_currency': base_currency,
+      'from': from_date,
+      'to': to_date,
+      'rf': rf,
+      'windows': windows,
+      'metrics': metrics,
+      **rolling_payload(daily, windows, metrics, from_d, to_d, rf=rf),
+      **extra
+    }
+
+  params = {'window': ','.join(map(str, windows)), 'metric': ','.join(metrics), 'from': from_d, 'to': to_d, 'base': base_currency, 'rf': rf}
+  return _coalesced_json('/portfolio/rolling', params, compute, cancel=cancel)
+
+
+@app.get('/portfolio/pnl')
+def portfolio_pnl(
+  from_date: Optional[str] = Query(default=None, alias="from", description="Fecha inicial ISO (YYYY-MM-DD) de los cierres"),
+  to_date: Optional[str] = Query(default=None, alias="to", description="Fecha final ISO (YYYY-MM-DD): cierres hasta ese día y no realizado a esa fecha"),
+  base: Optional[str] = Query(default=None, description="Moneda base deseada (default: config)"),
+  ticker: Optional[str] = Query(default=None, description="Limitar a un ticker")
+):
+  """PnL realizado (lotes FIFO cerrados en el rango, por ticker y año) y no realizado de los lotes abiertos a `to`."""
+  to_d = _parse_date(to_date)
+  from_d = _parse_date(from_date)
+  db_path = ensure_db_ready()
+  base_currency = (base or get_config_value('base_currency', 'USD') or 'USD').upper()
+  ticker = ticker.strip().upper() if ticker else None
+
+  def compute():
+    conn = get_connection(str(db_path))
+    try:
+      fx_matrix = get_fx_matrix(conn, base_currency)
+      realized = realized_pnl(conn, fx_matrix, from_d.isoformat() if from_d else None, to_d.isoformat() if to_d else None, ticker)
+      unrealized = unrealized_pnl(conn, fx_matrix, to_d.isoformat() if to_d else None, ticker)
+    finally:
+      conn.close()
+    return {
+      'base_currency': base_currency,
+      'from': from_date,
+      'to': to_date,
+      'ticker': ticker,
+      'realized': realized,
+      'unrealized': unrealized
+    }
+
+  params = {'from': from_d, 'to': to_d, 'base': base_currency, 'ticker': ticker}
+  return _coalesced_json('/portfolio/pnl', params, compute)
+
+
+@app.get('/portfolio/snapshot')
+def portfolio_snapshot(
+  date_param: Optional[str] = Query(default=None, alias="date", description="Fecha ISO (YYYY-MM-DD); por defecto hoy"),
+  dates: Optional[str] = Query(default=None, description="Varias fechas ISO separadas por comas (respuesta en lote)"),
+  base: Optional[str] = Query(default=None, description="Moneda base deseada (default: config)")
+):
+  """Posiciones, precios, FX y caja en moneda base a una fecha (o a varias con `dates`), por búsqueda binaria en el índice temporal."""
+  if date_param and dates:
+    raise HTTPException(status_code=400, detail='Use date o dates, no ambos')
+  if dates:
+    targets = sorted({_parse_date(item.strip()) for item in dates.split(',') if item.strip()})
+    if not targets:
+      raise HTTPException(status_code=400, detail='dates no contiene fechas')
+    if len(targets) > MAX_SNAPSHOT_DATES:
+      raise HTTPException(status_code=400, detail=f'Como máximo {MAX_SNAPSHOT_DATES} fechas por petición')
+  else:
+    targets = [_parse_date(date_param) or date.today()]
+  db_path = ensure_db_ready()
+  base_currency = (base or get_config_value('base_currency', 'USD') or 'USD').upper()
+
+  def compute():
+    conn = get_connection(str(db_path))
+    try:
+      versions = read_data_versions(conn, tables_for_path('/portfolio/'))
+      key = (str(db_path), tuple(sorted((name, version) for name, (version, _updated) in versions.items())))
+      timeline = TIMELINES.get_or_build(key, lambda: PositionTimeline.from_db(conn))
+      result = snapshots(conn, timeline, get_fx_matrix(conn, base_currency), targets)
+    finally:
+      conn.close()
+    if dates:
+      return {'base_currency': base_currency, 'dates': [d.isoformat() for d in targets], 'snapshots': result}
+    return {'base_currency': base_currency, **result[0]}
+
+  params = {'dates': ','.join(d.isoformat() for d in targets), 'batch': bool(dates), 'base': base_currency}
+  return _coalesced_json('/portfolio/snapshot', params, compute)
+
+
+@app.get('/portfolio/attribution')
+def portfolio_attribution(
+  from_date: Optional[str] = Query(default=None, alias="from", description="Fecha inicial ISO (YYYY-MM-DD); parte del cierre del día anterior"),
+  to_date: Optional[str] = Query(default=None, alias="to", description="Fecha final ISO (YYYY-MM-DD), incluida"),
+  base: Optional[str] = Query(default=None, description="Moneda base deseada (default: config)")
+):
+  """Peso medio, PnL, contribución y rentabilidad (Dietz modificado) por ticker y por clase de activo en el rango."""
+  from_d = _parse_date(from_date)
+  to_d = _parse_date(to_date)
+  if from_d and to_d and from_d > to_d:
+    raise HTTPException(status_code=400, detail='from debe ser anterior o igual a to')
+  db_path = ensure_db_ready()
+  base_currency = (base or get_config_value('base_currency', 'USD') or 'USD').upper()
+
+  def compute():
+    today = date.today()
+    conn = get_connection(str(db_path))
+    try:
+      versions = read_data_versions(conn, tables_for_path('/portfolio/'))
+      key = (str(db_path), tuple(sorted((name, version) for name, (version, _updated) in versions.items())))
+      timeline = TIMELINES.get_or_build(key, lambda: PositionTimeline.from_db(conn))
+      inputs = ATTRIBUTIONS.get_or_build(
+        (key, base_currency, today),
+        lambda: AttributionInputs.build(conn, timeline, get_fx_matrix(conn, base_currency), today)
+      )
+    finally:
+      conn.close()
+    return {'base_currency': base_currency, 'from': from_date, 'to': to_date, **attribution(inputs, from_d, to_d)}
+
+  params = {'from': from_d, 'to': to_d, 'base': base_currency}
+  return _coalesced_json('/portfolio/attribution', params, compute)
+
+
+@app.get('/dashboard')
+def dashboard(
+  sections: Optional[str] = Query(default=None, description="Secciones separadas por comas (por defecto todas): config,net_transfers,value_series,transfers_series,cash_balance,cash_series,latest_prices"),
+  interval: str = Query(default='day', pattern='^(day|week|month|quarter|year)$'),
+  from_date: Optional[str] = Query(default=None, description="Fecha mínima ISO (YYYY-MM-DD)"),
+  to_date: Optional[str] = Query(default=None, description="Fecha máxima ISO (YYYY-MM-DD)"),
+  base: Optional[str] = Query(default=None, description="Moneda base deseada (default: config)"),
+  tickers: Optional[str] = Query(default=None, description="Tickers para latest_prices (por defecto, posiciones abiertas)"),
+  missing: str = Query(default='ranges', pattern='^(ranges|points)$')
+):
+  """
+  Todas las vistas del dashboard en una respuesta, calculadas en una única transacción de lectura
+  para que las cifras de las distintas secciones sean coherentes entre sí.
+  """
+  requested = parse_sections(sections)
+  ticker_list = [t.strip() for t in (tickers or '').split(',') if t.strip()]
+  db_path = ensure_db_ready()
+
+  def compute():
+    value_series = None
+    if 'value_series' in requested:
+      # La serie de valor va al pool de analítica, fuera del snapshot; se usa si los datos no cambian mientras
+      base_currency = (base or get_config_value('base_currency', 'USD') or 'USD').upper()
+      meta = {'base_currency': base_currency, 'interval': interval, 'from': from_date, 'to': to_date}
+      options = {'from_d': _parse_date(from_date), 'to_d': _parse_date(to_date), 'missing': missing, 'format': 'rows', 'dates': 'iso'}
+      versions = read_versions(tables_for_path('/dashboard'))
+      value_series = ANALYTICS.value_series(str(db_path), meta, options)
+    conn = get_connection(str(db_path))
+    try:
+      with read_snapshot(conn):
+        if value_series is not None and read_data_versions(conn, tables_for_path('/dashboard')) != versions:
+          value_series = None
+        return build_dashboard(conn, requested, interval, from_date, to_date, base, ticker_list, missing, value_series=value_series)
+    finally:
+      conn.close()
+
+  params = {'sections': ','.join(requested), 'interval': interval, 'from': from_date, 'to': to_date, 'base': base, 'tickers': ','.join(ticker_list), 'missing': missing}
+  return _coalesced_json('/dashboard', params, compute)
 
 
 @app.post('/reset')
 def reset_database():
   logging.info("Borrando Base de datos")
   db_path = get_db_path()
+  invalidate_fx_matrices(db_path)
   if db_path.exists():
     db_path.unlink()
   log_path = db_path.with_suffix('.log')
@@ -698,12 +1049,27 @@ def reset_database():
 
 
 @app.get('/trades')
-def list_trades():
-  rows = fetch_rows(
-    "SELECT trade_id, ticker, quantity, purchase, datetime, commission, commission_currency, currency, isin, asset_class, raw_json FROM trades ORDER BY datetime ASC",
-    ['trade_id', 'ticker', 'quantity', 'purchase', 'datetime', 'commission', 'commission_currency', 'currency', 'isin', 'asset_class', 'raw_json']
-  )
-  return rows
+def list_trades(
+  response: Response,
+  ticker: Optional[str] = None,
+  currency: Optional[str] = None,
+  asset_class: Optional[str] = Query(default=None, description="STK|OPT"),
+  from_date: Optional[str] = None,
+  to_date: Optional[str] = None,
+  fields: Optional[str] = Query(default=None, description="Columnas separadas por comas (raw_json sólo si se pide)"),
+  cursor: Optional[str] = None,
+  limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+  format: str = Query(default='rows', pattern=LIST_FORMAT_PATTERN, description="rows (JSON paginado) | ndjson (streaming, una fila por línea)")
+):
+  filters = date_range_filters(from_date, to_date)
+  if ticker:
+    filters.append(('ticker = ?', ticker.upper()))
+  if currency:
+    filters.append(('currency = ?', currency.upper()))
+  if asset_class:
+    filters.append(("COALESCE(asset_class, 'STK') = ?", asset_class.upper()))
+  columns = parse_fields(fields, TRADE_FIELDS, TRADE_DEFAULT_FIELDS)
+  return _list_response(response, 'trades', columns, filters, cursor, limit, format)
 
 
 @app.get('/cash/net-transfers')
@@ -716,21 +1082,7 @@ def net_transfers(
   conn = get_connection(str(db_path))
   ensure_schema(conn)
   try:
-    params: List[Any] = []
-    clauses: List[str] = []
-    clauses.append("origin = 'externo'")
-    if from_date:
-      clauses.append("datetime >= ?")
-      params.append(from_date)
-    if to_date:
-      clauses.append("datetime <= ?")
-      params.append(to_date)
-    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
-    query = f"SELECT currency, SUM(amount) as total FROM transfers {where} GROUP BY currency"
-    cur = conn.execute(query, params)
-    totals = []
-    for row in cur.fetchall():
-      totals.append({'currency': row[0], 'total': row[1]})
+    totals = net_transfer_totals(conn, from_date, to_date)
     base_currency = (base or get_config_value('base_currency', 'USD') or 'USD').upper()
     return {'base_currency': base_currency, 'totals': totals}
   finally:
@@ -775,9 +1127,52 @@ def prices_series(ticker: str):
 
 
 @app.get('/dividends')
-def list_dividends():
-  rows = fetch_rows(
-    "SELECT action_id, ticker, currency, datetime, amount, gross, tax, issuer_country FROM dividends ORDER BY datetime ASC",
-    ['action_id', 'ticker', 'currency', 'datetime', 'amount', 'gross', 'tax', 'issuer_country']
-  )
-  return rows
+def list_dividends(
+  response: Response,
+  ticker: Optional[str] = None,
+  currency: Optional[str] = None,
+  from_date: Optional[str] = None,
+  to_date: Optional[str] = None,
+  fields: Optional[str] = Query(default=None, description="Columnas separadas por comas (raw_json sólo si se pide)"),
+  cursor: Optional[str] = None,
+  limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+  format: str = Query(default='rows', pattern=LIST_FORMAT_PATTERN, description="rows (JSON paginado) | ndjson (streaming, una fila por línea)")
+):
+  filters = date_range_filters(from_date, to_date)
+  if ticker:
+    filters.append(('ticker = ?', ticker.upper()))
+  if currency:
+    filters.append(('currency = ?', currency.upper()))
+  columns = parse_fields(fields, DIVIDEND_FIELDS, DIVIDEND_DEFAULT_FIELDS)
+  return _list_response(response, 'dividends', columns, filters, cursor, limit, format)
+
+
+@app.get('/changes')
+def list_changes(
+  since: Optional[int] = Query(default=None, ge=0, description="Último seq conocido por el cliente; sin él sólo se devuelve la secuencia actual"),
+  tables: Optional[str] = Query(default=None, description="trades,transfers,dividends (por defecto todas)"),
+  raw: bool = Query(default=False, description="Incluir raw_json en las filas"),
+  limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE)
+):
+  """
+  Feed de cambios para caches de cliente: filas insertadas/actualizadas y claves borradas desde `since`.
+  """
+  fields = {
+    'trades': TRADE_FIELDS if raw else TRADE_DEFAULT_FIELDS,
+    'transfers': TRANSFER_FIELDS if raw else TRANSFER_DEFAULT_FIELDS,
+    'dividends': DIVIDEND_FIELDS if raw else DIVIDEND_DEFAULT_FIELDS,
+  }
+  selected = [t.strip() for t in (tables or '').split(',') if t.strip()] or list(CHANGE_TABLES)
+  unknown = set(selected) - set(CHANGE_TABLES)
+  if unknown:
+    raise HTTPException(status_code=400, detail=f"Tablas desconocidas: {', '.join(sorted(unknown))}")
+  db_path = ensure_db_ready()
+  conn = get_connection(str(db_path))
+  ensure_schema(conn)
+  try:
+    if since is None:
+      current = current_change_seq(conn)
+      return {'seq': current, 'current': current, 'since': None, 'reset': False, 'more': False, 'changes': {}}
+    return changes_since(conn, since, {t: fields[t] for t in selected}, limit=limit)
+  finally:
+    conn.close()
@@ -0,0 +1,298 @@
+"""
+Instrumentación por petición: latencia por ruta, consultas SQLite, filas leídas y bytes enviados.
+
+- `MetricsMiddleware` (ASGI) abre un `RequestStats` por petición en un ContextVar; las conexiones
+  de `db.get_connection` son `InstrumentedConnection` y acumulan ahí nº de consultas, tiempo en
+  SQLite (ejecución + lectura de filas) y filas devueltas. Los handlers síncronos corren en el
+  threadpool con una copia del contexto, que apunta al mismo `RequestStats`.
+- Cada respuesta lleva `Server-Timing` (`app` y `db`) y el registro se expone en texto Prometheus
+  (`GET /debug/metrics`).
+- Con `set_slow_query_log` los cursores informan además de cada sentencia a un `SlowQueryLog`
+  (dentro o fuera de una petición), que guarda las que superan su umbral con su plan.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .slow_queries import SlowQueryLog
+
+LOGGER = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+  __slots__ = ("queries", "db_seconds", "rows", "path")
+
+  def __init__(self, path: Optional[str] = None) -> None:
+    self.queries = 0
+    self.db_seconds = 0.0
+    self.rows = 0
+    self.path = path
+
+
+_CURRENT: ContextVar[Optional[RequestStats]] = ContextVar("portfolio_request_stats", default=None)
+# Registro de consultas lentas; None = sin registro (sólo métricas por petición)
+_SLOW_LOG: Optional[SlowQueryLog] = None
+
+
+def current_stats() -> Optional[RequestStats]:
+  return _CURRENT.get()
+
+
+def set_slow_query_log(log: Optional[SlowQueryLog]) -> None:
+  global _SLOW_LOG
+  _SLOW_LOG = log
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+  """
+  Cursor que suma el tiempo y las filas de cada sentencia a la petición en curso (si la hay).
+  Con registro de lentas, la sentencia se informa al terminar de leerla (última fila, nueva
+  sentencia, `close()` o al liberarse el cursor) con el tiempo de ejecución más el de lectura.
+  """
+
+  _pending = None  # (sql, parámetros, executemany) de la sentencia aún sin informar
+  _elapsed = 0.0
+  _read = 0
+
+  def _run(self, method, sql, parameters, many):
+    stats = _CURRENT.get()
+    slow = _SLOW_LOG
+    if self._pending is not None:
+      self._report()
+    if stats is None and slow is None:
+      return method(sql, parameters)
+    start = time.perf_counter()
+    try:
+      return method(sql, parameters)
+    finally:
+      elapsed = time.perf_counter() - start
+      if stats is not None:
+        stats.db_seconds += elapsed
+        stats.queries += 1
+      if slow is not None:
+        if many:
+          parameters = parameters[0] if isinstance(parameters, (list, tuple)) and parameters else ()
+        self._pending = (sql, parameters, many)
+        self._elapsed = elapsed
+        self._read = 0
+        if many or self.description is None:
+          self._report()
+
+  def execute(self, sql, parameters=()):
+    return self._run(super().execute, sql, parameters, False)
+
+  def executemany(self, sql, seq_of_parameters):
+    return self._run(super().executemany, sql, seq_of_parameters, True)
+
+  def _timed_fetch(self, fetch, *args):
+    stats = _CURRENT.get()
+    if stats is None and self._pending is None:
+      return fetch(*args)
+    start = time.perf_counter()
+    result = fetch(*args)
+    elapsed = time.perf_counter() - start
+    count = (len(result) if isinstance(result, list) else 1) if result is not None else 0
+    if stats is not None:
+      stats.db_seconds += elapsed
+      stats.rows += count
+    if self._pending is not None:
+      self._elapsed += elapsed
+      self._read += count
+      if result is None or (isinstance(result, list) and (not args or count < args[0])):
+        self._report()
+    return result
+
+  def fetchone(self):
+    return self._timed_fetch(super().fetchone)
+
+  def fetchmany(self, size: int = 1):
+    return self._timed_fetch(super().fetchmany, size)
+
+  def fetchall(self):
+    return self._timed_fetch(super().fetchall)
+
+  def __next__(self):
+    row = self._timed_fetch(super().fetchone)
+    if row is None:
+      raise StopIteration
+    return row
+
+  def close(self):
+    if self._pending is not None:
+      self._report()
+    super().close()
+
+  def __del__(self):
+    if self._pending is not None:
+      self._report()
+
+  def _report(self):
+    sql, parameters, many = self._pending
+    self._pending = None
+    slow = _SLOW_LOG
+    if slow is None:
+      return
+    stats = _CURRENT.get()
+    try:
+      slow.record(self.connection, sql, parameters, self._elapsed, self._read, many=many, path=stats.path if stats else None)
+    except Exception:  # el registro nunca debe romper la consulta
+      LOGGER.exception("No se pudo registrar la consulta lenta")
+
+
+class InstrumentedConnection(sqlite3.Connection):
+  """Conexión cuyos cursores se instrumentan; sin petición en curso ni registro de lentas sólo añade un ContextVar.get()."""
+
+  def cursor(self, factory=InstrumentedCursor):
+    return super().cursor(factory)
+
+  # `Connection.execute` de C no pasa por `cursor()`: se crea el cursor aquí para que sea el instrumentado
+  def execute(self, sql, parameters=()):
+    return self.cursor().execute(sql, parameters)
+
+  def executemany(self, sql, seq_of_parameters):
+    return self.cursor().executemany(sql, seq_of_parameters)
+
+  def executescript(self, sql_script):
+    stats = _CURRENT.get()
+    if stats is None:
+      return super().executescript(sql_script)
+    start = time.perf_counter()
+    try:
+      return super().executescript(sql_script)
+    finally:
+      stats.db_seconds += time.perf_counter() - start
+      stats.queries += 1
+
+
+def _escape(value: str) -> str:
+  return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+  return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._requests: Dict[Tuple[str, str, str], int] = {}
+    self._latency: Dict[str, List[float]] = {}
+    self._latency_sum: Dict[str, float] = {}
+    self._route_totals: Dict[str, Dict[str, float]] = {}
+    self._collectors: List[Callable[[], List[str]]] = []
+
+  def add_collector(self, collector: Callable[[], List[str]]) -> None:
+    """Registra una función que devuelve líneas Prometheus adicionales (con sus # HELP/# TYPE)."""
+    self._collectors.append(collector)
+
+  def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats, response_bytes: int) -> None:
+    with self._lock:
+      key = (method, route, str(status))
+      self._requests[key] = self._requests.get(key, 0) + 1
+      counts = self._latency.setdefault(route, [0] * (len(LATENCY_BUCKETS) + 1))
+      for idx, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+          counts[idx] += 1
+      counts[-1] += 1
+      self._latency_sum[route] = self._latency_sum.get(route, 0.0) + seconds
+      totals = self._route_totals.setdefault(route, {"queries": 0, "db_seconds": 0.0, "rows": 0, "bytes": 0})
+      totals["queries"] += stats.queries
+      totals["db_seconds"] += stats.db_seconds
+      totals["rows"] += stats.rows
+      totals["bytes"] += response_bytes
+
+  def render(self) -> str:
+    with self._lock:
+      requests = dict(self._requests)
+      latency = {route: list(counts) for route, counts in self._latency.items()}
+      latency_sum = dict(self._latency_sum)
+      totals = {route: dict(values) for route, values in self._route_totals.items()}
+    lines = [
+      "# HELP portfolio_http_requests_total Peticiones HTTP atendidas.",
+      "# TYPE portfolio_http_requests_total counter",
+    ]
+    for (method, route, status), count in sorted(requests.items()):
+      lines.append(f"portfolio_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+    lines += [
+      "# HELP portfolio_http_request_duration_seconds Latencia de las peticiones por ruta.",
+      "# TYPE portfolio_http_request_duration_seconds histogram",
+    ]
+    for route, counts in sorted(latency.items()):
+      for bound, count in zip(LATENCY_BUCKETS, counts):
+        lines.append(f"portfolio_http_request_duration_seconds_bucket{_labels(route=route, le=repr(bound))} {count}")
+      lines.append(f"portfolio_http_request_duration_seconds_bucket{_labels(route=route, le='+Inf')} {counts[-1]}")
+      lines.append(f"portfolio_http_request_duration_seconds_sum{_labels(route=route)} {latency_sum[route]:.6f}")
+      lines.append(f"portfolio_http_request_duration_seconds_count{_labels(route=route)} {counts[-1]}")
+    for name, field, help_text in (
+      ("portfolio_sqlite_queries_total", "queries", "Sentencias SQLite ejecutadas."),
+      ("portfolio_sqlite_query_seconds_total", "db_seconds", "Tiempo en SQLite (ejecución y lectura de filas)."),
+      ("portfolio_sqlite_rows_total", "rows", "Filas leídas de SQLite."),
+      ("portfolio_http_response_bytes_total", "bytes", "Bytes de cuerpo enviados (tras compresión)."),
+    ):
+      lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+      for route, values in sorted(totals.items()):
+        value = values[field]
+        lines.append(f"{name}{_labels(route=route)} {value:.6f}" if isinstance(value, float) else f"{name}{_labels(route=route)} {value}")
+    for collector in self._collectors:
+      lines += collector()
+    return "\n".join(lines) + "\n"
+
+
+def _route_template(scope: Scope, cache: Dict[int, str]) -> str:
+  """Plantilla de la ruta (`/prices/{ticker}`) para no crear una serie por valor de parámetro."""
+  endpoint = scope.get("endpoint")
+  app = scope.get("app")
+  if endpoint is None or app is None:
+    return UNMATCHED_ROUTE
+  template = cache.get(id(endpoint))
+  if template is None:
+    template = next((route.path for route in getattr(app, "routes", ()) if getattr(route, "endpoint", None) is endpoint), UNMATCHED_ROUTE)
+    cache[id(endpoint)] = template
+  return template
+
+
+class MetricsMiddleware:
+  def __init__(self, app: ASGIApp, registry: MetricsRegistry) -> None:
+    self.app = app
+    self.registry = registry
+    self._templates: Dict[int, str] = {}
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+    start = time.perf_counter()
+    stats = RequestStats(scope.get("path"))
+    token = _CURRENT.set(stats)
+    status = 500
+    response_bytes = 0
+
+    async def send_with_timing(message: Message) -> None:
+      nonlocal status, response_bytes
+      if message["type"] == "http.response.start":
+        status = message["status"]
+        headers = MutableHeaders(scope=message)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        headers.append(
+          "Server-Timing",
+          f'app;dur={elapsed_ms:.1f}, db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} consultas, {stats.rows} filas"'
+        )
+        headers["Timing-Allow-Origin"] = "*"
+      elif message["type"] == "http.response.body":
+        response_bytes += len(message.get("body", b""))
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_with_timing)
+    finally:
+      _CURRENT.reset(token)
+      self.registry.observe(scope["method"], _route_template(scope, self._templates), status, time.perf_counter() - start, stats, response_bytes)
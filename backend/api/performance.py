@@ -0,0 +1,129 @@
+"""
+Métricas de rendimiento de la cartera (docs/metrics.md): TWR, rentabilidad anualizada, volatilidad,
+drawdown, Sharpe y Sortino sobre la serie diaria de valor en moneda base y los flujos externos
+(aportes/retiros de `collect_transfers_and_cash`).
+
+La serie diaria se reduce a días hábiles (los flujos de fin de semana pasan al siguiente hábil) y
+se guarda por versión de datos en `DAILY_SERIES` (un `LruCache`); cada rango pedido es un corte de esos arrays
+y todas las métricas salen de unas pocas pasadas vectorizadas O(n) con NumPy.
+
+- Retorno diario con flujos al cierre: `r_t = (V_t - F_t) / V_{t-1} - 1`; sin valor previo positivo
+  el día no tiene retorno (NaN) y no cuenta en las estadísticas.
+- TWR = Π(1 + r_t) - 1; anualizada con `periods_per_year` (252) periodos por año.
+- Drawdown sobre el índice TWR (no sobre el valor bruto, que sube con cada aportación).
+- Sharpe = (anualizada - rf) / vol; Sortino = (anualizada - rf) / desviación a la baja anualizada
+  (raíz de la media de `min(r_t, 0)²`).
+"""
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+PERIODS_PER_YEAR = 252
+
+DailySeries = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def business_days(ordinals: np.ndarray, values: np.ndarray, flows: np.ndarray) -> DailySeries:
+  """
+  Quita sábados y domingos (se conserva siempre el último punto). El flujo de cada día eliminado se
+  suma al siguiente punto conservado, así que el total de flujos no cambia.
+  """
+  ordinals = np.asarray(ordinals, dtype=np.int64)
+  if not len(ordinals):
+    return ordinals, np.asarray(values, dtype=np.float64), np.asarray(flows, dtype=np.float64)
+  keep = (ordinals - 1) % 7 < 5  # date.fromordinal(1) es lunes
+  keep[-1] = True
+  idx = np.flatnonzero(keep)
+  kept_flows = np.diff(np.cumsum(flows, dtype=np.float64)[idx], prepend=0.0)
+  return ordinals[idx], np.asarray(values, dtype=np.float64)[idx], kept_flows
+
+
+def daily_returns(values: np.ndarray, flows: np.ndarray) -> np.ndarray:
+  """Retorno de cada día respecto al anterior descontando el flujo del día; NaN en el primero y sin base."""
+  returns = np.full(len(values), np.nan)
+  if len(values) > 1:
+    prev = values[:-1]
+    valid = prev > 0
+    returns[1:][valid] = (values[1:][valid] - flows[1:][valid]) / prev[valid] - 1.0
+  return returns
+
+
+def _annualized(total: float, periods: int, periods_per_year: int) -> Optional[float]:
+  if periods <= 0 or total <= -1.0:
+    return None
+  return float((1.0 + total) ** (periods_per_year / periods) - 1.0)
+
+
+def _ratio(numerator: Optional[float], denominator: Optional[float]) -> Optional[float]:
+  if numerator is None or not denominator:
+    return None
+  return float(numerator / denominator)
+
+
+def performance_metrics(ordinals: np.ndarray, values: np.ndarray, flows: np.ndarray, rf: float = 0.0, periods_per_year: int = PERIODS_PER_YEAR, with_series: bool = False) -> Dict[str, Any]:
+  """KPIs del tramo (arrays ya cortados al rango). Los indefinidos (pocos datos, volatilidad 0) son None."""
+  returns = daily_returns(values, flows)
+  valid = ~np.isnan(returns)
+  periods = int(valid.sum())
+  growth = np.where(valid, 1.0 + returns, 1.0)
+  index = np.cumprod(growth)
+  peaks = np.maximum.accumulate(index)
+  drawdown = index / peaks - 1.0
+
+  twr = float(index[-1] - 1.0) if periods else None
+  annualized = _annualized(twr, periods, periods_per_year) if twr is not None else None
+  r = returns[valid]
+  volatility = float(r.std(ddof=1) * np.sqrt(periods_per_year)) if periods > 1 else None
+  downside = float(np.sqrt(np.mean(np.minimum(r, 0.0) ** 2)) * np.sqrt(periods_per_year)) if periods > 1 else None
+  excess = annualized - rf if annualized is not None else None
+  out: Dict[str, Any] = {
+    'start_date': date.fromordinal(int(ordinals[0])).isoformat() if len(ordinals) else None,
+    'end_date': date.fromordinal(int(ordinals[-1])).isoformat() if len(ordinals) else None,
+    'periods': periods,
+    'periods_per_year': periods_per_year,
+    'rf': rf,
+    'start_value': float(values[0]) if len(values) else None,
+    'end_value': float(values[-1]) if len(values) else None,
+    'net_flows': float(flows[1:].sum()) if len(flows) > 1 else 0.0,
+    'twr': twr,
+    'annualized_return': annualized,
+    'volatility': volatility,
+    'downside_volatility': downside,
+    'max_drawdown': float(drawdown.min()) if periods else None,
+    'max_drawdown_date': date.fromordinal(int(ordinals[int(drawdown.argmin())])).isoformat() if periods else None,
+    'current_drawdown': float(drawdown[-1]) if periods else None,
+    'sharpe': _ratio(excess, volatility),
+    'sortino': _ratio(excess, downside),
+  }
+  if with_series:
+    out['series'] = {
+      'format': 'columnar',
+      'length': len(ordinals),
+      'date': [date.fromordinal(int(d)).isoformat() for d in ordinals],
+      'value_base': values.tolist(),
+      'return': [None if np.isnan(x) else x for x in returns.tolist()],
+      'twr': (index - 1.0).tolist(),
+      'drawdown': drawdown.tolist(),
+    }
+  return out
+
+
+def slice_range(series: DailySeries, from_d: Optional[date], to_d: Optional[date]) -> DailySeries:
+  """Corte `[from_d, to_d]` (fechas incluidas) por búsqueda binaria sobre los ordinales."""
+  ordinals, values, flows = series
+  lo = int(np.searchsorted(ordinals, from_d.toordinal(), side='left')) if from_d else 0
+  hi = int(np.searchsorted(ordinals, to_d.toordinal(), side='right')) if to_d else len(ordinals)
+  return ordinals[lo:hi], values[lo:hi], flows[lo:hi]
+
+
+def daily_series_from_columnar(series: Dict[str, Any]) -> DailySeries:
+  """Arrays de días hábiles a partir de la serie de valor diaria en formato columnar (`dates=delta`)."""
+  if not series.get('length'):
+    empty = np.empty(0)
+    return np.empty(0, dtype=np.int64), empty, empty
+  start = date.fromisoformat(series['date_start'][:10]).toordinal()
+  ordinals = start + np.cumsum(np.asarray(series['date_delta'], dtype=np.int64))
+  values = np.asarray(series['value_base'], dtype=np.float64)
+  flows = np.asarray(series['transfers_base'], dtype=np.float64)
+  return business_days(ordinals, values, flows)
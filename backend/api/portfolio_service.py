@@ -1,21 +1,138 @@
 import logging
+from bisect import bisect_right
 from datetime import date, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 from fastapi import HTTPException
 
+from cash_ledger import daily_cash_rows
+from fx_matrix import FxMatrix, get_fx_matrix
+from price_store import load_price_columns
+from .series_format import columnar_points
 
-def _record_missing(missing_data: Optional[Dict[str, set]], key: str, value) -> None:
+def new_missing_data(points: bool = False) -> Dict[str, Any]:
+  """
+  Estructura para registrar faltantes de FX y precios.
+  - `fx` y `prices` agrupan por par/ticker una lista ordenada de tramos `[desde, hasta]` de días
+    consecutivos, todos registrados: un día dentro de un tramo ya está contado.
+  - Con `points=True` se guarda además el detalle punto a punto (formato antiguo) en `points`.
+  """
+  data: Dict[str, Any] = {'fx': {}, 'prices': {}}
+  if points:
+    data['points'] = {'fx': set(), 'prices': set()}
+  return data
+
+
+def _merge_into_ranges(ranges: List[list], day: date) -> None:
+  """Añade `day` a la lista ordenada de tramos, extendiendo o uniendo los tramos vecinos."""
+  one_day = timedelta(days=1)
+  if ranges:
+    last = ranges[-1]
+    # Camino rápido: las fechas suelen llegar en orden ascendente
+    if last[0] <= day <= last[1]:
+      return
+    if day == last[1] + one_day:
+      last[1] = day
+      return
+  idx = bisect_right(ranges, [day, date.max])
+  prev = ranges[idx - 1] if idx > 0 else None
+  nxt = ranges[idx] if idx < len(ranges) else None
+  if prev is not None and day <= prev[1]:
+    return
+  joins_prev = prev is not None and day == prev[1] + one_day
+  joins_next = nxt is not None and day == nxt[0] - one_day
+  if joins_prev and joins_next:
+    prev[1] = nxt[1]
+    del ranges[idx]
+  elif joins_prev:
+    prev[1] = day
+  elif joins_next:
+    nxt[0] = day
+  else:
+    ranges.insert(idx, [day, day])
+
+
+def _record_missing(missing_data: Optional[Dict[str, Any]], key: str, group: Tuple[str, ...], day: date) -> None:
   if missing_data is None:
     return
-  missing_data.setdefault(key, set()).add(value)
+  _merge_into_ranges(missing_data.setdefault(key, {}).setdefault(group, []), day)
+  points = missing_data.get('points')
+  if points is not None:
+    points.setdefault(key, set()).add((day.isoformat(), *group))
+
+
+def _weekend_only_between(end: date, start: date) -> bool:
+  return all((end + timedelta(days=n)).weekday() >= 5 for n in range(1, (start - end).days))
+
+
+def _output_ranges(ranges: List[list]) -> List[Tuple[date, date, int]]:
+  """
+  Tramos de la respuesta: se unen los separados sólo por un fin de semana sin registrar, que la serie
+  diaria no evalúa (un tipo o precio que falta el lunes ya faltaba el sábado con el forward-fill).
+  `count` son los días registrados del tramo.
+  """
+  out: List[list] = []
+  for start, end in ranges:
+    count = (end - start).days + 1
+    if out and (start - out[-1][1]).days <= 3 and _weekend_only_between(out[-1][1], start):
+      out[-1][1] = end
+      out[-1][2] += count
+    else:
+      out.append([start, end, count])
+  return [tuple(r) for r in out]
+
+
+def has_missing_data(missing_data: Optional[Dict[str, Any]]) -> bool:
+  if not missing_data:
+    return False
+  return bool(missing_data.get('fx') or missing_data.get('prices'))
+
+
+def missing_data_ranges(missing_data: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+  """Formato compacto: un objeto por tramo contiguo `{pair|ticker, from, to, count}` (sin cortar en fines de semana)."""
+  fx_out = []
+  for (base, quote) in sorted(missing_data.get('fx', {})):
+    for start, end, count in _output_ranges(missing_data['fx'][(base, quote)]):
+      fx_out.append({
+        'pair': f"{base}/{quote}",
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'count': count
+      })
+  prices_out = []
+  for (ticker,) in sorted(missing_data.get('prices', {})):
+    for start, end, count in _output_ranges(missing_data['prices'][(ticker,)]):
+      prices_out.append({
+        'ticker': ticker,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'count': count
+      })
+  return {'fx': fx_out, 'prices': prices_out}
+
+
+def missing_data_points(missing_data: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+  """Formato detallado (compatibilidad): un objeto por fecha faltante."""
+  points = missing_data.get('points') or {}
+  return {
+    'fx': [
+      {'date': d, 'base_currency': base, 'quote_currency': quote}
+      for (d, base, quote) in sorted(points.get('fx', set()))
+    ],
+    'prices': [
+      {'date': d, 'ticker': ticker}
+      for (d, ticker) in sorted(points.get('prices', set()))
+    ]
+  }
 
 
 def _parse_db_datetime(value: str) -> Optional[date]:
   if not value:
     return None
   try:
-    return date.fromisoformat(value.split(' ')[0])
+    # '2024-01-10 10:00:00' o el ISO del importador '2024-01-10T10:00:00+00:00'
+    return date.fromisoformat(value[:10])
   except Exception:
     return None
 
@@ -49,35 +166,31 @@ def _period_end_for(d: date, interval: str) -> date:
   raise HTTPException(status_code=400, detail='Intervalo inválido, use day|week|month|quarter|year')
 
 
-def fx_rate_on_date(conn, base: str, quote: str, target: date) -> Optional[float]:
+def fx_rate_on_date(conn, base: str, quote: str, target: date, fx_matrix: Optional[FxMatrix] = None) -> Optional[float]:
+  """
+  Tasa vigente en `target`; si el par no está descargado se deriva (inverso o cruce por pivote).
+  Se resuelve sobre la matriz FX densa de `base`; pásala en `fx_matrix` para reutilizarla en bucles.
+  """
   if not base or not quote:
     return None
-  if base.upper() == quote.upper():
-    return 1.0
-  cur = conn.execute(
-    """SELECT rate FROM fx_rates
-       WHERE base_currency = ? AND quote_currency = ? AND date <= ?
-       ORDER BY date DESC LIMIT 1""",
-    (base.upper(), quote.upper(), target.isoformat())
-  )
-  row = cur.fetchone()
-  return float(row[0]) if row else None
+  if fx_matrix is None or fx_matrix.base != base.upper():
+    fx_matrix = get_fx_matrix(conn, base)
+  return fx_matrix.rate(quote, target)
 
 
-def convert_amount_on_date(conn, amount: float, from_currency: str, base_currency: str, target: date, *, missing_data: Optional[Dict[str, set]] = None, allow_missing: bool = False) -> Optional[float]:
-  rate = fx_rate_on_date(conn, base_currency, from_currency, target)
+def convert_amount_on_date(conn, amount: float, from_currency: str, base_currency: str, target: date, *, missing_data: Optional[Dict[str, Any]] = None, allow_missing: bool = False, fx_matrix: Optional[FxMatrix] = None) -> Optional[float]:
+  rate = fx_rate_on_date(conn, base_currency, from_currency, target, fx_matrix)
   if rate is None:
     if allow_missing:
-      _record_missing(missing_data, 'fx', (target.isoformat(), base_currency.upper(), from_currency.upper()))
+      _record_missing(missing_data, 'fx', (base_currency.upper(), from_currency.upper()), target)
       return None
     raise HTTPException(status_code=400, detail=f'No hay tipo de cambio para {from_currency}->{base_currency} en {target.isoformat()}')
   return amount * rate
 
 
-def collect_trades_and_cash(conn) -> Tuple[Dict[str, List[Tuple[date, float, str, float]]], Dict[str, str], Dict[date, Dict[str, float]]]:
+def collect_trades_and_cash(conn) -> Tuple[Dict[str, List[Tuple[date, float, str, float]]], Dict[str, str]]:
   trades: Dict[str, List[Tuple[date, float, str, float]]] = {}
   ticker_currency: Dict[str, str] = {}
-  cash_movements: Dict[date, Dict[str, float]] = {}
   cur = conn.execute("SELECT ticker, quantity, datetime, currency, purchase FROM trades ORDER BY datetime ASC")
   for ticker, qty, dt_str, currency, purchase in cur.fetchall():
     if not ticker or qty is None:
@@ -87,92 +200,100 @@ def collect_trades_and_cash(conn) -> Tuple[Dict[str, List[Tuple[date, float, str
       continue
     purchase_price = float(purchase or 0)
     trades.setdefault(ticker, []).append((d, float(qty), (currency or '').upper(), purchase_price))
-    cash_movements.setdefault(d, {})
-    cash_movements[d][(currency or '').upper()] = cash_movements[d].get((currency or '').upper(), 0.0) - float(qty) * purchase_price
     if ticker not in ticker_currency and currency:
       ticker_currency[ticker] = (currency or '').upper()
-  return trades, ticker_currency, cash_movements
+  return trades, ticker_currency
 
 
-def build_value_by_date(conn, trades: Dict[str, List[Tuple[date, float, str, float]]], ticker_currency: Dict[str, str], base_currency: str, missing_data: Optional[Dict[str, set]] = None) -> Dict[date, float]:
+def build_value_by_date(conn, trades: Dict[str, List[Tuple[date, float, str, float]]], ticker_currency: Dict[str, str], base_currency: str, missing_data: Optional[Dict[str, Any]] = None, fx_matrix: Optional[FxMatrix] = None, price_columns: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None) -> Dict[date, float]:
+  """`price_columns` (ticker -> `(days, closes)`) se usa como caché de `load_price_columns` y se rellena."""
   value_by_date: Dict[date, float] = {}
+  fx_matrix = fx_matrix or get_fx_matrix(conn, base_currency)
   for ticker, rows in trades.items():
-    price_rows = conn.execute(
-      "SELECT date, close FROM prices WHERE ticker = ? ORDER BY date ASC",
-      (ticker,)
-    ).fetchall()
-    if not price_rows:
+    cached = price_columns.get(ticker) if price_columns is not None else None
+    days, closes = cached if cached is not None else load_price_columns(conn, ticker)
+    if price_columns is not None:
+      price_columns[ticker] = (days, closes)
+    if not len(days):
       if rows and missing_data is not None:
-        trade_date = rows[0][0]
-        _record_missing(missing_data, 'prices', (trade_date.isoformat(), ticker))
+        _record_missing(missing_data, 'prices', (ticker,), rows[0][0])
       continue
-    ticker_trades = rows
-    trade_idx = 0
-    qty = 0.0
     currency = ticker_currency.get(ticker) or base_currency
-    for date_str, close in price_rows:
-      try:
-        price_date = date.fromisoformat(date_str)
-      except ValueError:
-        continue
-      while trade_idx < len(ticker_trades) and ticker_trades[trade_idx][0] <= price_date:
-        qty += float(ticker_trades[trade_idx][1])
-        trade_idx += 1
-      if qty == 0:
-        continue
-      value = qty * float(close)
-      converted = convert_amount_on_date(conn, value, currency, base_currency, price_date, missing_data=missing_data, allow_missing=True)
-      if converted is None:
-        continue
-      value_by_date[price_date] = value_by_date.get(price_date, 0.0) + converted
+    # Cantidad vigente en cada fecha de precio: acumulado de trades con fecha <= precio
+    trade_days = np.fromiter((row[0].toordinal() for row in rows), dtype=np.int64, count=len(rows))
+    trade_qty = np.cumsum(np.fromiter((float(row[1]) for row in rows), dtype=np.float64, count=len(rows)))
+    applied = np.searchsorted(trade_days, days, side='right')
+    qty = np.where(applied > 0, trade_qty[np.maximum(applied - 1, 0)], 0.0)
+    held = qty != 0
+    if not held.any():
+      continue
+    held_days = days[held]
+    rates = fx_matrix.rates(currency, held_days)
+    converted = qty[held] * closes[held] * rates
+    missing_fx = np.isnan(rates)
+    if missing_fx.any() and missing_data is not None:
+      for ordinal in held_days[missing_fx].tolist():
+        _record_missing(missing_data, 'fx', (base_currency.upper(), currency.upper()), date.fromordinal(ordinal))
+    for ordinal, value in zip(held_days[~missing_fx].tolist(), converted[~missing_fx].tolist()):
+      price_date = date.fromordinal(ordinal)
+      value_by_date[price_date] = value_by_date.get(price_date, 0.0) + value
   return value_by_date
 
 
-def collect_transfers_and_cash(conn, base_currency: str, cash_movements: Dict[date, Dict[str, float]], missing_data: Optional[Dict[str, set]] = None) -> Tuple[Dict[date, float], Dict[date, Dict[str, float]]]:
+def collect_transfers_and_cash(conn, base_currency: str, cash_movements: Optional[Dict[date, Dict[str, float]]] = None, missing_data: Optional[Dict[str, Any]] = None, fx_matrix: Optional[FxMatrix] = None) -> Tuple[Dict[date, float], Dict[date, Dict[str, float]]]:
   """
-  Combina transferencias externas (para transfers_base) y flujos de caja por divisa.
-  - `cash_movements` se pasa como deltas (p. ej. compras/ventas de trades).
+  Lee del libro de caja las transferencias externas (para transfers_base) y los saldos por divisa.
+  - `cash_movements` admite deltas adicionales por fecha y divisa que se suman a los saldos del libro.
   - Devuelve saldos acumulados de caja por fecha y transferencias externas convertidas a base.
   """
   transfer_by_date: Dict[date, float] = {}
-  raw_cash = dict(cash_movements)
-  cur = conn.execute("SELECT currency, datetime, amount, origin FROM transfers ORDER BY datetime ASC")
-  for currency, dt_str, amount, origin in cur.fetchall():
-    d = _parse_db_datetime(dt_str)
-    if not d:
-      continue
-    cur_code = (currency or '').upper()
-    amt = float(amount or 0)
-    raw_cash.setdefault(d, {})
-    raw_cash[d][cur_code] = raw_cash[d].get(cur_code, 0.0) + amt
-    if origin == 'externo':
-      converted = convert_amount_on_date(conn, amt, cur_code, base_currency, d, missing_data=missing_data, allow_missing=True)
+  fx_matrix = fx_matrix or get_fx_matrix(conn, base_currency)
+  ledger_by_date: Dict[date, Dict[str, float]] = {}
+  for d, cur_code, balance, external_amount, external_count in daily_cash_rows(conn):
+    ledger_by_date.setdefault(d, {})[cur_code] = balance
+    if external_count:
+      converted = convert_amount_on_date(conn, external_amount, cur_code, base_currency, d, missing_data=missing_data, allow_missing=True, fx_matrix=fx_matrix)
       if converted is not None:
         transfer_by_date[d] = transfer_by_date.get(d, 0.0) + converted
-  # Convertir deltas en saldos acumulados por divisa
+  extra = cash_movements or {}
+  # Saldos del libro (ya acumulados) más el acumulado de los deltas adicionales
   cash_balances: Dict[date, Dict[str, float]] = {}
-  running: Dict[str, float] = {}
-  for day in sorted(raw_cash.keys()):
-    for cur_code, delta in raw_cash[day].items():
-      running[cur_code] = running.get(cur_code, 0.0) + delta
-    cash_balances[day] = dict(running)
+  ledger_running: Dict[str, float] = {}
+  extra_running: Dict[str, float] = {}
+  for day in sorted(set(ledger_by_date) | set(extra)):
+    ledger_running.update(ledger_by_date.get(day, {}))
+    for cur_code, delta in extra.get(day, {}).items():
+      extra_running[cur_code] = extra_running.get(cur_code, 0.0) + delta
+    cash_balances[day] = {
+      cur_code: ledger_running.get(cur_code, 0.0) + extra_running.get(cur_code, 0.0)
+      for cur_code in set(ledger_running) | set(extra_running)
+    }
   return transfer_by_date, cash_balances
 
 
-def build_buckets(from_d: Optional[date], to_d: Optional[date], interval: str, value_by_date: Dict[date, float], transfer_by_date: Dict[date, float], cash_movements: Dict[date, Dict[str, float]]):
-  all_dates = [d for d in (set(value_by_date.keys()) | set(transfer_by_date.keys()) | set(cash_movements.keys())) if (not from_d or d >= from_d) and (not to_d or d <= to_d)]
+def iter_buckets(from_d: Optional[date], to_d: Optional[date], interval: str, value_by_date: Dict[date, float], transfer_by_date: Dict[date, float], cash_movements: Dict[date, Dict[str, float]]) -> Iterator[Tuple[date, Dict[str, Any]]]:
+  """
+  Genera `(fin de periodo, bucket)` en orden cronológico. Cada bucket se emite en cuanto empieza el
+  siguiente periodo, así que sólo hay uno en memoria a la vez.
+  """
+  all_dates = sorted(d for d in (set(value_by_date.keys()) | set(transfer_by_date.keys()) | set(cash_movements.keys())) if (not from_d or d >= from_d) and (not to_d or d <= to_d))
   if not all_dates:
-    return {}
-  min_date = min(all_dates)
-  max_date = max(all_dates)
+    return
+  min_date = all_dates[0]
+  max_date = all_dates[-1]
   if to_d and to_d > max_date:
     max_date = to_d
-  buckets: Dict[date, Dict[str, Any]] = {}
   cash_balance: Dict[str, float] = {}
+  bucket_end: Optional[date] = None
+  bucket: Optional[Dict[str, Any]] = None
   current = min_date
   while current <= max_date:
-    bucket_end = _period_end_for(current, interval)
-    bucket = buckets.setdefault(bucket_end, {'transfers': 0.0, 'value': None, 'has_value': False, 'cash': {}})
+    period_end = _period_end_for(current, interval)
+    if period_end != bucket_end:
+      if bucket is not None:
+        yield bucket_end, bucket
+      bucket_end = period_end
+      bucket = {'transfers': 0.0, 'value': None, 'has_value': False, 'cash': {}}
     if current in transfer_by_date:
       bucket['transfers'] += transfer_by_date[current]
     if current in value_by_date:
@@ -184,17 +305,24 @@ def build_buckets(from_d: Optional[date], to_d: Optional[date], interval: str, v
     if interval == 'day':
       current += timedelta(days=1)
     else:
-      future = [d for d in all_dates if d > current]
-      current = min(future) if future else max_date + timedelta(days=1)
-  return buckets
+      # Siguiente fecha con datos (lista ordenada: búsqueda binaria en lugar de recorrerla entera)
+      idx = bisect_right(all_dates, current)
+      current = all_dates[idx] if idx < len(all_dates) else max_date + timedelta(days=1)
+  if bucket is not None:
+    yield bucket_end, bucket
 
 
-def build_series_from_buckets(conn, buckets: Dict[date, Dict[str, Any]], base_currency: str, missing_data: Optional[Dict[str, set]] = None):
-  out = []
+def build_buckets(from_d: Optional[date], to_d: Optional[date], interval: str, value_by_date: Dict[date, float], transfer_by_date: Dict[date, float], cash_movements: Dict[date, Dict[str, float]]):
+  return dict(iter_buckets(from_d, to_d, interval, value_by_date, transfer_by_date, cash_movements))
+
+
+def iter_series_from_buckets(conn, buckets: Union[Dict[date, Dict[str, Any]], Iterable[Tuple[date, Dict[str, Any]]]], base_currency: str, missing_data: Optional[Dict[str, Any]] = None, fx_matrix: Optional[FxMatrix] = None) -> Iterator[Dict[str, Any]]:
+  """Genera los puntos de la serie; `buckets` puede ser el dict de `build_buckets` o el generador de `iter_buckets`."""
+  fx_matrix = fx_matrix or get_fx_matrix(conn, base_currency)
+  items = sorted(buckets.items(), key=lambda kv: kv[0]) if isinstance(buckets, dict) else buckets
   cumulative_transfers = 0.0
   last_positions_value = 0.0
-  for bucket_end in sorted(buckets.keys()):
-    bucket = buckets[bucket_end]
+  for bucket_end, bucket in items:
     cumulative_transfers += bucket['transfers']
     if bucket['has_value']:
       last_positions_value = float(bucket['value'] or 0.0)
@@ -202,7 +330,7 @@ def build_series_from_buckets(conn, buckets: Dict[date, Dict[str, Any]], base_cu
     cash_base_map = {}
     for cur_code, bal in bucket.get('cash', {}).items():
       cash_map[cur_code] = bal
-      converted_cash = convert_amount_on_date(conn, bal, cur_code, base_currency, bucket_end, missing_data=missing_data, allow_missing=True)
+      converted_cash = convert_amount_on_date(conn, bal, cur_code, base_currency, bucket_end, missing_data=missing_data, allow_missing=True, fx_matrix=fx_matrix)
       if converted_cash is None:
         continue
       cash_base_map[cur_code] = converted_cash
@@ -210,24 +338,101 @@ def build_series_from_buckets(conn, buckets: Dict[date, Dict[str, Any]], base_cu
     total_value = last_positions_value + cash_total_base
     base_capital = max(0.0, cumulative_transfers)
     pnl_pct = total_value / base_capital * 100 if base_capital > 0 else 0.0
-    out.append({
+    yield {
       'date': bucket_end.isoformat(),
       'value_base': total_value,
       'transfers_base': bucket['transfers'],
       'pnl_pct': pnl_pct,
       'cash': cash_map,
       'cash_base': cash_base_map
-    })
-  return out
+    }
+
+
+def build_series_from_buckets(conn, buckets: Dict[date, Dict[str, Any]], base_currency: str, missing_data: Optional[Dict[str, Any]] = None, fx_matrix: Optional[FxMatrix] = None):
+  return list(iter_series_from_buckets(conn, buckets, base_currency, missing_data=missing_data, fx_matrix=fx_matrix))
+
+
+def value_series_inputs(conn, base_currency: str, missing_data: Dict[str, Any], fx_matrix: Optional[FxMatrix] = None, trades_and_cash: Optional[Tuple[Any, Any]] = None, value_by_date: Optional[Dict[date, float]] = None, price_columns: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None):
+  """
+  Entradas de la serie de valor: `(fx_matrix, valor de posiciones, transferencias y caja por día)`.
+  `trades_and_cash` permite reutilizar un `collect_trades_and_cash` ya leído y `value_by_date` un
+  valor de posiciones ya calculado (p. ej. repartido por tickers entre workers).
+  """
+  fx_matrix = fx_matrix or get_fx_matrix(conn, base_currency)
+  if value_by_date is None:
+    trades, ticker_currency = trades_and_cash or collect_trades_and_cash(conn)
+    value_by_date = build_value_by_date(conn, trades, ticker_currency, base_currency, missing_data=missing_data, fx_matrix=fx_matrix, price_columns=price_columns)
+  transfer_by_date, cash_movements = collect_transfers_and_cash(conn, base_currency, missing_data=missing_data, fx_matrix=fx_matrix)
+  return fx_matrix, value_by_date, transfer_by_date, cash_movements
 
 
-def schedule_missing_data_sync(missing_data: Dict[str, set]) -> bool:
+def value_series_payload(conn, meta: Dict[str, Any], from_d: Optional[date], to_d: Optional[date], missing: str = 'ranges', format: str = 'rows', dates: str = 'iso', *, missing_data: Optional[Dict[str, Any]] = None, **inputs) -> Dict[str, Any]:
+  """
+  Cuerpo de `/portfolio/value/series` en formato rows o columnar (`meta` aporta `base_currency` e
+  `interval`). `inputs` se pasa a `value_series_inputs` (trades ya leídos, valor precalculado, caché de precios).
+  """
+  base_currency, interval = meta['base_currency'], meta['interval']
+  if missing_data is None:
+    missing_data = new_missing_data(points=(missing == 'points'))
+  fx_matrix, value_by_date, transfer_by_date, cash_movements = value_series_inputs(conn, base_currency, missing_data, **inputs)
+  buckets = build_buckets(from_d, to_d, interval, value_by_date, transfer_by_date, cash_movements)
+  out = build_series_from_buckets(conn, buckets, base_currency, missing_data=missing_data, fx_matrix=fx_matrix)
+  data = {
+    **meta,
+    'series': columnar_points(out, delta_dates=(dates == 'delta')) if format == 'columnar' else out,
+    **missing_data_summary(missing_data, missing)
+  }
+  logging.info("Serie de valor %s/%s: %d puntos, sync_in_progress=%s", base_currency, interval, len(out), data['sync_in_progress'])
+  return data
+
+
+def merge_missing_points(missing_data: Dict[str, Any], points: Dict[str, Iterable[Tuple[str, ...]]]) -> None:
+  """
+  Registra en `missing_data` los faltantes punto a punto (`new_missing_data(points=True)['points']`) de
+  un cálculo parcial. Se recorren en orden de fecha, como llegan en el cálculo secuencial.
+  """
+  for key, items in points.items():
+    for day, *group in sorted(items):
+      _record_missing(missing_data, key, tuple(group), date.fromisoformat(day))
+
+
+def missing_data_summary(missing_data: Dict[str, Any], missing: str = 'ranges') -> Dict[str, Any]:
+  """Campos de faltantes de la respuesta (`sync_in_progress`, `missing_fx`, `missing_prices`); programa el sync si hace falta."""
+  sync_in_progress = has_missing_data(missing_data)
+  if sync_in_progress:
+    schedule_missing_data_sync(missing_data)
+  missing_out = missing_data_points(missing_data) if missing == 'points' else missing_data_ranges(missing_data)
+  return {
+    'sync_in_progress': sync_in_progress,
+    'missing_fx': missing_out['fx'],
+    'missing_prices': missing_out['prices']
+  }
+
+
+def net_transfer_totals(conn, from_date: Optional[str] = None, to_date: Optional[str] = None) -> List[Dict[str, Any]]:
+  """Aportes/retiros externos netos por divisa (sin FX) dentro del rango."""
+  params: List[Any] = []
+  clauses: List[str] = ["origin = 'externo'"]
+  if from_date:
+    clauses.append("datetime >= ?")
+    params.append(from_date)
+  if to_date:
+    clauses.append("datetime <= ?")
+    params.append(to_date)
+  cur = conn.execute(f"SELECT currency, SUM(amount) as total FROM transfers WHERE {' AND '.join(clauses)} GROUP BY currency", params)
+  return [{'currency': row[0], 'total': row[1]} for row in cur.fetchall()]
+
+
+def schedule_missing_data_sync(missing_data: Dict[str, Any]) -> bool:
   """
   Placeholder de orquestación: registra faltantes para que un proceso de sync los atienda.
   Retorna True si hay faltantes que requieren sincronización.
   """
-  has_work = bool(missing_data.get('fx') or missing_data.get('prices'))
-  if not has_work:
+  if not has_missing_data(missing_data):
     return False
-  logging.info("Programando sync de datos faltantes: %s", missing_data)
+  logging.info(
+    "Programando sync de datos faltantes: fx=%s prices=%s",
+    sorted(f"{b}/{q}" for (b, q) in missing_data.get('fx', {})),
+    sorted(t for (t,) in missing_data.get('prices', {}))
+  )
   return True
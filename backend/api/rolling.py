@@ -0,0 +1,144 @@
+"""
+Métricas en ventana móvil sobre la serie diaria de días hábiles de `performance` (retorno,
+volatilidad, Sharpe y drawdown máximo a 30/90/252 días, o las ventanas pedidas).
+
+Rehacer cada ventana desde cero cuesta O(n·w). Aquí todo es O(n) por ventana:
+- Retorno: cociente del índice TWR acumulado, `I_t / I_{t-w} - 1`.
+- Volatilidad: sumas acumuladas de `r` y `r²` (centradas en la media global para no perder
+  precisión) y de los días con retorno; varianza muestral de la ventana por diferencias.
+- Drawdown máximo: el de una ventana no se deduce del máximo móvil, así que cada ventana es una
+  cola de dos pilas que agrega `(máximo, mínimo, drawdown máximo)` de forma asociativa (el
+  drawdown de `A+B` es el peor de `A`, `B` y `min(B) / max(A) - 1`); cada punto entra y sale una
+  vez. Todas las ventanas avanzan en la misma pasada por la serie.
+"""
+import math
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .performance import PERIODS_PER_YEAR, DailySeries, daily_returns, slice_range
+
+DEFAULT_WINDOWS = (30, 90, 252)
+ROLLING_METRICS = ("return", "volatility", "sharpe", "max_drawdown")
+
+# (máximo, mínimo, drawdown máximo) de un tramo del índice
+_Agg = Tuple[float, float, float]
+
+
+def _combine(left: _Agg, right: _Agg) -> _Agg:
+  return (
+    max(left[0], right[0]),
+    min(left[1], right[1]),
+    min(left[2], right[2], right[1] / left[0] - 1.0),
+  )
+
+
+class _DrawdownWindow:
+  """Cola de dos pilas con agregados: `push` por la derecha, `pop` por la izquierda, O(1) amortizado."""
+  __slots__ = ("front", "back", "back_agg")
+
+  def __init__(self) -> None:
+    self.front: List[_Agg] = []  # agregados de sufijo: front[-1] es el elemento más antiguo
+    self.back: List[float] = []
+    self.back_agg: Optional[_Agg] = None
+
+  def push(self, value: float) -> None:
+    self.back.append(value)
+    leaf = (value, value, 0.0)
+    self.back_agg = leaf if self.back_agg is None else _combine(self.back_agg, leaf)
+
+  def pop(self) -> None:
+    if not self.front:
+      # Volcar la pila de entrada: cada agregado cubre desde ese elemento hasta el más reciente volcado
+      agg: Optional[_Agg] = None
+      while self.back:
+        value = self.back.pop()
+        leaf = (value, value, 0.0)
+        agg = leaf if agg is None else _combine(leaf, agg)
+        self.front.append(agg)
+      self.back_agg = None
+    self.front.pop()
+
+  def max_drawdown(self) -> float:
+    if not self.front:
+      return self.back_agg[2]
+    if self.back_agg is None:
+      return self.front[-1][2]
+    return _combine(self.front[-1], self.back_agg)[2]
+
+
+def rolling_metrics(values: np.ndarray, flows: np.ndarray, windows: Sequence[int], metrics: Sequence[str] = ROLLING_METRICS, rf: float = 0.0, periods_per_year: int = PERIODS_PER_YEAR) -> Dict[int, Dict[str, np.ndarray]]:
+  """
+  `{ventana: {métrica: array}}` alineados con `values`; NaN hasta tener `w` retornos detrás.
+  El retorno es el acumulado de la ventana; volatilidad anualizada y Sharpe sobre la rentabilidad
+  anualizada de la ventana, como en `performance_metrics`.
+  """
+  n = len(values)
+  returns = daily_returns(values, flows)
+  valid = ~np.isnan(returns)
+  index = np.cumprod(np.where(valid, 1.0 + returns, 1.0))
+  centered = np.where(valid, returns - (returns[valid].mean() if valid.any() else 0.0), 0.0)
+  sum1 = np.concatenate(([0.0], np.cumsum(centered)))
+  sum2 = np.concatenate(([0.0], np.cumsum(centered * centered)))
+  count = np.concatenate(([0], np.cumsum(valid)))
+
+  out: Dict[int, Dict[str, np.ndarray]] = {}
+  for w in windows:
+    series: Dict[str, np.ndarray] = {}
+    total = np.full(n, np.nan)
+    vol = np.full(n, np.nan)
+    if n > w:
+      total[w:] = index[w:] / index[:-w] - 1.0
+      # Retornos de la ventana que acaba en t: posiciones t-w+1 .. t
+      k = (count[w + 1:] - count[1:n - w + 1]).astype(np.float64)
+      s1 = sum1[w + 1:] - sum1[1:n - w + 1]
+      s2 = sum2[w + 1:] - sum2[1:n - w + 1]
+      with np.errstate(invalid="ignore", divide="ignore"):
+        var = np.where(k > 1, (s2 - s1 * s1 / np.maximum(k, 1)) / (k - 1), np.nan)
+      vol[w:] = np.sqrt(np.maximum(var, 0.0)) * math.sqrt(periods_per_year)
+    if "return" in metrics:
+      series["return"] = total
+    if "volatility" in metrics:
+      series["volatility"] = vol
+    if "sharpe" in metrics:
+      with np.errstate(invalid="ignore", divide="ignore"):
+        annualized = np.where(total > -1.0, np.power(1.0 + total, periods_per_year / w) - 1.0, np.nan)
+        series["sharpe"] = np.where(vol > 0, (annualized - rf) / vol, np.nan)
+    out[w] = series
+
+  drawdown_windows = [w for w in windows if "max_drawdown" in metrics]
+  if drawdown_windows:
+    queues = {w: _DrawdownWindow() for w in drawdown_windows}
+    drawdowns = {w: np.full(n, np.nan) for w in drawdown_windows}
+    for t, value in enumerate(index.tolist()):
+      for w, queue in queues.items():
+        queue.push(value)
+        if t >= w:
+          if t > w:
+            queue.pop()
+          drawdowns[w][t] = queue.max_drawdown()
+    for w in drawdown_windows:
+      out[w]["max_drawdown"] = drawdowns[w]
+  return out
+
+
+def rolling_payload(daily: DailySeries, windows: Sequence[int], metrics: Sequence[str], from_d: Optional[date] = None, to_d: Optional[date] = None, rf: float = 0.0) -> Dict[str, Any]:
+  """
+  Curvas en formato columnar (`date` + `series[ventana][métrica]`, null sin historia suficiente).
+  Se calculan sobre toda la serie y después se corta al rango: la primera ventana del rango tiene su pasado.
+  """
+  ordinals, values, flows = daily
+  rolled = rolling_metrics(values, flows, windows, metrics, rf=rf)
+  days = slice_range(daily, from_d, to_d)[0]
+  lo = int(np.searchsorted(ordinals, days[0])) if len(days) else 0
+  hi = lo + len(days)
+  return {
+    'format': 'columnar',
+    'length': len(days),
+    'date': [date.fromordinal(int(d)).isoformat() for d in days],
+    'series': {
+      str(w): {name: [None if math.isnan(x) else x for x in curve[lo:hi].tolist()] for name, curve in rolled[w].items()}
+      for w in windows
+    },
+  }
@@ -0,0 +1,49 @@
+"""
+Formato columnar (opt-in) de las series temporales.
+
+En lugar de una lista de objetos que repiten las claves en cada punto, `format=columnar` devuelve
+arrays paralelos por campo:
+
+    {"format": "columnar", "length": 3, "date": [...], "value_base": [...], ...,
+     "currencies": ["EUR", "USD"], "cash": [[...EUR...], [...USD...]], "cash_base": [...]}
+
+- Los campos con un dict por punto (`cash`, `cash_base`) se codifican con un diccionario de
+  divisas compartido (`currencies`) y una columna por divisa; `null` donde el punto no la tiene.
+- Con `dates=delta` las fechas se envían como `date_start` + `date_delta` (días desde el punto
+  anterior; 0 en el primero), que en series diarias se reduce a una lista de unos.
+"""
+from datetime import date
+from typing import Any, Dict, List, Sequence
+
+SERIES_FORMAT_PATTERN = '^(rows|columnar|ndjson)$'
+DATES_PATTERN = '^(iso|delta)$'
+
+
+def columnar_points(points: Sequence[Dict[str, Any]], delta_dates: bool = False) -> Dict[str, Any]:
+  """Convierte una lista de puntos `{date, campo: escalar | {divisa: valor}}` en columnas."""
+  out: Dict[str, Any] = {"format": "columnar", "length": len(points)}
+  if not points:
+    out["date"] = []
+    return out
+  scalar_keys: List[str] = []
+  dict_keys: List[str] = []
+  for key, value in points[0].items():
+    if key == "date":
+      continue
+    (dict_keys if isinstance(value, dict) else scalar_keys).append(key)
+
+  dates = [point["date"] for point in points]
+  if delta_dates:
+    days = [date.fromisoformat(d[:10]).toordinal() for d in dates]
+    out["date_start"] = dates[0]
+    out["date_delta"] = [0] + [b - a for a, b in zip(days, days[1:])]
+  else:
+    out["date"] = dates
+  for key in scalar_keys:
+    out[key] = [point.get(key) for point in points]
+  if dict_keys:
+    currencies = sorted({cur for point in points for key in dict_keys for cur in (point.get(key) or {})})
+    out["currencies"] = currencies
+    for key in dict_keys:
+      out[key] = [[(point.get(key) or {}).get(cur) for point in points] for cur in currencies]
+  return out
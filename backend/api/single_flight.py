@@ -0,0 +1,72 @@
+"""
+Coalescencia de peticiones idénticas concurrentes ("single flight").
+
+Los endpoints pesados se ejecutan en el threadpool; si llegan a la vez varias peticiones con la
+misma clave (ruta, parámetros normalizados y versión de datos), sólo la primera calcula y el resto
+espera su resultado. Al terminar la clave se libera: no es una caché, una petición posterior
+vuelve a calcular (la caché entre peticiones es el ETag de `http_cache`).
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+  __slots__ = ("event", "result", "error")
+
+  def __init__(self) -> None:
+    self.event = threading.Event()
+    self.result: Any = None
+    self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._calls: Dict[Hashable, _Call] = {}
+    self._counters: Dict[str, Dict[str, int]] = {}
+
+  def _count(self, route: str, field: str) -> None:
+    counters = self._counters.setdefault(route, {"computed": 0, "coalesced": 0, "errors": 0})
+    counters[field] += 1
+
+  def do(self, key: Tuple[Any, ...], fn: Callable[[], Any]) -> Any:
+    """Ejecuta `fn` o espera a la ejecución en curso con la misma clave. `key[0]` es la ruta (para contadores)."""
+    route = str(key[0])
+    with self._lock:
+      call = self._calls.get(key)
+      leader = call is None
+      if leader:
+        call = _Call()
+        self._calls[key] = call
+        self._count(route, "computed")
+      else:
+        self._count(route, "coalesced")
+    if not leader:
+      call.event.wait()
+      if call.error is not None:
+        raise call.error
+      return call.result
+    try:
+      call.result = fn()
+      return call.result
+    except BaseException as exc:
+      call.error = exc
+      with self._lock:
+        self._count(route, "errors")
+      raise
+    finally:
+      with self._lock:
+        self._calls.pop(key, None)
+      call.event.set()
+
+  def stats(self) -> Dict[str, Any]:
+    """Contadores por ruta: cálculos hechos, peticiones que reutilizaron uno en curso y errores."""
+    with self._lock:
+      routes = {route: dict(values) for route, values in self._counters.items()}
+      in_flight = len(self._calls)
+    return {
+      "computed": sum(v["computed"] for v in routes.values()),
+      "coalesced": sum(v["coalesced"] for v in routes.values()),
+      "in_flight": in_flight,
+      "routes": routes,
+    }
@@ -0,0 +1,114 @@
+"""
+Registro de consultas lentas.
+
+Las conexiones instrumentadas (`metrics.InstrumentedConnection`) informan de cada sentencia al
+terminar de leerla; las que superan el umbral (`PORTFOLIO_SLOW_QUERY_MS`, 100 ms por defecto) se
+guardan con su SQL, la forma de los parámetros (tipos, nunca valores), la duración (ejecución +
+lectura de filas), las filas leídas y el `EXPLAIN QUERY PLAN`, en un buffer circular que expone
+`GET /debug/slow-queries`. Con umbral 0 se registran todas (lo usa `tests/test_query_plans.py`).
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD_MS = 100.0
+DEFAULT_CAPACITY = 200
+# Sentencias con plan (EXPLAIN QUERY PLAN no las ejecuta); PRAGMA/BEGIN/DDL no lo tienen
+_EXPLAINABLE = {"SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE"}
+_WHITESPACE = re.compile(r"\s+")
+
+
+def threshold_from_env(default: float = DEFAULT_THRESHOLD_MS) -> float:
+  """Umbral en ms de `PORTFOLIO_SLOW_QUERY_MS` (el valor por defecto si falta o no es un número)."""
+  raw = os.environ.get("PORTFOLIO_SLOW_QUERY_MS")
+  try:
+    return max(0.0, float(raw)) if raw else default
+  except ValueError:
+    LOGGER.warning("PORTFOLIO_SLOW_QUERY_MS inválido (%r); se usa %s ms", raw, default)
+    return default
+
+
+def normalize_sql(sql: str) -> str:
+  return _WHITESPACE.sub(" ", sql).strip()
+
+
+def param_shape(params: Any) -> Any:
+  """Tipos de los parámetros ligados: `["str", "int"]` o `{"day": "str"}`."""
+  if isinstance(params, dict):
+    return {name: type(value).__name__ for name, value in params.items()}
+  return [type(value).__name__ for value in (params or ())]
+
+
+def query_plan(conn: sqlite3.Connection, sql: str, params: Any = ()) -> List[str]:
+  """
+  Líneas de `EXPLAIN QUERY PLAN`, sangradas según el árbol (`SEARCH prices USING INDEX ...`).
+  Usa el `execute` base de sqlite3 para no instrumentar (ni registrar) la propia consulta del plan.
+  """
+  keyword = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+  if keyword not in _EXPLAINABLE:
+    return []
+  try:
+    rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+  except sqlite3.Error as exc:
+    return [f"(sin plan: {exc})"]
+  depth: Dict[int, int] = {0: -1}
+  lines = []
+  for node_id, parent, _unused, detail in rows:
+    depth[node_id] = depth.get(parent, -1) + 1
+    lines.append("  " * depth[node_id] + detail)
+  return lines
+
+
+class SlowQueryLog:
+  def __init__(self, threshold_ms: float = DEFAULT_THRESHOLD_MS, capacity: int = DEFAULT_CAPACITY) -> None:
+    self.threshold_ms = threshold_ms
+    self._lock = threading.Lock()
+    self._entries: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+    self._total = 0
+
+  @property
+  def threshold_seconds(self) -> float:
+    return self.threshold_ms / 1000
+
+  def record(self, conn: sqlite3.Connection, sql: str, params: Any, seconds: float, rows: int, many: bool = False, path: Optional[str] = None) -> None:
+    """
+    Registra la sentencia si supera el umbral; el plan se calcula sólo en ese caso.
+    En executemany `params` es el primer juego de parámetros (o vacío si no se conserva).
+    """
+    if seconds < self.threshold_seconds:
+      return
+    entry = {
+      "sql": normalize_sql(sql),
+      "params": param_shape(params),
+      "many": many,
+      "duration_ms": round(seconds * 1000, 3),
+      "rows": rows,
+      "plan": query_plan(conn, sql, params),
+      "path": path,
+      "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+    }
+    with self._lock:
+      self._entries.append(entry)
+      self._total += 1
+    if self.threshold_ms > 0:
+      LOGGER.warning("Consulta lenta (%.1f ms, %s filas, %s): %s | plan: %s", entry["duration_ms"], rows, path or "-", entry["sql"], "; ".join(line.strip() for line in entry["plan"]))
+
+  def entries(self) -> List[Dict[str, Any]]:
+    """Entradas registradas, la más reciente primero."""
+    with self._lock:
+      return list(reversed(self._entries))
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      return {"threshold_ms": self.threshold_ms, "total": self._total, "kept": len(self._entries)}
@@ -0,0 +1,40 @@
+"""
+Respuestas NDJSON en streaming (una línea JSON por elemento).
+
+El cuerpo se genera a medida que se producen los elementos y se envía en trozos de `CHUNK_LINES`
+líneas, así que la memoria no crece con la longitud de la respuesta y el primer byte sale en cuanto
+está el primer trozo. La conexión se abre dentro del generador y se cierra al terminar (o si el
+cliente corta): los trozos se generan en el threadpool, cada uno posiblemente en un hilo distinto.
+"""
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+from db import get_connection
+from .responses import dumps_json
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CHUNK_LINES = 500
+
+
+def ndjson_chunks(items: Iterable[Any], chunk_lines: int = CHUNK_LINES) -> Iterator[bytes]:
+  iterator = iter(items)
+  while True:
+    lines = [dumps_json(item) for item in islice(iterator, chunk_lines)]
+    if not lines:
+      return
+    yield b"\n".join(lines) + b"\n"
+
+
+def ndjson_response(db_path: Path, produce: Callable[[Any], Iterable[Any]], headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+  """`produce(conn)` genera los elementos; las validaciones deben hacerse antes de llamar aquí."""
+  def body() -> Iterator[bytes]:
+    conn = get_connection(str(db_path), check_same_thread=False)
+    try:
+      yield from ndjson_chunks(produce(conn))
+    finally:
+      conn.close()
+
+  return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,158 @@
+"""
+Índice temporal de posiciones y caja para consultas "a fecha" (`GET /portfolio/snapshot`).
+
+Por ticker se guardan los puntos de cambio de la cantidad acumulada (ordinal del día de cada trade
+y cantidad tras aplicarlo) y por divisa el saldo de caja al cierre de cada día con movimientos
+(`cash_ledger`). Cualquier fecha se resuelve con una búsqueda binaria por ticker/divisa en lugar de
+repetir `collect_trades_and_cash` y `build_value_by_date` sobre todo el histórico; varias fechas se
+resuelven juntas con `np.searchsorted`.
+
+El índice se construye una vez por versión de datos (`TIMELINES`, un `LruCache`) con las mismas
+lecturas que la serie de valor, así que las cantidades y saldos coinciden con los suyos. Valoración:
+último cierre con fecha <= la pedida y tipo de cambio de esa fecha (`FxMatrix`, ya con forward-fill).
+"""
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cash_ledger import daily_cash_rows
+from fx_matrix import FxMatrix
+from price_store import load_price_columns
+from .portfolio_service import collect_trades_and_cash
+
+# Cantidades acumuladas por debajo de esto se consideran posición cerrada
+QTY_EPSILON = 1e-9
+
+_Steps = Tuple[np.ndarray, np.ndarray]
+
+
+def _steps(ordinals: Sequence[int], values: Sequence[float]) -> _Steps:
+  """Último valor de cada día (los puntos llegan en orden) como arrays `(ordinales, valores)`."""
+  days = np.asarray(ordinals, dtype=np.int64)
+  vals = np.asarray(values, dtype=np.float64)
+  if len(days):
+    last_of_day = np.append(days[1:] != days[:-1], True)
+    days, vals = days[last_of_day], vals[last_of_day]
+  return days, vals
+
+
+def _as_of(steps: _Steps, ordinals: np.ndarray) -> np.ndarray:
+  """Valor vigente en cada ordinal pedido (0 antes del primer punto)."""
+  days, vals = steps
+  idx = np.searchsorted(days, ordinals, side='right') - 1
+  return np.where(idx >= 0, vals[np.maximum(idx, 0)], 0.0) if len(days) else np.zeros(len(ordinals))
+
+
+class PositionTimeline:
+  """Cantidades por ticker y saldos de caja por divisa como funciones escalonadas del día."""
+
+  def __init__(self, positions: Dict[str, _Steps], ticker_currency: Dict[str, str], cash: Dict[str, _Steps], amounts: Optional[Dict[str, _Steps]] = None):
+    self.positions = positions
+    self.ticker_currency = ticker_currency
+    self.cash = cash
+    # Importe de cada trade (cantidad × precio, moneda local) por ticker y ordinal, sin acumular
+    self.amounts = amounts or {}
+    # Cierres por ticker (`load_price_columns`), cargados al primer uso; la caché ya es por versión de datos
+    self._prices: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+  @classmethod
+  def from_db(cls, conn) -> "PositionTimeline":
+    trades, ticker_currency = collect_trades_and_cash(conn)
+    positions = {
+      ticker: _steps([row[0].toordinal() for row in rows], np.cumsum([row[1] for row in rows]))
+      for ticker, rows in trades.items()
+    }
+    amounts = {
+      ticker: (np.asarray([row[0].toordinal() for row in rows], dtype=np.int64), np.asarray([row[1] * row[3] for row in rows], dtype=np.float64))
+      for ticker, rows in trades.items()
+    }
+    cash_points: Dict[str, Tuple[List[int], List[float]]] = {}
+    for day, currency, balance, _external, _count in daily_cash_rows(conn):
+      days, balances = cash_points.setdefault(currency, ([], []))
+      days.append(day.toordinal())
+      balances.append(balance)
+    cash = {currency: _steps(days, balances) for currency, (days, balances) in cash_points.items()}
+    return cls(positions, ticker_currency, cash, amounts)
+
+  def quantities(self, ordinals: np.ndarray) -> Dict[str, np.ndarray]:
+    """Cantidad de cada ticker en cada fecha pedida."""
+    return {ticker: _as_of(steps, ordinals) for ticker, steps in self.positions.items()}
+
+  def balances(self, ordinals: np.ndarray) -> Dict[str, np.ndarray]:
+    """Saldo de caja de cada divisa al cierre de cada fecha pedida."""
+    return {currency: _as_of(steps, ordinals) for currency, steps in self.cash.items()}
+
+  def prices(self, conn, ticker: str) -> Tuple[np.ndarray, np.ndarray]:
+    cached = self._prices.get(ticker)
+    if cached is None:
+      days, closes = load_price_columns(conn, ticker)
+      cached = self._prices[ticker] = (np.asarray(days, dtype=np.int64), np.asarray(closes))
+    return cached
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+  return None if value is None or np.isnan(value) else round(float(value), 4)
+
+
+def snapshots(conn, timeline: PositionTimeline, fx_matrix: FxMatrix, targets: Sequence[date]) -> List[Dict[str, Any]]:
+  """
+  Posiciones, precios, tipos de cambio y caja en moneda base a cada fecha de `targets`. Las
+  posiciones sin precio o sin tipo se devuelven con valor null y se listan en `missing_prices`/`missing_fx`.
+  """
+  ordinals = np.asarray([d.toordinal() for d in targets], dtype=np.int64)
+  out = [
+    {'date': d.isoformat(), 'positions': [], 'cash': [], 'positions_base': 0.0, 'cash_base': 0.0, 'missing_fx': set(), 'missing_prices': []}
+    for d in targets
+  ]
+  base = fx_matrix.base
+  for ticker, qty in sorted(timeline.quantities(ordinals).items()):
+    held = np.abs(qty) > QTY_EPSILON
+    if not held.any():
+      continue
+    currency = timeline.ticker_currency.get(ticker) or base
+    days, closes = timeline.prices(conn, ticker)
+    idx = np.searchsorted(days, ordinals, side='right') - 1
+    rates = fx_matrix.rates(currency, ordinals)
+    for i in np.flatnonzero(held).tolist():
+      snap = out[i]
+      entry = {
+        'ticker': ticker, 'quantity': float(qty[i]), 'currency': currency,
+        'price': None, 'price_date': None, 'fx_rate': None, 'value': None, 'value_base': None
+      }
+      if idx[i] < 0:
+        snap['missing_prices'].append(ticker)
+      else:
+        entry['price'] = float(closes[idx[i]])
+        entry['price_date'] = date.fromordinal(int(days[idx[i]])).isoformat()
+        entry['value'] = _round(entry['quantity'] * entry['price'])
+        if np.isnan(rates[i]):
+          snap['missing_fx'].add(currency)
+        else:
+          entry['fx_rate'] = float(rates[i])
+          entry['value_base'] = _round(entry['quantity'] * entry['price'] * rates[i])
+          snap['positions_base'] += entry['value_base']
+      snap['positions'].append(entry)
+  for currency, balances in sorted(timeline.balances(ordinals).items()):
+    rates = fx_matrix.rates(currency, ordinals)
+    for i, snap in enumerate(out):
+      # Divisas sin movimientos hasta la fecha no aparecen
+      if ordinals[i] < timeline.cash[currency][0][0]:
+        continue
+      balance_base = None if np.isnan(rates[i]) else float(balances[i] * rates[i])
+      if balance_base is None:
+        snap['missing_fx'].add(currency)
+      else:
+        snap['cash_base'] += balance_base
+      snap['cash'].append({
+        'currency': currency,
+        'balance': _round(balances[i]),
+        'fx_rate': None if np.isnan(rates[i]) else float(rates[i]),
+        'balance_base': _round(balance_base)
+      })
+  for snap in out:
+    snap['positions_base'] = round(snap['positions_base'], 4)
+    snap['cash_base'] = round(snap['cash_base'], 4)
+    snap['total_base'] = round(snap['positions_base'] + snap['cash_base'], 4)
+    snap['missing_fx'] = sorted(snap['missing_fx'])
+  return out
@@ -0,0 +1,259 @@
+"""
+Benchmark de carga de la API completa: genera una cartera sintética del tamaño pedido (trades,
+tickers, divisas, años de precios y FX diarios), la carga en una base temporal y lanza contra la app
+FastAPI en proceso (`httpx.AsyncClient` + `ASGITransport`, sin red) varios clientes concurrentes.
+
+Por endpoint informa p50/p95/p99 de latencia, throughput, bytes y pico de RSS durante su tanda, y
+guarda el resultado en JSON. Con `--baseline` compara contra una ejecución anterior y termina con
+código 1 si algún endpoint empeora más de `--tolerance` (p95 o throughput).
+
+Las peticiones no envían `If-None-Match` y las idénticas concurrentes se coalescen (como con varios
+clientes reales); `--vary` añade un parámetro distinto por petición para medir el cálculo sin coalescencia.
+
+Uso (desde backend/):
+  python benchmarks/bench_api_load.py --trades 20000 --tickers 100 --years 10 --concurrency 8 --output bench-api.json
+  python benchmarks/bench_api_load.py ... --baseline bench-api.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+BASE_CURRENCY = "USD"
+CURRENCY_POOL = ["USD", "EUR", "GBP", "CHF", "JPY", "CAD", "AUD", "SEK"]
+DEFAULT_ENDPOINTS = [
+  "/health",
+  "/portfolio/value",
+  "/portfolio/value/series?interval=day",
+  "/portfolio/value/series?interval=month&format=columnar",
+  "/cash/series?interval=day",
+  "/transfers/series?interval=month",
+  "/cash/balance",
+  "/cash/net-transfers",
+  "/trades?limit=500",
+  "/changes?since=0&limit=1000",
+  "/prices/{ticker}",
+  "/dashboard?interval=week",
+]
+
+
+def populate(db_path: str, trades: int, tickers: int, currencies: int, years: int, seed: int = 42) -> Dict[str, Any]:
+  """Cartera sintética: precios y FX diarios (días hábiles), trades, depósitos mensuales y dividendos trimestrales."""
+  from db import ensure_schema, get_connection
+  from ingest import upsert_fx_rows, upsert_price_rows
+
+  rng = np.random.default_rng(seed)
+  end = date(2024, 12, 31)
+  start = end - timedelta(days=365 * years)
+  days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+  business = [d for d in days if d.weekday() < 5]
+  codes = CURRENCY_POOL[:max(1, currencies)]
+  names = [f"TCK{i:04d}" for i in range(tickers)]
+  ticker_currency = {name: codes[i % len(codes)] for i, name in enumerate(names)}
+
+  conn = get_connection(db_path)
+  ensure_schema(conn)
+  try:
+    conn.execute("INSERT INTO app_config(key, value) VALUES('base_currency', ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value", (BASE_CURRENCY,))
+    for name in names:
+      closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.012, len(business))))
+      upsert_price_rows(conn, name, zip(business, closes.tolist()), today=end + timedelta(days=1))
+    for code in codes:
+      if code != BASE_CURRENCY:
+        rates = np.exp(np.cumsum(rng.normal(0, 0.004, len(business))))
+        upsert_fx_rows(conn, BASE_CURRENCY, code, zip(business, rates.tolist()))
+
+    trade_rows = []
+    for n, offset in enumerate(sorted(rng.integers(0, len(business), trades))):
+      name = names[int(rng.integers(0, tickers))]
+      qty = float(rng.integers(1, 50)) * (1 if rng.random() < 0.7 else -1)
+      trade_rows.append((
+        f"T{n}", name, qty, float(rng.uniform(20, 300)), f"{business[offset].isoformat()} 15:30:00",
+        1.0, ticker_currency[name], ticker_currency[name], "STK"
+      ))
+    conn.executemany(
+      "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, commission, commission_currency, currency, asset_class) VALUES(?,?,?,?,?,?,?,?,?)",
+      trade_rows
+    )
+    months = sorted({d.replace(day=1) for d in days})
+    conn.executemany(
+      "INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)",
+      [(f"D{m.isoformat()}{code}", code, m.isoformat(), 5000.0, "externo", "deposito") for m in months for code in codes]
+    )
+    conn.executemany(
+      "INSERT INTO dividends(action_id, ticker, currency, datetime, amount) VALUES(?,?,?,?,?)",
+      [(f"V{name}{m.isoformat()}", name, ticker_currency[name], m.isoformat(), float(rng.uniform(5, 50)))
+       for name in names for m in months if m.month % 3 == 0]
+    )
+    conn.commit()
+  finally:
+    conn.close()
+  return {"tickers": names, "days": len(days), "business_days": len(business), "currencies": codes}
+
+
+def current_rss_mb() -> float:
+  """RSS actual (Linux: /proc/self/statm); en otros sistemas, el máximo del proceso según getrusage."""
+  try:
+    with open("/proc/self/statm") as handle:
+      return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+  except (OSError, ValueError, AttributeError):
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+async def _sample_rss(stop: asyncio.Event, peak: List[float], interval: float = 0.01) -> None:
+  while not stop.is_set():
+    peak[0] = max(peak[0], current_rss_mb())
+    try:
+      await asyncio.wait_for(stop.wait(), timeout=interval)
+    except asyncio.TimeoutError:
+      pass
+
+
+async def drive(client: httpx.AsyncClient, url: str, requests: int, concurrency: int, vary: bool) -> Dict[str, Any]:
+  latencies: List[float] = []
+  errors = 0
+  body_bytes = 0
+  counter = iter(range(requests))
+
+  async def worker():
+    nonlocal errors, body_bytes
+    for n in counter:
+      target = f"{url}{'&' if '?' in url else '?'}_bench={n}" if vary else url
+      start = time.perf_counter()
+      resp = await client.get(target)
+      latencies.append(time.perf_counter() - start)
+      body_bytes += len(resp.content)
+      if resp.status_code >= 400:
+        errors += 1
+
+  stop = asyncio.Event()
+  peak = [current_rss_mb()]
+  sampler = asyncio.create_task(_sample_rss(stop, peak))
+  started = time.perf_counter()
+  await asyncio.gather(*(worker() for _ in range(concurrency)))
+  elapsed = time.perf_counter() - started
+  stop.set()
+  await sampler
+  ms = np.array(latencies) * 1000
+  return {
+    "requests": requests,
+    "errors": errors,
+    "concurrency": concurrency,
+    "p50_ms": round(float(np.percentile(ms, 50)), 2),
+    "p95_ms": round(float(np.percentile(ms, 95)), 2),
+    "p99_ms": round(float(np.percentile(ms, 99)), 2),
+    "mean_ms": round(float(ms.mean()), 2),
+    "throughput_rps": round(requests / elapsed, 2),
+    "bytes_per_request": int(body_bytes / requests),
+    "peak_rss_mb": round(peak[0], 1),
+  }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+  """Endpoints cuyo p95 crece o cuyo throughput cae más de `tolerance` respecto a la referencia."""
+  regressions = []
+  for url, current in results["endpoints"].items():
+    previous = baseline.get("endpoints", {}).get(url)
+    if not previous:
+      continue
+    if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+      regressions.append(f"{url}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+    if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+      regressions.append(f"{url}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+  return regressions
+
+
+def _git_revision() -> Optional[str]:
+  try:
+    return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+async def run(args, db_path: str, dataset: Dict[str, Any]) -> Dict[str, Any]:
+  from api.main import app
+
+  endpoints = args.endpoint or DEFAULT_ENDPOINTS
+  results: Dict[str, Any] = {}
+  transport = httpx.ASGITransport(app=app)
+  async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+    for raw in endpoints:
+      url = raw.replace("{ticker}", dataset["tickers"][0])
+      # Calentamiento: materializa derivados (libro de caja, bloques de precios, matriz FX)
+      await client.get(url)
+      stats = await drive(client, url, args.requests, args.concurrency, args.vary)
+      results[raw] = stats
+      print(f"{raw:<58} p50 {stats['p50_ms']:8.1f}  p95 {stats['p95_ms']:8.1f}  p99 {stats['p99_ms']:8.1f} ms"
+            f"  {stats['throughput_rps']:8.1f} req/s  {stats['bytes_per_request']:>9} B  RSS {stats['peak_rss_mb']:.0f} MB"
+            + (f"  errores {stats['errors']}" if stats["errors"] else ""))
+  return results
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark de carga de la API en proceso con una cartera sintética.")
+  parser.add_argument("--trades", type=int, default=5000)
+  parser.add_argument("--tickers", type=int, default=50)
+  parser.add_argument("--currencies", type=int, default=3)
+  parser.add_argument("--years", type=int, default=5)
+  parser.add_argument("--requests", type=int, default=50, help="Peticiones por endpoint")
+  parser.add_argument("--concurrency", type=int, default=8, help="Clientes simultáneos")
+  parser.add_argument("--endpoint", action="append", help="Endpoint a medir (repetible; `{ticker}` = primer ticker). Por defecto, el conjunto habitual del dashboard")
+  parser.add_argument("--vary", action="store_true", help="Parámetro distinto por petición (sin coalescencia)")
+  parser.add_argument("--output", type=Path, help="Fichero JSON donde guardar el resultado")
+  parser.add_argument("--baseline", type=Path, help="Resultado JSON anterior con el que comparar")
+  parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento admitido frente a la referencia (0.2 = 20%%)")
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = str(Path(tmpdir) / "bench.db")
+    os.environ["PORTFOLIO_DB_PATH"] = db_path
+    started = time.perf_counter()
+    dataset = populate(db_path, args.trades, args.tickers, args.currencies, args.years)
+    print(f"Cartera generada en {time.perf_counter() - started:.1f}s: {args.trades} trades, {args.tickers} tickers, "
+          f"{len(dataset['currencies'])} divisas, {dataset['business_days']} días hábiles")
+    endpoints = asyncio.run(run(args, db_path, dataset))
+
+  results = {
+    "meta": {
+      "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+      "git": _git_revision(),
+      "python": platform.python_version(),
+      "platform": platform.platform(),
+      "params": {k: v for k, v in vars(args).items() if k in ("trades", "tickers", "currencies", "years", "requests", "concurrency", "vary")},
+    },
+    "endpoints": endpoints,
+  }
+  if args.output:
+    args.output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultado guardado en {args.output}")
+  if args.baseline:
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline.get("meta", {}).get("params") != results["meta"]["params"]:
+      print("Aviso: la referencia se generó con otros parámetros; la comparación es orientativa")
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+      print(f"REGRESIÓN {line}")
+    if regressions:
+      sys.exit(1)
+    print(f"Sin regresiones frente a {args.baseline} (tolerancia {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+  main()
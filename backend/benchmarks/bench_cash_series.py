@@ -0,0 +1,77 @@
+"""
+Benchmark de `/cash/series` sobre el libro de caja: coste de la serie completa frente a un rango
+de un mes con el mismo histórico, para comprobar que crece con el rango pedido y no con el total.
+
+Uso (desde backend/):
+  python benchmarks/bench_cash_series.py --years 20 --per-day 20
+"""
+import argparse
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+import numpy as np  # noqa: E402
+
+from cash_ledger import ledger_series, refresh_cash_ledger  # noqa: E402
+from db import ensure_schema, get_connection  # noqa: E402
+
+
+def populate(conn, years: int, per_day: int, seed: int = 7) -> int:
+  rng = np.random.default_rng(seed)
+  start = date(2024, 12, 31) - timedelta(days=365 * years)
+  currencies = ["EUR", "USD", "GBP"]
+  rows = []
+  for offset in range(365 * years):
+    day = (start + timedelta(days=offset)).isoformat()
+    for n in range(per_day):
+      rows.append((f"TX{offset}-{n}", currencies[n % len(currencies)], day, float(rng.normal(0, 100)), "externo", "deposito"))
+  with conn:
+    conn.executemany(
+      "INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)",
+      rows
+    )
+  refresh_cash_ledger(conn)
+  return len(rows)
+
+
+def bench(label, conn, repeat, **kwargs):
+  best = float("inf")
+  points = 0
+  for _ in range(repeat):
+    start = time.perf_counter()
+    series = ledger_series(conn, with_balance=True, **kwargs)
+    best = min(best, time.perf_counter() - start)
+    points = sum(len(v) for v in series.values())
+  print(f"{label:>6}: {points} puntos en {best * 1000:.1f} ms (mejor de {repeat})")
+  return best
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark de /cash/series: histórico completo vs rango de un mes.")
+  parser.add_argument("--years", type=int, default=20)
+  parser.add_argument("--per-day", type=int, default=20)
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args()
+  with tempfile.TemporaryDirectory() as tmpdir:
+    conn = get_connection(str(Path(tmpdir) / "bench.db"))
+    ensure_schema(conn)
+    try:
+      start = time.perf_counter()
+      rows = populate(conn, args.years, args.per_day)
+      print(f"Base generada: {rows} movimientos en {time.perf_counter() - start:.2f}s")
+      full = bench("full", conn, args.repeat, interval="day")
+      month = bench("month", conn, args.repeat, interval="day", from_day="2024-06-01", to_day="2024-06-30")
+      bench("yearly", conn, args.repeat, interval="year")
+      print(f"rango de un mes x{full / month:.1f} más rápido que el histórico completo")
+    finally:
+      conn.close()
+
+
+if __name__ == "__main__":
+  main()
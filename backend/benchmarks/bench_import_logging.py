@@ -0,0 +1,110 @@
+"""
+Benchmark del coste del logging en la importación: `process_rows` sobre las mismas filas sintéticas
+(trades, dividendos y transferencias) con el logging apagado (WARNING), con un FileHandler
+síncrono en DEBUG y con la tubería asíncrona de `logging_config` en DEBUG (cada fila se registra).
+
+Uso (desde backend/):
+  python benchmarks/bench_import_logging.py --rows 20000 --repeat 3
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+import logging_config  # noqa: E402
+from db import ensure_schema, get_connection  # noqa: E402
+from importer import insert_batch, process_rows  # noqa: E402
+
+
+def synthetic_rows(count: int, seed_offset: int = 0):
+  """Filas con la forma del CSV de IBKR: 80% trades STK, 10% dividendos y 10% depósitos."""
+  start = date(2015, 1, 2)
+  rows = []
+  for n in range(count):
+    uid = seed_offset + n
+    day = (start + timedelta(days=n % 3650)).isoformat()
+    if n % 10 == 8:
+      rows.append((n, {
+        "ActionID": f"DIV{uid}", "Code": "PO", "Symbol": f"T{n % 40}", "CurrencyPrimary": "USD",
+        "PayDate": day, "GrossAmount": "12.5", "Tax": "-1.9", "Description": "Cash dividend " + "x" * 200,
+      }))
+    elif n % 10 == 9:
+      rows.append((n, {
+        "TransactionID": f"TX{uid}", "Description": "CASH RECEIPTS / ELECTRONIC FUND TRANSFERS",
+        "CurrencyPrimary": "EUR", "Amount": "1000", "Date": day,
+      }))
+    else:
+      rows.append((n, {
+        "TradeID": f"TR{uid}", "Ticker": f"T{n % 40}", "Quantity": "10", "PurchasePrice": "101.5",
+        "DateTime": f"{day}T15:30:00+00:00", "CurrencyPrimary": "USD", "AssetClass": "STK",
+        "Commission": "-1", "CommissionCurrency": "USD",
+      }))
+  return rows
+
+
+def configure(mode: str, log_path: Path) -> None:
+  root = logging.getLogger()
+  logging_config.shutdown_logging()
+  for handler in list(root.handlers):
+    root.removeHandler(handler)
+    handler.close()
+  os.environ["BACKEND_LOG_PATH"] = str(log_path)
+  if mode == "off":
+    logging_config.configure_root_logging(level="WARNING", module_levels={"importer": "WARNING"}, force=True)
+  elif mode == "sync":
+    handler = logging.FileHandler(log_path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter(logging_config.LOG_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    logging.getLogger("importer").setLevel(logging.DEBUG)
+  else:
+    logging_config.configure_root_logging(level="INFO", module_levels={"importer": "DEBUG"}, force=True)
+
+
+def run_mode(mode: str, rows_count: int, repeat: int, workdir: Path):
+  best = None
+  for attempt in range(repeat):
+    log_path = workdir / f"{mode}-{attempt}.log"
+    conn = get_connection(str(workdir / f"{mode}-{attempt}.db"))
+    ensure_schema(conn)
+    rows = synthetic_rows(rows_count, seed_offset=attempt * rows_count)
+    configure(mode, log_path)
+    batch_id = insert_batch(conn, "bench", Path("bench.csv"), "2024-01-01T00:00:00+00:00")
+    start = time.perf_counter()
+    process_rows(conn, batch_id, rows)
+    elapsed = time.perf_counter() - start
+    # El vaciado de la cola no bloquea al importador; se mide aparte
+    flush_start = time.perf_counter()
+    logging_config.shutdown_logging()
+    flush = time.perf_counter() - flush_start
+    conn.close()
+    size_kb = log_path.stat().st_size / 1024 if log_path.exists() else 0.0
+    if best is None or elapsed < best[0]:
+      best = (elapsed, flush, size_kb)
+  elapsed, flush, size_kb = best
+  return {"mode": mode, "seconds": elapsed, "rows_per_s": rows_count / elapsed, "flush_s": flush, "log_kb": size_kb}
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--rows", type=int, default=20000)
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    results = [run_mode(mode, args.rows, args.repeat, Path(tmp)) for mode in ("off", "sync", "async")]
+  print(f"{'modo':<6} {'filas/s':>10} {'import s':>9} {'vaciado s':>10} {'log KB':>9}")
+  for item in results:
+    print(f"{item['mode']:<6} {item['rows_per_s']:>10.0f} {item['seconds']:>9.3f} {item['flush_s']:>10.3f} {item['log_kb']:>9.0f}")
+
+
+if __name__ == "__main__":
+  main()
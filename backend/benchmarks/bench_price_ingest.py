@@ -0,0 +1,114 @@
+"""
+Benchmark de ingesta de precios: histórico sintético con la forma de yfinance
+(columnas MultiIndex Price/Ticker) leído de un fixture local y escrito en SQLite.
+
+Compara la ruta antigua (iterrows + un INSERT por fila) con la vectorizada
+(history_to_rows + executemany por ticker).
+
+Uso (desde backend/):
+  python benchmarks/bench_price_ingest.py --tickers 500 --years 20
+"""
+import argparse
+import pickle
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from db import ensure_schema, get_connection  # noqa: E402
+from ingest import PRICE_UPSERT_SQL, history_to_rows, upsert_price_rows  # noqa: E402
+
+
+def build_fixture(path: Path, tickers: int, years: int, seed: int = 7) -> None:
+  """Genera un DataFrame por ticker con el formato de `yf.download` (incluye NaN ocasionales)."""
+  rng = np.random.default_rng(seed)
+  index = pd.bdate_range(end="2024-12-31", periods=252 * years, tz="America/New_York")
+  frames = {}
+  for i in range(tickers):
+    symbol = f"TCK{i:04d}"
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+    closes[rng.random(len(index)) < 0.002] = np.nan
+    frame = pd.DataFrame({("Close", symbol): closes, ("Open", symbol): closes, ("Volume", symbol): 1000}, index=index)
+    frame.columns.names = ["Price", "Ticker"]
+    frames[symbol] = frame
+  with path.open("wb") as handle:
+    pickle.dump(frames, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_fixture(path: Path):
+  with path.open("rb") as handle:
+    return pickle.load(handle)
+
+
+def ingest_legacy(conn, frames, today: date) -> int:
+  """Réplica de la ruta anterior: iterrows + INSERT ... ON CONFLICT por fila."""
+  total = 0
+  for symbol, hist in frames.items():
+    flat = hist.droplevel("Ticker", axis=1)
+    for idx, row in flat.iterrows():
+      close = row.get("Close")
+      if close is None or pd.isna(close):
+        continue
+      d = idx.date()
+      conn.execute(PRICE_UPSERT_SQL, (symbol, d.isoformat(), float(close), 1 if d >= today else 0))
+      total += 1
+  conn.commit()
+  return total
+
+
+def ingest_vectorized(conn, frames, today: date) -> int:
+  total = 0
+  for symbol, hist in frames.items():
+    total += upsert_price_rows(conn, symbol, history_to_rows(hist, "Close", symbol), today)
+  return total
+
+
+def _timed(label: str, fn, frames, today: date, workdir: Path):
+  db_path = workdir / f"{label}.db"
+  conn = get_connection(str(db_path))
+  ensure_schema(conn)
+  try:
+    start = time.perf_counter()
+    rows = fn(conn, frames, today)
+    elapsed = time.perf_counter() - start
+  finally:
+    conn.close()
+  print(f"{label:>10}: {len(frames)} tickers, {rows} filas en {elapsed:.2f}s ({rows / elapsed:,.0f} filas/s)")
+  return elapsed, rows
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark de ingesta de precios (legacy vs vectorizada).")
+  parser.add_argument("--tickers", type=int, default=500)
+  parser.add_argument("--years", type=int, default=20)
+  parser.add_argument("--legacy-tickers", type=int, default=25, help="Tickers a ingerir con la ruta antigua (se extrapola al total).")
+  parser.add_argument("--fixture", default=None, help="Ruta del fixture (.pkl); se genera si no existe.")
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmpdir:
+    workdir = Path(tmpdir)
+    fixture = Path(args.fixture) if args.fixture else workdir / f"prices_{args.tickers}x{args.years}y.pkl"
+    if not fixture.exists():
+      start = time.perf_counter()
+      build_fixture(fixture, args.tickers, args.years)
+      print(f"Fixture generado en {time.perf_counter() - start:.2f}s: {fixture}")
+    frames = load_fixture(fixture)
+    today = date(2025, 1, 1)
+
+    new_elapsed, _ = _timed("vectorized", ingest_vectorized, frames, today, workdir)
+    legacy_frames = dict(list(frames.items())[:max(1, min(args.legacy_tickers, len(frames)))])
+    legacy_elapsed, _ = _timed("legacy", ingest_legacy, legacy_frames, today, workdir)
+    legacy_total = legacy_elapsed * len(frames) / len(legacy_frames)
+    print(f"legacy extrapolado a {len(frames)} tickers: {legacy_total:.2f}s | speedup x{legacy_total / new_elapsed:.1f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,91 @@
+"""
+Benchmark de lectura de precios: tabla de filas `prices` frente al almacén columnar
+`price_columns` (BLOB por ticker y año).
+
+La ruta de filas reproduce la lectura que hacía `build_value_by_date`
+(SELECT date, close ... ORDER BY date + `date.fromisoformat` por fila).
+
+Uso (desde backend/):
+  python benchmarks/bench_price_store.py --tickers 200 --years 20
+"""
+import argparse
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+import numpy as np  # noqa: E402
+
+from db import ensure_schema, get_connection  # noqa: E402
+from ingest import upsert_price_rows  # noqa: E402
+from price_store import load_price_columns  # noqa: E402
+
+
+def populate(conn, tickers: int, years: int, seed: int = 11):
+  rng = np.random.default_rng(seed)
+  start = date(2024, 12, 31) - timedelta(days=365 * years)
+  days = [start + timedelta(days=i) for i in range(365 * years) if (start + timedelta(days=i)).weekday() < 5]
+  names = []
+  for i in range(tickers):
+    ticker = f"TCK{i:04d}"
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+    upsert_price_rows(conn, ticker, zip(days, closes.tolist()), today=date(2025, 1, 1))
+    names.append(ticker)
+  return names, len(days)
+
+
+def read_rows(conn, tickers):
+  total = 0
+  for ticker in tickers:
+    rows = conn.execute("SELECT date, close FROM prices WHERE ticker = ? ORDER BY date ASC", (ticker,)).fetchall()
+    parsed = [(date.fromisoformat(d), float(c)) for d, c in rows]
+    total += len(parsed)
+  return total
+
+
+def read_columns(conn, tickers):
+  total = 0
+  for ticker in tickers:
+    days, closes = load_price_columns(conn, ticker)
+    total += len(closes)
+  return total
+
+
+def bench(label, fn, conn, tickers, repeat):
+  best = float("inf")
+  rows = 0
+  for _ in range(repeat):
+    start = time.perf_counter()
+    rows = fn(conn, tickers)
+    best = min(best, time.perf_counter() - start)
+  print(f"{label:>8}: {rows} filas en {best:.3f}s ({rows / best:,.0f} filas/s, mejor de {repeat})")
+  return best
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark de lectura: tabla prices vs almacén columnar.")
+  parser.add_argument("--tickers", type=int, default=200)
+  parser.add_argument("--years", type=int, default=20)
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args()
+  with tempfile.TemporaryDirectory() as tmpdir:
+    conn = get_connection(str(Path(tmpdir) / "bench.db"))
+    ensure_schema(conn)
+    try:
+      start = time.perf_counter()
+      tickers, days = populate(conn, args.tickers, args.years)
+      print(f"Base generada: {len(tickers)} tickers × {days} días en {time.perf_counter() - start:.2f}s")
+      rows_time = bench("rows", read_rows, conn, tickers, args.repeat)
+      cols_time = bench("columns", read_columns, conn, tickers, args.repeat)
+      print(f"speedup x{rows_time / cols_time:.1f}")
+    finally:
+      conn.close()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,52 @@
+"""
+Presupuestos de tiempo del registro de planes de consulta (`tests/test_query_plans.py`): genera la
+misma base sintética, recorre los mismos endpoints `--repeat` veces y, por patrón registrado, compara
+la mediana de duración con su presupuesto. El test sólo comprueba índices; los tiempos dependen de la
+máquina y se miden aquí. Termina con código 1 si alguna mediana supera su presupuesto.
+
+Uso (desde backend/):
+  python benchmarks/bench_query_plans.py --repeat 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+for path in (BACKEND_ROOT, BACKEND_ROOT / "tests"):
+  if str(path) not in sys.path:
+    sys.path.insert(0, str(path))
+
+from test_query_plans import EXPECTED_PLANS, capture_queries, check_queries  # noqa: E402
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Duración de las consultas registradas frente a su presupuesto.")
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args()
+
+  durations = {}
+  for _ in range(args.repeat):
+    with tempfile.TemporaryDirectory() as tmpdir:
+      db_path = os.path.join(tmpdir, "large.db")
+      os.environ["PORTFOLIO_DB_PATH"] = db_path
+      for pattern, values in check_queries(capture_queries(db_path))[3].items():
+        durations.setdefault(pattern, []).extend(values)
+
+  over = 0
+  for pattern, _index, budget_ms in EXPECTED_PLANS:
+    values = durations.get(pattern)
+    if not values:
+      continue
+    median = statistics.median(values)
+    flag = "SUPERA" if median > budget_ms else "ok"
+    over += median > budget_ms
+    print(f"{flag:>6} {median:8.1f} ms (máx {max(values):8.1f}, presupuesto {budget_ms}) {pattern}")
+  print(f"{over} patrones por encima del presupuesto")
+  sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,83 @@
+"""
+Benchmark del cuerpo de `/portfolio/value/series`: tiempo de serialización y bytes enviados del
+formato por puntos frente al columnar, con `json` estándar y con el encoder rápido (orjson si está
+instalado), sin comprimir y con gzip/brotli.
+
+Uso (desde backend/):
+  python benchmarks/bench_series_payload.py --years 10 --currencies 3
+"""
+import argparse
+import gzip
+import json
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+import numpy as np  # noqa: E402
+
+from api.responses import brotli, dumps_json, orjson  # noqa: E402
+from api.series_format import columnar_points  # noqa: E402
+
+
+def synthetic_series(years: int, currencies: int, seed: int = 7):
+  rng = np.random.default_rng(seed)
+  codes = ["EUR", "USD", "GBP", "CHF", "JPY"][:currencies]
+  start = date(2024, 12, 31) - timedelta(days=365 * years)
+  points = []
+  for offset in range(365 * years):
+    cash = {code: float(rng.normal(1000, 300)) for code in codes}
+    points.append({
+      "date": (start + timedelta(days=offset)).isoformat(),
+      "value_base": float(rng.normal(50000, 5000)),
+      "transfers_base": float(rng.normal(0, 50)),
+      "pnl_pct": float(rng.normal(5, 2)),
+      "cash": cash,
+      "cash_base": {code: value * 1.1 for code, value in cash.items()}
+    })
+  return points
+
+
+def timed(fn, repeat):
+  best = float("inf")
+  result = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = fn()
+    best = min(best, time.perf_counter() - start)
+  return best, result
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark de serialización de series: filas vs columnar, json vs orjson.")
+  parser.add_argument("--years", type=int, default=10)
+  parser.add_argument("--currencies", type=int, default=3)
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args()
+
+  points = synthetic_series(args.years, args.currencies)
+  print(f"{len(points)} puntos, {args.currencies} divisas; orjson={'sí' if orjson else 'no'}, brotli={'sí' if brotli else 'no'}")
+  payloads = {
+    "rows": lambda: {"series": points},
+    "columnar": lambda: {"series": columnar_points(points)},
+    "columnar+delta": lambda: {"series": columnar_points(points, delta_dates=True)},
+  }
+  encoders = {
+    "json": lambda content: json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8"),
+    "rápido": dumps_json,
+  }
+  print(f"{'formato':>15} {'encoder':>7} {'ms':>8} {'bytes':>10} {'gzip':>10} {'br':>10}")
+  for label, build in payloads.items():
+    for enc_label, encode in encoders.items():
+      elapsed, body = timed(lambda: encode(build()), args.repeat)
+      gz = len(gzip.compress(body, compresslevel=6))
+      br = len(brotli.compress(body, quality=4)) if brotli is not None else "-"
+      print(f"{label:>15} {enc_label:>7} {elapsed * 1000:8.1f} {len(body):10d} {gz:10d} {br:>10}")
+
+
+if __name__ == "__main__":
+  main()
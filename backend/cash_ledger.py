@@ -0,0 +1,171 @@
+"""
+Libro de caja unificado (`cash_ledger`): una fila por movimiento de efectivo con su divisa, día,
+importe, origen (`transfer`, `dividend`, `trade`), marca de transferencia externa y saldo
+acumulado por divisa.
+
+Las filas las mantienen los triggers de `transfers`, `dividends` y `trades` (ver `db.SCHEMA`);
+aquí sólo se recalculan los saldos pendientes y se exponen las lecturas por rango. Definición de
+caja única para todos los consumidores: transferencias (externas e internas), dividendos y trades
+STK (`-(qty * precio)` menos la comisión si va en la misma divisa). Las opciones no mueven caja.
+"""
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+SOURCE_TRANSFER = "transfer"
+SOURCE_DIVIDEND = "dividend"
+SOURCE_TRADE = "trade"
+
+# Clave de agrupación por intervalo sobre la columna `day` (YYYY-MM-DD): inicio del periodo
+BUCKET_SQL = {
+  "day": "day",
+  "week": "date(day, '-' || ((CAST(strftime('%w', day) AS INTEGER) + 6) % 7) || ' days')",
+  "month": "substr(day, 1, 7) || '-01'",
+  "quarter": "substr(day, 1, 5) || printf('%02d', ((CAST(substr(day, 6, 2) AS INTEGER) - 1) / 3) * 3 + 1) || '-01'",
+  "year": "substr(day, 1, 4) || '-01-01'",
+}
+
+
+def refresh_cash_ledger(conn) -> int:
+  """Recalcula los saldos acumulados desde la fecha marcada de cada divisa. Devuelve cuántas divisas se tocaron."""
+  dirty = conn.execute("SELECT currency, from_day FROM cash_ledger_dirty").fetchall()
+  if not dirty:
+    return 0
+  with conn:
+    for currency, from_day in dirty:
+      conn.execute(
+        """UPDATE cash_ledger SET balance = running.balance
+           FROM (
+             SELECT id,
+                    COALESCE((SELECT balance FROM cash_ledger
+                              WHERE currency = ? AND day < ? ORDER BY day DESC, id DESC LIMIT 1), 0)
+                    + SUM(amount) OVER (ORDER BY day, id) AS balance
+             FROM cash_ledger WHERE currency = ? AND day >= ?
+           ) AS running
+           WHERE cash_ledger.id = running.id""",
+        (currency, from_day, currency, from_day)
+      )
+    conn.executemany("DELETE FROM cash_ledger_dirty WHERE currency = ? AND from_day = ?", dirty)
+  return len(dirty)
+
+
+def cash_balances(conn) -> Dict[str, float]:
+  """Saldo actual por divisa: último saldo acumulado de cada una (búsqueda por índice)."""
+  refresh_cash_ledger(conn)
+  cur = conn.execute(
+    """SELECT c.currency,
+              (SELECT balance FROM cash_ledger WHERE currency = c.currency ORDER BY day DESC, id DESC LIMIT 1)
+       FROM (SELECT DISTINCT currency FROM cash_ledger) c"""
+  )
+  return {currency: float(balance or 0.0) for currency, balance in cur.fetchall()}
+
+
+def _opening_balances(conn, currencies: Iterable[str], from_day: str) -> Dict[str, float]:
+  out: Dict[str, float] = {}
+  for currency in currencies:
+    row = conn.execute(
+      "SELECT balance FROM cash_ledger WHERE currency = ? AND day < ? ORDER BY day DESC, id DESC LIMIT 1",
+      (currency, from_day)
+    ).fetchone()
+    out[currency] = float(row[0] or 0.0) if row else 0.0
+  return out
+
+
+def _series_query(interval: str, from_day: Optional[str], to_day: Optional[str], sources: Optional[Tuple[str, ...]]) -> Tuple[str, List[Any]]:
+  """Suma por divisa y periodo dentro de `[from_day, to_day]`, ordenada por divisa y periodo."""
+  bucket = BUCKET_SQL[interval]
+  where = ["day >= ?", "day <= ?"]
+  params: List[Any] = [from_day or "", to_day or "9999-12-31"]
+  if sources:
+    where.append(f"source IN ({','.join('?' for _ in sources)})")
+    params.extend(sources)
+  sql = f"""SELECT currency, {bucket} AS bucket, SUM(amount)
+            FROM cash_ledger WHERE {' AND '.join(where)}
+            GROUP BY currency, bucket
+            ORDER BY currency, bucket"""
+  return sql, params
+
+
+def ledger_series(conn, interval: str = "day", from_day: Optional[str] = None, to_day: Optional[str] = None, sources: Optional[Tuple[str, ...]] = None, with_balance: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+  """
+  Serie por divisa de movimientos agrupados por intervalo (clave = inicio del periodo) dentro de
+  `[from_day, to_day]`. El rango y la agrupación se resuelven en SQL sobre el índice de `day`, de
+  modo que el coste crece con el rango pedido y no con el histórico.
+  `cumulative` acumula desde el inicio del rango; con `with_balance` se añade el saldo absoluto
+  (saldo de apertura precalculado + acumulado), sin recorrer el histórico anterior al rango.
+  """
+  if with_balance:
+    refresh_cash_ledger(conn)
+  rows = conn.execute(*_series_query(interval, from_day, to_day, sources)).fetchall()
+  if not rows:
+    return {}
+  currencies = [row[0] for row in rows]
+  buckets = [row[1] for row in rows]
+  amounts = np.fromiter((float(row[2] or 0.0) for row in rows), dtype=np.float64, count=len(rows))
+  # Tramos contiguos por divisa (las filas llegan ordenadas por currency)
+  starts = [0] + [i for i in range(1, len(rows)) if currencies[i] != currencies[i - 1]] + [len(rows)]
+  opening: Dict[str, float] = {}
+  if with_balance and from_day:
+    opening = _opening_balances(conn, {currencies[i] for i in starts[:-1]}, from_day)
+  result: Dict[str, List[Dict[str, Any]]] = {}
+  for lo, hi in zip(starts[:-1], starts[1:]):
+    currency = currencies[lo]
+    cumulative = np.cumsum(amounts[lo:hi])
+    points = [
+      {"date": day, "amount": round(amount, 4), "cumulative": round(total, 4)}
+      for day, amount, total in zip(buckets[lo:hi], amounts[lo:hi].tolist(), cumulative.tolist())
+    ]
+    if with_balance:
+      balances = (opening.get(currency, 0.0) + cumulative).tolist()
+      for point, balance in zip(points, balances):
+        point["balance"] = round(balance, 4)
+    result[currency or "N/A"] = points
+  return result
+
+
+def iter_ledger_points(conn, interval: str = "day", from_day: Optional[str] = None, to_day: Optional[str] = None, sources: Optional[Tuple[str, ...]] = None, with_balance: bool = False) -> Iterator[Tuple[str, Dict[str, Any]]]:
+  """
+  Variante en streaming de `ledger_series`: genera `(divisa, punto)` recorriendo el cursor, con
+  acumulados corrientes por divisa en lugar de cargar todos los grupos. Mismos puntos y orden.
+  """
+  if with_balance:
+    refresh_cash_ledger(conn)
+  cur = conn.execute(*_series_query(interval, from_day, to_day, sources))
+  currency = None
+  total = 0.0
+  opening = 0.0
+  for row_currency, day, amount in cur:
+    if row_currency != currency:
+      currency = row_currency
+      total = 0.0
+      opening = _opening_balances(conn, [currency], from_day)[currency] if with_balance and from_day else 0.0
+    amount = float(amount or 0.0)
+    total += amount
+    point = {"date": day, "amount": round(amount, 4), "cumulative": round(total, 4)}
+    if with_balance:
+      point["balance"] = round(opening + total, 4)
+    yield currency or "N/A", point
+
+
+def daily_cash_rows(conn) -> List[Tuple[date, str, float, float, int]]:
+  """
+  Por día y divisa: `(día, divisa, saldo al cierre, importe de transferencias externas, nº de externas)`.
+  """
+  refresh_cash_ledger(conn)
+  # Con un único MAX() las columnas sueltas (balance) salen de la fila con el id máximo del grupo
+  cur = conn.execute(
+    """SELECT day, currency, balance, MAX(id),
+              SUM(CASE WHEN external = 1 THEN amount ELSE 0 END), SUM(external)
+       FROM cash_ledger
+       GROUP BY currency, day
+       ORDER BY day"""
+  )
+  out = []
+  for day, currency, balance, _last_id, external_amount, external_count in cur.fetchall():
+    try:
+      d = date.fromisoformat(day)
+    except (TypeError, ValueError):
+      continue
+    out.append((d, currency, float(balance or 0.0), float(external_amount or 0.0), int(external_count or 0)))
+  return out
@@ -0,0 +1,77 @@
+"""
+Feed de cambios de las tablas de hechos (`trades`, `transfers`, `dividends`) a partir de `change_log`.
+
+Los triggers asignan un `seq` creciente a cada alta, cambio o baja, sea quien sea el escritor
+(importador, sincronizaciones o endpoints). Cada registro conserva sólo su último cambio, de modo que
+un cliente que guarda el `seq` de su última sincronización recibe únicamente las filas tocadas desde
+entonces (`upserted` con la fila actual y `deleted` con la clave natural).
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+# Tabla -> columna de clave natural (la que usan los clientes como identificador)
+CHANGE_TABLES = {
+  "trades": "trade_id",
+  "transfers": "transaction_id",
+  "dividends": "action_id",
+}
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+def current_change_seq(conn) -> int:
+  row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+  return int(row[0]) if row else 0
+
+
+def _fetch_rows(conn, table: str, columns: Sequence[str], keys: List[str]) -> List[Dict[str, Any]]:
+  key_col = CHANGE_TABLES[table]
+  select_cols = list(columns) if key_col in columns else [key_col] + list(columns)
+  out: List[Dict[str, Any]] = []
+  # Lotes por debajo del límite de parámetros de SQLite
+  for start in range(0, len(keys), 500):
+    chunk = keys[start:start + 500]
+    cur = conn.execute(
+      f"SELECT {', '.join(select_cols)} FROM {table} WHERE {key_col} IN ({','.join('?' for _ in chunk)}) ORDER BY datetime ASC, id ASC",
+      chunk
+    )
+    out.extend({col: row[idx] for idx, col in enumerate(select_cols)} for row in cur.fetchall())
+  return out
+
+
+def changes_since(conn, since: int, columns_by_table: Dict[str, Sequence[str]], limit: Optional[int] = None) -> Dict[str, Any]:
+  """
+  Cambios con `seq > since`. Devuelve `{seq, current, since, reset, more, changes: {tabla: {upserted, deleted}}}`.
+  - `seq` es el último seq incluido (o `since` si no hay cambios); el cliente lo usa como siguiente `since`.
+  - `current` es la secuencia actual de la base.
+  - `reset` indica que `since` es posterior a la secuencia actual (base recreada): hay que resincronizar entero.
+  - Con `limit`, `more` indica que quedan cambios por pedir.
+  """
+  current = current_change_seq(conn)
+  changes: Dict[str, Dict[str, List[Any]]] = {table: {"upserted": [], "deleted": []} for table in columns_by_table}
+  if since > current:
+    return {"seq": current, "current": current, "since": since, "reset": True, "more": False, "changes": changes}
+  params: List[Any] = [since, *columns_by_table.keys()]
+  # `+table_name` descarta el índice UNIQUE(table_name, row_key): se recorre el rango de seq en
+  # orden de clave primaria y LIMIT corta pronto, en vez de leer y ordenar todo el log de esas tablas
+  sql = f"""SELECT seq, table_name, row_key, op FROM change_log
+            WHERE seq > ? AND +table_name IN ({','.join('?' for _ in columns_by_table)})
+            ORDER BY seq ASC"""
+  if limit:
+    sql += " LIMIT ?"
+    params.append(limit + 1)
+  rows = conn.execute(sql, params).fetchall()
+  more = bool(limit) and len(rows) > limit
+  if more:
+    rows = rows[:limit]
+  upsert_keys: Dict[str, List[str]] = {table: [] for table in columns_by_table}
+  for _seq, table, key, op in rows:
+    if op == DELETE:
+      changes[table]["deleted"].append(key)
+    else:
+      upsert_keys[table].append(key)
+  for table, keys in upsert_keys.items():
+    if keys:
+      changes[table]["upserted"] = _fetch_rows(conn, table, columns_by_table[table], keys)
+  last_seq = rows[-1][0] if rows else since
+  return {"seq": last_seq, "current": current, "since": since, "reset": False, "more": more, "changes": changes}
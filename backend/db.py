@@ -28,7 +28,7 @@ CREATE TABLE IF NOT EXISTS transfers (
   raw_json TEXT
 );
 
-CREATE INDEX IF NOT EXISTS idx_transfers_currency ON transfers(currency);
+CREATE INDEX IF NOT EXISTS idx_transfers_currency_datetime ON transfers(currency, datetime);
 CREATE INDEX IF NOT EXISTS idx_transfers_datetime ON transfers(datetime);
 
 CREATE TABLE IF NOT EXISTS trades (
@@ -46,7 +46,8 @@ CREATE TABLE IF NOT EXISTS trades (
   raw_json TEXT
 );
 
-CREATE INDEX IF NOT EXISTS idx_trades_ticker ON trades(ticker);
+CREATE INDEX IF NOT EXISTS idx_trades_ticker_datetime ON trades(ticker, datetime);
+CREATE INDEX IF NOT EXISTS idx_trades_currency_datetime ON trades(currency, datetime);
 CREATE INDEX IF NOT EXISTS idx_trades_datetime ON trades(datetime);
 
 CREATE TABLE IF NOT EXISTS prices (
@@ -74,7 +75,8 @@ CREATE TABLE IF NOT EXISTS dividends (
   raw_json TEXT
 );
 
-CREATE INDEX IF NOT EXISTS idx_dividends_currency ON dividends(currency);
+CREATE INDEX IF NOT EXISTS idx_dividends_ticker_datetime ON dividends(ticker, datetime);
+CREATE INDEX IF NOT EXISTS idx_dividends_currency_datetime ON dividends(currency, datetime);
 CREATE INDEX IF NOT EXISTS idx_dividends_datetime ON dividends(datetime);
 
 CREATE TABLE IF NOT EXISTS app_config (
@@ -92,11 +94,364 @@ CREATE TABLE IF NOT EXISTS fx_rates (
 );
 
 CREATE INDEX IF NOT EXISTS idx_fx_base_quote ON fx_rates(base_currency, quote_currency);
+CREATE INDEX IF NOT EXISTS idx_fx_rates_date ON fx_rates(date);
+
+-- Almacén columnar de precios: un bloque por ticker y año con ordinales de fecha (int32) y cierres (float64)
+CREATE TABLE IF NOT EXISTS price_columns (
+  ticker TEXT NOT NULL,
+  year INTEGER NOT NULL,
+  days BLOB NOT NULL,
+  closes BLOB NOT NULL,
+  PRIMARY KEY(ticker, year)
+) WITHOUT ROWID;
+
+-- Bloques pendientes de recalcular tras cambios en prices
+CREATE TABLE IF NOT EXISTS price_columns_dirty (
+  ticker TEXT NOT NULL,
+  year INTEGER NOT NULL,
+  PRIMARY KEY(ticker, year)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_prices_dirty_insert AFTER INSERT ON prices
+BEGIN
+  INSERT INTO price_columns_dirty(ticker, year)
+  SELECT NEW.ticker, CAST(substr(NEW.date, 1, 4) AS INTEGER)
+  WHERE NOT EXISTS (SELECT 1 FROM price_columns_dirty WHERE ticker = NEW.ticker AND year = CAST(substr(NEW.date, 1, 4) AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_prices_dirty_update AFTER UPDATE ON prices
+BEGIN
+  INSERT INTO price_columns_dirty(ticker, year)
+  SELECT OLD.ticker, CAST(substr(OLD.date, 1, 4) AS INTEGER)
+  WHERE NOT EXISTS (SELECT 1 FROM price_columns_dirty WHERE ticker = OLD.ticker AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER));
+  INSERT INTO price_columns_dirty(ticker, year)
+  SELECT NEW.ticker, CAST(substr(NEW.date, 1, 4) AS INTEGER)
+  WHERE NOT EXISTS (SELECT 1 FROM price_columns_dirty WHERE ticker = NEW.ticker AND year = CAST(substr(NEW.date, 1, 4) AS INTEGER));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_prices_dirty_delete AFTER DELETE ON prices
+BEGIN
+  INSERT INTO price_columns_dirty(ticker, year)
+  SELECT OLD.ticker, CAST(substr(OLD.date, 1, 4) AS INTEGER)
+  WHERE NOT EXISTS (SELECT 1 FROM price_columns_dirty WHERE ticker = OLD.ticker AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER));
+END;
+
+-- Registro compacto de fechas de fx_rates modificadas (una fila por fecha, seq creciente).
+-- Los triggers evitan cláusulas de conflicto: el UPSERT externo impondría su propia política.
+CREATE TABLE IF NOT EXISTS fx_rates_log (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  date TEXT NOT NULL UNIQUE
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_fx_rates_log_insert AFTER INSERT ON fx_rates
+BEGIN
+  DELETE FROM fx_rates_log WHERE date = NEW.date;
+  INSERT INTO fx_rates_log(date) VALUES (NEW.date);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_fx_rates_log_update AFTER UPDATE ON fx_rates
+BEGIN
+  DELETE FROM fx_rates_log WHERE date = MIN(OLD.date, NEW.date);
+  INSERT INTO fx_rates_log(date) VALUES (MIN(OLD.date, NEW.date));
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_fx_rates_log_delete AFTER DELETE ON fx_rates
+BEGIN
+  DELETE FROM fx_rates_log WHERE date = OLD.date;
+  INSERT INTO fx_rates_log(date) VALUES (OLD.date);
+END;
+
+-- Libro de caja unificado: un movimiento por fila (transferencia, dividendo o trade STK) con saldo
+-- acumulado por divisa. Se mantiene con triggers sobre las tablas origen; `balance` se recalcula
+-- desde la fecha más antigua marcada en cash_ledger_dirty.
+CREATE TABLE IF NOT EXISTS cash_ledger (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  source TEXT NOT NULL,
+  source_id INTEGER NOT NULL,
+  currency TEXT NOT NULL,
+  day TEXT NOT NULL,
+  datetime TEXT NOT NULL,
+  amount REAL NOT NULL,
+  external INTEGER NOT NULL DEFAULT 0,
+  balance REAL,
+  UNIQUE(source, source_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_cash_ledger_currency_day ON cash_ledger(currency, day, id);
+CREATE INDEX IF NOT EXISTS idx_cash_ledger_day ON cash_ledger(day);
+CREATE INDEX IF NOT EXISTS idx_cash_ledger_source_day ON cash_ledger(source, day);
+
+CREATE TABLE IF NOT EXISTS cash_ledger_dirty (
+  currency TEXT PRIMARY KEY,
+  from_day TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_cash_ledger_dirty_insert AFTER INSERT ON cash_ledger
+BEGIN
+  DELETE FROM cash_ledger_dirty WHERE currency = NEW.currency AND from_day > NEW.day;
+  INSERT INTO cash_ledger_dirty(currency, from_day)
+  SELECT NEW.currency, NEW.day
+  WHERE NOT EXISTS (SELECT 1 FROM cash_ledger_dirty WHERE currency = NEW.currency);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cash_ledger_dirty_delete AFTER DELETE ON cash_ledger
+BEGIN
+  DELETE FROM cash_ledger_dirty WHERE currency = OLD.currency AND from_day > OLD.day;
+  INSERT INTO cash_ledger_dirty(currency, from_day)
+  SELECT OLD.currency, OLD.day
+  WHERE NOT EXISTS (SELECT 1 FROM cash_ledger_dirty WHERE currency = OLD.currency);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cash_ledger_transfers_insert AFTER INSERT ON transfers
+BEGIN
+  INSERT INTO cash_ledger(source, source_id, currency, day, datetime, amount, external)
+  VALUES ('transfer', NEW.id, UPPER(TRIM(NEW.currency)), substr(NEW.datetime, 1, 10), NEW.datetime, NEW.amount,
+          CASE WHEN NEW.origin = 'externo' THEN 1 ELSE 0 END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cash_ledger_transfers_update AFTER UPDATE OF currency, datetime, amount, origin ON transfers
+BEGIN
+  DELETE FROM cash_ledger WHERE source = 'transfer' AND source_id = OLD.id;
+  INSERT INTO cash_ledger(source, source_id, currency, day, datetime, amount, external)
+  VALUES ('transfer', NEW.id, UPPER(TRIM(NEW.currency)), substr(NEW.datetime, 1, 10), NEW.datetime, NEW.amount,
+          CASE WHEN NEW.origin = 'externo' THEN 1 ELSE 0 END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cash_ledger_transfers_delete AFTER DELETE ON transfers
+BEGIN
+  DELETE FROM cash_ledger WHERE source = 'transfer' AND source_id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cash_ledger_dividends_insert AFTER INSERT ON dividends
+BEGIN
+  INSERT INTO cash_ledger(source, source_id, currency, day, datetime, amount)
+  VALUES ('dividend', NEW.id, UPPER(TRIM(NEW.currency)), substr(NEW.datetime, 1, 10), NEW.datetime, NEW.amount);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cash_ledger_dividends_update AFTER UPDATE OF currency, datetime, amount ON dividends
+BEGIN
+  DELETE FROM cash_ledger WHERE source = 'dividend' AND source_id = OLD.id;
+  INSERT INTO cash_ledger(source, source_id, currency, day, datetime, amount)
+  VALUES ('dividend', NEW.id, UPPER(TRIM(NEW.currency)), substr(NEW.datetime, 1, 10), NEW.datetime, NEW.amount);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cash_ledger_dividends_delete AFTER DELETE ON dividends
+BEGIN
+  DELETE FROM cash_ledger WHERE source = 'dividend' AND source_id = OLD.id;
+END;
+
+-- Trades STK (asset_class vacío se trata como STK): -(qty * precio) menos la comisión si va en la misma divisa
+CREATE TRIGGER IF NOT EXISTS trg_cash_ledger_trades_insert AFTER INSERT ON trades
+WHEN COALESCE(NEW.asset_class, 'STK') = 'STK' AND COALESCE(TRIM(NEW.currency), '') <> '' AND NEW.datetime IS NOT NULL
+BEGIN
+  INSERT INTO cash_ledger(source, source_id, currency, day, datetime, amount)
+  VALUES ('trade', NEW.id, UPPER(TRIM(NEW.currency)), substr(NEW.datetime, 1, 10), NEW.datetime,
+          -(COALESCE(NEW.quantity, 0) * COALESCE(NEW.purchase, 0))
+          - CASE WHEN COALESCE(NEW.commission_currency, '') = '' OR UPPER(NEW.commission_currency) = UPPER(TRIM(NEW.currency))
+                 THEN COALESCE(NEW.commission, 0) ELSE 0 END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cash_ledger_trades_update AFTER UPDATE OF quantity, purchase, datetime, commission, commission_currency, currency, asset_class ON trades
+BEGIN
+  DELETE FROM cash_ledger WHERE source = 'trade' AND source_id = OLD.id;
+  INSERT INTO cash_ledger(source, source_id, currency, day, datetime, amount)
+  SELECT 'trade', NEW.id, UPPER(TRIM(NEW.currency)), substr(NEW.datetime, 1, 10), NEW.datetime,
+         -(COALESCE(NEW.quantity, 0) * COALESCE(NEW.purchase, 0))
+         - CASE WHEN COALESCE(NEW.commission_currency, '') = '' OR UPPER(NEW.commission_currency) = UPPER(TRIM(NEW.currency))
+                THEN COALESCE(NEW.commission, 0) ELSE 0 END
+  WHERE COALESCE(NEW.asset_class, 'STK') = 'STK' AND COALESCE(TRIM(NEW.currency), '') <> '' AND NEW.datetime IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cash_ledger_trades_delete AFTER DELETE ON trades
+BEGIN
+  DELETE FROM cash_ledger WHERE source = 'trade' AND source_id = OLD.id;
+END;
+
+-- Lotes FIFO por ticker (trades STK y OPT). `quantity`/`remaining` llevan signo (>0 largo, <0 corto);
+-- `cost` es `qty * precio * multiplicador` en la divisa del trade y la comisión va aparte en su divisa,
+-- para convertir a cualquier moneda base con el tipo de la fecha de apertura. Cada cierre (total o
+-- parcial) es una fila de lot_closures con su parte del coste y de las comisiones. Se recalculan
+-- desde `refresh_lots` para los tickers marcados en lots_dirty.
+CREATE TABLE IF NOT EXISTS lots (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ticker TEXT NOT NULL,
+  asset_class TEXT NOT NULL,
+  currency TEXT NOT NULL,
+  trade_id INTEGER NOT NULL,
+  day TEXT NOT NULL,
+  datetime TEXT NOT NULL,
+  quantity REAL NOT NULL,
+  remaining REAL NOT NULL,
+  price REAL NOT NULL,
+  multiplier REAL NOT NULL DEFAULT 1,
+  cost REAL NOT NULL,
+  commission REAL NOT NULL DEFAULT 0,
+  commission_currency TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_lots_ticker_datetime ON lots(ticker, datetime, id);
+CREATE INDEX IF NOT EXISTS idx_lots_day ON lots(day);
+CREATE INDEX IF NOT EXISTS idx_lots_open ON lots(ticker, datetime, id) WHERE remaining <> 0;
+
+CREATE TABLE IF NOT EXISTS lot_closures (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  lot_id INTEGER NOT NULL,
+  ticker TEXT NOT NULL,
+  asset_class TEXT NOT NULL,
+  currency TEXT NOT NULL,
+  trade_id INTEGER NOT NULL,
+  open_day TEXT NOT NULL,
+  day TEXT NOT NULL,
+  quantity REAL NOT NULL,
+  cost REAL NOT NULL,
+  open_commission REAL NOT NULL,
+  open_commission_currency TEXT NOT NULL,
+  proceeds REAL NOT NULL,
+  commission REAL NOT NULL,
+  commission_currency TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_lot_closures_day ON lot_closures(day);
+CREATE INDEX IF NOT EXISTS idx_lot_closures_ticker_day ON lot_closures(ticker, day);
+CREATE INDEX IF NOT EXISTS idx_lot_closures_lot_day ON lot_closures(lot_id, day);
+
+-- Último trade aplicado por ticker: un trade posterior sólo extiende los lotes abiertos
+CREATE TABLE IF NOT EXISTS lots_state (
+  ticker TEXT PRIMARY KEY,
+  datetime TEXT NOT NULL
+) WITHOUT ROWID;
+
+-- Tickers pendientes desde la fecha más antigua tocada ('' = rehacer el ticker completo)
+CREATE TABLE IF NOT EXISTS lots_dirty (
+  ticker TEXT PRIMARY KEY,
+  from_datetime TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_lots_dirty_trades_insert AFTER INSERT ON trades
+WHEN NEW.ticker IS NOT NULL AND NEW.datetime IS NOT NULL
+BEGIN
+  DELETE FROM lots_dirty WHERE ticker = NEW.ticker AND from_datetime > NEW.datetime;
+  INSERT INTO lots_dirty(ticker, from_datetime)
+  SELECT NEW.ticker, NEW.datetime
+  WHERE NOT EXISTS (SELECT 1 FROM lots_dirty WHERE ticker = NEW.ticker);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_lots_dirty_trades_update AFTER UPDATE OF ticker, quantity, purchase, datetime, commission, commission_currency, currency, asset_class, raw_json ON trades
+BEGIN
+  INSERT OR REPLACE INTO lots_dirty(ticker, from_datetime)
+  SELECT ticker, '' FROM (SELECT OLD.ticker AS ticker UNION SELECT NEW.ticker) WHERE ticker IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_lots_dirty_trades_delete AFTER DELETE ON trades
+WHEN OLD.ticker IS NOT NULL
+BEGIN
+  INSERT OR REPLACE INTO lots_dirty(ticker, from_datetime) VALUES (OLD.ticker, '');
+END;
+
+-- Secuencia de cambios de las tablas de hechos para sincronización incremental de clientes:
+-- una fila por registro (clave natural) con el último seq y la operación (upsert/delete).
+CREATE TABLE IF NOT EXISTS change_log (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  table_name TEXT NOT NULL,
+  row_key TEXT NOT NULL,
+  op TEXT NOT NULL,
+  UNIQUE(table_name, row_key)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_trades_insert AFTER INSERT ON trades
+BEGIN
+  DELETE FROM change_log WHERE table_name = 'trades' AND row_key = NEW.trade_id;
+  INSERT INTO change_log(table_name, row_key, op) VALUES ('trades', NEW.trade_id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_trades_update AFTER UPDATE ON trades
+BEGIN
+  DELETE FROM change_log WHERE table_name = 'trades' AND row_key IN (OLD.trade_id, NEW.trade_id);
+  INSERT INTO change_log(table_name, row_key, op) SELECT 'trades', OLD.trade_id, 'delete' WHERE OLD.trade_id <> NEW.trade_id;
+  INSERT INTO change_log(table_name, row_key, op) VALUES ('trades', NEW.trade_id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_trades_delete AFTER DELETE ON trades
+BEGIN
+  DELETE FROM change_log WHERE table_name = 'trades' AND row_key = OLD.trade_id;
+  INSERT INTO change_log(table_name, row_key, op) VALUES ('trades', OLD.trade_id, 'delete');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_transfers_insert AFTER INSERT ON transfers
+BEGIN
+  DELETE FROM change_log WHERE table_name = 'transfers' AND row_key = NEW.transaction_id;
+  INSERT INTO change_log(table_name, row_key, op) VALUES ('transfers', NEW.transaction_id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_transfers_update AFTER UPDATE ON transfers
+BEGIN
+  DELETE FROM change_log WHERE table_name = 'transfers' AND row_key IN (OLD.transaction_id, NEW.transaction_id);
+  INSERT INTO change_log(table_name, row_key, op) SELECT 'transfers', OLD.transaction_id, 'delete' WHERE OLD.transaction_id <> NEW.transaction_id;
+  INSERT INTO change_log(table_name, row_key, op) VALUES ('transfers', NEW.transaction_id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_transfers_delete AFTER DELETE ON transfers
+BEGIN
+  DELETE FROM change_log WHERE table_name = 'transfers' AND row_key = OLD.transaction_id;
+  INSERT INTO change_log(table_name, row_key, op) VALUES ('transfers', OLD.transaction_id, 'delete');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_dividends_insert AFTER INSERT ON dividends
+BEGIN
+  DELETE FROM change_log WHERE table_name = 'dividends' AND row_key = NEW.action_id;
+  INSERT INTO change_log(table_name, row_key, op) VALUES ('dividends', NEW.action_id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_dividends_update AFTER UPDATE ON dividends
+BEGIN
+  DELETE FROM change_log WHERE table_name = 'dividends' AND row_key IN (OLD.action_id, NEW.action_id);
+  INSERT INTO change_log(table_name, row_key, op) SELECT 'dividends', OLD.action_id, 'delete' WHERE OLD.action_id <> NEW.action_id;
+  INSERT INTO change_log(table_name, row_key, op) VALUES ('dividends', NEW.action_id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_dividends_delete AFTER DELETE ON dividends
+BEGIN
+  DELETE FROM change_log WHERE table_name = 'dividends' AND row_key = OLD.action_id;
+  INSERT INTO change_log(table_name, row_key, op) VALUES ('dividends', OLD.action_id, 'delete');
+END;
+
+-- Versión de datos por tabla (para ETag/Last-Modified): los triggers la incrementan en cada escritura.
+-- `_epoch` identifica la base concreta para que una base recreada no repita ETags anteriores.
+CREATE TABLE IF NOT EXISTS data_versions (
+  name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0,
+  updated_at TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Tablas con versión de datos; cada escritura (importador, sync, endpoints) incrementa su contador.
+VERSIONED_TABLES = ("trades", "transfers", "dividends", "prices", "fx_rates", "app_config")
+
+SCHEMA += "".join(
+  f"""
+CREATE TRIGGER IF NOT EXISTS trg_data_version_{table}_{event.lower()} AFTER {event} ON {table}
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now') WHERE name = '{table}';
+END;
 """
+  for table in VERSIONED_TABLES
+  for event in ("INSERT", "UPDATE", "DELETE")
+)
+
+
+# Clase de las conexiones de `get_connection`; el backend HTTP la sustituye por una instrumentada
+_connection_factory = sqlite3.Connection
+
+
+def set_connection_factory(factory) -> None:
+  global _connection_factory
+  _connection_factory = factory
 
 
-def get_connection(db_path: str) -> sqlite3.Connection:
-  conn = sqlite3.connect(db_path)
+def get_connection(db_path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+  # check_same_thread=False sólo para conexiones que un único consumidor usa desde varios hilos
+  # en secuencia (respuestas en streaming, cuyos trozos se generan en el threadpool)
+  conn = sqlite3.connect(db_path, check_same_thread=check_same_thread, factory=_connection_factory)
   conn.execute("PRAGMA foreign_keys = ON;")
   conn.execute("PRAGMA journal_mode = WAL;")
   conn.execute("PRAGMA synchronous = NORMAL;")
@@ -124,4 +479,63 @@ def ensure_schema(conn: sqlite3.Connection) -> None:
   );
   """)
   conn.execute("CREATE INDEX IF NOT EXISTS idx_fx_base_quote ON fx_rates(base_currency, quote_currency);")
+  # Índices de una columna sustituidos por (columna, datetime): filtran y además sirven MIN(datetime)
+  # y el orden de los listados sin ordenar en memoria
+  for index in ("idx_trades_ticker", "idx_transfers_currency", "idx_dividends_currency"):
+    conn.execute(f"DROP INDEX IF EXISTS {index}")
+  # Bases previas al almacén columnar: marcar todos los bloques para construirlos en la primera lectura
+  has_columns = conn.execute("SELECT EXISTS(SELECT 1 FROM price_columns)").fetchone()[0]
+  if not has_columns and conn.execute("SELECT EXISTS(SELECT 1 FROM prices)").fetchone()[0]:
+    conn.execute("""
+      INSERT OR IGNORE INTO price_columns_dirty(ticker, year)
+      SELECT DISTINCT ticker, CAST(substr(date, 1, 4) AS INTEGER) FROM prices
+    """)
+  # Bases previas al libro de caja: volcar los movimientos existentes (los saldos se calculan al leer)
+  has_ledger = conn.execute("SELECT EXISTS(SELECT 1 FROM cash_ledger)").fetchone()[0]
+  if not has_ledger:
+    conn.execute("""
+      INSERT INTO cash_ledger(source, source_id, currency, day, datetime, amount, external)
+      SELECT 'transfer', id, UPPER(TRIM(currency)), substr(datetime, 1, 10), datetime, amount,
+             CASE WHEN origin = 'externo' THEN 1 ELSE 0 END
+      FROM transfers
+      UNION ALL
+      SELECT 'dividend', id, UPPER(TRIM(currency)), substr(datetime, 1, 10), datetime, amount, 0
+      FROM dividends
+      UNION ALL
+      SELECT 'trade', id, UPPER(TRIM(currency)), substr(datetime, 1, 10), datetime,
+             -(COALESCE(quantity, 0) * COALESCE(purchase, 0))
+             - CASE WHEN COALESCE(commission_currency, '') = '' OR UPPER(commission_currency) = UPPER(TRIM(currency))
+                    THEN COALESCE(commission, 0) ELSE 0 END,
+             0
+      FROM trades
+      WHERE COALESCE(asset_class, 'STK') = 'STK' AND COALESCE(TRIM(currency), '') <> '' AND datetime IS NOT NULL
+    """)
+  # Bases previas a los lotes: marcar todos los tickers para construirlos en la primera lectura. Una sola
+  # vez: los tickers sin trades de acciones u opciones no dejan lots_state, que no sirve de marca
+  lots_backfilled = conn.execute("SELECT EXISTS(SELECT 1 FROM app_config WHERE key = 'lots_backfilled')").fetchone()[0]
+  if not lots_backfilled:
+    has_lots = conn.execute("SELECT EXISTS(SELECT 1 FROM lots_state) OR EXISTS(SELECT 1 FROM lots_dirty)").fetchone()[0]
+    if not has_lots:
+      conn.execute("""
+        INSERT OR IGNORE INTO lots_dirty(ticker, from_datetime)
+        SELECT DISTINCT ticker, '' FROM trades WHERE ticker IS NOT NULL
+      """)
+    conn.execute("INSERT INTO app_config(key, value) VALUES ('lots_backfilled', '1')")
+  # Bases previas al registro de cambios: registrar todas las filas para que `since=0` las devuelva
+  has_changes = conn.execute("SELECT EXISTS(SELECT 1 FROM change_log)").fetchone()[0]
+  if not has_changes:
+    conn.execute("""
+      INSERT INTO change_log(table_name, row_key, op)
+      SELECT 'trades', trade_id, 'upsert' FROM trades
+      UNION ALL SELECT 'transfers', transaction_id, 'upsert' FROM transfers
+      UNION ALL SELECT 'dividends', action_id, 'upsert' FROM dividends
+    """)
+  # Contadores de versión: una fila por tabla y una época aleatoria por base
+  conn.executemany(
+    "INSERT OR IGNORE INTO data_versions(name, version, updated_at) VALUES (?, 0, strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))",
+    [(table,) for table in VERSIONED_TABLES]
+  )
+  conn.execute(
+    "INSERT OR IGNORE INTO data_versions(name, version, updated_at) VALUES ('_epoch', abs(random() % 1000000000), strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))"
+  )
   conn.commit()
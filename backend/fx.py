@@ -2,25 +2,20 @@ import logging
 from datetime import date, timedelta
 from typing import Dict, Iterable, List, Tuple
 
-import yfinance as yf
+from fx_engine import is_derivable
+from ingest import history_to_rows, upsert_fx_rows
+from providers import yfinance
 
 LOGGER = logging.getLogger(__name__)
 
 
 def _fetch_yahoo_fx_history(symbol: str, start: date, end: date) -> List[Tuple[date, float]]:
   """Descarga histórico diario de FX desde Yahoo Finance para un símbolo tipo EURUSD=X."""
-  hist = yf.download(symbol, start=start, end=end + timedelta(days=1), interval="1d", auto_adjust=False, progress=False)
+  hist = yfinance().download(symbol, start=start, end=end + timedelta(days=1), interval="1d", auto_adjust=False, progress=False)
   if hist is None or hist.empty:
     LOGGER.info("Yahoo devolvió dataset vacío para %s", symbol)
     return []
-  rows: List[Tuple[date, float]] = []
-  for idx, row in hist.iterrows():
-    close = row.get("Close")
-    if close is None:
-      continue
-    d = idx.date() if hasattr(idx, "date") else date.fromisoformat(str(idx))
-    rows.append((d, float(close)))
-  return rows
+  return history_to_rows(hist, "Close", symbol)
 
 
 def _min_date_for_currency(conn, currency: str) -> date:
@@ -40,8 +35,11 @@ def _min_date_for_currency(conn, currency: str) -> date:
   return min(parsed) if parsed else date.today()
 
 
-def sync_fx_for_currencies(conn, base: str, quotes: Iterable[str]) -> Dict[str, int]:
-  """Descarga y guarda FX para las divisas indicadas respecto a base. Devuelve recuento por par."""
+def sync_fx_for_currencies(conn, base: str, quotes: Iterable[str], force: bool = False) -> Dict[str, int]:
+  """
+  Descarga y guarda FX para las divisas indicadas respecto a base. Devuelve recuento por par.
+  Los pares derivables localmente (inverso/cruce al día) se omiten salvo `force=True`.
+  """
   base = (base or "").upper()
   summary: Dict[str, int] = {}
   for quote in set((q or "").upper() for q in quotes):
@@ -49,17 +47,14 @@ def sync_fx_for_currencies(conn, base: str, quotes: Iterable[str]) -> Dict[str,
       continue
     start = _min_date_for_currency(conn, quote)
     today = date.today()
+    if not force and is_derivable(conn, base, quote, start, today):
+      # El par se obtiene por inverso/cruce de tasas ya guardadas: no hace falta descargarlo.
+      LOGGER.info("Par %s/%s derivable localmente; se omite descarga", base, quote)
+      summary[f"{base}/{quote}"] = 0
+      continue
     symbol = f"{base}{quote}=X"
     rows = _fetch_yahoo_fx_history(symbol, start, today)
-    inserted = 0
-    for d, rate in rows:
-      conn.execute(
-        """INSERT INTO fx_rates(base_currency, quote_currency, date, rate)
-           VALUES(?, ?, ?, ?)
-           ON CONFLICT(base_currency, quote_currency, date) DO UPDATE SET rate=excluded.rate""",
-        (base, quote, d.isoformat(), float(rate))
-      )
-      inserted += 1
+    inserted = upsert_fx_rows(conn, base, quote, rows)
     summary[f"{base}/{quote}"] = inserted
   conn.commit()
   return summary
@@ -0,0 +1,113 @@
+"""
+Motor de tipos de cambio derivados a partir de `fx_rates`.
+
+Convención (la misma que usa la conversión a base): `rate(base, quote)` son unidades de `base`
+por unidad de `quote`, de modo que `importe_quote * rate = importe_base`.
+
+Si un par no se ha descargado directamente se deriva (la precedencia se aplica en `fx_matrix`):
+- inverso: `rate(A, B) = 1 / rate(B, A)`
+- cruce por pivote P (USD/EUR): `rate(A, B) = rate(A, P) * rate(P, B)`, donde cada tramo puede ser directo o inverso.
+
+Cada resolución devuelve su procedencia (`identity`, `direct`, `inverse`, `cross:<P>`).
+"""
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+PIVOT_CURRENCIES = ("USD", "EUR")
+FX_IDENTITY = "identity"
+FX_DIRECT = "direct"
+FX_INVERSE = "inverse"
+FX_CROSS = "cross"
+
+# Un par derivado se considera al día si sus tramos tienen datos de los últimos N días.
+FX_STALE_DAYS = 5
+
+
+def resolve_fx_rate(conn, base: str, quote: str, target: date) -> Optional[Tuple[float, str]]:
+  """
+  Devuelve `(rate, procedencia)` vigente en `target` o None si no es derivable.
+  La tasa sale de la matriz FX de `base`, que es donde vive la precedencia directo > inverso > cruce.
+  """
+  if not base or not quote:
+    return None
+  base = base.upper()
+  quote = quote.upper()
+  if base == quote:
+    return 1.0, FX_IDENTITY
+  # Import diferido: fx_matrix importa las constantes de este módulo
+  from fx_matrix import get_fx_matrix, rate_provenance
+  matrix = get_fx_matrix(conn, base)
+  rate = matrix.rate(quote, target)
+  if rate is None:
+    return None
+  # La última fila de la matriz cubre cualquier fecha posterior
+  return rate, rate_provenance(conn, base, quote, min(target, matrix.end))
+
+
+def _stored_bounds(conn, base: str, quote: str) -> Optional[Tuple[str, str]]:
+  cur = conn.execute(
+    "SELECT MIN(date), MAX(date) FROM fx_rates WHERE base_currency = ? AND quote_currency = ?",
+    (base, quote)
+  )
+  row = cur.fetchone()
+  if not row or not row[0]:
+    return None
+  return row[0], row[1]
+
+
+def _leg_bounds(conn, base: str, quote: str) -> Optional[Tuple[str, str, str]]:
+  bounds = _stored_bounds(conn, base, quote)
+  if bounds:
+    return bounds[0], bounds[1], FX_DIRECT
+  bounds = _stored_bounds(conn, quote, base)
+  if bounds:
+    return bounds[0], bounds[1], FX_INVERSE
+  return None
+
+
+def pair_coverage(conn, base: str, quote: str) -> Optional[Dict[str, str]]:
+  """
+  Rango de fechas cubierto por la mejor vía disponible para el par (directa, inversa o cruzada).
+  Devuelve `{'from', 'to', 'provenance'}` o None si no hay forma de derivarlo.
+  """
+  base = (base or "").upper()
+  quote = (quote or "").upper()
+  if not base or not quote:
+    return None
+  if base == quote:
+    return {"from": date.min.isoformat(), "to": date.max.isoformat(), "provenance": FX_IDENTITY}
+  leg = _leg_bounds(conn, base, quote)
+  if leg:
+    return {"from": leg[0], "to": leg[1], "provenance": leg[2]}
+  for pivot in PIVOT_CURRENCIES:
+    if pivot in (base, quote):
+      continue
+    first = _leg_bounds(conn, base, pivot)
+    second = _leg_bounds(conn, pivot, quote) if first else None
+    if not first or not second:
+      continue
+    start = max(first[0], second[0])
+    end = min(first[1], second[1])
+    if start > end:
+      continue
+    return {"from": start, "to": end, "provenance": f"{FX_CROSS}:{pivot}"}
+  return None
+
+
+def is_derivable(conn, base: str, quote: str, start: date, today: Optional[date] = None) -> bool:
+  """True si el par se puede derivar localmente desde `start` hasta hoy (con margen de FX_STALE_DAYS)."""
+  coverage = pair_coverage(conn, base, quote)
+  if not coverage or coverage["provenance"] == FX_DIRECT:
+    return False
+  today = today or date.today()
+  return coverage["from"] <= start.isoformat() and coverage["to"] >= (today - timedelta(days=FX_STALE_DAYS)).isoformat()
+
+
+def coverage_for_base(conn, base: str, currencies: Iterable[str]) -> Dict[str, Optional[Dict[str, str]]]:
+  """Cobertura de cada divisa respecto a `base`; None indica que hace falta sincronizar."""
+  base = (base or "").upper()
+  return {
+    cur: pair_coverage(conn, base, cur)
+    for cur in sorted({(c or "").upper() for c in currencies})
+    if cur and cur != base
+  }
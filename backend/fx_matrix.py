@@ -0,0 +1,350 @@
+"""
+Matriz densa de tipos de cambio por moneda base: array NumPy contiguo (días × divisas) con
+forward-fill sobre fines de semana y festivos, persistido como `.npy` junto a la base de datos
+y abierto con memory-map. El `.json` de cada base apunta al `.npy` vigente, que nunca se reescribe:
+cada persistencia crea uno nuevo, así que los workers de analítica (otros procesos) pueden escribir
+a la vez y un lector nunca junta datos de una versión con metadatos de otra.
+
+Cada columna aplica la precedencia de derivación (directo, inverso, cruce por pivote) resuelta
+una sola vez para todo el rango; `fx_engine.resolve_fx_rate` lee de aquí la tasa y su procedencia,
+así que ésta es la única implementación de esa precedencia. La matriz se reconstruye de
+forma incremental a partir de `fx_rates_log` (fechas tocadas por los triggers de `fx_rates`):
+sólo se recalculan las filas desde la fecha modificada más antigua.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from fx_engine import FX_CROSS, FX_DIRECT, FX_INVERSE, PIVOT_CURRENCIES
+
+LOGGER = logging.getLogger(__name__)
+
+_CACHE: Dict[Tuple[str, str], "FxMatrix"] = {}
+_LOCK = threading.Lock()
+
+
+class FxMatrix:
+  """Tasas `rate(base, quote)` forward-filled por día; `NaN` antes del primer dato disponible."""
+
+  def __init__(self, base: str, start: date, currencies: List[str], data: np.ndarray, seq: int):
+    self.base = base
+    self.start = start
+    self.start_ord = start.toordinal()
+    self.currencies = list(currencies)
+    self.index = {cur: i for i, cur in enumerate(self.currencies)}
+    self.data = data
+    self.seq = seq
+
+  @property
+  def days(self) -> int:
+    return int(self.data.shape[0])
+
+  @property
+  def end(self) -> date:
+    return self.start + timedelta(days=max(self.days - 1, 0))
+
+  def rate(self, quote: str, target: date) -> Optional[float]:
+    """Tasa vigente en `target` (la última fila cubre cualquier fecha posterior)."""
+    quote = (quote or "").upper()
+    if not quote:
+      return None
+    if quote == self.base:
+      return 1.0
+    col = self.index.get(quote)
+    if col is None or not self.days:
+      return None
+    row = target.toordinal() - self.start_ord
+    if row < 0:
+      return None
+    value = self.data[min(row, self.days - 1), col]
+    return None if np.isnan(value) else float(value)
+
+  def rates(self, quote: str, ordinals: np.ndarray) -> np.ndarray:
+    """Versión vectorizada de `rate` para un array de ordinales de fecha (NaN si falta)."""
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    quote = (quote or "").upper()
+    if quote == self.base:
+      return np.ones(len(ordinals), dtype=np.float64)
+    col = self.index.get(quote)
+    out = np.full(len(ordinals), np.nan, dtype=np.float64)
+    if col is None or not self.days:
+      return out
+    rows = ordinals - self.start_ord
+    valid = rows >= 0
+    out[valid] = self.data[np.minimum(rows[valid], self.days - 1), col]
+    return out
+
+
+def _db_file(conn) -> Optional[Path]:
+  for _seq, name, path in conn.execute("PRAGMA database_list").fetchall():
+    if name == "main" and path:
+      return Path(path)
+  return None
+
+
+def _meta_path(db_file: Path, base: str) -> Path:
+  return Path(f"{db_file.with_suffix('')}.fx-{base}.json")
+
+
+def _log_state(conn, since: int = 0) -> Tuple[int, Optional[str]]:
+  """Último `seq` del log y fecha más antigua tocada después de `since`."""
+  row = conn.execute(
+    "SELECT (SELECT MAX(seq) FROM fx_rates_log), (SELECT MIN(date) FROM fx_rates_log WHERE seq > ?)",
+    (since,)
+  ).fetchone()
+  return int(row[0] or 0), row[1]
+
+
+def _currencies(conn, base: str) -> List[str]:
+  cur = conn.execute(
+    "SELECT base_currency FROM fx_rates UNION SELECT quote_currency FROM fx_rates"
+  )
+  return sorted({(row[0] or "").upper() for row in cur.fetchall()} - {"", base})
+
+
+def _bounds(conn) -> Tuple[Optional[date], Optional[date]]:
+  row = conn.execute("SELECT MIN(date), MAX(date) FROM fx_rates").fetchone()
+  if not row or not row[0]:
+    return None, None
+  return date.fromisoformat(str(row[0])[:10]), date.fromisoformat(str(row[1])[:10])
+
+
+def _ffill(values: np.ndarray) -> np.ndarray:
+  """Forward-fill de NaN a lo largo del eje 0 (vectorizado)."""
+  mask = np.isnan(values)
+  idx = np.where(mask, 0, np.arange(len(values)))
+  np.maximum.accumulate(idx, out=idx)
+  # Antes del primer valor válido idx apunta a la posición 0, que sigue siendo NaN
+  return values[idx]
+
+
+def _pair_series(conn, start: date, days: int) -> Dict[Tuple[str, str], np.ndarray]:
+  """Series densas forward-filled de cada par almacenado en [start, start + days)."""
+  start_iso = start.isoformat()
+  series: Dict[Tuple[str, str], np.ndarray] = {}
+  # Semilla: último valor anterior a `start` para continuar el forward-fill en reconstrucciones parciales
+  seeds = conn.execute(
+    """SELECT f.base_currency, f.quote_currency, f.rate
+       FROM fx_rates f
+       JOIN (SELECT base_currency, quote_currency, MAX(date) AS d
+             FROM fx_rates WHERE date < ? GROUP BY base_currency, quote_currency) last
+         ON last.base_currency = f.base_currency AND last.quote_currency = f.quote_currency AND last.d = f.date""",
+    (start_iso,)
+  ).fetchall()
+  for base, quote, rate in seeds:
+    if rate and rate > 0:
+      arr = series.setdefault((base.upper(), quote.upper()), np.full(days, np.nan))
+      arr[0] = float(rate)
+  start_ord = start.toordinal()
+  cur = conn.execute(
+    "SELECT base_currency, quote_currency, date, rate FROM fx_rates WHERE date >= ? AND date < ? AND rate > 0",
+    (start_iso, (start + timedelta(days=days)).isoformat())
+  )
+  for base, quote, day, rate in cur.fetchall():
+    row = date.fromisoformat(str(day)[:10]).toordinal() - start_ord
+    if row < 0 or row >= days:
+      continue
+    arr = series.setdefault((base.upper(), quote.upper()), np.full(days, np.nan))
+    arr[row] = float(rate)
+  return {pair: _ffill(arr) for pair, arr in series.items()}
+
+
+def _leg(
+  pairs: Dict[Tuple[str, str], np.ndarray], base: str, quote: str, days: int,
+  sources: Optional[np.ndarray] = None
+) -> np.ndarray:
+  """Tramo simple: par directo y, en sus huecos, el inverso. `sources` recibe la procedencia por día."""
+  out = np.full(days, np.nan)
+  direct = pairs.get((base, quote))
+  if direct is not None:
+    out = direct.copy()
+    if sources is not None:
+      sources[~np.isnan(out)] = FX_DIRECT
+  inverse = pairs.get((quote, base))
+  if inverse is not None:
+    gap = np.isnan(out)
+    out[gap] = 1.0 / inverse[gap]
+    if sources is not None:
+      sources[gap & ~np.isnan(out)] = FX_INVERSE
+  return out
+
+
+def _compose(
+  pairs: Dict[Tuple[str, str], np.ndarray], base: str, currencies: List[str], days: int,
+  sources: Optional[List[np.ndarray]] = None
+) -> np.ndarray:
+  """
+  Columnas `rate(base, quote)`: tramo simple y, en sus huecos, cruce por cada pivote en orden.
+  Si se pasa `sources`, se le añade por columna la procedencia de cada día ('' si falta).
+  """
+  data = np.full((days, len(currencies)), np.nan, dtype=np.float64)
+  for col, quote in enumerate(currencies):
+    kinds = np.full(days, "", dtype=object) if sources is not None else None
+    values = _leg(pairs, base, quote, days, kinds)
+    for pivot in PIVOT_CURRENCIES:
+      if pivot in (base, quote):
+        continue
+      gap = np.isnan(values)
+      if not gap.any():
+        break
+      cross = _leg(pairs, base, pivot, days) * _leg(pairs, pivot, quote, days)
+      values[gap] = cross[gap]
+      if kinds is not None:
+        kinds[gap & ~np.isnan(cross)] = f"{FX_CROSS}:{pivot}"
+    data[:, col] = values
+    if sources is not None:
+      sources.append(kinds)
+  return data
+
+
+def rate_provenance(conn, base: str, quote: str, target: date) -> Optional[str]:
+  """Procedencia (`direct`, `inverse`, `cross:<P>`) del valor de la matriz en `target`, o None si falta."""
+  sources: List[np.ndarray] = []
+  _compose(_pair_series(conn, target, 1), base.upper(), [quote.upper()], 1, sources)
+  return sources[0][0] or None
+
+
+def _build(conn, base: str, seq: int, today: date) -> FxMatrix:
+  first, last = _bounds(conn)
+  currencies = _currencies(conn, base)
+  if first is None:
+    return FxMatrix(base, today, currencies, np.empty((0, len(currencies))), seq)
+  end = max(last, today)
+  days = (end - first).days + 1
+  data = _compose(_pair_series(conn, first, days), base, currencies, days)
+  return FxMatrix(base, first, currencies, np.ascontiguousarray(data), seq)
+
+
+def _refresh(conn, matrix: FxMatrix, seq: int, changed_from: Optional[str], today: date) -> FxMatrix:
+  """Recalcula sólo las filas desde la fecha modificada más antigua (o todo si cambia la forma)."""
+  first, last = _bounds(conn)
+  currencies = _currencies(conn, matrix.base)
+  if first is None or currencies != matrix.currencies or first < matrix.start or not changed_from:
+    return _build(conn, matrix.base, seq, today)
+  changed = max(date.fromisoformat(str(changed_from)[:10]), matrix.start)
+  end = max(last, today, matrix.end)
+  days = (end - matrix.start).days + 1
+  keep = min((changed - matrix.start).days, matrix.days)
+  tail_days = days - keep
+  data = np.empty((days, len(currencies)), dtype=np.float64)
+  data[:keep] = matrix.data[:keep]
+  tail_start = matrix.start + timedelta(days=keep)
+  data[keep:] = _compose(_pair_series(conn, tail_start, tail_days), matrix.base, currencies, tail_days)
+  return FxMatrix(matrix.base, matrix.start, currencies, data, seq)
+
+
+def _read_meta(meta_path: Path) -> Optional[dict]:
+  try:
+    return json.loads(meta_path.read_text(encoding="utf-8"))
+  except (OSError, ValueError):
+    return None
+
+
+def _load(meta_path: Path, base: str) -> Optional[FxMatrix]:
+  meta = _read_meta(meta_path)
+  if not meta or meta.get("base") != base or not meta.get("data"):
+    return None
+  try:
+    data = np.load(meta_path.with_name(meta["data"]), mmap_mode="r")
+  except (OSError, ValueError):
+    return None
+  if data.shape != (meta.get("days"), len(meta.get("currencies", []))):
+    return None
+  return FxMatrix(base, date.fromisoformat(meta["start"]), meta["currencies"], data, int(meta.get("seq", 0)))
+
+
+def _persist(matrix: FxMatrix, meta_path: Path) -> FxMatrix:
+  """
+  Escribe los datos en un `.npy` de nombre único y publica después el `.json` que lo referencia
+  (`os.replace`, atómico). Devuelve la matriz reabierta en modo memory-map.
+  """
+  fd, data_name = tempfile.mkstemp(dir=meta_path.parent, prefix=f"{meta_path.stem}.", suffix=".npy")
+  data_path = Path(data_name)
+  meta_tmp = None
+  try:
+    with os.fdopen(fd, "wb") as handle:
+      np.save(handle, np.ascontiguousarray(matrix.data, dtype=np.float64))
+    previous = (_read_meta(meta_path) or {}).get("data")
+    meta = {
+      "base": matrix.base, "start": matrix.start.isoformat(), "currencies": matrix.currencies,
+      "seq": matrix.seq, "days": matrix.days, "data": data_path.name
+    }
+    fd, meta_tmp = tempfile.mkstemp(dir=meta_path.parent, prefix=f"{meta_path.name}.", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+      handle.write(json.dumps(meta))
+    os.replace(meta_tmp, meta_path)
+  except BaseException:
+    for path in (data_path, meta_tmp):
+      if path:
+        try:
+          os.unlink(path)
+        except OSError:
+          pass
+    raise
+  if previous and previous != data_path.name:
+    # Quien lo tenga abierto en memory-map sigue leyéndolo; en Windows no se puede borrar y se queda
+    try:
+      meta_path.with_name(previous).unlink()
+    except OSError:
+      pass
+  return FxMatrix(matrix.base, matrix.start, matrix.currencies, np.load(data_path, mmap_mode="r"), matrix.seq)
+
+
+def get_fx_matrix(conn, base: str, today: Optional[date] = None) -> FxMatrix:
+  """
+  Devuelve la matriz FX de `base` al día respecto a `fx_rates`.
+  Coste en caliente: una consulta sobre `fx_rates_log` por llamada; reutilízala dentro de un mismo cálculo.
+  """
+  base = (base or "").upper()
+  today = today or date.today()
+  db_file = _db_file(conn)
+  key = (str(db_file or ":memory:"), base)
+  with _LOCK:
+    matrix = _CACHE.get(key)
+    meta_path = _meta_path(db_file, base) if db_file else None
+    if matrix is None and meta_path:
+      matrix = _load(meta_path, base)
+    if matrix is None:
+      seq, _ = _log_state(conn)
+      matrix = _build(conn, base, seq, today)
+    else:
+      seq, changed_from = _log_state(conn, matrix.seq)
+      if seq < matrix.seq:
+        # El log es más antiguo que la caché (p. ej. base recreada): reconstrucción completa
+        seq, _ = _log_state(conn)
+        matrix = _build(conn, base, seq, today)
+      elif seq > matrix.seq or matrix.end < today:
+        matrix = _refresh(conn, matrix, seq, changed_from or today.isoformat(), today)
+      else:
+        _CACHE[key] = matrix
+        return matrix
+    if meta_path:
+      try:
+        matrix = _persist(matrix, meta_path)
+      except OSError as exc:
+        LOGGER.warning("No se pudo persistir la matriz FX %s: %s", meta_path, exc)
+    _CACHE[key] = matrix
+    return matrix
+
+
+def invalidate_fx_matrices(db_file: Optional[Path] = None) -> None:
+  """Olvida las matrices en memoria (y sus ficheros) de una base concreta o de todas."""
+  with _LOCK:
+    for key in list(_CACHE):
+      if db_file is None or key[0] == str(db_file):
+        del _CACHE[key]
+  if db_file is not None:
+    stem = Path(db_file).with_suffix("")
+    for path in stem.parent.glob(f"{stem.name}.fx-*"):
+      try:
+        path.unlink()
+      except OSError:
+        pass
+
@@ -14,7 +14,12 @@ except ImportError:
   def load_dotenv():
     return False
 
+from cash_ledger import refresh_cash_ledger
 from db import ensure_schema, get_connection
+from lots import refresh_lots
+
+# Nombre fijo (no __name__): como script se ejecuta como __main__ y BACKEND_LOG_LEVELS usa "importer"
+LOGGER = logging.getLogger("importer")
 
 
 def parse_args():
@@ -86,7 +91,7 @@ def iter_inputs(args):
     if payload_path.exists():
       inputs.append(("payload", payload_path))
     else:
-      logging.warning("El payload %s no existe; se omite.", payload_path)
+      LOGGER.warning("El payload %s no existe; se omite.", payload_path)
   for file_path_str in args.files:
     csv_path = Path(file_path_str).expanduser()
     inputs.append(("file", csv_path))
@@ -125,9 +130,8 @@ def is_opt_operation(data: Dict[str, Any]) -> bool:
 def is_dividend_operation(data: Dict[str, Any]) -> bool:
   description = str(data.get("Description") or data.get("descripcion") or "").upper()
   code = str(data.get("Code") or "").upper()
-  logging.info(f"Analizando el Dividendo de: { json.dumps(data,ensure_ascii=False, indent=2)}")
   if ("PO" in code.upper()):
-    logging.info(f"Nuevo Dividendo: {data}")
+    LOGGER.debug("Nuevo Dividendo: %s", data)
     return True
 
   return False
@@ -154,7 +158,7 @@ def is_external_transfer(data: Dict[str, Any]) -> bool:
   """
   description = str(data.get("Description") or data.get("descripcion") or "").upper()
   if "CASH RECEIPTS" in description:
-    logging.info(f"Nueva Transfer externa: {data}")
+    LOGGER.debug("Nueva Transfer externa: %s", data)
     return True
  
   return False
@@ -241,9 +245,9 @@ def process_rows(conn, batch_id: int, rows: list[Tuple[int, Dict[str, Any]]]):
       (batch_id, row_index, json.dumps(data, ensure_ascii=False, default=str))
     )
     total += 1
+    LOGGER.debug("Fila %s del lote %s: %s", row_index, batch_id, data)
 
     if is_external_transfer(data):
-      logging.info(f"Procesndo external Transfer: {json.dumps(data, ensure_ascii=False, default=str, indent=2)}")
       inserted_transfers += process_external_transfer(conn, data)
       continue
 
@@ -268,6 +272,10 @@ def process_rows(conn, batch_id: int, rows: list[Tuple[int, Dict[str, Any]]]):
 
   conn.execute("UPDATE import_batches SET total_rows = ? WHERE id = ?", (total, batch_id))
   conn.commit()
+  # Los triggers ya añadieron los movimientos al libro de caja y marcaron los tickers con trades
+  # nuevos; dejar saldos y lotes calculados
+  refresh_cash_ledger(conn)
+  refresh_lots(conn)
   return inserted_transfers, inserted_trades, inserted_dividends, total
 
 
@@ -445,21 +453,21 @@ def main():
   """Orquesta la importación: logging, DB, inputs y procesamiento por lote."""
   args = parse_args()
   configure_logging_from_args(args)
-  logging.info("importer.py: importando datos")
+  LOGGER.info("importer.py: importando datos")
 
   # Preparar base de datos
   db_path = Path(args.db)
   db_path.parent.mkdir(parents=True, exist_ok=True)
   conn = ensure_db(db_path)
   if args.init_only:
-    logging.info("Inicialización solicitada; esquema asegurado en %s", db_path)
+    LOGGER.info("Inicialización solicitada; esquema asegurado en %s", db_path)
     conn.close()
     return
 
   # Resolver inputs (archivos o payload)
   inputs = iter_inputs(args)
   if not inputs:
-    logging.warning("No se encontraron orígenes válidos para importar.")
+    LOGGER.warning("No se encontraron orígenes válidos para importar.")
     conn.close()
     return
 
@@ -467,21 +475,21 @@ def main():
   kind = str(args.kind or "").strip().lower()
   now_iso = datetime.now(timezone.utc).isoformat()
 
-  logging.info(f"Procesar cada origen y registrar batch: {kind}")
+  LOGGER.info(f"Procesar cada origen y registrar batch: {kind}")
   for source_type, path_obj in inputs:
     if source_type == "file":
       if not path_obj.exists():
-        logging.warning("El archivo %s no existe; se omite.", path_obj)
+        LOGGER.warning("El archivo %s no existe; se omite.", path_obj)
         continue
       iterator = read_rows(path_obj)
     else:
       try:
         data_list = json.loads(path_obj.read_text(encoding="utf-8"))
       except Exception:
-        logging.warning("Payload %s ilegible; se omite.", path_obj)
+        LOGGER.warning("Payload %s ilegible; se omite.", path_obj)
         continue
       if not isinstance(data_list, list):
-        logging.warning("Payload %s no es una lista; se omite.", path_obj)
+        LOGGER.warning("Payload %s no es una lista; se omite.", path_obj)
         continue
       iterator = [(idx, row) for idx, row in enumerate(data_list) if isinstance(row, dict)]
 
@@ -491,13 +499,13 @@ def main():
     # logging.info(f"Ultima: {json.dumps(rows_cache[-1], ensure_ascii=False, indent=2)}")
 
     if not rows_cache:
-      logging.warning("Origen %s sin filas; se omite.", path_obj)
+      LOGGER.warning("Origen %s sin filas; se omite.", path_obj)
       continue
 
-    logging.info("Iniciando importación | kind=%s | origen=%s | filas=%s", kind or args.kind, path_obj, len(rows_cache))
+    LOGGER.info("Iniciando importación | kind=%s | origen=%s | filas=%s", kind or args.kind, path_obj, len(rows_cache))
     batch_id = insert_batch(conn, kind, path_obj, now_iso)
     inserted_transfers, inserted_trades, inserted_dividends, total = process_rows(conn, batch_id, rows_cache)
-    logging.info(
+    LOGGER.info(
       "Importación finalizada | lote=%s | filas=%s | nuevas_transfers=%s | nuevas_trades=%s | nuevas_dividends=%s | archivo=%s",
       batch_id,
       total,
@@ -0,0 +1,86 @@
+"""
+Conversión vectorizada de históricos descargados (DataFrame de yfinance) a filas `(date, close)`
+y escritura en bloque (`executemany`) sobre `prices` y `fx_rates`.
+"""
+import logging
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+
+from price_store import refresh_price_columns
+
+LOGGER = logging.getLogger(__name__)
+
+PRICE_UPSERT_SQL = """INSERT INTO prices (ticker, date, close, provisional)
+   VALUES (?, ?, ?, ?)
+   ON CONFLICT(ticker, date) DO UPDATE SET close=excluded.close, provisional=excluded.provisional"""
+
+FX_UPSERT_SQL = """INSERT INTO fx_rates(base_currency, quote_currency, date, rate)
+   VALUES(?, ?, ?, ?)
+   ON CONFLICT(base_currency, quote_currency, date) DO UPDATE SET rate=excluded.rate"""
+
+
+def _select_field(hist, field: str, symbol: Optional[str]):
+  """
+  Devuelve la columna `field` como Series, tanto para columnas planas como para el
+  MultiIndex (Price, Ticker) que devuelven las versiones recientes de yfinance.
+  """
+  columns = hist.columns
+  if getattr(columns, "nlevels", 1) > 1:
+    level = next((lvl for lvl in range(columns.nlevels) if field in columns.get_level_values(lvl)), None)
+    if level is None:
+      return None
+    block = hist.xs(field, axis=1, level=level)
+    if getattr(block, "ndim", 1) == 1:
+      return block
+    if block.shape[1] == 0:
+      return None
+    if symbol and symbol in block.columns:
+      return block[symbol]
+    return block.iloc[:, 0]
+  if field not in columns:
+    return None
+  return hist[field]
+
+
+def history_to_rows(hist, field: str = "Close", symbol: Optional[str] = None) -> List[Tuple[date, float]]:
+  """Convierte un histórico diario a `[(date, close)]` con operaciones por columna, descartando NaN."""
+  if hist is None or getattr(hist, "empty", True):
+    return []
+  import pandas as pd
+
+  series = _select_field(hist, field, symbol)
+  if series is None:
+    return []
+  series = pd.to_numeric(series, errors="coerce").dropna()
+  if series.empty:
+    return []
+  index = series.index
+  if not isinstance(index, pd.DatetimeIndex):
+    index = pd.to_datetime(index)
+  days = index.date
+  closes = series.to_numpy(dtype="float64")
+  return list(zip(days.tolist(), closes.tolist()))
+
+
+def upsert_price_rows(conn, ticker: str, rows: Iterable[Tuple[date, float]], today: date) -> int:
+  """Inserta/actualiza en bloque los cierres de un ticker en una única transacción."""
+  params = [
+    (ticker, d.isoformat(), float(close), 1 if d >= today else 0)
+    for d, close in rows
+  ]
+  if not params:
+    return 0
+  with conn:
+    conn.executemany(PRICE_UPSERT_SQL, params)
+  refresh_price_columns(conn, ticker)
+  return len(params)
+
+
+def upsert_fx_rows(conn, base: str, quote: str, rows: Iterable[Tuple[date, float]]) -> int:
+  """Inserta/actualiza en bloque las tasas de un par en una única transacción."""
+  params = [(base, quote, d.isoformat(), float(rate)) for d, rate in rows]
+  if not params:
+    return 0
+  with conn:
+    conn.executemany(FX_UPSERT_SQL, params)
+  return len(params)
@@ -1,13 +1,29 @@
 """
 Configuración centralizada de logging para backend (FastAPI, importer, precios).
 Escribe en la ruta indicada por BACKEND_LOG_PATH (env/.env) o backend-fastapi.log.
+
+`configure_root_logging` es el único punto de entrada. Los hilos que registran (peticiones,
+importador) sólo encolan el registro (`QueueHandler`); el formateo y la escritura en fichero los
+hace el hilo de un `QueueListener`. Variables de entorno:
+- BACKEND_LOG_LEVEL: nivel raíz (INFO por defecto).
+- BACKEND_LOG_LEVELS: niveles por módulo, `importer=DEBUG,api.slow_queries=WARNING`.
+- BACKEND_LOG_MAX_CHARS: longitud máxima de un mensaje ya formateado (2000; 0 = sin límite);
+  los payloads grandes se recortan indicando cuántos caracteres se omitieron.
 """
+import atexit
 import logging
 import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+from typing import Dict, Optional
 
 APP_IDENTIFIER = "com.portfolio.desktop"
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+DEFAULT_MAX_CHARS = 2000
+# Librerías de terceros muy verbosas en DEBUG/INFO
+DEFAULT_MODULE_LEVELS = {"yfinance": "WARNING", "urllib3": "WARNING", "peewee": "WARNING"}
 
 def _user_data_dir(appname: str) -> Path:
   try:
@@ -35,25 +51,103 @@ def log_path_from_env() -> Path:
 
 # LOG_PATH se recalcula cada vez que se configure el logging para respetar .env actualizado.
 LOG_PATH = log_path_from_env()
+_LISTENER: Optional[QueueListener] = None
+
+
+class TruncatingFormatter(logging.Formatter):
+  """Formatter que recorta mensajes largos (filas o payloads completos) a `max_chars`."""
+
+  def __init__(self, fmt: str = LOG_FORMAT, max_chars: int = DEFAULT_MAX_CHARS) -> None:
+    super().__init__(fmt)
+    self.max_chars = max_chars
+
+  def formatMessage(self, record: logging.LogRecord) -> str:
+    message = record.message
+    if self.max_chars and len(message) > self.max_chars:
+      record.message = f"{message[:self.max_chars]}… (+{len(message) - self.max_chars} caracteres)"
+    return super().formatMessage(record)
+
+
+class AsyncQueueHandler(QueueHandler):
+  """
+  Encola el registro sin formatearlo: `QueueHandler.prepare` interpola el mensaje en el hilo que
+  registra, pensado para colas entre procesos. Aquí la cola es del mismo proceso y el mensaje se
+  interpola en el listener; sólo la traza de una excepción se renderiza antes, mientras existe.
+  """
+
+  def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+    if record.exc_info and not record.exc_text:
+      record.exc_text = logging.Formatter().formatException(record.exc_info)
+      record.exc_info = None
+    return record
 
 
-def configure_root_logging():
-  global LOG_PATH
+def parse_module_levels(spec: Optional[str]) -> Dict[str, str]:
+  """`importer=DEBUG,prices=WARNING` -> {"importer": "DEBUG", "prices": "WARNING"} (ignora entradas mal formadas)."""
+  levels: Dict[str, str] = {}
+  for item in (spec or "").split(","):
+    name, sep, level = item.partition("=")
+    if sep and name.strip() and level.strip():
+      levels[name.strip()] = level.strip().upper()
+  return levels
+
+
+def configure_root_logging(level: Optional[str] = None, module_levels: Optional[Dict[str, str]] = None, max_chars: Optional[int] = None, force: bool = False) -> Path:
+  """
+  Instala (o reinstala) la tubería asíncrona sobre el logger raíz y devuelve la ruta del fichero.
+  Si otro código ya configuró el logger raíz (pytest, `uvicorn --log-config`) no se toca salvo `force`,
+  que reemplaza sus handlers.
+  """
+  global LOG_PATH, _LISTENER
   LOG_PATH = log_path_from_env()
   LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-  if not logging.getLogger().handlers:
-    logging.basicConfig(
-      level=logging.INFO,
-      format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-      filename=str(LOG_PATH),
-      filemode="a"
-    )
+  root = logging.getLogger()
+  ours = [h for h in root.handlers if isinstance(h, AsyncQueueHandler)]
+  if root.handlers and not ours and not force:
+    return LOG_PATH
+  shutdown_logging()
+  # Como basicConfig(force=True): `force` sustituye todos los handlers del raíz (sin cerrar los ajenos)
+  for handler in list(root.handlers) if force else ours:
+    root.removeHandler(handler)
+
+  if max_chars is None:
+    try:
+      max_chars = int(os.environ.get("BACKEND_LOG_MAX_CHARS", DEFAULT_MAX_CHARS))
+    except ValueError:
+      max_chars = DEFAULT_MAX_CHARS
+  file_handler = logging.FileHandler(LOG_PATH, encoding="utf-8")
+  file_handler.setFormatter(TruncatingFormatter(max_chars=max_chars))
+  records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+  _LISTENER = QueueListener(records, file_handler, respect_handler_level=True)
+  _LISTENER.start()
+  root.addHandler(AsyncQueueHandler(records))
+  root.setLevel((level or os.environ.get("BACKEND_LOG_LEVEL") or "INFO").upper())
+
+  levels = {**DEFAULT_MODULE_LEVELS, **parse_module_levels(os.environ.get("BACKEND_LOG_LEVELS")), **(module_levels or {})}
+  for name, module_level in levels.items():
+    try:
+      logging.getLogger(name).setLevel(module_level.upper())
+    except ValueError:
+      root.warning("Nivel de log inválido para %s: %s", name, module_level)
   return LOG_PATH
 
 
+def shutdown_logging() -> None:
+  """Vacía la cola y detiene el hilo del listener (al salir del proceso o antes de reconfigurar)."""
+  global _LISTENER
+  if _LISTENER is not None:
+    _LISTENER.stop()
+    for handler in _LISTENER.handlers:
+      handler.close()
+    _LISTENER = None
+
+
+atexit.register(shutdown_logging)
+
+
 def get_file_handler():
   path = log_path_from_env()
   path.parent.mkdir(parents=True, exist_ok=True)
   handler = logging.FileHandler(path, encoding="utf-8")
-  handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
+  handler.setFormatter(logging.Formatter(LOG_FORMAT))
   return handler
@@ -0,0 +1,349 @@
+"""
+Motor de lotes FIFO (`lots` y `lot_closures`) sobre los trades STK y OPT (`asset_class` vacío se
+trata como STK, igual que en el libro de caja).
+
+Cada trade abre un lote o cierra, de más antiguo a más reciente, los lotes abiertos de signo
+contrario; lo que sobra abre un lote en el otro sentido (largos y cortos). Las comisiones siempre
+son un coste (valor absoluto) en su `commission_currency` (la del trade si viene vacía) y se
+reparten a prorrata de la cantidad. El multiplicador sale de `Multiplier` en `raw_json` (1 si falta).
+
+Los importes se guardan en la divisa del trade y las comisiones en la suya: la conversión a la
+moneda base se hace al leer con el tipo de la fecha de cada trade (`FxMatrix`), así que cambiar de
+base o sincronizar FX después de importar no obliga a rehacer los lotes.
+
+Mantenimiento incremental como en `cash_ledger`: los triggers de `trades` marcan el ticker en
+`lots_dirty` con la fecha más antigua tocada; si es posterior al último trade aplicado
+(`lots_state`) sólo se procesan los trades nuevos contra los lotes abiertos, y si no se rehace el
+ticker. PnL realizado por rango, ticker o año y lotes abiertos a una fecha son lecturas por índice.
+"""
+from collections import defaultdict, deque
+from datetime import date
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from fx_matrix import FxMatrix
+from price_store import load_price_columns
+
+LOT_ASSET_CLASSES = ("STK", "OPT")
+# Cantidades por debajo de esto se consideran cerradas
+QTY_EPSILON = 1e-9
+
+_LOT_COLUMNS = "id, ticker, asset_class, currency, trade_id, day, datetime, quantity, remaining, price, multiplier, cost, commission, commission_currency"
+
+
+def _open_lot(conn, ticker: str, trade: Dict[str, Any], quantity: float, commission: float) -> Dict[str, Any]:
+  lot = {
+    'ticker': ticker,
+    'asset_class': trade['asset_class'],
+    'currency': trade['currency'],
+    'trade_id': trade['id'],
+    'day': trade['datetime'][:10],
+    'datetime': trade['datetime'],
+    'quantity': quantity,
+    'remaining': quantity,
+    'price': trade['price'],
+    'multiplier': trade['multiplier'],
+    'cost': quantity * trade['price'] * trade['multiplier'],
+    'commission': commission,
+    'commission_currency': trade['commission_currency'],
+  }
+  cur = conn.execute(
+    """INSERT INTO lots(ticker, asset_class, currency, trade_id, day, datetime, quantity, remaining, price, multiplier, cost, commission, commission_currency)
+       VALUES (:ticker, :asset_class, :currency, :trade_id, :day, :datetime, :quantity, :remaining, :price, :multiplier, :cost, :commission, :commission_currency)""",
+    lot
+  )
+  lot['id'] = cur.lastrowid
+  return lot
+
+
+def _apply_trade(conn, ticker: str, open_lots: Deque[Dict[str, Any]], trade: Dict[str, Any], touched: Dict[int, Dict[str, Any]]) -> None:
+  """Cierra FIFO contra los lotes de signo contrario y abre un lote con el resto."""
+  quantity = trade['quantity']
+  left = quantity
+  closures = []
+  while open_lots and abs(left) > QTY_EPSILON and (open_lots[0]['remaining'] > 0) != (left > 0):
+    lot = open_lots[0]
+    # Parte del lote que se cierra, con el signo del lote
+    closed = -left if abs(left) < abs(lot['remaining']) else lot['remaining']
+    share = closed / lot['quantity']
+    closures.append((
+      lot['id'], ticker, lot['asset_class'], lot['currency'], trade['id'], lot['day'], trade['datetime'][:10],
+      closed, lot['cost'] * share, lot['commission'] * share, lot['commission_currency'],
+      closed * trade['price'] * lot['multiplier'], trade['commission'] * abs(closed / quantity), trade['commission_currency']
+    ))
+    lot['remaining'] -= closed
+    left += closed
+    touched[lot['id']] = lot
+    if abs(lot['remaining']) <= QTY_EPSILON:
+      lot['remaining'] = 0.0
+      open_lots.popleft()
+  if closures:
+    conn.executemany(
+      """INSERT INTO lot_closures(lot_id, ticker, asset_class, currency, trade_id, open_day, day, quantity, cost,
+                                  open_commission, open_commission_currency, proceeds, commission, commission_currency)
+         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+      closures
+    )
+  if abs(left) > QTY_EPSILON:
+    open_lots.append(_open_lot(conn, ticker, trade, left, trade['commission'] * abs(left / quantity)))
+
+
+def _ticker_trades(conn, ticker: str, after: str) -> Iterable[Dict[str, Any]]:
+  cur = conn.execute(
+    """SELECT id, quantity, purchase, datetime, commission, commission_currency, currency, asset_class,
+              json_extract(raw_json, '$.Multiplier')
+       FROM trades WHERE ticker = ? AND datetime > ?
+       ORDER BY datetime, id""",
+    (ticker, after)
+  )
+  for trade_id, qty, price, dt, commission, comm_currency, currency, asset_class, multiplier in cur.fetchall():
+    asset_class = (asset_class or 'STK').upper()
+    currency = (currency or '').strip().upper()
+    if asset_class not in LOT_ASSET_CLASSES or not currency or not qty:
+      continue
+    try:
+      multiplier = float(multiplier) if multiplier not in (None, '') else 1.0
+    except (TypeError, ValueError):
+      multiplier = 1.0
+    yield {
+      'id': trade_id,
+      'quantity': float(qty),
+      'price': float(price or 0.0),
+      'datetime': dt,
+      'commission': abs(float(commission or 0.0)),
+      'commission_currency': (comm_currency or '').strip().upper() or currency,
+      'currency': currency,
+      'asset_class': asset_class,
+      'multiplier': multiplier or 1.0,
+    }
+
+
+def _refresh_ticker(conn, ticker: str, from_datetime: str) -> None:
+  row = conn.execute("SELECT datetime FROM lots_state WHERE ticker = ?", (ticker,)).fetchone()
+  last = row[0] if row else None
+  if last is not None and from_datetime > last:
+    # Sólo trades posteriores al último aplicado: continuar desde los lotes abiertos
+    open_lots = deque(
+      dict(zip(_LOT_COLUMNS.split(', '), values))
+      for values in conn.execute(
+        f"SELECT {_LOT_COLUMNS} FROM lots WHERE ticker = ? AND remaining <> 0 ORDER BY datetime, id",
+        (ticker,)
+      ).fetchall()
+    )
+    after = last
+  else:
+    conn.execute("DELETE FROM lot_closures WHERE ticker = ?", (ticker,))
+    conn.execute("DELETE FROM lots WHERE ticker = ?", (ticker,))
+    open_lots = deque()
+    after = ''
+    last = None
+  touched: Dict[int, Dict[str, Any]] = {}
+  for trade in _ticker_trades(conn, ticker, after):
+    _apply_trade(conn, ticker, open_lots, trade, touched)
+    last = trade['datetime']
+  conn.executemany("UPDATE lots SET remaining = ? WHERE id = ?", [(lot['remaining'], lot_id) for lot_id, lot in touched.items()])
+  if last is None:
+    conn.execute("DELETE FROM lots_state WHERE ticker = ?", (ticker,))
+  else:
+    conn.execute(
+      "INSERT INTO lots_state(ticker, datetime) VALUES (?, ?) ON CONFLICT(ticker) DO UPDATE SET datetime = excluded.datetime",
+      (ticker, last)
+    )
+
+
+def _has_dirty(conn) -> bool:
+  return bool(conn.execute("SELECT EXISTS(SELECT 1 FROM lots_dirty)").fetchone()[0])
+
+
+def refresh_lots(conn) -> int:
+  """Aplica los trades pendientes de los tickers marcados. Devuelve cuántos tickers se tocaron."""
+  if not _has_dirty(conn):
+    return 0
+  # El lock de escritura se toma antes de leer las marcas, el estado y los lotes abiertos: otro
+  # refresco que terminase entre la lectura y la escritura haría aplicar dos veces los mismos trades
+  owns_transaction = not conn.in_transaction
+  if owns_transaction:
+    conn.execute("BEGIN IMMEDIATE")
+  try:
+    dirty = conn.execute("SELECT ticker, from_datetime FROM lots_dirty").fetchall()
+    for ticker, from_datetime in dirty:
+      _refresh_ticker(conn, ticker, from_datetime)
+    conn.executemany("DELETE FROM lots_dirty WHERE ticker = ? AND from_datetime = ?", dirty)
+  except BaseException:
+    if owns_transaction:
+      conn.rollback()
+    raise
+  if owns_transaction:
+    conn.commit()
+  return len(dirty)
+
+
+def _ordinals(days: Iterable[str]) -> np.ndarray:
+  return np.fromiter((date.fromisoformat(d).toordinal() for d in days), dtype=np.int64)
+
+
+def _to_base(fx_matrix: FxMatrix, amounts: np.ndarray, currencies: List[str], ordinals: np.ndarray, missing_fx: set) -> np.ndarray:
+  """`amounts` en su divisa convertidos con el tipo de su fecha (NaN y divisa anotada si falta)."""
+  out = np.full(len(amounts), np.nan)
+  groups: Dict[str, List[int]] = defaultdict(list)
+  for i, currency in enumerate(currencies):
+    groups[currency].append(i)
+  for currency, idx in groups.items():
+    idx = np.asarray(idx)
+    rates = fx_matrix.rates(currency, ordinals[idx])
+    out[idx] = amounts[idx] * rates
+    if np.isnan(rates).any():
+      missing_fx.add(currency)
+  return out
+
+
+def _round(value: float) -> Optional[float]:
+  return None if np.isnan(value) else round(float(value), 4)
+
+
+def realized_pnl(conn, fx_matrix: FxMatrix, from_day: Optional[str] = None, to_day: Optional[str] = None, ticker: Optional[str] = None) -> Dict[str, Any]:
+  """
+  PnL realizado de los cierres con fecha en `[from_day, to_day]`, en la base de `fx_matrix`:
+  producto de la venta (tipo del cierre) menos coste del lote (tipo de la apertura) menos comisiones
+  de ambos lados. Totales, por ticker y por año; los cierres sin tipo de cambio no suman.
+  """
+  refresh_lots(conn)
+  where = ["day >= ?", "day <= ?"]
+  params: List[Any] = [from_day or '', to_day or '9999-12-31']
+  if ticker:
+    where.insert(0, "ticker = ?")
+    params.insert(0, ticker)
+  rows = conn.execute(
+    f"""SELECT ticker, asset_class, currency, open_day, day, quantity, cost, open_commission, open_commission_currency,
+               proceeds, commission, commission_currency
+        FROM lot_closures WHERE {' AND '.join(where)}
+        ORDER BY day, id""",
+    params
+  ).fetchall()
+  missing_fx: set = set()
+  by_ticker: Dict[str, Dict[str, Any]] = {}
+  by_year: Dict[str, float] = defaultdict(float)
+  total = {'cost_base': 0.0, 'proceeds_base': 0.0, 'commission_base': 0.0, 'realized_base': 0.0, 'closures': 0}
+  if rows:
+    columns = list(zip(*rows))
+    open_ords = _ordinals(columns[3])
+    close_ords = _ordinals(columns[4])
+    cost = _to_base(fx_matrix, np.asarray(columns[6], dtype=np.float64), list(columns[2]), open_ords, missing_fx)
+    open_comm = _to_base(fx_matrix, np.asarray(columns[7], dtype=np.float64), list(columns[8]), open_ords, missing_fx)
+    proceeds = _to_base(fx_matrix, np.asarray(columns[9], dtype=np.float64), list(columns[2]), close_ords, missing_fx)
+    close_comm = _to_base(fx_matrix, np.asarray(columns[10], dtype=np.float64), list(columns[11]), close_ords, missing_fx)
+    commission = open_comm + close_comm
+    realized = proceeds - cost - commission
+    for i, (row_ticker, asset_class, currency, _open_day, day, quantity) in enumerate(zip(*columns[:6])):
+      entry = by_ticker.setdefault(row_ticker, {
+        'ticker': row_ticker, 'asset_class': asset_class, 'currency': currency, 'quantity': 0.0,
+        'cost_base': 0.0, 'proceeds_base': 0.0, 'commission_base': 0.0, 'realized_base': 0.0, 'closures': 0
+      })
+      entry['quantity'] += quantity
+      if np.isnan(realized[i]):
+        continue
+      for target in (entry, total):
+        target['cost_base'] += cost[i]
+        target['proceeds_base'] += proceeds[i]
+        target['commission_base'] += commission[i]
+        target['realized_base'] += realized[i]
+        target['closures'] += 1
+      by_year[day[:4]] += realized[i]
+  for target in (total, *by_ticker.values()):
+    for key in ('cost_base', 'proceeds_base', 'commission_base', 'realized_base'):
+      target[key] = round(target[key], 4)
+  return {
+    **total,
+    'by_ticker': sorted(by_ticker.values(), key=lambda entry: entry['ticker']),
+    'by_year': [{'year': int(year), 'realized_base': round(value, 4)} for year, value in sorted(by_year.items())],
+    'missing_fx': sorted(missing_fx),
+  }
+
+
+def open_lots(conn, as_of: Optional[str] = None, ticker: Optional[str] = None) -> List[Dict[str, Any]]:
+  """
+  Lotes abiertos con su cantidad pendiente. Sin `as_of` se leen del índice parcial de lotes abiertos;
+  con fecha, los abiertos hasta ese día menos sus cierres hasta ese día.
+  """
+  refresh_lots(conn)
+  columns = _LOT_COLUMNS.split(', ')
+  ticker_filter = "ticker = ? AND " if ticker else ""
+  ticker_params = [ticker] if ticker else []
+  if as_of is None:
+    rows = conn.execute(
+      f"SELECT {_LOT_COLUMNS} FROM lots WHERE {ticker_filter}remaining <> 0 ORDER BY ticker, datetime, id",
+      ticker_params
+    ).fetchall()
+  else:
+    # Cierres hasta la fecha agregados una vez por lote (no una subconsulta por cada lote)
+    rows = conn.execute(
+      f"""SELECT {', '.join('l.' + c for c in columns[:-6])}, l.quantity - COALESCE(c.quantity, 0),
+                 {', '.join('l.' + c for c in columns[-5:])}
+          FROM lots l LEFT JOIN (
+            SELECT lot_id, SUM(quantity) AS quantity FROM lot_closures WHERE {ticker_filter}day <= ? GROUP BY lot_id
+          ) c ON c.lot_id = l.id
+          WHERE {ticker_filter.replace('ticker', 'l.ticker')}l.day <= ?""",
+      [*ticker_params, as_of, *ticker_params, as_of]
+    ).fetchall()
+    # Orden en memoria: así el rango por `day` usa su índice
+    rows.sort(key=lambda row: (row[1], row[6], row[0]))
+  lots = [dict(zip(columns, row)) for row in rows]
+  return [lot for lot in lots if abs(lot['remaining']) > QTY_EPSILON]
+
+
+def unrealized_pnl(conn, fx_matrix: FxMatrix, as_of: Optional[str] = None, ticker: Optional[str] = None) -> Dict[str, Any]:
+  """
+  PnL no realizado por ticker a `as_of` (hoy si falta): valor de mercado con el último cierre y el
+  tipo de esa fecha menos el coste pendiente de los lotes abiertos (tipo de la apertura, comisión
+  incluida). Las opciones no se valoran (docs/metrics.md): se devuelve su coste y valor null.
+  """
+  lots = open_lots(conn, as_of, ticker)
+  target = date.fromisoformat(as_of) if as_of else date.today()
+  missing_fx: set = set()
+  missing_prices: List[str] = []
+  positions: Dict[str, Dict[str, Any]] = {}
+  if lots:
+    share = np.asarray([lot['remaining'] / lot['quantity'] for lot in lots])
+    ords = _ordinals(lot['day'] for lot in lots)
+    cost = _to_base(fx_matrix, np.asarray([lot['cost'] for lot in lots]) * share, [lot['currency'] for lot in lots], ords, missing_fx)
+    cost += _to_base(fx_matrix, np.asarray([lot['commission'] for lot in lots]) * share, [lot['commission_currency'] for lot in lots], ords, missing_fx)
+    for lot, lot_cost in zip(lots, cost.tolist()):
+      entry = positions.setdefault(lot['ticker'], {
+        'ticker': lot['ticker'], 'asset_class': lot['asset_class'], 'currency': lot['currency'],
+        'quantity': 0.0, 'multiplier': lot['multiplier'], 'lots': 0, 'cost_base': 0.0
+      })
+      entry['quantity'] += lot['remaining']
+      entry['lots'] += 1
+      entry['cost_base'] += lot_cost
+  total = {'cost_base': 0.0, 'market_value_base': 0.0, 'unrealized_base': 0.0}
+  for entry in positions.values():
+    entry.update({'price': None, 'price_date': None, 'market_value_base': None, 'unrealized_base': None})
+    if entry['asset_class'] == 'OPT':
+      entry['cost_base'] = _round(entry['cost_base'])
+      continue
+    days, closes = load_price_columns(conn, entry['ticker'])
+    idx = int(np.searchsorted(days, target.toordinal(), side='right')) - 1
+    rate = fx_matrix.rate(entry['currency'], target)
+    if idx < 0:
+      missing_prices.append(entry['ticker'])
+    elif rate is None:
+      missing_fx.add(entry['currency'])
+    else:
+      entry['price'] = float(closes[idx])
+      entry['price_date'] = date.fromordinal(int(days[idx])).isoformat()
+      entry['market_value_base'] = entry['quantity'] * entry['price'] * entry['multiplier'] * rate
+      entry['unrealized_base'] = entry['market_value_base'] - entry['cost_base']
+      if not np.isnan(entry['unrealized_base']):
+        for key in total:
+          total[key] += entry[key]
+    for key in ('cost_base', 'market_value_base', 'unrealized_base'):
+      if entry[key] is not None:
+        entry[key] = _round(entry[key])
+  return {
+    'as_of': target.isoformat(),
+    **{key: round(value, 4) for key, value in total.items()},
+    'positions': sorted(positions.values(), key=lambda entry: entry['ticker']),
+    'missing_fx': sorted(missing_fx),
+    'missing_prices': sorted(missing_prices),
+  }
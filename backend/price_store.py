@@ -0,0 +1,81 @@
+"""
+Almacén columnar de precios sobre SQLite: por cada (ticker, año) un BLOB con ordinales de fecha
+(`int32`, `date.toordinal()`) y otro con cierres (`float64`), ordenados por fecha.
+
+`prices` sigue siendo la fuente de verdad; los triggers marcan en `price_columns_dirty` los
+bloques afectados y se recalculan al sincronizar precios o, de forma perezosa, en la primera
+lectura. La lectura devuelve vistas NumPy sobre los BLOB (`np.frombuffer`) sin decodificar filas.
+"""
+from datetime import date
+from typing import Optional, Tuple
+
+import numpy as np
+
+DAY_DTYPE = np.dtype("<i4")
+CLOSE_DTYPE = np.dtype("<f8")
+
+_EMPTY_DAYS = np.empty(0, dtype=DAY_DTYPE)
+_EMPTY_CLOSES = np.empty(0, dtype=CLOSE_DTYPE)
+
+
+def _rebuild_block(conn, ticker: str, year: int) -> None:
+  rows = conn.execute(
+    "SELECT date, close FROM prices WHERE ticker = ? AND date >= ? AND date < ? ORDER BY date ASC",
+    (ticker, f"{year:04d}", f"{year + 1:04d}")
+  ).fetchall()
+  days = []
+  closes = []
+  for day, close in rows:
+    try:
+      days.append(date.fromisoformat(str(day)[:10]).toordinal())
+    except ValueError:
+      continue
+    closes.append(float(close))
+  if not days:
+    conn.execute("DELETE FROM price_columns WHERE ticker = ? AND year = ?", (ticker, year))
+    return
+  conn.execute(
+    """INSERT INTO price_columns(ticker, year, days, closes) VALUES (?, ?, ?, ?)
+       ON CONFLICT(ticker, year) DO UPDATE SET days=excluded.days, closes=excluded.closes""",
+    (
+      ticker,
+      year,
+      np.asarray(days, dtype=DAY_DTYPE).tobytes(),
+      np.asarray(closes, dtype=CLOSE_DTYPE).tobytes()
+    )
+  )
+
+
+def refresh_price_columns(conn, ticker: Optional[str] = None) -> int:
+  """Recalcula los bloques pendientes (de un ticker o de todos). Devuelve cuántos se reescribieron."""
+  if ticker is None:
+    dirty = conn.execute("SELECT ticker, year FROM price_columns_dirty").fetchall()
+  else:
+    dirty = conn.execute("SELECT ticker, year FROM price_columns_dirty WHERE ticker = ?", (ticker,)).fetchall()
+  if not dirty:
+    return 0
+  with conn:
+    for block_ticker, year in dirty:
+      _rebuild_block(conn, block_ticker, int(year))
+    conn.executemany("DELETE FROM price_columns_dirty WHERE ticker = ? AND year = ?", dirty)
+  return len(dirty)
+
+
+def load_price_columns(conn, ticker: str) -> Tuple[np.ndarray, np.ndarray]:
+  """
+  Devuelve `(days, closes)` del ticker ordenados por fecha. Con un único bloque anual son vistas
+  directas sobre el BLOB; con varios se concatenan en un solo array contiguo.
+  """
+  refresh_price_columns(conn, ticker)
+  blocks = conn.execute(
+    "SELECT days, closes FROM price_columns WHERE ticker = ? ORDER BY year ASC",
+    (ticker,)
+  ).fetchall()
+  if not blocks:
+    return _EMPTY_DAYS, _EMPTY_CLOSES
+  days = [np.frombuffer(block[0], dtype=DAY_DTYPE) for block in blocks]
+  closes = [np.frombuffer(block[1], dtype=CLOSE_DTYPE) for block in blocks]
+  if len(blocks) == 1:
+    return days[0], closes[0]
+  return np.concatenate(days), np.concatenate(closes)
+
@@ -1,20 +1,13 @@
 import logging
-from pathlib import Path
 import time as pytime
 from datetime import date, datetime, time as dt_time, timedelta, timezone
 from typing import Dict, List, Tuple
 
-import yfinance as yf
+from ingest import history_to_rows, upsert_price_rows
+from providers import yfinance
 
 RATE_LIMIT_SECONDS = 1.5
 LOGGER = logging.getLogger(__name__)
-if not LOGGER.handlers:
-  log_path = Path(__file__).resolve().parent / "backend-fastapi.log"
-  log_path.parent.mkdir(parents=True, exist_ok=True)
-  handler = logging.FileHandler(log_path, encoding="utf-8")
-  handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
-  LOGGER.addHandler(handler)
-LOGGER.propagate = False
 
 def _normalize_ticker(value: str) -> str:
   return str(value or '').strip().upper()
@@ -66,7 +59,7 @@ def _fetch_yahoo_history(symbol: str, start_date: date, end_date: date) -> List[
     hist = None
     while attempt < max_attempts:
       try:
-        hist = yf.download(alias, start=start_date, end=end_date + timedelta(days=1), interval="1d", auto_adjust=False, progress=False)
+        hist = yfinance().download(alias, start=start_date, end=end_date + timedelta(days=1), interval="1d", auto_adjust=False, progress=False)
         break
       except Exception as exc:
         attempt += 1
@@ -77,13 +70,7 @@ def _fetch_yahoo_history(symbol: str, start_date: date, end_date: date) -> List[
     if hist.empty:
       LOGGER.info("Yahoo devolvió dataset vacío para %s", alias)
       continue
-    rows.clear()
-    for idx, row in hist.iterrows():
-      close = row.get("Close")
-      if close is None:
-        continue
-      d = idx.date() if hasattr(idx, "date") else date.fromisoformat(str(idx))
-      rows.append((d, float(close)))
+    rows = history_to_rows(hist, "Close", alias)
     if rows:
       LOGGER.info("Descargados %s registros para %s (alias %s)", len(rows), symbol, alias)
       return list(rows)
@@ -116,21 +103,12 @@ def _sync_single_ticker(conn, ticker: str) -> int:
     return 0
   if fetch_from > start:
     fetch_from = max(start, fetch_from - timedelta(days=3))
-  inserted = 0
   LOGGER.info("Sincronizando precios para %s desde %s hasta %s", ticker, fetch_from.isoformat(), today.isoformat())
   rows = _fetch_yahoo_history(ticker, fetch_from, today)
   if not rows:
     LOGGER.warning("No se encontraron precios recientes para %s; se omite actualización.", ticker)
     return 0
-  for d, close in rows:
-    provisional_flag = 1 if d >= today else 0
-    conn.execute(
-      """INSERT INTO prices (ticker, date, close, provisional)
-         VALUES (?, ?, ?, ?)
-         ON CONFLICT(ticker, date) DO UPDATE SET close=excluded.close, provisional=excluded.provisional""",
-      (ticker, d.isoformat(), close, provisional_flag)
-    )
-    inserted += 1
+  inserted = upsert_price_rows(conn, ticker, rows, today)
   LOGGER.info("Ticker %s sincronizado: %s registros (último=%s, provisional=%s)", ticker, inserted, rows[-1][0] if rows else "n/a", bool(rows and rows[-1][0] >= today))
   return inserted
 
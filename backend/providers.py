@@ -0,0 +1,49 @@
+"""
+Carga diferida de los proveedores de datos de mercado.
+
+`yfinance` arrastra pandas, requests y lxml (varios cientos de ms de importación) y sólo lo usan las
+sincronizaciones de precios y FX. Se importa en la primera llamada a `yfinance()` para que el
+backend responda antes a `/health`, que es lo que la app de escritorio percibe como arranque;
+`start_warmup` lo importa en un hilo de fondo cuando el servidor ya atiende peticiones.
+"""
+import logging
+import os
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+_warmup_lock = threading.Lock()
+_warmup_thread = None
+
+
+def yfinance():
+  """Módulo `yfinance`, importado en la primera llamada (después sale de `sys.modules`)."""
+  import yfinance as yf
+  return yf
+
+
+def _warm_up() -> None:
+  start = time.perf_counter()
+  try:
+    yfinance()
+  except Exception:  # sin proveedor la app sigue funcionando; la sincronización fallará al usarlo
+    LOGGER.exception("No se pudo precargar yfinance")
+    return
+  LOGGER.info("Proveedores de mercado precargados en %.0f ms", (time.perf_counter() - start) * 1000)
+
+
+def start_warmup() -> bool:
+  """
+  Lanza (una sola vez por proceso) la precarga de los proveedores en un hilo daemon.
+  Devuelve True si la ha lanzado esta llamada. `PORTFOLIO_WARMUP=0` la desactiva.
+  """
+  global _warmup_thread
+  if os.environ.get("PORTFOLIO_WARMUP", "1") == "0":
+    return False
+  with _warmup_lock:
+    if _warmup_thread is not None:
+      return False
+    _warmup_thread = threading.Thread(target=_warm_up, name="providers-warmup", daemon=True)
+    _warmup_thread.start()
+  return True
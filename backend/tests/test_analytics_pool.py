@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api import analytics_pool  # noqa: E402
+from api.analytics_pool import AnalyticsCancelled, AnalyticsExecutor, run_cancellable  # noqa: E402
+from api.main import ensure_db_ready, get_connection  # noqa: E402
+
+TICKERS = [f"T{n:02d}" for n in range(6)]
+DAYS = [date(2024, 1, 1) + timedelta(days=n) for n in range(40)]
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    conn = get_connection(db_path)
+    with conn:
+      conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES('D1','USD','2024-01-01',10000,'externo','deposito')")
+      for n, ticker in enumerate(TICKERS):
+        currency = "EUR" if n % 2 else "USD"
+        conn.execute(
+          "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class) VALUES(?,?,?,?,?,?,?)",
+          (f"TR{n}", ticker, 1 + n, 10.0, DAYS[n].isoformat(), currency, "STK")
+        )
+        # El último ticker no tiene precios: debe aparecer en los faltantes en ambos modos
+        if ticker != TICKERS[-1]:
+          conn.executemany(
+            "INSERT INTO prices(ticker, date, close) VALUES(?,?,?)",
+            [(ticker, d.isoformat(), 10.0 + n + i * 0.1) for i, d in enumerate(DAYS)]
+          )
+      # EUR sin tipo los primeros días: faltantes FX repartidos entre workers
+      conn.executemany(
+        "INSERT INTO fx_rates(base_currency, quote_currency, date, rate) VALUES('USD','EUR',?,?)",
+        [(d.isoformat(), 0.9) for d in DAYS[5:]]
+      )
+    conn.close()
+    yield db_path
+
+
+def test_pool_series_matches_inline_and_spreads_tickers(temp_db, monkeypatch):
+  """
+  Cobertura: REQ-BK-0006
+  La serie calculada en workers (valoración repartida por tickers) coincide con la calculada en el hilo, faltantes incluidos.
+  """
+  monkeypatch.setattr(analytics_pool, "PARALLEL_MIN_TICKERS", 2)
+  meta = {'base_currency': 'USD', 'interval': 'day', 'from': None, 'to': None}
+  options = {'from_d': None, 'to_d': None, 'missing': 'ranges', 'format': 'rows', 'dates': 'iso'}
+  inline = AnalyticsExecutor(workers=0).value_series(temp_db, meta, options)
+  pool = AnalyticsExecutor(workers=2)
+  try:
+    first = pool.value_series(temp_db, meta, options)
+    # Segunda llamada con los workers en caliente (misma versión de datos)
+    second = pool.value_series(temp_db, meta, options)
+  finally:
+    pool.shutdown()
+
+  for result in (first, second):
+    assert [p["date"] for p in result["series"]] == [p["date"] for p in inline["series"]]
+    assert [p["value_base"] for p in result["series"]] == pytest.approx([p["value_base"] for p in inline["series"]])
+    assert result["missing_fx"] == inline["missing_fx"] and inline["missing_fx"]
+    assert result["missing_prices"] == inline["missing_prices"] == [{"ticker": TICKERS[-1], "from": "2024-01-06", "to": "2024-01-06", "count": 1}]
+  stats = pool.stats()
+  # Dos tramos de tickers + el ensamblado, en cada una de las dos llamadas
+  assert stats["tasks"] == 6 and stats["completed"] == 2 and stats["running"] == 0
+
+
+def test_concurrency_cap_queues_rejects_and_cancels(temp_db):
+  """
+  Cobertura: REQ-BK-0020
+  Por encima del límite las peticiones esperan en cola (visible en stats), con la cola llena se responde 503 y una en cola se puede cancelar.
+  """
+  executor = AnalyticsExecutor(workers=0, max_concurrent=1, max_queue=1)
+  release = threading.Event()
+
+  def hold():
+    with executor.slot():
+      release.wait(5)
+
+  holder = threading.Thread(target=hold)
+  holder.start()
+  cancel = threading.Event()
+  outcome = {}
+
+  def queued():
+    try:
+      with executor.slot(cancel):
+        outcome["ran"] = True
+    except AnalyticsCancelled:
+      outcome["cancelled"] = True
+
+  waiter = threading.Thread(target=queued)
+  waiter.start()
+  deadline = time.monotonic() + 5
+  while executor.stats()["queued"] < 1 and time.monotonic() < deadline:
+    time.sleep(0.01)
+  assert executor.stats()["running"] == 1 and executor.stats()["queued"] == 1
+
+  with pytest.raises(HTTPException) as exc:
+    with executor.slot():
+      pass
+  assert exc.value.status_code == 503
+
+  cancel.set()
+  waiter.join(5)
+  release.set()
+  holder.join(5)
+  assert outcome == {"cancelled": True}
+  stats = executor.stats()
+  assert (stats["queued"], stats["running"]) == (0, 0)
+  assert (stats["completed"], stats["cancelled"], stats["rejected"]) == (1, 1, 1)
+
+
+def test_disconnected_client_cancels_and_gets_499():
+  """
+  Cobertura: REQ-BK-0020
+  Si el cliente se desconecta se marca la cancelación del cálculo en curso y se responde 499.
+  """
+  class DisconnectedRequest:
+    class url:
+      path = "/portfolio/value/series"
+
+    async def is_disconnected(self):
+      return True
+
+  def work(cancel):
+    assert cancel.wait(5)
+    raise AnalyticsCancelled()
+
+  response = asyncio.run(run_cancellable(DisconnectedRequest(), work))
+  assert response.status_code == 499
@@ -0,0 +1,115 @@
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api import main as api_main  # noqa: E402
+from api.main import app, ensure_db_ready, get_connection  # noqa: E402
+
+DAYS = [date(2024, 1, 1) + timedelta(days=n) for n in range(19)]
+OPTION = "AAA 240119C100"
+
+
+def _close(base, step, d):
+  return base + step * DAYS.index(d)
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    conn = get_connection(db_path)
+    with conn:
+      conn.execute("INSERT INTO app_config(key, value) VALUES('base_currency', 'USD')")
+      conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES('D1','USD','2024-01-01',10000,'externo','deposito')")
+      conn.executemany(
+        "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, commission, currency, asset_class) VALUES(?,?,?,?,?,?,'USD',?)",
+        [
+          ("T1", "AAA", 10, 100, "2024-01-02 10:00:00", 1, "STK"),
+          ("T2", "BBB", 20, 50, "2024-01-03 10:00:00", 0, "STK"),
+          ("T3", OPTION, 2, 5, "2024-01-03 11:00:00", 0, "OPT"),
+          ("T4", "BBB", -20, 55, "2024-01-10 10:00:00", 0, "STK"),
+        ]
+      )
+      conn.execute("INSERT INTO dividends(action_id, ticker, currency, datetime, amount) VALUES('DV1','AAA','USD','2024-01-05',20)")
+      conn.executemany(
+        "INSERT INTO prices(ticker, date, close) VALUES(?,?,?)",
+        [
+          (ticker, d.isoformat(), _close(base, step, d))
+          for ticker, base, step in (("AAA", 100, 1), ("BBB", 50, 0.5), (OPTION, 5, 0.25))
+          for d in DAYS if d.weekday() < 5
+        ]
+      )
+    conn.close()
+    api_main.TIMELINES.clear()
+    api_main.ATTRIBUTIONS.clear()
+    yield db_path
+
+
+def test_attribution_splits_total_pnl_by_asset_and_class(temp_db):
+  """
+  Cobertura: REQ-UI-0004, REQ-UI-0005
+  El PnL por ticker (con comisiones y dividendos) y el de la caja suman el PnL total; las clases agregan sus tickers.
+  """
+  client = TestClient(app)
+  data = client.get("/portfolio/attribution", params={"to": "2024-01-19"}).json()
+  assert (data["start_date"], data["end_date"], data["days"]) == ("2024-01-01", "2024-01-19", 19)
+  assets = {row["ticker"]: row for row in data["assets"]}
+  assert set(assets) == {"AAA", "BBB", OPTION, "CASH"}
+  last = DAYS[-1]
+  assert assets["AAA"]["pnl"] == pytest.approx(10 * _close(100, 1, last) - 1000 - 1 + 20)
+  assert assets["AAA"]["income"] == 20
+  assert assets["BBB"]["pnl"] == pytest.approx(20 * 5) and assets["BBB"]["end_value"] == 0
+  assert assets[OPTION]["pnl"] == pytest.approx(2 * (_close(5, 0.25, last) - 5))
+  assert assets["CASH"]["pnl"] == pytest.approx(0, abs=1e-9)
+
+  total = data["total"]
+  # La prima de la opción no mueve caja: cuenta como aporte junto al depósito
+  assert total["net_flows"] == pytest.approx(10000 + 10)
+  assert total["pnl"] == pytest.approx(total["end_value"] - total["start_value"] - total["net_flows"])
+  assert sum(row["pnl"] for row in data["assets"]) == pytest.approx(total["pnl"])
+  classes = {row["asset_class"]: row for row in data["classes"]}
+  assert set(classes) == {"STK", "OPT", "CASH"}
+  assert classes["STK"]["pnl"] == pytest.approx(assets["AAA"]["pnl"] + assets["BBB"]["pnl"])
+  assert sum(row["weight"] for row in data["classes"]) == pytest.approx(1)
+  # Dietz modificado sobre 19 días: compra el día 2 y venta el día 9
+  assert assets["BBB"]["return"] == pytest.approx(100 / (1000 * 17 / 19 - 1100 * 10 / 19), abs=1e-4)
+
+
+def test_attribution_ranges_slice_cached_matrices(temp_db, monkeypatch):
+  """
+  Cobertura: REQ-UI-0004, REQ-BK-0006
+  Un rango parte del valor al cierre anterior y se resuelve sobre las matrices en caché hasta que cambia la versión de datos.
+  """
+  builds = []
+  original = api_main.AttributionInputs.build.__func__
+  monkeypatch.setattr(api_main.AttributionInputs, "build", classmethod(lambda cls, *args: builds.append(args) or original(cls, *args)))
+  client = TestClient(app)
+  week = client.get("/portfolio/attribution", params={"from": "2024-01-08", "to": "2024-01-12"}).json()
+  snap = client.get("/portfolio/snapshot", params={"date": "2024-01-07"}).json()
+  assert week["total"]["start_value"] == pytest.approx(snap["total_base"])
+  aaa = next(row for row in week["assets"] if row["ticker"] == "AAA")
+  # El domingo 7 vale al cierre del viernes 5
+  assert aaa["pnl"] == pytest.approx(10 * (_close(100, 1, date(2024, 1, 12)) - _close(100, 1, date(2024, 1, 5))))
+  assert aaa["net_flows"] == 0 and aaa["return"] == pytest.approx(aaa["pnl"] / aaa["start_value"], abs=1e-4)
+  client.get("/portfolio/attribution", params={"from": "2024-01-15"})
+  assert len(builds) == 1
+
+  conn = get_connection(temp_db)
+  with conn:
+    conn.execute("INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class) VALUES('T5','AAA',1,110,'2024-01-11 10:00:00','USD','STK')")
+  conn.close()
+  week = client.get("/portfolio/attribution", params={"from": "2024-01-08", "to": "2024-01-12"}).json()
+  aaa = next(row for row in week["assets"] if row["ticker"] == "AAA")
+  assert aaa["net_flows"] == 110 and len(builds) == 2
+  assert client.get("/portfolio/attribution", params={"from": "2024-01-12", "to": "2024-01-08"}).status_code == 400
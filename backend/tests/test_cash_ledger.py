@@ -0,0 +1,114 @@
+import os
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api.main import app, ensure_db_ready, ensure_schema, get_connection  # noqa: E402
+from cash_ledger import cash_balances, daily_cash_rows, ledger_series, refresh_cash_ledger  # noqa: E402
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def _ledger(conn):
+  refresh_cash_ledger(conn)
+  cur = conn.execute("SELECT source, currency, day, amount, external, balance FROM cash_ledger ORDER BY currency, day, id")
+  return cur.fetchall()
+
+
+def test_cash_ledger_follows_source_tables(temp_db):
+  """
+  Cobertura: REQ-BK-0012
+  Los triggers reflejan altas, cambios y bajas de transferencias, dividendos y trades STK (las opciones no mueven caja).
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("DEP:1", "eur", "2024-01-02 10:00:00", 1000, "externo", "deposito"))
+    conn.execute("INSERT INTO dividends(action_id, currency, datetime, amount) VALUES(?,?,?,?)", ("DIV:1", "EUR", "2024-01-10", 20))
+    conn.execute(
+      "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, commission, commission_currency, currency, asset_class) VALUES(?,?,?,?,?,?,?,?,?)",
+      ("T1", "ACME", 2, 100, "2024-01-05", -1.5, "EUR", "EUR", "STK")
+    )
+    conn.execute(
+      "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, commission, commission_currency, currency, asset_class) VALUES(?,?,?,?,?,?,?,?,?)",
+      ("O1", "ACME 240119C", 1, 5, "2024-01-06", -1, "EUR", "EUR", "OPT")
+    )
+    # Duplicado ignorado: no duplica el movimiento del libro
+    conn.execute("INSERT OR IGNORE INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("DEP:1", "EUR", "2024-01-02", 1000, "externo", "deposito"))
+    conn.commit()
+    assert _ledger(conn) == [
+      ("transfer", "EUR", "2024-01-02", 1000.0, 1, 1000.0),
+      ("trade", "EUR", "2024-01-05", -198.5, 0, 801.5),
+      ("dividend", "EUR", "2024-01-10", 20.0, 0, 821.5),
+    ]
+
+    # Un cambio anterior recalcula los saldos posteriores; una baja los descuenta
+    conn.execute("UPDATE transfers SET amount = 1500 WHERE transaction_id = 'DEP:1'")
+    conn.execute("DELETE FROM dividends WHERE action_id = 'DIV:1'")
+    conn.commit()
+    assert [row[5] for row in _ledger(conn)] == [1500.0, 1301.5]
+    assert cash_balances(conn) == {"EUR": 1301.5}
+  finally:
+    conn.close()
+
+
+def test_cash_ledger_series_range_uses_opening_balance(temp_db):
+  """
+  Cobertura: REQ-BK-0012
+  La serie por rango acumula desde el inicio del rango y añade el saldo absoluto partiendo del saldo previo.
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    for tx_id, dt, amount in [("A", "2024-01-02", 100), ("B", "2024-02-03", 50), ("C", "2024-02-20", -30), ("D", "2024-03-01", 10)]:
+      conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", (tx_id, "USD", dt, amount, "externo", "deposito"))
+    conn.commit()
+    series = ledger_series(conn, "month", "2024-02-01", "2024-02-29", with_balance=True)
+    assert series == {"USD": [{"date": "2024-02-01", "amount": 20.0, "cumulative": 20.0, "balance": 120.0}]}
+    rows = daily_cash_rows(conn)
+    assert rows[0] == (date(2024, 1, 2), "USD", 100.0, 100.0, 1)
+    assert rows[-1] == (date(2024, 3, 1), "USD", 130.0, 10.0, 1)
+  finally:
+    conn.close()
+
+  client = TestClient(app)
+  resp = client.get("/cash/series?interval=day&from_date=2024-02-10")
+  assert resp.status_code == 200
+  usd = resp.json()["series"]["USD"]
+  assert [pt["date"] for pt in usd] == ["2024-02-20", "2024-03-01"]
+  assert [pt["cumulative"] for pt in usd] == [-30.0, -20.0]
+  assert [pt["balance"] for pt in usd] == [120.0, 130.0]
+
+
+def test_cash_ledger_backfills_existing_database(temp_db):
+  """
+  Cobertura: REQ-BK-0012
+  Una base previa al libro de caja se vuelca al asegurar el esquema.
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("DEP:1", "EUR", "2024-01-02", 300, "externo", "deposito"))
+    conn.execute("INSERT INTO dividends(action_id, currency, datetime, amount) VALUES(?,?,?,?)", ("DIV:1", "EUR", "2024-01-03", 5))
+    conn.execute("DELETE FROM cash_ledger")
+    conn.execute("DELETE FROM cash_ledger_dirty")
+    conn.commit()
+    ensure_schema(conn)
+    assert cash_balances(conn) == {"EUR": 305.0}
+  finally:
+    conn.close()
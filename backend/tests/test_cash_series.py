@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 import tempfile
@@ -98,5 +99,36 @@ def test_cash_series_month_invalid_interval(temp_db):
   Responde 422 con interval inválido.
   """
   client = TestClient(app)
-  resp = client.get("/cash/series?interval=year")
+  resp = client.get("/cash/series?interval=hour")
   assert resp.status_code == 422
+
+
+def test_cash_series_ndjson_matches_json(temp_db):
+  """
+  Cobertura: REQ-BK-0012
+  format=ndjson emite una línea de meta y una por punto con los mismos valores que la respuesta JSON.
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    insert_transfer(conn, "DEP:1", "EUR", "2024-01-02", 1000, "externo", "deposito")
+    insert_transfer(conn, "DEP:2", "USD", "2024-01-05", 200, "externo", "deposito")
+    insert_dividend(conn, "DIV:1", "EUR", "2024-02-01", 50, 0)
+    insert_transfer(conn, "RET:1", "EUR", "2024-03-01", -100, "externo", "retiro")
+    conn.commit()
+  finally:
+    conn.close()
+
+  client = TestClient(app)
+  params = {"interval": "month", "from_date": "2024-02-01"}
+  series = client.get("/cash/series", params=params).json()["series"]
+  resp = client.get("/cash/series", params={**params, "format": "ndjson"})
+  assert resp.status_code == 200
+  assert resp.headers["content-type"].startswith("application/x-ndjson")
+  lines = [json.loads(line) for line in resp.text.splitlines()]
+  assert lines[0] == {"meta": {"interval": "month"}}
+  streamed = {}
+  for line in lines[1:]:
+    streamed.setdefault(line.pop("currency"), []).append(line)
+  assert streamed == series
+  assert streamed["EUR"][-1]["balance"] == pytest.approx(950)
@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api.main import app, ensure_db_ready, ensure_schema, get_connection  # noqa: E402
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def _execute(db_path, *statements):
+  conn = get_connection(db_path)
+  ensure_schema(conn)
+  try:
+    for sql, params in statements:
+      conn.execute(sql, params)
+    conn.commit()
+  finally:
+    conn.close()
+
+
+def test_changes_since_returns_only_deltas(temp_db):
+  """
+  Cobertura: REQ-BK-0018
+  /changes devuelve sólo las filas insertadas, actualizadas o borradas desde el seq del cliente.
+  """
+  _execute(
+    temp_db,
+    ("INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class, raw_json) VALUES(?,?,?,?,?,?,?,?)", ("T1", "AAPL", 1, 10, "2024-01-02", "USD", "STK", "{}")),
+    ("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("DEP:1", "EUR", "2024-01-01", 100, "externo", "deposito")),
+  )
+  client = TestClient(app)
+  head = client.get("/changes").json()
+  assert head["seq"] == head["current"] == 2
+  assert head["changes"] == {}
+
+  full = client.get("/changes?since=0").json()
+  assert [r["trade_id"] for r in full["changes"]["trades"]["upserted"]] == ["T1"]
+  assert "raw_json" not in full["changes"]["trades"]["upserted"][0]
+  assert full["seq"] == 2
+
+  _execute(
+    temp_db,
+    ("UPDATE trades SET quantity = 5 WHERE trade_id = ?", ("T1",)),
+    ("DELETE FROM transfers WHERE transaction_id = ?", ("DEP:1",)),
+    ("INSERT INTO dividends(action_id, ticker, currency, datetime, amount) VALUES(?,?,?,?,?)", ("DIV:1", "SAP", "EUR", "2024-02-01", 3)),
+  )
+  delta = client.get("/changes?since=2").json()
+  assert delta["reset"] is False
+  assert delta["changes"]["trades"]["upserted"][0]["quantity"] == 5
+  assert delta["changes"]["transfers"] == {"upserted": [], "deleted": ["DEP:1"]}
+  assert [r["action_id"] for r in delta["changes"]["dividends"]["upserted"]] == ["DIV:1"]
+  assert delta["seq"] == delta["current"] == 5
+
+  # Paginado por número de cambios y sin novedades al llegar al final
+  page = client.get("/changes?since=2&limit=2").json()
+  assert page["more"] is True and page["seq"] == 4
+  assert client.get(f"/changes?since={delta['seq']}").json()["changes"]["trades"] == {"upserted": [], "deleted": []}
+
+
+def test_changes_since_ahead_of_database_requests_reset(temp_db):
+  """
+  Cobertura: REQ-BK-0018
+  Un seq posterior al actual (base recreada) pide resincronización completa.
+  """
+  client = TestClient(app)
+  data = client.get("/changes?since=99").json()
+  assert data["reset"] is True
+  assert data["seq"] == 0
+  assert client.get("/changes?since=0&tables=nope").status_code == 400
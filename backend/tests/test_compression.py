@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api.main import app, ensure_db_ready, ensure_schema, get_connection  # noqa: E402
+from api.responses import accepted_encodings  # noqa: E402
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def test_large_responses_are_gzip_compressed_when_accepted(temp_db):
+  """
+  Cobertura: REQ-BK-0021
+  Las respuestas grandes se comprimen si el cliente acepta gzip y se sirven sin comprimir si no.
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    conn.executemany(
+      "INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)",
+      [(f"DEP:{n}", "EUR", f"2024-01-{n % 28 + 1:02d}", 10 + n, "externo", "deposito") for n in range(200)]
+    )
+    conn.commit()
+  finally:
+    conn.close()
+
+  client = TestClient(app)
+  compressed = client.get("/transfers", headers={"Accept-Encoding": "gzip"})
+  assert compressed.headers["Content-Encoding"] == "gzip"
+  assert "Accept-Encoding" in compressed.headers["Vary"]
+  assert len(compressed.json()) == 200
+
+  raw = client.get("/transfers", headers={"Accept-Encoding": "identity"})
+  assert "Content-Encoding" not in raw.headers
+  assert raw.json() == compressed.json()
+  assert compressed.num_bytes_downloaded < raw.num_bytes_downloaded
+
+  # Respuestas pequeñas sin comprimir
+  assert "Content-Encoding" not in client.get("/health", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_accepted_encodings_honours_quality():
+  """
+  Cobertura: REQ-BK-0021
+  Accept-Encoding con q=0 descarta la codificación.
+  """
+  assert accepted_encodings("gzip, br;q=0") == {"gzip"}
+  assert accepted_encodings("br; q=0.5, identity") == {"br", "identity"}
+  assert accepted_encodings("") == set()
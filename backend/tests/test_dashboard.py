@@ -0,0 +1,105 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api import main as api_main  # noqa: E402
+from api.main import app, ensure_db_ready, ensure_schema, get_connection  # noqa: E402
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def populate(db_path):
+  conn = get_connection(db_path)
+  ensure_schema(conn)
+  try:
+    conn.execute("INSERT INTO app_config(key, value) VALUES('base_currency', 'EUR')")
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("DEP1", "EUR", "2024-03-01", 1000, "externo", "deposito"))
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("FX1", "EUR", "2024-03-02", -200, "fx_interno", "mov_interno"))
+    conn.execute("INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class) VALUES(?,?,?,?,?,?,?)", ("T1", "ACME", 5, 10, "2024-03-02", "EUR", "STK"))
+    conn.execute("INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class) VALUES(?,?,?,?,?,?,?)", ("T2", "OLD", 1, 5, "2024-03-02", "EUR", "STK"))
+    conn.execute("INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class) VALUES(?,?,?,?,?,?,?)", ("T3", "OLD", -1, 6, "2024-03-03", "EUR", "STK"))
+    conn.execute("INSERT INTO dividends(action_id, ticker, currency, datetime, amount) VALUES(?,?,?,?,?)", ("DIV1", "ACME", "EUR", "2024-03-03", 4))
+    conn.execute("INSERT INTO prices(ticker, date, close, provisional) VALUES(?,?,?,?)", ("ACME", "2024-03-02", 10, 0))
+    conn.execute("INSERT INTO prices(ticker, date, close, provisional) VALUES(?,?,?,?)", ("ACME", "2024-03-03", 12, 0))
+    conn.commit()
+  finally:
+    conn.close()
+
+
+def test_dashboard_matches_individual_endpoints(temp_db):
+  """
+  Cobertura: REQ-BK-0022, REQ-BK-0006
+  /dashboard devuelve en una respuesta los mismos cuerpos que los endpoints individuales.
+  """
+  populate(temp_db)
+  client = TestClient(app)
+  resp = client.get("/dashboard")
+  assert resp.status_code == 200
+  data = resp.json()
+  assert data["base_currency"] == "EUR"
+  assert data["config"] == client.get("/config").json()
+  assert data["net_transfers"] == client.get("/cash/net-transfers").json()
+  assert data["value_series"] == client.get("/portfolio/value/series").json()
+  assert data["transfers_series"] == client.get("/transfers/series").json()
+  assert data["cash_balance"] == client.get("/cash/balance").json()
+  assert data["cash_series"] == client.get("/cash/series").json()
+  # Por defecto, precios de las posiciones abiertas (OLD está cerrada)
+  assert data["latest_prices"] == client.post("/prices/latest", json={"tickers": ["ACME"]}).json()
+  assert data["latest_prices"]["ACME"]["close"] == 12
+
+
+def test_dashboard_sections_selector(temp_db):
+  """
+  Cobertura: REQ-BK-0022
+  sections= limita las secciones calculadas y rechaza nombres desconocidos.
+  """
+  populate(temp_db)
+  client = TestClient(app)
+  data = client.get("/dashboard", params={"sections": "cash_balance,config", "interval": "month"}).json()
+  assert data["sections"] == ["config", "cash_balance"]
+  assert "value_series" not in data and "cash_series" not in data
+  assert data["cash_balance"] == client.get("/cash/balance").json()
+  assert client.get("/dashboard", params={"sections": "config,nope"}).status_code == 400
+
+
+def test_dashboard_value_series_runs_in_analytics_pool(temp_db, monkeypatch):
+  """
+  Cobertura: REQ-BK-0022, REQ-BK-0020
+  La serie de valor del dashboard se calcula en el pool de analítica y se recalcula en el snapshot si los datos cambian entre medias; los tickers admiten espacios.
+  """
+  populate(temp_db)
+  calls = []
+  original = api_main.ANALYTICS.value_series
+  monkeypatch.setattr(api_main.ANALYTICS, "value_series", lambda *args, **kwargs: calls.append(args) or original(*args, **kwargs))
+  client = TestClient(app)
+  data = client.get("/dashboard", params={"sections": "value_series,latest_prices", "tickers": "OLD, ACME"}).json()
+  assert len(calls) == 1
+  assert data["value_series"] == client.get("/portfolio/value/series").json()
+  assert set(data["latest_prices"]) == {"ACME"}
+
+  def write_meanwhile(*args, **kwargs):
+    body = original(*args, **kwargs)
+    conn = get_connection(temp_db)
+    with conn:
+      conn.execute("INSERT INTO prices(ticker, date, close, provisional) VALUES('ACME', '2024-03-04', 20, 0)")
+    conn.close()
+    return body
+
+  monkeypatch.setattr(api_main.ANALYTICS, "value_series", write_meanwhile)
+  data = client.get("/dashboard", params={"sections": "value_series"}).json()
+  assert data["value_series"]["series"][-1]["date"] == "2024-03-04"
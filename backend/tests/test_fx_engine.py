@@ -0,0 +1,103 @@
+import os
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api.main import app, ensure_db_ready, ensure_schema, get_connection  # noqa: E402
+from api.portfolio_service import fx_rate_on_date  # noqa: E402
+from fx import sync_fx_for_currencies  # noqa: E402
+from fx_engine import pair_coverage, resolve_fx_rate  # noqa: E402
+
+
+def insert_fx(conn, base: str, quote: str, dt: str, rate: float):
+  conn.execute("INSERT INTO fx_rates(base_currency, quote_currency, date, rate) VALUES(?,?,?,?)", (base, quote, dt, rate))
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def test_resolve_direct_inverse_and_cross(temp_db):
+  """
+  Cobertura: REQ-BK-0002, REQ-BK-0005
+  Deriva pares no descargados por inverso y por cruce a través del pivote USD, indicando la procedencia.
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    # 1 USD = 0.9 EUR ; 1 CHF = 1.1 USD
+    insert_fx(conn, "EUR", "USD", "2024-01-01", 0.9)
+    insert_fx(conn, "USD", "CHF", "2024-01-01", 1.1)
+    conn.commit()
+    target = date(2024, 1, 5)
+    assert resolve_fx_rate(conn, "EUR", "USD", target) == (0.9, "direct")
+    rate, provenance = resolve_fx_rate(conn, "USD", "EUR", target)
+    assert provenance == "inverse"
+    assert pytest.approx(rate, rel=1e-9) == 1 / 0.9
+    rate, provenance = resolve_fx_rate(conn, "EUR", "CHF", target)
+    assert provenance == "cross:USD"
+    assert pytest.approx(rate, rel=1e-9) == 0.9 * 1.1
+    assert resolve_fx_rate(conn, "EUR", "GBP", target) is None
+    assert resolve_fx_rate(conn, "EUR", "USD", date(2023, 12, 31)) is None
+    assert pytest.approx(fx_rate_on_date(conn, "CHF", "EUR", target), rel=1e-9) == 1 / (0.9 * 1.1)
+    assert pair_coverage(conn, "CHF", "EUR") == {"from": "2024-01-01", "to": "2024-01-01", "provenance": "cross:USD"}
+  finally:
+    conn.close()
+
+
+def test_base_currency_switch_is_local(temp_db, monkeypatch):
+  """
+  Cobertura: REQ-BK-0002, REQ-BK-0007
+  Al cambiar la moneda base los pares se derivan de las tasas guardadas y la serie se valora sin descargar FX.
+  """
+  today = date.today().isoformat()
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    insert_fx(conn, "EUR", "USD", "2024-01-01", 0.9)
+    insert_fx(conn, "EUR", "USD", today, 0.95)
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("DEP1", "EUR", "2024-01-01", 90, "externo", "deposito"))
+    conn.commit()
+  finally:
+    conn.close()
+
+  def fail_fetch(*_args, **_kwargs):
+    raise AssertionError("No debería descargarse FX para un par derivable")
+
+  monkeypatch.setattr("fx._fetch_yahoo_fx_history", fail_fetch)
+  client = TestClient(app)
+  resp = client.post("/config/base-currency", json={"currency": "USD"})
+  assert resp.status_code == 200
+  body = resp.json()
+  assert body["fx_coverage"]["EUR"]["provenance"] == "inverse"
+  assert body["needs_sync"] == []
+
+  conn = get_connection(temp_db)
+  try:
+    assert sync_fx_for_currencies(conn, "USD", ["EUR"]) == {"USD/EUR": 0}
+  finally:
+    conn.close()
+
+  resp = client.get("/fx/rate", params={"base_currency": "USD", "quote_currency": "EUR", "date": "2024-01-02"})
+  assert resp.status_code == 200
+  assert resp.json()["provenance"] == "inverse"
+  assert pytest.approx(resp.json()["rate"], rel=1e-9) == 1 / 0.9
+
+  resp = client.get("/portfolio/value/series", params={"interval": "day", "to": "2024-01-01"})
+  assert resp.status_code == 200
+  series = resp.json()["series"]
+  assert pytest.approx(series[0]["value_base"], rel=1e-9) == 100.0
+  assert resp.json()["missing_fx"] == []
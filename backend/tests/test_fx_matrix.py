@@ -0,0 +1,101 @@
+import json
+import sys
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+import fx_matrix  # noqa: E402
+from api.main import ensure_schema, get_connection  # noqa: E402
+from fx_engine import resolve_fx_rate  # noqa: E402
+from fx_matrix import get_fx_matrix, invalidate_fx_matrices  # noqa: E402
+
+
+def insert_fx(conn, base: str, quote: str, dt: str, rate: float):
+  conn.execute(
+    """INSERT INTO fx_rates(base_currency, quote_currency, date, rate) VALUES(?,?,?,?)
+       ON CONFLICT(base_currency, quote_currency, date) DO UPDATE SET rate=excluded.rate""",
+    (base, quote, dt, rate)
+  )
+
+
+@pytest.fixture()
+def conn(tmp_path):
+  db_file = tmp_path / "portfolio.db"
+  c = get_connection(str(db_file))
+  ensure_schema(c)
+  yield c
+  c.close()
+  invalidate_fx_matrices(db_file)
+
+
+def test_matrix_forward_fills_and_matches_engine(conn, tmp_path):
+  """
+  Cobertura: REQ-BK-0005
+  La matriz arrastra la última tasa en fines de semana y coincide con la resolución directa/inversa/cruzada.
+  """
+  insert_fx(conn, "EUR", "USD", "2024-01-05", 0.9)  # viernes
+  insert_fx(conn, "EUR", "USD", "2024-01-08", 0.92)  # lunes
+  insert_fx(conn, "USD", "CHF", "2024-01-05", 1.1)
+  conn.commit()
+  today = date(2024, 1, 10)
+  matrix = get_fx_matrix(conn, "EUR", today=today)
+  assert matrix.currencies == ["CHF", "USD"]
+  assert matrix.data.shape == (6, 2)
+  assert matrix.rate("USD", date(2024, 1, 4)) is None
+  assert matrix.rate("USD", date(2024, 1, 6)) == 0.9
+  assert matrix.rate("USD", date(2024, 1, 7)) == 0.9
+  assert matrix.rate("USD", date(2030, 1, 1)) == 0.92
+  assert matrix.rate("EUR", date(2024, 1, 4)) == 1.0
+  ordinals = np.array([date(2024, 1, 1).toordinal(), date(2024, 1, 7).toordinal()])
+  out = matrix.rates("USD", ordinals)
+  assert np.isnan(out[0]) and out[1] == 0.9
+  # Persistida junto a la base y abierta en modo memory-map
+  meta = json.loads((tmp_path / "portfolio.fx-EUR.json").read_text())
+  assert (meta["seq"], meta["days"]) == (matrix.seq, 6) and (tmp_path / meta["data"]).exists()
+  assert isinstance(matrix.data, np.memmap)
+  for day in [date(2024, 1, 6), date(2024, 1, 9)]:
+    rate, provenance = resolve_fx_rate(conn, "EUR", "CHF", day)
+    assert pytest.approx(matrix.rate("CHF", day), rel=1e-12) == rate and provenance == "cross:USD"
+
+
+def test_matrix_refreshes_incrementally_and_reloads_from_disk(conn, tmp_path, monkeypatch):
+  """
+  Cobertura: REQ-BK-0005, REQ-BK-0007
+  Tras modificar fx_rates sólo se recalculan las filas desde la fecha tocada; sin cambios se reutiliza el fichero.
+  """
+  insert_fx(conn, "EUR", "USD", "2024-01-01", 0.9)
+  conn.commit()
+  today = date(2024, 1, 10)
+  first = get_fx_matrix(conn, "EUR", today=today)
+  assert first.rate("USD", date(2024, 1, 9)) == 0.9
+
+  rebuilt_from = []
+  original = fx_matrix._pair_series
+
+  def tracking(conn_, start, days):
+    rebuilt_from.append(start)
+    return original(conn_, start, days)
+
+  monkeypatch.setattr(fx_matrix, "_pair_series", tracking)
+  insert_fx(conn, "EUR", "USD", "2024-01-08", 0.95)
+  conn.commit()
+  second = get_fx_matrix(conn, "EUR", today=today)
+  assert rebuilt_from == [date(2024, 1, 8)]
+  assert second.rate("USD", date(2024, 1, 7)) == 0.9
+  assert second.rate("USD", date(2024, 1, 9)) == 0.95
+
+  # Nuevo proceso: sin caché en memoria se carga el .npy sin recalcular
+  fx_matrix._CACHE.clear()
+  rebuilt_from.clear()
+  third = get_fx_matrix(conn, "EUR", today=today)
+  assert rebuilt_from == []
+  assert third.rate("USD", date(2024, 1, 9)) == 0.95
+  # Cada versión se escribe en un .npy propio y el anterior se retira al publicar la nueva
+  assert len(list(tmp_path.glob("portfolio.fx-EUR.*.npy"))) == 1
+  assert not list(tmp_path.glob("*.tmp"))
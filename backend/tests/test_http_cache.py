@@ -0,0 +1,100 @@
+import os
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api import http_cache  # noqa: E402
+from api.main import app, ensure_db_ready, ensure_schema, get_connection  # noqa: E402
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def _insert_transfer(db_path, transaction_id, amount):
+  conn = get_connection(db_path)
+  ensure_schema(conn)
+  try:
+    conn.execute(
+      "INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)",
+      (transaction_id, "EUR", "2024-01-01", amount, "externo", "deposito")
+    )
+    conn.commit()
+  finally:
+    conn.close()
+
+
+def test_conditional_get_returns_304_until_data_changes(temp_db):
+  """
+  Cobertura: REQ-BK-0018
+  Con If-None-Match igual al ETag vigente se responde 304; una escritura en la tabla cambia el ETag.
+  """
+  _insert_transfer(temp_db, "DEP:1", 100)
+  client = TestClient(app)
+  first = client.get("/transfers")
+  assert first.status_code == 200
+  etag = first.headers["ETag"]
+  assert first.headers["Cache-Control"] == "no-cache"
+  assert "Last-Modified" in first.headers
+
+  cached = client.get("/transfers", headers={"If-None-Match": etag})
+  assert cached.status_code == 304
+  assert cached.content == b""
+  assert cached.headers["ETag"] == etag
+
+  # Otra query es otro recurso
+  assert client.get("/transfers?currency=EUR").headers["ETag"] != etag
+
+  _insert_transfer(temp_db, "DEP:2", 50)
+  fresh = client.get("/transfers", headers={"If-None-Match": etag})
+  assert fresh.status_code == 200
+  assert len(fresh.json()) == 2
+  assert fresh.headers["ETag"] != etag
+
+
+def test_etag_tracks_only_route_dependencies(temp_db):
+  """
+  Cobertura: REQ-BK-0018
+  Cambiar la configuración invalida /config y /portfolio pero no los listados que no dependen de ella.
+  """
+  client = TestClient(app)
+  config_etag = client.get("/config").headers["ETag"]
+  trades_etag = client.get("/trades").headers["ETag"]
+  assert "ETag" not in client.get("/health").headers
+
+  assert client.post("/config/base-currency", json={"currency": "EUR"}).status_code == 200
+  assert client.get("/config", headers={"If-None-Match": config_etag}).status_code == 200
+  assert client.get("/trades", headers={"If-None-Match": trades_etag}).status_code == 304
+
+
+def test_etag_of_today_dependent_routes_changes_with_the_date(temp_db, monkeypatch):
+  """
+  Cobertura: REQ-BK-0018
+  Las rutas de cartera (a fecha de hoy por defecto) no reutilizan el ETag de otro día; los listados sí.
+  """
+  class Tomorrow(date):
+    @classmethod
+    def today(cls):
+      return date(2100, 1, 1)
+
+  client = TestClient(app)
+  snapshot_etag = client.get("/portfolio/snapshot").headers["ETag"]
+  trades_etag = client.get("/trades").headers["ETag"]
+  assert client.get("/portfolio/snapshot", headers={"If-None-Match": snapshot_etag}).status_code == 304
+
+  monkeypatch.setattr(http_cache, "date", Tomorrow)
+  assert client.get("/portfolio/snapshot", headers={"If-None-Match": snapshot_etag}).status_code == 200
+  assert client.get("/trades", headers={"If-None-Match": trades_etag}).status_code == 304
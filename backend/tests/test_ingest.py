@@ -0,0 +1,82 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api.main import ensure_schema, get_connection  # noqa: E402
+from ingest import history_to_rows, upsert_fx_rows, upsert_price_rows  # noqa: E402
+from prices import sync_prices_for_tickers  # noqa: E402
+
+
+def _frame(multi: bool, symbol: str = "ACME"):
+  index = pd.date_range("2024-01-01", periods=3, tz="America/New_York")
+  closes = [10.0, float("nan"), 12.5]
+  if multi:
+    frame = pd.DataFrame({("Close", symbol): closes, ("Open", symbol): [9.0, 9.5, 12.0]}, index=index)
+    frame.columns.names = ["Price", "Ticker"]
+    return frame
+  return pd.DataFrame({"Close": closes, "Open": [9.0, 9.5, 12.0]}, index=index)
+
+
+@pytest.mark.parametrize("multi", [False, True])
+def test_history_to_rows_drops_nan_and_handles_multiindex(multi):
+  """
+  Cobertura: REQ-BK-0005, REQ-BK-0007
+  Convierte históricos planos y MultiIndex (Price, Ticker) descartando cierres NaN.
+  """
+  rows = history_to_rows(_frame(multi), "Close", "ACME")
+  assert rows == [(date(2024, 1, 1), 10.0), (date(2024, 1, 3), 12.5)]
+
+
+def test_history_to_rows_empty_or_without_close():
+  """
+  Cobertura: REQ-BK-0005, REQ-BK-0007
+  Devuelve lista vacía si el histórico no trae datos o columna Close.
+  """
+  assert history_to_rows(None) == []
+  assert history_to_rows(pd.DataFrame()) == []
+  assert history_to_rows(pd.DataFrame({"Open": [1.0]}, index=pd.date_range("2024-01-01", periods=1))) == []
+
+
+def test_bulk_upserts_are_idempotent(tmp_path):
+  """
+  Cobertura: REQ-BK-0005, REQ-BK-0007
+  La escritura en bloque actualiza cierres/tasas existentes sin duplicar filas.
+  """
+  conn = get_connection(str(tmp_path / "test.db"))
+  ensure_schema(conn)
+  try:
+    rows = [(date(2024, 1, 1), 10.0), (date(2024, 1, 2), 11.0)]
+    assert upsert_price_rows(conn, "ACME", rows, today=date(2024, 1, 2)) == 2
+    assert upsert_price_rows(conn, "ACME", [(date(2024, 1, 2), 11.5)], today=date(2024, 1, 3)) == 1
+    prices = conn.execute("SELECT date, close, provisional FROM prices ORDER BY date").fetchall()
+    assert prices == [("2024-01-01", 10.0, 0), ("2024-01-02", 11.5, 0)]
+    assert upsert_fx_rows(conn, "EUR", "USD", rows) == 2
+    assert upsert_fx_rows(conn, "EUR", "USD", rows) == 2
+    assert conn.execute("SELECT COUNT(*) FROM fx_rates").fetchone()[0] == 2
+  finally:
+    conn.close()
+
+
+def test_sync_prices_uses_vectorized_frame(monkeypatch, tmp_path):
+  """
+  Cobertura: REQ-BK-0005, REQ-BK-0007
+  La sincronización de precios ingiere el DataFrame de yfinance por la ruta vectorizada.
+  """
+  conn = get_connection(str(tmp_path / "test.db"))
+  ensure_schema(conn)
+  try:
+    conn.execute("INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency) VALUES(?,?,?,?,?,?)", ("T1", "ACME", 1, 10, "2024-01-01", "USD"))
+    conn.commit()
+    monkeypatch.setattr("yfinance.download", lambda alias, **_kwargs: _frame(True, alias))
+    summary = sync_prices_for_tickers(conn, ["acme"])
+    assert summary == {"ACME": 2}
+    assert conn.execute("SELECT COUNT(*) FROM prices WHERE ticker = 'ACME'").fetchone()[0] == 2
+  finally:
+    conn.close()
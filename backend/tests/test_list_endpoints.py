@@ -0,0 +1,135 @@
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api.main import app, ensure_db_ready, ensure_schema, get_connection  # noqa: E402
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def insert_trades(db_path):
+  conn = get_connection(db_path)
+  ensure_schema(conn)
+  try:
+    rows = [
+      ("T1", "AAPL", 1, 10, "2024-01-02", "USD", "STK", '{"a": 1}'),
+      # Sin clase: se trata como STK, igual que en el libro de caja y los lotes
+      ("T2", "AAPL", 2, 11, "2024-01-02", "USD", None, '{"a": 2}'),
+      ("T3", "SAP", 3, 12, "2024-01-05", "EUR", "STK", '{"a": 3}'),
+      ("O1", "AAPL 240119C", 1, 2, "2024-01-03", "USD", "OPT", '{"side": "SELL"}'),
+      ("T4", "AAPL", -1, 13, "2024-02-01", "USD", "STK", '{"a": 4}'),
+    ]
+    conn.executemany(
+      "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class, raw_json) VALUES(?,?,?,?,?,?,?,?)",
+      rows
+    )
+    conn.commit()
+  finally:
+    conn.close()
+
+
+def test_trades_keyset_pagination(temp_db):
+  """
+  Cobertura: REQ-BK-0019
+  /trades pagina por cursor sobre (datetime, id) y devuelve total y siguiente cursor en cabeceras.
+  """
+  insert_trades(temp_db)
+  client = TestClient(app)
+  seen = []
+  cursor = None
+  pages = 0
+  while True:
+    url = "/trades?limit=2" + (f"&cursor={cursor}" if cursor else "")
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp.headers["X-Total-Count"] == "5"
+    seen.extend(row["trade_id"] for row in resp.json())
+    pages += 1
+    cursor = resp.headers.get("X-Next-Cursor")
+    if not cursor:
+      break
+  assert pages == 3
+  assert seen == ["T1", "T2", "O1", "T3", "T4"]
+
+
+def test_trades_filters_and_projection(temp_db):
+  """
+  Cobertura: REQ-BK-0019
+  Filtra por ticker, clase de activo y rango de fechas; raw_json sólo aparece si se pide en fields.
+  """
+  insert_trades(temp_db)
+  client = TestClient(app)
+
+  resp = client.get("/trades?ticker=aapl&asset_class=STK&to_date=2024-01-31")
+  assert resp.status_code == 200
+  rows = resp.json()
+  assert [r["trade_id"] for r in rows] == ["T1", "T2"]
+  assert "raw_json" not in rows[0]
+  assert resp.headers["X-Total-Count"] == "2"
+  assert "X-Next-Cursor" not in resp.headers
+
+  resp = client.get("/trades?asset_class=OPT&fields=trade_id,raw_json")
+  assert resp.json() == [{"trade_id": "O1", "raw_json": '{"side": "SELL"}'}]
+
+  assert client.get("/trades?fields=trade_id,nope").status_code == 400
+  assert client.get("/trades?cursor=%%%").status_code == 400
+
+
+def test_transfers_and_dividends_filters(temp_db):
+  """
+  Cobertura: REQ-BK-0019
+  /transfers filtra por origen y divisa; /dividends por ticker y fecha, con el total filtrado en cabecera.
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("DEP:1", "EUR", "2024-01-02", 1000, "externo", "deposito"))
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("FX:1:in", "USD", "2024-01-03", 320, "fx_interno", "deposito"))
+    conn.execute("INSERT INTO dividends(action_id, ticker, currency, datetime, amount) VALUES(?,?,?,?,?)", ("DIV:1", "SAP", "EUR", "2024-03-01", 10))
+    conn.execute("INSERT INTO dividends(action_id, ticker, currency, datetime, amount) VALUES(?,?,?,?,?)", ("DIV:2", "SAP", "EUR", "2024-06-01", 12))
+    conn.commit()
+  finally:
+    conn.close()
+
+  client = TestClient(app)
+  resp = client.get("/transfers?origin=externo&currency=eur")
+  assert [r["transaction_id"] for r in resp.json()] == ["DEP:1"]
+  assert resp.headers["X-Total-Count"] == "1"
+
+  resp = client.get("/dividends?ticker=SAP&from_date=2024-04-01")
+  assert [r["action_id"] for r in resp.json()] == ["DIV:2"]
+  assert resp.headers["X-Total-Count"] == "1"
+
+
+def test_trades_ndjson_stream(temp_db):
+  """
+  Cobertura: REQ-BK-0019
+  format=ndjson devuelve una fila por línea con los mismos filtros, proyección y orden que el listado JSON.
+  """
+  insert_trades(temp_db)
+  client = TestClient(app)
+  resp = client.get("/trades?format=ndjson&ticker=AAPL&fields=trade_id,quantity")
+  assert resp.status_code == 200
+  rows = [json.loads(line) for line in resp.text.splitlines()]
+  assert rows == client.get("/trades?ticker=AAPL&fields=trade_id,quantity").json()
+  assert [r["trade_id"] for r in rows] == ["T1", "T2", "T4"]
+
+  limited = client.get("/trades?format=ndjson&limit=2").text.splitlines()
+  assert len(limited) == 2
+  assert client.get("/trades?format=ndjson&cursor=%%%").status_code == 400
@@ -0,0 +1,86 @@
+import logging
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+import logging_config  # noqa: E402
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+  """Instala la tubería asíncrona sobre el logger raíz y restaura los handlers de pytest al acabar."""
+  log_path = tmp_path / "backend.log"
+  monkeypatch.setenv("BACKEND_LOG_PATH", str(log_path))
+  monkeypatch.setenv("BACKEND_LOG_LEVELS", "bench.verbose=DEBUG,bench.quiet=ERROR,bench.bad")
+  root = logging.getLogger()
+  saved_handlers, saved_level = list(root.handlers), root.level
+  touched = ["bench.verbose", "bench.quiet", "bench.module", *logging_config.DEFAULT_MODULE_LEVELS]
+  saved_levels = {name: logging.getLogger(name).level for name in touched}
+  yield log_path
+  logging_config.shutdown_logging()
+  root.handlers[:] = saved_handlers
+  root.setLevel(saved_level)
+  for name, level in saved_levels.items():
+    logging.getLogger(name).setLevel(level)
+
+
+def test_queue_pipeline_writes_from_listener_thread_with_module_levels(pipeline):
+  """
+  Cobertura: REQ-BK-0017
+  El logger raíz sólo encola; el listener escribe en BACKEND_LOG_PATH respetando los niveles por módulo.
+  """
+  path = logging_config.configure_root_logging(module_levels={"bench.module": "WARNING"}, force=True)
+  assert path == pipeline
+  root = logging.getLogger()
+  assert [type(h) for h in root.handlers] == [logging_config.AsyncQueueHandler]
+  assert logging.getLogger("yfinance").level == logging.WARNING
+
+  seen_threads = []
+
+  class Spy(logging.Filter):
+    def filter(self, record):
+      seen_threads.append(threading.current_thread().name)
+      return True
+
+  logging_config._LISTENER.handlers[0].addFilter(Spy())
+  logging.getLogger("bench.verbose").debug("detalle %s", "visible")
+  logging.getLogger("bench.quiet").warning("oculto")
+  logging.getLogger("bench.module").info("oculto")
+  logging.getLogger("bench.module").warning("aviso %d", 1)
+  try:
+    raise ValueError("boom")
+  except ValueError:
+    logging.getLogger("bench.verbose").exception("fallo")
+  logging_config.shutdown_logging()
+
+  text = pipeline.read_text(encoding="utf-8")
+  assert "bench.verbose | detalle visible" in text
+  assert "bench.module | aviso 1" in text
+  assert "oculto" not in text
+  assert "ValueError: boom" in text
+  assert seen_threads and threading.current_thread().name not in seen_threads
+
+
+def test_long_payloads_are_truncated_and_reconfigure_is_idempotent(pipeline):
+  """
+  Cobertura: REQ-BK-0017
+  Los mensajes más largos que max_chars se recortan y reconfigurar no duplica handlers ni listeners.
+  """
+  logging_config.configure_root_logging(max_chars=50, force=True)
+  logging_config.configure_root_logging(max_chars=50)
+  assert len(logging.getLogger().handlers) == 1
+
+  logging.getLogger("bench.module").info("fila %s", {"payload": "x" * 500})
+  logging_config.shutdown_logging()
+
+  lines = pipeline.read_text(encoding="utf-8").splitlines()
+  assert len(lines) == 1
+  message = lines[0].split(" | ", 3)[3]
+  assert message.startswith("fila {'payload': 'xxx")
+  assert message.endswith("(+470 caracteres)")
@@ -0,0 +1,173 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api.main import app, ensure_db_ready, ensure_schema, get_connection  # noqa: E402
+from fx_matrix import get_fx_matrix  # noqa: E402
+import lots as lots_module  # noqa: E402
+from lots import open_lots, realized_pnl, refresh_lots  # noqa: E402
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def _trade(conn, trade_id, ticker, qty, price, day, commission=0.0, currency="USD", asset_class="STK", commission_currency=None):
+  conn.execute(
+    "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, commission, commission_currency, currency, asset_class) VALUES(?,?,?,?,?,?,?,?,?)",
+    (trade_id, ticker, qty, price, f"{day}T10:00:00", commission, commission_currency, currency, asset_class)
+  )
+
+
+def _snapshot(conn):
+  lots = [(lot["trade_id"], lot["quantity"], lot["remaining"], lot["cost"], lot["commission"]) for lot in open_lots(conn)]
+  closures = conn.execute(
+    "SELECT trade_id, open_day, day, quantity, cost, open_commission, proceeds, commission FROM lot_closures ORDER BY day, trade_id, open_day, quantity"
+  ).fetchall()
+  return lots, closures
+
+
+def test_fifo_lots_split_commissions_and_extend_incrementally(temp_db):
+  """
+  Cobertura: REQ-TR-0002
+  Las ventas cierran los lotes más antiguos con su parte de coste y comisiones, el exceso abre un corto y los trades nuevos extienden los lotes sin rehacerlos.
+  """
+  conn = get_connection(temp_db)
+  with conn:
+    _trade(conn, "B1", "AAA", 10, 100, "2024-01-02", commission=1.0)
+    _trade(conn, "B2", "AAA", 10, 110, "2024-01-03", commission=-1.0)  # signo del bróker: sigue siendo coste
+    _trade(conn, "S1", "AAA", -15, 120, "2024-02-01", commission=1.5)
+  assert refresh_lots(conn) == 1
+  fx = get_fx_matrix(conn, "USD")
+  realized = realized_pnl(conn, fx)
+  # Lote 1 completo: 1200 - 1000 - (1 + 1); mitad del lote 2: 600 - 550 - (0.5 + 0.5)
+  assert realized["realized_base"] == pytest.approx(198 + 49)
+  assert realized["commission_base"] == pytest.approx(3.0)
+  assert [lot["remaining"] for lot in open_lots(conn)] == [5]
+
+  # Venta posterior: continúa desde el lote abierto (mismo id) y abre un corto con el exceso
+  lot_id = open_lots(conn)[0]["id"]
+  with conn:
+    _trade(conn, "S2", "AAA", -8, 90, "2025-03-01")
+  refresh_lots(conn)
+  assert conn.execute("SELECT remaining FROM lots WHERE id = ?", (lot_id,)).fetchone()[0] == 0
+  assert [(lot["quantity"], lot["cost"]) for lot in open_lots(conn)] == [(-3, -270)]
+  by_year = realized_pnl(conn, fx)["by_year"]
+  assert by_year == [{"year": 2024, "realized_base": 247.0}, {"year": 2025, "realized_base": pytest.approx(450 - 550 - 0.5)}]
+  assert realized_pnl(conn, fx, from_day="2025-01-01")["realized_base"] == pytest.approx(-100.5)
+  # A una fecha pasada el lote 2 seguía con 5 pendientes
+  assert [lot["remaining"] for lot in open_lots(conn, as_of="2024-12-31")] == [5]
+  incremental = _snapshot(conn)
+
+  # Un trade con fecha anterior rehace el ticker y el resultado es el de una reconstrucción completa
+  with conn:
+    _trade(conn, "B0", "AAA", 2, 95, "2024-01-01")
+  refresh_lots(conn)
+  assert _snapshot(conn) != incremental
+  rebuilt = _snapshot(conn)
+  with conn:
+    conn.execute("DELETE FROM lots")
+    conn.execute("DELETE FROM lot_closures")
+    conn.execute("DELETE FROM lots_state")
+    conn.execute("INSERT INTO lots_dirty(ticker, from_datetime) VALUES('AAA', '')")
+  refresh_lots(conn)
+  assert _snapshot(conn) == rebuilt
+  conn.close()
+
+
+def test_interleaved_refreshes_apply_trades_once(temp_db, monkeypatch):
+  """
+  Cobertura: REQ-TR-0002
+  Si otro refresco termina mientras uno ve marcas pendientes, éste relee bajo el lock de escritura y no repite los cierres.
+  """
+  first = get_connection(temp_db)
+  second = get_connection(temp_db)
+  with first:
+    _trade(first, "B1", "AAA", 10, 100, "2024-01-02")
+    _trade(first, "S1", "AAA", -4, 120, "2024-02-01")
+  original = lots_module._has_dirty
+
+  def interleaved(conn):
+    pending = original(conn)
+    if conn is second:
+      # El primero termina entre la comprobación del segundo y su transacción
+      monkeypatch.setattr(lots_module, "_has_dirty", original)
+      assert refresh_lots(first) == 1
+    return pending
+
+  monkeypatch.setattr(lots_module, "_has_dirty", interleaved)
+  assert refresh_lots(second) == 0
+  assert second.execute("SELECT quantity FROM lot_closures").fetchall() == [(4.0,)]
+  assert [lot["remaining"] for lot in open_lots(second)] == [6]
+  first.close()
+  second.close()
+
+
+def test_lots_backfill_runs_once_without_lot_trades(temp_db):
+  """
+  Cobertura: REQ-TR-0002
+  Una base sólo con trades sin lotes (divisas) no vuelve a marcar sus tickers en cada arranque del esquema.
+  """
+  conn = get_connection(temp_db)
+  try:
+    with conn:
+      _trade(conn, "FX1", "EUR.USD", 1000, 1.1, "2024-01-02", asset_class="CASH")
+    assert refresh_lots(conn) == 1
+    assert conn.execute("SELECT COUNT(*) FROM lots_state").fetchone()[0] == 0
+    ensure_schema(conn)
+    assert refresh_lots(conn) == 0
+  finally:
+    conn.close()
+
+
+def test_portfolio_pnl_converts_with_trade_date_fx(temp_db):
+  """
+  Cobertura: REQ-TR-0002, REQ-BK-0006
+  /portfolio/pnl convierte coste y venta con el tipo de su fecha (la diferencia de cambio es PnL) y valora los lotes abiertos con el último cierre.
+  """
+  conn = get_connection(temp_db)
+  with conn:
+    conn.execute("INSERT INTO app_config(key, value) VALUES('base_currency', 'USD')")
+    conn.executemany(
+      "INSERT INTO fx_rates(base_currency, quote_currency, date, rate) VALUES('USD','EUR',?,?)",
+      [("2024-01-02", 1.1), ("2024-03-01", 1.2)]
+    )
+    _trade(conn, "E1", "EEE", 10, 50, "2024-01-02", currency="EUR", commission=2.0, commission_currency="USD")
+    _trade(conn, "E2", "EEE", -4, 50, "2024-03-04", currency="EUR")
+    _trade(conn, "O1", "AAA 240621C00100000", -1, 2.5, "2024-01-10", asset_class="OPT")
+    conn.execute("UPDATE trades SET raw_json = '{\"Multiplier\": \"100\"}' WHERE trade_id = 'O1'")
+    _trade(conn, "O2", "AAA 240621C00100000", 1, 1.0, "2024-02-10", asset_class="OPT")
+    conn.executemany("INSERT INTO prices(ticker, date, close) VALUES('EEE',?,?)", [("2024-03-01", 55.0), ("2024-06-03", 60.0)])
+  conn.close()
+
+  client = TestClient(app)
+  data = client.get("/portfolio/pnl").json()
+  realized = {entry["ticker"]: entry for entry in data["realized"]["by_ticker"]}
+  # 4 acciones a 50 EUR: 200 * 1.2 - 200 * 1.1 - 0.8 USD de comisión de compra
+  assert realized["EEE"]["realized_base"] == pytest.approx(20 - 0.8)
+  # Opción vendida a 2.5 y recomprada a 1.0 con multiplicador 100
+  assert realized["AAA 240621C00100000"]["realized_base"] == pytest.approx(150)
+  assert data["realized"]["missing_fx"] == []
+
+  position = data["unrealized"]["positions"][0]
+  assert (position["ticker"], position["quantity"], position["price"]) == ("EEE", 6, 60.0)
+  assert position["cost_base"] == pytest.approx(300 * 1.1 + 1.2)
+  assert position["unrealized_base"] == pytest.approx(360 * 1.2 - (330 + 1.2))
+
+  ranged = client.get("/portfolio/pnl", params={"from": "2024-03-01", "to": "2024-04-30", "ticker": "eee"}).json()
+  assert ranged["ticker"] == "EEE" and ranged["realized"]["closures"] == 1
+  assert ranged["unrealized"]["positions"][0]["price"] == 55.0
+  assert client.get("/portfolio/pnl", params={"to": "2024-02-30"}).status_code == 400
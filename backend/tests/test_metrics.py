@@ -0,0 +1,95 @@
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api.main import app, ensure_db_ready, ensure_schema, get_connection  # noqa: E402
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def _metric(text, name, route):
+  prefix = f'{name}{{route="{route}"}} '
+  for line in text.splitlines():
+    if line.startswith(prefix):
+      return float(line[len(prefix):])
+  return 0.0
+
+
+def test_server_timing_and_prometheus_metrics(temp_db):
+  """
+  Cobertura: REQ-BK-0017
+  Cada respuesta lleva Server-Timing y /debug/metrics acumula latencia, consultas, filas y bytes por ruta.
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    conn.executemany(
+      "INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)",
+      [(f"DEP:{n}", "EUR", f"2024-01-{n + 1:02d}", 100, "externo", "deposito") for n in range(5)]
+    )
+    conn.commit()
+  finally:
+    conn.close()
+
+  client = TestClient(app)
+  before = client.get("/debug/metrics").text
+  resp = client.get("/transfers")
+  assert resp.status_code == 200
+  timing = resp.headers["Server-Timing"]
+  assert "app;dur=" in timing and "db;dur=" in timing
+  queries, rows = re.search(r'desc="(\d+) consultas, (\d+) filas"', timing).groups()
+  assert int(queries) >= 2 and int(rows) >= 5
+  assert "Server-Timing" in client.get("/health").headers
+
+  after = client.get("/debug/metrics").text
+  assert "# TYPE portfolio_http_request_duration_seconds histogram" in after
+  assert 'portfolio_http_requests_total{method="GET",route="/transfers",status="200"}' in after
+  assert _metric(after, "portfolio_http_request_duration_seconds_count", "/transfers") == _metric(before, "portfolio_http_request_duration_seconds_count", "/transfers") + 1
+  assert _metric(after, "portfolio_sqlite_queries_total", "/transfers") >= _metric(before, "portfolio_sqlite_queries_total", "/transfers") + 2
+  assert _metric(after, "portfolio_sqlite_rows_total", "/transfers") >= _metric(before, "portfolio_sqlite_rows_total", "/transfers") + 5
+  assert _metric(after, "portfolio_http_response_bytes_total", "/transfers") > _metric(before, "portfolio_http_response_bytes_total", "/transfers")
+
+  # Las rutas con parámetros se agrupan por plantilla, no por valor
+  client.get("/prices/ACME")
+  assert 'route="/prices/{ticker}"' in client.get("/debug/metrics").text
+
+
+def test_slow_query_log_records_sql_shape_and_plan(temp_db, monkeypatch):
+  """
+  Cobertura: REQ-BK-0017
+  Las sentencias por encima del umbral se registran con forma de parámetros, duración, filas, plan y ruta.
+  """
+  from api.main import SLOW_QUERIES
+
+  client = TestClient(app)
+  monkeypatch.setattr(SLOW_QUERIES, "threshold_ms", 10_000)
+  SLOW_QUERIES.clear()
+  client.get("/prices/ACME")
+  assert client.get("/debug/slow-queries").json()["queries"] == []
+
+  monkeypatch.setattr(SLOW_QUERIES, "threshold_ms", 0)
+  client.get("/prices/ACME")
+  body = client.get("/debug/slow-queries").json()
+  assert body["threshold_ms"] == 0
+  entry = next(q for q in body["queries"] if q["sql"].startswith("SELECT date, close, provisional FROM prices"))
+  assert entry["params"] == ["str"]
+  assert entry["path"] == "/prices/ACME"
+  assert entry["rows"] == 0 and entry["duration_ms"] >= 0
+  assert any("USING INDEX sqlite_autoindex_prices_1" in line for line in entry["plan"])
+  assert "portfolio_sqlite_slow_queries_total" in client.get("/debug/metrics").text
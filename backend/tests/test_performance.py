@@ -0,0 +1,122 @@
+import math
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api import main as api_main  # noqa: E402
+from api.main import app, ensure_db_ready, get_connection  # noqa: E402
+from api.performance import business_days, performance_metrics, slice_range  # noqa: E402
+
+MONDAY = date(2024, 1, 1)
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def _ordinals(*offsets):
+  return np.array([(MONDAY + timedelta(days=n)).toordinal() for n in offsets], dtype=np.int64)
+
+
+def test_metrics_engine_matches_hand_computed_values():
+  """
+  Cobertura: REQ-TR-0001
+  TWR descuenta el aporte del día, drawdown sobre el índice TWR y Sharpe/Sortino con rf coinciden con el cálculo a mano.
+  """
+  values = np.array([100.0, 110.0, 99.0, 120.0])
+  flows = np.array([100.0, 0.0, 0.0, 20.0])
+  out = performance_metrics(_ordinals(0, 1, 2, 3), values, flows, rf=0.02)
+
+  returns = [0.1, -0.1, 100 / 99 - 1]
+  vol = np.std(returns, ddof=1) * math.sqrt(252)
+  downside = math.sqrt(0.01 / 3) * math.sqrt(252)
+  # 1.1 * 0.9 * (100 / 99) = 1: el aporte de 20 del último día no es rentabilidad
+  assert out["twr"] == pytest.approx(0.0, abs=1e-12)
+  assert out["annualized_return"] == pytest.approx(0.0, abs=1e-9)
+  assert out["periods"] == 3 and out["net_flows"] == 20.0
+  assert out["volatility"] == pytest.approx(vol, rel=1e-9)
+  assert out["downside_volatility"] == pytest.approx(downside, rel=1e-9)
+  assert out["max_drawdown"] == pytest.approx(0.99 / 1.1 - 1, rel=1e-9)
+  assert out["max_drawdown_date"] == "2024-01-03"
+  assert out["current_drawdown"] == pytest.approx(1 / 1.1 - 1, rel=1e-9)
+  assert out["sharpe"] == pytest.approx(-0.02 / vol, rel=1e-6)
+  assert out["sortino"] == pytest.approx(-0.02 / downside, rel=1e-6)
+
+
+def test_weekend_flows_move_to_next_business_day_and_ranges_slice():
+  """
+  Cobertura: REQ-TR-0001
+  Sábados y domingos se eliminan llevando su flujo al lunes; un rango es un corte sin recalcular la serie.
+  """
+  ordinals = _ordinals(*range(8))  # lunes 1 .. lunes 8
+  values = np.array([100, 101, 102, 103, 104, 104, 154, 155], dtype=float)
+  flows = np.array([100, 0, 0, 0, 0, 0, 50, 0], dtype=float)
+  days, kept_values, kept_flows = business_days(ordinals, values, flows)
+  assert days.tolist() == _ordinals(0, 1, 2, 3, 4, 7).tolist()
+  assert kept_flows.tolist() == [100, 0, 0, 0, 0, 50]
+  assert kept_values.tolist() == [100, 101, 102, 103, 104, 155]
+
+  week = slice_range((days, kept_values, kept_flows), MONDAY + timedelta(days=4), None)
+  out = performance_metrics(*week)
+  assert out["start_date"] == "2024-01-05" and out["end_date"] == "2024-01-08"
+  assert out["twr"] == pytest.approx(105 / 104 - 1)
+  # Un solo retorno: sin volatilidad ni ratios
+  assert out["volatility"] is None and out["sharpe"] is None
+
+
+def test_portfolio_metrics_endpoint_caches_daily_series_per_data_version(temp_db, monkeypatch):
+  """
+  Cobertura: REQ-TR-0001, REQ-BK-0006
+  /portfolio/metrics calcula los KPIs por rango reutilizando la serie diaria mientras no cambie la versión de datos.
+  """
+  conn = get_connection(temp_db)
+  with conn:
+    conn.execute("INSERT INTO app_config(key, value) VALUES('base_currency', 'USD')")
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES('D1','USD','2024-01-01',1000,'externo','deposito')")
+    conn.execute(
+      "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class) VALUES('T1','AAA',10,100,'2024-01-01','USD','STK')"
+    )
+    conn.executemany(
+      "INSERT INTO prices(ticker, date, close) VALUES('AAA',?,?)",
+      [((MONDAY + timedelta(days=n)).isoformat(), close) for n, close in enumerate([100, 110, 99, 99, 121])]
+    )
+  conn.close()
+  api_main.DAILY_SERIES.clear()
+  builds = []
+  original = api_main.ANALYTICS.value_series
+  monkeypatch.setattr(api_main.ANALYTICS, "value_series", lambda *args: builds.append(args[2]) or original(*args))
+
+  client = TestClient(app)
+  data = client.get("/portfolio/metrics").json()
+  assert data["base_currency"] == "USD" and data["sync_in_progress"] is False
+  assert (data["start_date"], data["end_date"]) == ("2024-01-01", "2024-01-05")
+  assert data["twr"] == pytest.approx(1.21 - 1)
+  assert data["max_drawdown"] == pytest.approx(-0.1)
+
+  ranged = client.get("/portfolio/metrics", params={"from": "2024-01-03", "series": "true"}).json()
+  assert ranged["twr"] == pytest.approx(121 / 99 - 1)
+  assert ranged["series"]["date"] == ["2024-01-03", "2024-01-04", "2024-01-05"]
+  assert ranged["series"]["return"][0] is None
+  assert len(builds) == 1
+
+  conn = get_connection(temp_db)
+  with conn:
+    conn.execute("INSERT INTO prices(ticker, date, close) VALUES('AAA','2024-01-08',132)")
+  conn.close()
+  assert client.get("/portfolio/metrics").json()["end_date"] == "2024-01-08"
+  assert len(builds) == 2
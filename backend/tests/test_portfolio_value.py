@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 import tempfile
@@ -306,6 +307,7 @@ def test_portfolio_value_multicurrency(temp_db):
     # Trade: 10 AAPL at $10
     conn.execute("INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency) VALUES(?,?,?,?,?,?)", ("T1", "AAPL", 10, 10, "2024-01-01", "USD"))
     conn.execute("INSERT INTO prices(ticker, date, close, provisional) VALUES(?,?,?,?)", ("AAPL", "2024-01-10", 12, 0))
+    conn.execute("INSERT INTO dividends(action_id, ticker, currency, datetime, amount) VALUES(?,?,?,?,?)", ("DV1", "AAPL", "USD", "2024-01-05", 5))
     conn.commit()
   finally:
     conn.close()
@@ -315,11 +317,12 @@ def test_portfolio_value_multicurrency(temp_db):
   assert resp.status_code == 200
   data = resp.json()
   assert data["base_currency"] == "USD"
-  # Cash: 1000 EUR -> 1100 USD + 500 USD = 1600
+  # Cash (libro de caja): 1000 EUR -> 1100 USD + 500 USD - 100 de la compra + 5 de dividendo = 1505
   # Positions: 10 * $12 = 120
-  assert pytest.approx(data["cash_base"], rel=1e-6) == 1600
+  assert pytest.approx(data["cash_base"], rel=1e-6) == 1505
   assert pytest.approx(data["positions_base"], rel=1e-6) == 120
-  assert pytest.approx(data["total_base"], rel=1e-6) == 1720
+  assert pytest.approx(data["total_base"], rel=1e-6) == 1625
+  assert data["total_base"] == pytest.approx(client.get("/portfolio/snapshot").json()["total_base"])
 
 
 def test_portfolio_value_series_monthly(temp_db):
@@ -424,7 +427,7 @@ def test_portfolio_value_series_partial_with_missing_data(temp_db):
     conn.close()
 
   client = TestClient(app)
-  resp = client.get("/portfolio/value/series", params={"interval": "day", "to": "2024-01-02"})
+  resp = client.get("/portfolio/value/series", params={"interval": "day", "to": "2024-01-02", "missing": "points"})
   assert resp.status_code == 200
   payload = resp.json()
   assert payload["sync_in_progress"] is True
@@ -445,3 +448,95 @@ def test_portfolio_value_series_partial_with_missing_data(temp_db):
   # El trade en USD sí impacta la caja en base
   assert pytest.approx(series[0]["cash_base"].get("USD", 0), rel=1e-6) == -10.0
   assert series[1]["date"] == "2024-01-02"
+
+
+def test_portfolio_value_series_missing_data_as_ranges(temp_db):
+  """
+  Cobertura: REQ-BK-0011
+  Por defecto los faltantes se agrupan en tramos contiguos por par/ticker en lugar de fecha a fecha.
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    conn.execute("INSERT INTO app_config(key, value) VALUES('base_currency', 'USD')")
+    conn.execute(
+      "INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)",
+      ("DEP1", "EUR", "2024-01-01", 100, "externo", "deposito"),
+    )
+    conn.execute(
+      "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency) VALUES(?,?,?,?,?,?)",
+      ("T1", "ACME", 1, 10, "2024-01-01", "USD"),
+    )
+    conn.commit()
+  finally:
+    conn.close()
+
+  client = TestClient(app)
+  resp = client.get("/portfolio/value/series", params={"interval": "day", "to": "2024-01-10"})
+  assert resp.status_code == 200
+  payload = resp.json()
+  assert payload["sync_in_progress"] is True
+  assert payload["missing_fx"] == [{"pair": "USD/EUR", "from": "2024-01-01", "to": "2024-01-10", "count": 10}]
+  assert payload["missing_prices"] == [{"ticker": "ACME", "from": "2024-01-01", "to": "2024-01-01", "count": 1}]
+
+
+def test_portfolio_value_series_columnar_format(temp_db):
+  """
+  Cobertura: REQ-BK-0006
+  format=columnar devuelve los mismos valores que la lista de puntos en arrays paralelos, con divisas codificadas y fechas delta.
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    conn.execute("INSERT INTO app_config(key, value) VALUES('base_currency', 'EUR')")
+    conn.execute("INSERT INTO fx_rates(base_currency, quote_currency, date, rate) VALUES(?,?,?,?)", ("EUR", "USD", "2024-02-01", 1.1))
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("DEP1", "EUR", "2024-02-01", 100, "externo", "deposito"))
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("DEP2", "USD", "2024-02-03", 110, "externo", "deposito"))
+    conn.commit()
+  finally:
+    conn.close()
+
+  client = TestClient(app)
+  rows = client.get("/portfolio/value/series").json()["series"]
+  columnar = client.get("/portfolio/value/series", params={"format": "columnar"}).json()["series"]
+  assert columnar["format"] == "columnar"
+  assert columnar["length"] == len(rows) == 3
+  assert columnar["date"] == [p["date"] for p in rows]
+  assert columnar["value_base"] == [p["value_base"] for p in rows]
+  assert columnar["currencies"] == ["EUR", "USD"]
+  assert columnar["cash"][0] == [p["cash"].get("EUR") for p in rows]
+  assert columnar["cash"][1] == [None, None, 110]
+
+  delta = client.get("/portfolio/value/series", params={"format": "columnar", "dates": "delta"}).json()["series"]
+  assert delta["date_start"] == "2024-02-01"
+  assert delta["date_delta"] == [0, 1, 1]
+  assert "date" not in delta
+  assert client.get("/portfolio/value/series", params={"format": "csv"}).status_code == 422
+
+
+def test_portfolio_value_series_ndjson_stream(temp_db):
+  """
+  Cobertura: REQ-BK-0006, REQ-BK-0011
+  format=ndjson emite meta, un punto por línea y el resumen de faltantes al final, con los mismos puntos que JSON.
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    conn.execute("INSERT INTO app_config(key, value) VALUES('base_currency', 'EUR')")
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("DEP1", "EUR", "2024-01-30", 100, "externo", "deposito"))
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)", ("DEP2", "USD", "2024-02-03", 110, "externo", "deposito"))
+    conn.commit()
+  finally:
+    conn.close()
+
+  client = TestClient(app)
+  for interval in ("day", "week"):
+    data = client.get("/portfolio/value/series", params={"interval": interval}).json()
+    resp = client.get("/portfolio/value/series", params={"interval": interval, "format": "ndjson"})
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert lines[0]["meta"]["base_currency"] == "EUR"
+    assert lines[1:-1] == data["series"]
+    # Sin tipo EUR/USD: el resumen final lo reporta igual que la respuesta JSON
+    assert lines[-1]["end"]["missing_fx"] == data["missing_fx"]
+    assert lines[-1]["end"]["sync_in_progress"] is True
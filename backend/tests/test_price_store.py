@@ -0,0 +1,62 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api.main import ensure_schema, get_connection  # noqa: E402
+from ingest import upsert_price_rows  # noqa: E402
+from price_store import load_price_columns  # noqa: E402
+
+
+@pytest.fixture()
+def conn(tmp_path):
+  c = get_connection(str(tmp_path / "test.db"))
+  ensure_schema(c)
+  yield c
+  c.close()
+
+
+def insert_price(conn, ticker: str, dt: str, close: float):
+  conn.execute("INSERT INTO prices(ticker, date, close, provisional) VALUES(?,?,?,?)", (ticker, dt, close, 0))
+
+
+def test_columns_built_lazily_from_price_rows(conn):
+  """
+  Cobertura: REQ-TR-0003
+  Los bloques columnares se construyen desde `prices` en la primera lectura, concatenando años en orden.
+  """
+  insert_price(conn, "ACME", "2024-01-03", 11.0)
+  insert_price(conn, "ACME", "2023-12-29", 10.0)
+  insert_price(conn, "OTHER", "2024-01-03", 99.0)
+  conn.commit()
+  days, closes = load_price_columns(conn, "ACME")
+  assert days.tolist() == [date(2023, 12, 29).toordinal(), date(2024, 1, 3).toordinal()]
+  assert closes.tolist() == [10.0, 11.0]
+  assert conn.execute("SELECT COUNT(*) FROM price_columns WHERE ticker = 'ACME'").fetchone()[0] == 2
+  assert conn.execute("SELECT COUNT(*) FROM price_columns_dirty WHERE ticker = 'ACME'").fetchone()[0] == 0
+  empty_days, empty_closes = load_price_columns(conn, "MISSING")
+  assert len(empty_days) == 0 and len(empty_closes) == 0
+
+
+def test_columns_follow_price_sync_and_are_views(conn):
+  """
+  Cobertura: REQ-TR-0003
+  La sincronización mantiene al día el bloque anual y la lectura devuelve vistas sin copia sobre el BLOB.
+  """
+  upsert_price_rows(conn, "ACME", [(date(2024, 1, 2), 10.0), (date(2024, 1, 3), 10.5)], today=date(2024, 2, 1))
+  assert conn.execute("SELECT COUNT(*) FROM price_columns_dirty").fetchone()[0] == 0
+  upsert_price_rows(conn, "ACME", [(date(2024, 1, 3), 10.7), (date(2024, 1, 4), 10.9)], today=date(2024, 2, 1))
+  days, closes = load_price_columns(conn, "ACME")
+  assert closes.tolist() == [10.0, 10.7, 10.9]
+  assert not closes.flags.owndata and not closes.flags.writeable
+  assert days.dtype == np.int32 and closes.dtype == np.float64
+  conn.execute("DELETE FROM prices WHERE ticker = 'ACME' AND date = '2024-01-02'")
+  conn.commit()
+  _days, closes = load_price_columns(conn, "ACME")
+  assert closes.tolist() == [10.7, 10.9]
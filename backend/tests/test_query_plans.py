@@ -0,0 +1,216 @@
+"""
+Regresión de planes de consulta: se generan una base sintética grande, se recorren los endpoints y
+helpers de lectura con el registro de consultas lentas a umbral 0 y cada sentencia sobre una tabla
+de hechos se contrasta con `EXPECTED_PLANS` (índice esperado). Los presupuestos de tiempo del
+registro no se comprueban aquí, que dependen de la máquina: los mide `benchmarks/bench_query_plans.py`.
+
+Una consulta nueva sobre esas tablas que no figure en el registro hace fallar la suite: hay que
+añadirla con el índice que debe usar (o marcarla como lectura completa si es intencionado).
+"""
+import os
+import re
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+import fx  # noqa: E402
+import prices  # noqa: E402
+from api.main import SLOW_QUERIES, _list_currencies_in_use, app, ensure_db_ready, get_connection  # noqa: E402
+from api.metrics import set_slow_query_log  # noqa: E402
+from api.slow_queries import SlowQueryLog  # noqa: E402
+
+LARGE_TABLES = ("trades", "transfers", "dividends", "prices", "fx_rates", "cash_ledger", "change_log", "lots", "lot_closures")
+TOUCHES_LARGE = re.compile(rf"\b(?:FROM|JOIN|UPDATE|INTO)\s+({'|'.join(LARGE_TABLES)})\b")
+BARE_SCAN = re.compile(rf"^\s*SCAN ({'|'.join(LARGE_TABLES)})\s*$")
+
+# Lectura completa intencionada (agregados o series sobre todo el histórico): se admite SCAN
+FULL_READ = None
+INDEXED_BUDGET_MS = 150
+FULL_READ_BUDGET_MS = 500
+
+# (patrón sobre el SQL normalizado, índice que debe aparecer en el plan o FULL_READ, presupuesto en ms)
+EXPECTED_PLANS = [
+  # Precios
+  (r"^SELECT date, close, provisional FROM prices WHERE ticker = \? ORDER BY date (ASC|DESC)", "sqlite_autoindex_prices_1", INDEXED_BUDGET_MS),
+  (r"^SELECT date, provisional FROM prices WHERE ticker = \? ORDER BY date DESC LIMIT 1", "sqlite_autoindex_prices_1", INDEXED_BUDGET_MS),
+  (r"^SELECT date, close FROM prices WHERE ticker = \? AND date >= \? AND date < \?", "sqlite_autoindex_prices_1", INDEXED_BUDGET_MS),
+  (r"^SELECT EXISTS\(SELECT 1 FROM (prices|cash_ledger|change_log)\)", FULL_READ, INDEXED_BUDGET_MS),  # se detiene en la primera fila
+  (r"^INSERT OR IGNORE INTO price_columns_dirty\(ticker, year\) SELECT DISTINCT ticker", FULL_READ, FULL_READ_BUDGET_MS),  # migración única
+  # Trades
+  (r"^SELECT MIN\(datetime\) FROM trades WHERE ticker = \?", "idx_trades_ticker_datetime", INDEXED_BUDGET_MS),
+  (r"^SELECT MIN\(datetime\) FROM trades WHERE currency = \?", "idx_trades_currency_datetime", INDEXED_BUDGET_MS),
+  (r"^SELECT DISTINCT currency FROM trades WHERE currency IS NOT NULL", "idx_trades_currency_datetime", INDEXED_BUDGET_MS),
+  (r"^SELECT .* FROM trades WHERE ticker = \?", "idx_trades_ticker_datetime", INDEXED_BUDGET_MS),
+  (r"^SELECT .* FROM trades WHERE datetime >= \?", "idx_trades_datetime", INDEXED_BUDGET_MS),
+  (r"^SELECT .* FROM trades WHERE trade_id IN \(", "sqlite_autoindex_trades_1", INDEXED_BUDGET_MS),
+  (r"^SELECT ticker, quantity, currency FROM trades$", FULL_READ, FULL_READ_BUDGET_MS),  # posiciones de /portfolio/value
+  (r"^SELECT ticker, quantity, datetime, currency, purchase FROM trades ORDER BY datetime ASC$", FULL_READ, FULL_READ_BUDGET_MS),  # serie de valor
+  (r"^SELECT ticker, COUNT\(\*\) FROM trades WHERE ticker IS NOT NULL GROUP BY ticker", "idx_trades_ticker_datetime", INDEXED_BUDGET_MS),  # reparto del pool de analítica
+  (r"^SELECT ticker, MAX\(COALESCE\(asset_class, 'STK'\)\) FROM trades WHERE ticker IS NOT NULL GROUP BY ticker", "idx_trades_ticker_datetime", FULL_READ_BUDGET_MS),  # clases de /portfolio/attribution
+  # Transferencias y dividendos
+  (r"^SELECT MIN\(datetime\) FROM transfers WHERE currency = \?", "idx_transfers_currency_datetime", INDEXED_BUDGET_MS),
+  (r"^SELECT .* FROM transfers WHERE currency = \?", "idx_transfers_currency_datetime", INDEXED_BUDGET_MS),
+  (r"^SELECT DISTINCT currency FROM transfers WHERE currency IS NOT NULL", "idx_transfers_currency_datetime", INDEXED_BUDGET_MS),
+  (r"^SELECT currency, SUM\(amount\)( as total)? FROM transfers .*GROUP BY currency", FULL_READ, FULL_READ_BUDGET_MS),  # totales por divisa
+  (r"^SELECT .* FROM dividends WHERE ticker = \?", "idx_dividends_ticker_datetime", INDEXED_BUDGET_MS),
+  (r"^SELECT DISTINCT currency FROM dividends WHERE currency IS NOT NULL", "idx_dividends_currency_datetime", INDEXED_BUDGET_MS),
+  # Libro de caja
+  (r"^UPDATE cash_ledger SET balance", "idx_cash_ledger_currency_day", FULL_READ_BUDGET_MS),  # recalcula el libro entero tras la carga
+  (r"^SELECT c\.currency, \(SELECT balance FROM cash_ledger", "idx_cash_ledger_currency_day", INDEXED_BUDGET_MS),
+  (r"^SELECT balance FROM cash_ledger WHERE currency = \? AND day < \?", "idx_cash_ledger_currency_day", INDEXED_BUDGET_MS),
+  (r"^SELECT currency, .* FROM cash_ledger WHERE day >= \? AND day <= \? AND source IN", "idx_cash_ledger_source_day", INDEXED_BUDGET_MS),
+  (r"^SELECT currency, .* FROM cash_ledger WHERE day >= \? AND day <= \? GROUP BY", "idx_cash_ledger_day", INDEXED_BUDGET_MS),
+  (r"^SELECT day, currency, balance, .* FROM cash_ledger GROUP BY currency, day", FULL_READ, FULL_READ_BUDGET_MS),  # saldo diario completo
+  (r"^SELECT [td]\.ticker, c\.day, c\.currency, c\.amount FROM cash_ledger c JOIN (trades t|dividends d) ON", "idx_cash_ledger_source_day", FULL_READ_BUDGET_MS),  # flujos por ticker de la atribución
+  (r"^SELECT day, currency, amount FROM cash_ledger WHERE source = 'transfer' AND external = 1", "idx_cash_ledger_source_day", FULL_READ_BUDGET_MS),
+  # FX
+  (r"^SELECT f\.base_currency, f\.quote_currency, f\.rate FROM fx_rates f JOIN", "sqlite_autoindex_fx_rates_1", INDEXED_BUDGET_MS),
+  (r"^SELECT base_currency, quote_currency, date, rate FROM fx_rates WHERE date >= \?", "idx_fx_rates_date", INDEXED_BUDGET_MS),
+  (r"^SELECT MIN\(date\), MAX\(date\) FROM fx_rates", "idx_fx_rates_date", INDEXED_BUDGET_MS),
+  (r"^SELECT base_currency FROM fx_rates UNION SELECT quote_currency FROM fx_rates", "idx_fx_base_quote", INDEXED_BUDGET_MS),
+  # Lotes FIFO
+  (r"^SELECT .* FROM lots WHERE ticker = \? AND remaining <> 0", "idx_lots_open", INDEXED_BUDGET_MS),
+  (r"^SELECT .* FROM lots WHERE remaining <> 0", "idx_lots_open", INDEXED_BUDGET_MS),
+  (r"^SELECT .* FROM lots l LEFT JOIN \( SELECT lot_id, SUM\(quantity\) AS quantity FROM lot_closures WHERE day <= \? GROUP BY lot_id \) c ON c\.lot_id = l\.id WHERE l\.day <= \?", "idx_lots_day", INDEXED_BUDGET_MS),
+  (r"^DELETE FROM lots WHERE ticker = \?", "idx_lots_ticker_datetime", INDEXED_BUDGET_MS),
+  (r"^UPDATE lots SET remaining", "INTEGER PRIMARY KEY", INDEXED_BUDGET_MS),
+  (r"^DELETE FROM lot_closures WHERE ticker = \?", "idx_lot_closures_ticker_day", INDEXED_BUDGET_MS),
+  (r"^SELECT .* FROM lot_closures WHERE day >= \?", "idx_lot_closures_day", INDEXED_BUDGET_MS),
+  (r"^SELECT .* FROM lot_closures WHERE ticker = \? AND day >= \?", "idx_lot_closures_ticker_day", INDEXED_BUDGET_MS),
+  # Feed de cambios
+  (r"^SELECT seq, table_name, row_key, op FROM change_log WHERE seq > \?", "INTEGER PRIMARY KEY", INDEXED_BUDGET_MS),
+]
+
+TICKERS = [f"T{n:03d}" for n in range(40)]
+CURRENCIES = ["USD", "EUR", "GBP"]
+DAYS = [date(2021, 1, 1) + timedelta(days=n) for n in range(365 * 4)]
+
+
+def _populate(conn):
+  with conn:
+    conn.executemany(
+      "INSERT INTO prices(ticker, date, close) VALUES(?, ?, ?)",
+      [(t, d.isoformat(), 100.0 + (i % 17)) for i, t in enumerate(TICKERS) for d in DAYS if d.weekday() < 5]
+    )
+    conn.executemany(
+      "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, commission, commission_currency, currency, asset_class) VALUES(?,?,?,?,?,?,?,?,?)",
+      [(f"TR{n}", TICKERS[n % len(TICKERS)], float(n % 13 - 4), 100.0, f"{DAYS[n % len(DAYS)].isoformat()} 10:00:00", 1.0, CURRENCIES[n % 3], CURRENCIES[n % 3], "STK") for n in range(20000)]
+    )
+    conn.executemany(
+      "INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES(?,?,?,?,?,?)",
+      [(f"TX{n}", CURRENCIES[n % 3], DAYS[n % len(DAYS)].isoformat(), 1000.0, "externo", "deposito") for n in range(5000)]
+    )
+    conn.executemany(
+      "INSERT INTO dividends(action_id, ticker, currency, datetime, amount) VALUES(?,?,?,?,?)",
+      [(f"DV{n}", TICKERS[n % len(TICKERS)], CURRENCIES[n % 3], DAYS[n % len(DAYS)].isoformat(), 5.0) for n in range(3000)]
+    )
+    conn.executemany(
+      "INSERT INTO fx_rates(base_currency, quote_currency, date, rate) VALUES(?,?,?,?)",
+      [("USD", quote, d.isoformat(), 0.9) for quote in ("EUR", "GBP") for d in DAYS]
+    )
+
+
+def capture_queries(db_path):
+  """Carga la base sintética en `db_path`, ejercita los endpoints y devuelve las consultas registradas con su plan."""
+  ensure_db_ready()
+  conn = get_connection(db_path)
+  _populate(conn)
+  conn.close()
+
+  log = SlowQueryLog(threshold_ms=0, capacity=100_000)
+  set_slow_query_log(log)
+  try:
+    client = TestClient(app)
+    for url in (
+      "/portfolio/value",
+      "/portfolio/value/series?interval=month",
+      "/cash/series?interval=month&from_date=2022-01-01&to_date=2023-12-31",
+      "/cash/series?interval=day",
+      "/transfers/series?interval=week",
+      "/cash/balance",
+      "/cash/net-transfers?from_date=2022-01-01",
+      "/trades?ticker=T001&limit=50",
+      "/trades?from_date=2023-01-01&to_date=2023-02-01",
+      "/transfers?currency=EUR&limit=20",
+      "/dividends?ticker=T002",
+      "/changes?since=100&limit=200",
+      "/prices/T003",
+      "/fx/rate?base_currency=USD&quote_currency=EUR&date=2023-05-01",
+      "/dashboard?interval=month",
+      "/portfolio/pnl",
+      "/portfolio/pnl?from=2022-01-01&to=2023-06-30",
+      "/portfolio/snapshot?dates=2021-06-30,2022-06-30,2023-06-30,2024-06-30",
+      "/portfolio/attribution?from=2022-01-01&to=2022-12-31",
+    ):
+      assert client.get(url).status_code == 200, url
+    assert client.post("/prices/latest", json={"tickers": TICKERS[:5]}).status_code == 200
+    # Trade posterior al último aplicado: los lotes del ticker se extienden en lugar de rehacerse
+    conn = get_connection(db_path)
+    with conn:
+      conn.execute(
+        "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class) VALUES('TRX', 'T001', -3, 120, '2030-01-01 10:00:00', 'USD', 'STK')"
+      )
+    conn.close()
+    assert client.get("/portfolio/pnl?ticker=T001").status_code == 200
+    # Helpers de sincronización (sin red): fechas de arranque por ticker y divisa
+    conn = get_connection(db_path)
+    try:
+      prices._parse_trade_min_date(conn, "T001")
+      prices._last_price_entry(conn, "T001")
+      fx._min_date_for_currency(conn, "EUR")
+      _list_currencies_in_use(conn)
+    finally:
+      conn.close()
+  finally:
+    set_slow_query_log(SLOW_QUERIES)
+  return log.entries()
+
+
+@pytest.fixture(scope="module")
+def captured_queries():
+  with tempfile.TemporaryDirectory() as tmpdir, pytest.MonkeyPatch.context() as monkeypatch:
+    db_path = os.path.join(tmpdir, "large.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    yield capture_queries(db_path)
+
+
+def check_queries(entries):
+  """
+  Contrasta las consultas capturadas con el registro: `(sin registrar, plan incorrecto, patrones
+  ejercitados, {patrón: duraciones en ms})`.
+  """
+  unregistered, wrong_plan, durations = {}, {}, {}
+  for entry in entries:
+    sql = entry["sql"]
+    if not entry["plan"] or not TOUCHES_LARGE.search(sql):
+      continue
+    rule = next((rule for rule in EXPECTED_PLANS if re.search(rule[0], sql)), None)
+    if rule is None:
+      unregistered[sql] = entry["plan"]
+      continue
+    pattern, index, _budget_ms = rule
+    durations.setdefault(pattern, []).append(entry["duration_ms"])
+    plan = "\n".join(entry["plan"])
+    if index is not FULL_READ and (index not in plan or any(BARE_SCAN.match(line) for line in entry["plan"])):
+      wrong_plan[sql] = entry["plan"]
+  return unregistered, wrong_plan, set(durations), durations
+
+
+def test_queries_on_large_tables_use_expected_indexes(captured_queries):
+  """
+  Cobertura: REQ-BK-0006
+  Toda consulta sobre tablas de hechos está registrada y usa el índice esperado (sin SCAN completo salvo lectura intencionada).
+  """
+  unregistered, wrong_plan, matched, _durations = check_queries(captured_queries)
+  assert not unregistered, f"Consultas sin plan esperado registrado: {unregistered}"
+  assert not wrong_plan, f"Consultas que no usan el índice esperado: {wrong_plan}"
+  # El registro no debe acumular entradas muertas: cada patrón corresponde a una consulta ejercitada
+  assert matched == {rule[0] for rule in EXPECTED_PLANS}, {rule[0] for rule in EXPECTED_PLANS} - matched
@@ -0,0 +1,95 @@
+import math
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api.main import app, ensure_db_ready, get_connection  # noqa: E402
+from api.rolling import rolling_metrics  # noqa: E402
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def _naive(values, flows, w, rf):
+  """Recalcula cada ventana desde cero (O(n·w)) como referencia."""
+  n = len(values)
+  returns = [math.nan] + [(values[t] - flows[t]) / values[t - 1] - 1 for t in range(1, n)]
+  out = {"return": [], "volatility": [], "sharpe": [], "max_drawdown": []}
+  for t in range(n):
+    if t < w:
+      for curve in out.values():
+        curve.append(math.nan)
+      continue
+    window = returns[t - w + 1:t + 1]
+    total = float(np.prod([1 + r for r in window]) - 1)
+    vol = float(np.std(window, ddof=1) * math.sqrt(252))
+    index = np.cumprod([1.0] + [1 + r for r in window])
+    out["return"].append(total)
+    out["volatility"].append(vol)
+    out["sharpe"].append(((1 + total) ** (252 / w) - 1 - rf) / vol)
+    out["max_drawdown"].append(float((index / np.maximum.accumulate(index) - 1).min()))
+  return out
+
+
+def test_sliding_windows_match_full_recomputation():
+  """
+  Cobertura: REQ-TR-0001
+  Retorno, volatilidad, Sharpe y drawdown máximo por ventanas deslizantes coinciden con recalcular cada ventana.
+  """
+  rng = np.random.default_rng(11)
+  n = 400
+  flows = np.where(rng.random(n) < 0.05, rng.normal(0, 500, n), 0.0)
+  values = np.empty(n)
+  values[0] = 10_000.0
+  for t in range(1, n):
+    values[t] = values[t - 1] * (1 + rng.normal(0.0004, 0.02)) + flows[t]
+  windows = [5, 30, 90]
+  rolled = rolling_metrics(values, flows, windows, rf=0.01)
+  for w in windows:
+    expected = _naive(values, flows, w, 0.01)
+    for name, curve in expected.items():
+      assert np.isnan(rolled[w][name][:w]).all()
+      np.testing.assert_allclose(rolled[w][name][w:], curve[w:], rtol=1e-9, atol=1e-12, err_msg=f"{name} w={w}")
+
+
+def test_portfolio_rolling_endpoint_returns_columnar_curves(temp_db):
+  """
+  Cobertura: REQ-TR-0001, REQ-BK-0006
+  /portfolio/rolling devuelve fechas y una curva por ventana y métrica; el rango corta la salida sin perder la historia previa.
+  """
+  conn = get_connection(temp_db)
+  days = [date(2024, 1, 1) + timedelta(days=n) for n in range(21)]  # tres semanas (15 hábiles)
+  with conn:
+    conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES('D1','USD','2024-01-01',1000,'externo','deposito')")
+    conn.execute("INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class) VALUES('T1','AAA',10,100,'2024-01-01','USD','STK')")
+    conn.executemany("INSERT INTO prices(ticker, date, close) VALUES('AAA',?,?)", [(d.isoformat(), 100 + n) for n, d in enumerate(days)])
+  conn.close()
+
+  client = TestClient(app)
+  data = client.get("/portfolio/rolling", params={"window": "5,2", "metric": "return,max_drawdown", "from": "2024-01-08"}).json()
+  assert data["windows"] == [2, 5] and data["metrics"] == ["return", "max_drawdown"]
+  assert data["date"][0] == "2024-01-08" and data["length"] == 11
+  five = data["series"]["5"]
+  assert set(five) == {"return", "max_drawdown"}
+  # 8 de enero: cinco hábiles atrás es el 1 de enero (precio 100 -> 107)
+  assert five["return"][0] == pytest.approx(107 / 100 - 1)
+  assert five["max_drawdown"][0] == 0.0
+
+  assert client.get("/portfolio/rolling", params={"window": "1"}).status_code == 400
+  assert client.get("/portfolio/rolling", params={"metric": "beta"}).status_code == 400
@@ -15,7 +15,10 @@ from api.portfolio_service import (  # noqa: E402
   build_series_from_buckets,
   build_value_by_date,
   collect_trades_and_cash,
-  collect_transfers_and_cash
+  collect_transfers_and_cash,
+  missing_data_ranges,
+  new_missing_data,
+  _record_missing
 )
 from api.main import ensure_schema, get_connection  # noqa: E402
 
@@ -70,7 +73,35 @@ def test_build_value_by_date_uses_trade_prices(conn):
   conn.execute("INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency) VALUES(?,?,?,?,?,?)", ("T1", "ACME", 2, 120, "2024-01-01", "USD"))
   conn.execute("INSERT INTO prices(ticker, date, close, provisional) VALUES(?,?,?,?)", ("ACME", "2024-01-02", 120, 0))
   conn.commit()
-  trades, ticker_currency, _ = collect_trades_and_cash(conn)
+  trades, ticker_currency = collect_trades_and_cash(conn)
   values = build_value_by_date(conn, trades, ticker_currency, "EUR")
   # 2 acciones * 120 USD * 0.9 = 216
   assert pytest.approx(values[date(2024, 1, 2)], rel=1e-6) == 216.0
+
+
+def test_record_missing_merges_contiguous_ranges():
+  """
+  Cobertura: REQ-BK-0011
+  Los faltantes se agrupan en tramos de días registrados (unidos sólo a través de fines de semana), sin duplicar fechas repetidas.
+  """
+  missing = new_missing_data()
+  # Dos semanas de días hábiles (con fin de semana en medio) y un hueco largo después
+  for day in [date(2024, 1, 4), date(2024, 1, 5), date(2024, 1, 8), date(2024, 1, 9), date(2024, 2, 1)]:
+    _record_missing(missing, "fx", ("EUR", "USD"), day)
+  # Repetidos y fechas fuera de orden no duplican tramos; el miércoles 3 no falta y corta el tramo
+  _record_missing(missing, "fx", ("EUR", "USD"), date(2024, 1, 5))
+  _record_missing(missing, "fx", ("EUR", "USD"), date(2024, 1, 2))
+  # Un día del fin de semana que llega tarde cuenta una vez
+  _record_missing(missing, "fx", ("EUR", "USD"), date(2024, 1, 6))
+  _record_missing(missing, "fx", ("EUR", "USD"), date(2024, 1, 6))
+  # Un día que une dos tramos fuera de orden
+  _record_missing(missing, "fx", ("EUR", "USD"), date(2024, 1, 31))
+  _record_missing(missing, "fx", ("EUR", "USD"), date(2024, 1, 29))
+  _record_missing(missing, "fx", ("EUR", "USD"), date(2024, 1, 30))
+  out = missing_data_ranges(missing)
+  assert out["fx"] == [
+    {"pair": "EUR/USD", "from": "2024-01-02", "to": "2024-01-02", "count": 1},
+    {"pair": "EUR/USD", "from": "2024-01-04", "to": "2024-01-09", "count": 5},
+    {"pair": "EUR/USD", "from": "2024-01-29", "to": "2024-02-01", "count": 4},
+  ]
+  assert "points" not in missing
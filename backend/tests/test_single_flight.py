@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api.main import app, ensure_db_ready  # noqa: E402
+from api.single_flight import SingleFlight  # noqa: E402
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    yield db_path
+
+
+def test_concurrent_identical_calls_share_one_computation():
+  """
+  Cobertura: REQ-BK-0020, REQ-BK-0006
+  Las llamadas simultáneas con la misma clave esperan al primer cálculo; los errores se propagan a todas.
+  """
+  flights = SingleFlight()
+  release = threading.Event()
+  calls = []
+
+  def compute():
+    calls.append(1)
+    release.wait(5)
+    return {"value": 42}
+
+  results = []
+  threads = [threading.Thread(target=lambda: results.append(flights.do(("/series", "a"), compute))) for _ in range(5)]
+  for thread in threads:
+    thread.start()
+  deadline = time.time() + 5
+  while flights.stats()["coalesced"] < 4 and time.time() < deadline:
+    time.sleep(0.01)
+  release.set()
+  for thread in threads:
+    thread.join(5)
+
+  assert len(calls) == 1
+  assert results == [{"value": 42}] * 5
+  stats = flights.stats()
+  assert stats["routes"]["/series"] == {"computed": 1, "coalesced": 4, "errors": 0}
+  assert stats["in_flight"] == 0
+
+  # Sin concurrencia no hay reutilización: cada llamada calcula
+  flights.do(("/series", "a"), lambda: 1)
+  assert flights.stats()["computed"] == 2
+
+  def fail():
+    raise ValueError("boom")
+
+  with pytest.raises(ValueError):
+    flights.do(("/series", "b"), fail)
+  assert flights.stats()["routes"]["/series"]["errors"] == 1
+
+
+def test_series_endpoints_report_coalescing_counters(temp_db):
+  """
+  Cobertura: REQ-BK-0020
+  /cash/series pasa por la coalescencia y /debug/coalescing expone sus contadores.
+  """
+  client = TestClient(app)
+  before = client.get("/debug/coalescing").json()["routes"].get("/cash/series", {}).get("computed", 0)
+  assert client.get("/cash/series").status_code == 200
+  assert client.get("/cash/series").json() == {"interval": "day", "series": {}}
+  stats = client.get("/debug/coalescing").json()
+  assert stats["routes"]["/cash/series"]["computed"] == before + 2
+  assert stats["in_flight"] == 0
@@ -0,0 +1,99 @@
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+from api import main as api_main  # noqa: E402
+from api.main import app, ensure_db_ready, get_connection  # noqa: E402
+
+DAYS = [date(2024, 1, 1) + timedelta(days=n) for n in range(21)]
+
+
+@pytest.fixture()
+def temp_db(monkeypatch):
+  with tempfile.TemporaryDirectory() as tmpdir:
+    db_path = os.path.join(tmpdir, "test.db")
+    monkeypatch.setenv("PORTFOLIO_DB_PATH", db_path)
+    ensure_db_ready()
+    conn = get_connection(db_path)
+    with conn:
+      conn.execute("INSERT INTO app_config(key, value) VALUES('base_currency', 'USD')")
+      conn.execute("INSERT INTO transfers(transaction_id, currency, datetime, amount, origin, kind) VALUES('D1','USD','2024-01-01',10000,'externo','deposito')")
+      conn.executemany(
+        "INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class) VALUES(?,?,?,?,?,?,'STK')",
+        [
+          ("T1", "AAA", 10, 100, "2024-01-02 10:00:00", "USD"),
+          ("T2", "EEE", 5, 50, "2024-01-03 10:00:00", "EUR"),
+          ("T3", "AAA", -4, 110, "2024-01-10 10:00:00", "USD"),
+          ("T4", "BBB", 1, 10, "2024-01-10 11:00:00", "USD"),
+        ]
+      )
+      conn.executemany(
+        "INSERT INTO prices(ticker, date, close) VALUES(?,?,?)",
+        [(ticker, d.isoformat(), base + n) for ticker, base in (("AAA", 100), ("EEE", 50)) for n, d in enumerate(DAYS) if d.weekday() < 5]
+      )
+      conn.executemany(
+        "INSERT INTO fx_rates(base_currency, quote_currency, date, rate) VALUES('USD','EUR',?,?)",
+        [("2024-01-01", 1.1), ("2024-01-08", 1.2)]
+      )
+    conn.close()
+    api_main.TIMELINES.clear()
+    yield db_path
+
+
+def test_snapshot_matches_value_series_and_resolves_any_date(temp_db):
+  """
+  Cobertura: REQ-BK-0006
+  La foto a fecha da las mismas cantidades, caja y valor que la serie diaria, y en fin de semana usa el último cierre.
+  """
+  client = TestClient(app)
+  snap = client.get("/portfolio/snapshot", params={"date": "2024-01-09"}).json()
+  positions = {p["ticker"]: p for p in snap["positions"]}
+  assert set(positions) == {"AAA", "EEE"}
+  assert (positions["AAA"]["quantity"], positions["AAA"]["price"]) == (10, 108)
+  assert positions["EEE"]["fx_rate"] == 1.2 and positions["EEE"]["value_base"] == pytest.approx(5 * 58 * 1.2)
+  assert {c["currency"]: c["balance"] for c in snap["cash"]} == {"USD": 9000, "EUR": -250}
+
+  series = client.get("/portfolio/value/series").json()["series"]
+  assert snap["total_base"] == pytest.approx(next(p["value_base"] for p in series if p["date"] == "2024-01-09"))
+
+  weekend = client.get("/portfolio/snapshot", params={"date": "2024-01-14"}).json()
+  positions = {p["ticker"]: p for p in weekend["positions"]}
+  assert (positions["AAA"]["quantity"], positions["AAA"]["price_date"]) == (6, "2024-01-12")
+  # BBB no tiene precios: sin valor y listado como faltante
+  assert positions["BBB"]["value_base"] is None and weekend["missing_prices"] == ["BBB"]
+
+  before = client.get("/portfolio/snapshot", params={"date": "2023-12-31"}).json()
+  assert before["positions"] == [] and before["cash"] == [] and before["total_base"] == 0
+
+
+def test_batch_snapshots_equal_single_lookups_and_follow_data_version(temp_db):
+  """
+  Cobertura: REQ-BK-0006
+  Varias fechas en una llamada dan lo mismo que pedirlas una a una; una escritura nueva reconstruye el índice.
+  """
+  client = TestClient(app)
+  wanted = ["2024-01-15", "2024-01-02", "2024-01-09"]
+  batch = client.get("/portfolio/snapshot", params={"dates": ",".join(wanted)}).json()
+  assert batch["dates"] == sorted(wanted)
+  for snap in batch["snapshots"]:
+    single = client.get("/portfolio/snapshot", params={"date": snap["date"]}).json()
+    assert {**single, "base_currency": None} == {**snap, "base_currency": None}
+
+  conn = get_connection(temp_db)
+  with conn:
+    conn.execute("INSERT INTO trades(trade_id, ticker, quantity, purchase, datetime, currency, asset_class) VALUES('T5','AAA',1,100,'2024-01-05 10:00:00','USD','STK')")
+  conn.close()
+  snap = client.get("/portfolio/snapshot", params={"date": "2024-01-09"}).json()
+  assert next(p for p in snap["positions"] if p["ticker"] == "AAA")["quantity"] == 11
+
+  assert client.get("/portfolio/snapshot", params={"date": "2024-01-09", "dates": "2024-01-10"}).status_code == 400
+  assert client.get("/portfolio/snapshot", params={"dates": "2024-13-01"}).status_code == 400
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+  sys.path.insert(0, str(BACKEND_ROOT))
+
+import providers  # noqa: E402
+from api.main import app  # noqa: E402
+
+# Librerías de los proveedores de mercado: no deben cargarse al arrancar el backend
+PROVIDER_MODULES = {"yfinance", "pandas", "requests", "lxml"}
+# Presupuesto de importación de api.main en frío (medido con -X importtime, que añade algo de coste)
+IMPORT_BUDGET_MS = 1500
+
+
+def _importtime(tmp_path):
+  env = {
+    **os.environ,
+    "PORTFOLIO_DB_PATH": str(tmp_path / "startup.db"),
+    "BACKEND_LOG_PATH": str(tmp_path / "startup.log"),
+  }
+  out = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", "import api.main"],
+    cwd=BACKEND_ROOT, env=env, capture_output=True, text=True, check=True
+  )
+  cumulative = {}
+  for line in out.stderr.splitlines():
+    if not line.startswith("import time:") or "cumulative" in line:
+      continue
+    _self, total, name = line[len("import time:"):].split("|")
+    cumulative[name.strip()] = int(total) / 1000
+  return cumulative
+
+
+def test_cold_import_skips_providers_and_fits_budget(tmp_path):
+  """
+  Cobertura: REQ-BK-0016
+  Importar api.main no carga yfinance/pandas/requests/lxml y cabe en el presupuesto de arranque.
+  """
+  cumulative = _importtime(tmp_path)
+  loaded = {name.split(".")[0] for name in cumulative}
+  assert not loaded & PROVIDER_MODULES, sorted(loaded & PROVIDER_MODULES)
+  assert cumulative["api.main"] < IMPORT_BUDGET_MS, f"api.main tarda {cumulative['api.main']:.0f} ms en importarse"
+
+
+def test_health_starts_background_provider_warmup():
+  """
+  Cobertura: REQ-BK-0016
+  El primer /health lanza (una sola vez) la precarga de yfinance en un hilo de fondo.
+  """
+  client = TestClient(app)
+  assert client.get("/health").json() == {"status": "ok"}
+  thread = providers._warmup_thread
+  assert thread is not None and thread.daemon
+  client.get("/health")
+  assert providers._warmup_thread is thread
+  thread.join(timeout=60)
+  assert "yfinance" in sys.modules
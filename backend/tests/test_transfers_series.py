@@ -80,7 +80,7 @@ def test_transfers_series_rejects_invalid_interval(temp_db):
   Valida que interval inválido devuelve error 422.
   """
   client = TestClient(app)
-  resp = client.get("/transfers/series?interval=year")
+  resp = client.get("/transfers/series?interval=hour")
   assert resp.status_code == 422
 
 
@@ -113,3 +113,28 @@ def test_transfers_series_monthly_bucket(temp_db):
   assert eur_points[1]["date"].startswith("2024-02-01")
   assert eur_points[1]["amount"] == pytest.approx(-200)
   assert eur_points[1]["cumulative"] == pytest.approx(1300)
+
+
+def test_transfers_series_week_quarter_year_buckets(temp_db):
+  """
+  Cobertura: REQ-BK-0012
+  Agrupa por inicio de semana (lunes), trimestre y año, respetando el rango pedido.
+  """
+  conn = get_connection(temp_db)
+  ensure_schema(conn)
+  try:
+    insert_transfer(conn, "DEP:1", "EUR", "2023-12-29", 100, "externo", "deposito")
+    insert_transfer(conn, "DEP:2", "EUR", "2024-01-03", 200, "externo", "deposito")
+    insert_transfer(conn, "DEP:3", "EUR", "2024-01-07", 300, "externo", "deposito")
+    insert_transfer(conn, "DEP:4", "EUR", "2024-05-20", 400, "externo", "deposito")
+    conn.commit()
+  finally:
+    conn.close()
+
+  client = TestClient(app)
+  week = client.get("/transfers/series?interval=week&from_date=2024-01-01").json()["series"]["EUR"]
+  assert [(pt["date"], pt["amount"], pt["cumulative"]) for pt in week] == [("2024-01-01", 500, 500), ("2024-05-20", 400, 900)]
+  quarter = client.get("/transfers/series?interval=quarter&to_date=2024-03-31").json()["series"]["EUR"]
+  assert [(pt["date"], pt["amount"]) for pt in quarter] == [("2023-10-01", 100), ("2024-01-01", 500)]
+  year = client.get("/transfers/series?interval=year").json()["series"]["EUR"]
+  assert [(pt["date"], pt["cumulative"]) for pt in year] == [("2023-01-01", 100), ("2024-01-01", 1000)]
@@ -74,12 +74,37 @@ describe('DataService opciones desde backend', () => {
 
     await (service as any).syncTradesFromBackend();
 
-    expect(fetchSpy).toHaveBeenCalledWith(jasmine.stringMatching(/\/trades$/));
+    expect(fetchSpy).toHaveBeenCalledWith(jasmine.stringMatching(/\/trades\?limit=1000$/));
+    expect(fetchSpy).toHaveBeenCalledWith(jasmine.stringMatching(/\/trades\?asset_class=OPT&fields=.*raw_json&limit=1000$/));
     const options = service.options();
     expect(options.length).toBe(1);
     expect(options[0].OptionID).toBe('OPT-1');
     expect(options[0].underlying).toBe('AAPL');
   });
+
+  it('aplica sólo los cambios de /changes desde el último seq', async () => {
+    service.trades.set([{ TradeID: 'STK-1', Ticker: 'AAPL', Quantity: 10, PurchasePrice: 100, DateTime: new Date('2024-01-09') }]);
+    service.dividends.set([{ ActionID: 'DIV-1', CurrencyPrimary: 'USD', DateTime: new Date('2024-01-05'), Amount: 1, Tax: 0 }]);
+    (service as any).changeSeq = 7;
+    const delta = {
+      seq: 9, current: 9, since: 7, reset: false, more: false,
+      changes: {
+        trades: { upserted: [{ trade_id: 'STK-2', ticker: 'MSFT', quantity: 1, purchase: 300, datetime: '2024-01-10T00:00:00', asset_class: 'STK' }], deleted: [] },
+        transfers: { upserted: [], deleted: [] },
+        dividends: { upserted: [], deleted: ['DIV-1'] }
+      }
+    };
+    const fetchSpy = jasmine.createSpy('fetch').and.returnValue(Promise.resolve({ ok: true, json: async () => delta }));
+    (globalThis as any).fetch = fetchSpy;
+
+    await (service as any).syncChangesFromBackend();
+
+    expect(fetchSpy).toHaveBeenCalledTimes(1);
+    expect(fetchSpy).toHaveBeenCalledWith(jasmine.stringMatching(/\/changes\?since=7&raw=true&limit=1000$/));
+    expect(service.trades().map(t => t.TradeID)).toEqual(['STK-1', 'STK-2']);
+    expect(service.dividends().length).toBe(0);
+    expect((service as any).changeSeq).toBe(9);
+  });
 });
 
 describe('DataService health/init', () => {
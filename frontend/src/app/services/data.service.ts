@@ -54,6 +54,8 @@ export class DataService {
   private tradeIds = new Set<string>();
   private transferIds = new Set<string>();
   private dividendIds = new Set<string>();
+  /** Último seq de /changes aplicado; null obliga a recargar los listados completos. */
+  private changeSeq: number | null = null;
   private priceErrorShown = new Set<string>();
 
   constructor(private toast: ToastService) {}
@@ -103,9 +105,7 @@ export class DataService {
     this.transferIds.clear();
     this.dividendIds.clear();
     await this.loadConfig();
-    await this.syncTransfersFromBackend();
-    await this.syncTradesFromBackend();
-    await this.syncDividendsFromBackend();
+    await this.reloadAllFromBackend();
   }
 
   // CSV helpers
@@ -282,8 +282,7 @@ export class DataService {
     const payload = this.normalizeRowsForBackend(data);
     await this.importTradesToBackend(payload as any);
     await this.importTransfersFromBackendPayload(payload as any);
-    await this.syncTradesFromBackend();
-    await this.syncTransfersFromBackend();
+    await this.syncChangesFromBackend();
   }
 
   async importTradesCsv(files: FileList){
@@ -298,8 +297,7 @@ export class DataService {
     try {
       await this.apiPostRaw('/import/trades', body, 'text/plain');
       this.toast.success(`Importación enviada (${arr.length} archivo/s).`);
-      await this.syncTradesFromBackend();
-      await this.syncTransfersFromBackend();
+      await this.syncChangesFromBackend();
     } catch (error:any) {
       console.error('importTradesCsv', error);
       const msg = typeof error === 'string' ? error : error?.message || 'Error al importar CSV.';
@@ -312,7 +310,7 @@ export class DataService {
     try {
       const payload = this.normalizeRowsForBackend(rows);
       await this.apiPost('/import/transfers', { rows: payload });
-      await this.syncTransfersFromBackend();
+      await this.syncChangesFromBackend();
       this.toast.success(`Transferencias importadas (backend): ${rows.length}.`);
     } catch (error:any) {
       console.error('importTransfersFromBackendPayload', error);
@@ -333,7 +331,7 @@ export class DataService {
     try {
       const payload = this.normalizeRowsForBackend(rows);
       await this.apiPost('/import/dividends', { rows: payload });
-      await this.syncDividendsFromBackend();
+      await this.syncChangesFromBackend();
       this.toast.success(`Dividendos importados (backend): ${rows.length} (ign: ${dupCount}).`);
     } catch (error:any) {
       console.error('importDividends', error);
@@ -555,9 +553,7 @@ export class DataService {
       this.transferIds.clear();
       this.dividendIds.clear();
       this.priceErrorShown.clear();
-      await this.syncTransfersFromBackend();
-      await this.syncTradesFromBackend();
-      await this.syncDividendsFromBackend();
+      await this.reloadAllFromBackend();
       this.toast.success('Base de datos reiniciada correctamente.');
     } catch (error:any) {
       console.error('reset backend', error);
@@ -568,23 +564,15 @@ export class DataService {
 
   private async syncTransfersFromBackend(){
     try {
-      const remote = await this.apiGet('/transfers');
+      const remote = await this.apiGetAll('/transfers');
       if (!this.backendNotified) {
         this.toast.success(`Backend disponible (${this.apiBase}).`);
         this.backendNotified = true;
       }
       if (!Array.isArray(remote) || !remote.length) return;
-      const mapped = remote.map(item => ({
-        TransactionID: String(item.transaction_id || item.transactionId || ''),
-        CurrencyPrimary: String(item.currency || '').toUpperCase(),
-        DateTime: item.datetime ? new Date(item.datetime) : new Date(),
-        Amount: Number(item.amount) || 0,
-        origin: (item.origin || 'externo'),
-        kind: (item.kind || 'desconocido')
-      })).filter(r => r.TransactionID && r.CurrencyPrimary);
+      const mapped = remote.map(item => this.mapTransferRow(item)).filter(r => r.TransactionID && r.CurrencyPrimary);
       if (!mapped.length) return;
-      this.transfers.set(mapped);
-      this.transferIds = new Set(mapped.map(r => String(r.TransactionID)));
+      this.setTransfers(mapped);
       this.toast.info(`Transferencias sincronizadas desde el backend (${mapped.length}).`);
     } catch (error) {
       console.error('syncTransfersFromBackend', error);
@@ -593,24 +581,12 @@ export class DataService {
   }
   private async syncTradesFromBackend(){
     try {
-      const remote = await this.apiGet('/trades');
+      // Sin raw_json: sólo las opciones lo necesitan y se piden aparte
+      const remote = await this.apiGetAll('/trades');
       if (!Array.isArray(remote)) return;
-      const mapped = remote.map(item => ({
-        TradeID: item.trade_id,
-        Ticker: item.ticker || '',
-        Quantity: Number(item.quantity) || 0,
-        PurchasePrice: Number(item.purchase) || 0,
-        DateTime: item.datetime ? new Date(item.datetime) : null,
-        Commission: typeof item.commission === 'number' ? item.commission : null,
-        CommissionCurrency: item.commission_currency || undefined,
-        CurrencyPrimary: item.currency || undefined,
-        ISIN: item.isin || undefined,
-        AssetClass: item.asset_class || undefined
-      }));
-      this.trades.set(mapped);
-      this.tradeIds = new Set(mapped.map(r => String(r.TradeID||'')));
-      this.tradeKeys = new Set(mapped.map(r => `${r.Ticker}|${r.Quantity}|${r.PurchasePrice}`));
-      const options = remote
+      this.setTrades(remote.map(item => this.mapTradeRow(item)));
+      const optionRows = await this.apiGetAll('/trades?asset_class=OPT&fields=trade_id,ticker,quantity,purchase,datetime,currency,asset_class,raw_json');
+      const options = (Array.isArray(optionRows) ? optionRows : [])
         .filter((item:any) => (item.asset_class || '').toUpperCase() === 'OPT')
         .map((item:any) => this.mapOptionFromTrade(item))
         .filter((o:any) => o.OptionID && o.DateTime instanceof Date);
@@ -623,26 +599,137 @@ export class DataService {
 
   private async syncDividendsFromBackend(){
     try {
-      const remote = await this.apiGet('/dividends');
+      const remote = await this.apiGetAll('/dividends');
       if (!Array.isArray(remote)) return;
-      const mapped = remote.map(item => ({
-        ActionID: item.action_id,
-        Ticker: item.ticker || '',
-        CurrencyPrimary: (item.currency || '').toString().toUpperCase(),
-        DateTime: item.datetime ? new Date(item.datetime) : null,
-        Amount: Number(item.amount) || 0,
-        Tax: typeof item.tax === 'number' ? item.tax : 0,
-        IssuerCountryCode: item.issuer_country || '',
-        GrossAmount: typeof item.gross === 'number' ? item.gross : undefined
-      } as DividendRow));
-      this.dividends.set(mapped);
-      this.dividendIds = new Set(mapped.map(r => String(r.ActionID)));
+      this.setDividends(remote.map(item => this.mapDividendRow(item)));
     } catch (error) {
       console.error('syncDividendsFromBackend', error);
       this.toast.warning('No se pudo sincronizar los dividendos del backend.');
     }
   }
 
+  private mapTransferRow(item:any): TransferRow {
+    return {
+      TransactionID: String(item.transaction_id || item.transactionId || ''),
+      CurrencyPrimary: String(item.currency || '').toUpperCase(),
+      DateTime: item.datetime ? new Date(item.datetime) : new Date(),
+      Amount: Number(item.amount) || 0,
+      origin: (item.origin || 'externo'),
+      kind: (item.kind || 'desconocido')
+    } as TransferRow;
+  }
+
+  private mapTradeRow(item:any): TradeRow {
+    return {
+      TradeID: item.trade_id,
+      Ticker: item.ticker || '',
+      Quantity: Number(item.quantity) || 0,
+      PurchasePrice: Number(item.purchase) || 0,
+      DateTime: item.datetime ? new Date(item.datetime) : null,
+      Commission: typeof item.commission === 'number' ? item.commission : null,
+      CommissionCurrency: item.commission_currency || undefined,
+      CurrencyPrimary: item.currency || undefined,
+      ISIN: item.isin || undefined,
+      AssetClass: item.asset_class || undefined
+    };
+  }
+
+  private mapDividendRow(item:any): DividendRow {
+    return {
+      ActionID: item.action_id,
+      Ticker: item.ticker || '',
+      CurrencyPrimary: (item.currency || '').toString().toUpperCase(),
+      DateTime: item.datetime ? new Date(item.datetime) : null,
+      Amount: Number(item.amount) || 0,
+      Tax: typeof item.tax === 'number' ? item.tax : 0,
+      IssuerCountryCode: item.issuer_country || '',
+      GrossAmount: typeof item.gross === 'number' ? item.gross : undefined
+    } as DividendRow;
+  }
+
+  private setTransfers(rows: TransferRow[]){
+    this.transfers.set(rows);
+    this.transferIds = new Set(rows.map(r => String(r.TransactionID)));
+  }
+
+  private setTrades(rows: TradeRow[]){
+    this.trades.set(rows);
+    this.tradeIds = new Set(rows.map(r => String(r.TradeID||'')));
+    this.tradeKeys = new Set(rows.map(r => `${r.Ticker}|${r.Quantity}|${r.PurchasePrice}`));
+  }
+
+  private setDividends(rows: DividendRow[]){
+    this.dividends.set(rows);
+    this.dividendIds = new Set(rows.map(r => String(r.ActionID)));
+  }
+
+  /** Recarga completa de los listados; guarda antes el seq actual para que el siguiente delta no pierda cambios. */
+  private async reloadAllFromBackend(){
+    try {
+      const head = await this.apiGet('/changes');
+      const seq = Number(head?.seq);
+      this.changeSeq = Number.isFinite(seq) ? seq : null;
+    } catch (_) {
+      this.changeSeq = null;
+    }
+    await this.syncTransfersFromBackend();
+    await this.syncTradesFromBackend();
+    await this.syncDividendsFromBackend();
+  }
+
+  /** Aplica sólo los cambios desde el último seq; sin seq o con base recreada recarga todo. */
+  private async syncChangesFromBackend(){
+    if (this.changeSeq === null) {
+      await this.reloadAllFromBackend();
+      return;
+    }
+    try {
+      let more = true;
+      while (more) {
+        const delta = await this.apiGet(`/changes?since=${this.changeSeq}&raw=true&limit=1000`);
+        if (!delta || delta.reset || !Number.isFinite(Number(delta.seq))) {
+          await this.reloadAllFromBackend();
+          return;
+        }
+        this.applyChanges(delta.changes || {});
+        this.changeSeq = Number(delta.seq);
+        more = !!delta.more;
+      }
+    } catch (error) {
+      console.error('syncChangesFromBackend', error);
+      await this.reloadAllFromBackend();
+    }
+  }
+
+  private applyChanges(changes: any){
+    const byDate = (a: { DateTime?: Date|null }, b: { DateTime?: Date|null }) =>
+      (a.DateTime?.getTime() ?? 0) - (b.DateTime?.getTime() ?? 0);
+    const touched = (delta: any, key: string) => new Set<string>([
+      ...(delta.deleted || []).map((k:any) => String(k)),
+      ...(delta.upserted || []).map((r:any) => String(r[key]))
+    ]);
+    if (changes.transfers) {
+      const gone = touched(changes.transfers, 'transaction_id');
+      const added = (changes.transfers.upserted || []).map((r:any) => this.mapTransferRow(r)).filter((r:TransferRow) => r.TransactionID && r.CurrencyPrimary);
+      this.setTransfers([...this.transfers().filter(r => !gone.has(String(r.TransactionID))), ...added].sort(byDate));
+    }
+    if (changes.trades) {
+      const gone = touched(changes.trades, 'trade_id');
+      const upserted = changes.trades.upserted || [];
+      this.setTrades([...this.trades().filter(r => !gone.has(String(r.TradeID||''))), ...upserted.map((r:any) => this.mapTradeRow(r))].sort(byDate));
+      const options = upserted
+        .filter((item:any) => (item.asset_class || '').toUpperCase() === 'OPT')
+        .map((item:any) => this.mapOptionFromTrade(item))
+        .filter((o:any) => o.OptionID && o.DateTime instanceof Date);
+      this.options.set([...this.options().filter(o => !gone.has(String(o.OptionID))), ...options].sort(byDate));
+    }
+    if (changes.dividends) {
+      const gone = touched(changes.dividends, 'action_id');
+      const added = (changes.dividends.upserted || []).map((r:any) => this.mapDividendRow(r));
+      this.setDividends([...this.dividends().filter(r => !gone.has(String(r.ActionID))), ...added].sort(byDate));
+    }
+  }
+
   private async importTradesToBackend(rows:TradeRow[]){
     if (!rows.length) return;
     try {
@@ -776,6 +863,26 @@ export class DataService {
     return resp.json();
   }
 
+  /** Recorre un listado paginado por cursor (cabecera X-Next-Cursor) y concatena todas las páginas. */
+  private async apiGetAll(path: string, pageSize = 1000){
+    const rows: any[] = [];
+    let cursor: string | null = null;
+    do {
+      const sep = path.includes('?') ? '&' : '?';
+      const url = `${this.apiBase}${path}${sep}limit=${pageSize}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`;
+      const resp = await fetch(url);
+      if (!resp.ok) {
+        const detail = await resp.text();
+        throw new Error(detail || `Error al solicitar ${path}`);
+      }
+      const page = await resp.json();
+      if (!Array.isArray(page)) return page;
+      rows.push(...page);
+      cursor = resp.headers?.get?.('X-Next-Cursor') ?? null;
+    } while (cursor);
+    return rows;
+  }
+
   private async apiPost(path: string, body?:any){
     const resp = await fetch(`${this.apiBase}${path}`, {
       method: 'POST',